@@ -1,18 +1,72 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, abort
+import re
+import time
+import uuid
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify
 from datetime import datetime
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from models import db
+from database import init_db
+from ledger import (
+    ensure_campaign_rows,
+    load_campaign_totals,
+    load_currency_totals,
+    record_pending_donation,
+    complete_donation,
+    is_donation_pending,
+    snapshot_rate
+)
+from fx import get_rate_table
+from ratelimit import rate_limited, client_ip
+from mailer import enqueue_mail, dedupe_key_for, start_mail_sender
+from reconcile import start_reconciler
+from recurring import create_pledge, start_pledge_scheduler
+from idempotency import run_once
+from timings import timing_window
+from logs import SAMPLED, bind_reference, init_logging
+from tracing import Tracer, link_reference
+from assets import AssetManifest
+from critical_css import CriticalCSS
+from imaging import ImageResizer
+from media import MediaStore
+from offline import ServiceWorker
+from sharecards import ShareCards
+from hints import EarlyHints, preconnect, preload
+from health import HEALTH_ENDPOINTS, HealthMonitor, run_probe
+from feed import DonationFeed, notify_donation, time_ago
+from reporting import ReportingAdmin
+from impact import ImpactMetrics, ensure_opening_impact, opening_events
+from migrations import upgrade as upgrade_database
+from money import Money
 
 # Import payment functions from your existing payments.py
 from payments import (
     initialize_paystack_payment, 
     verify_paystack_payment, 
-    test_paystack_connection,
+    handle_paystack_webhook,
     format_amount
 )
 
 app = Flask(__name__)
 app.config.from_object(Config)
+init_logging(app)
+tracer = Tracer(app)
+init_db(app)
+
+assets = AssetManifest(app)
+critical = CriticalCSS(app)
+images = ImageResizer(app)
+media = MediaStore(app)
+service_worker = ServiceWorker(app)
+share_cards = ShareCards(app)
+hints = EarlyHints(app)
+health = HealthMonitor(app)
+feed = DonationFeed(app)
+reports = ReportingAdmin(app)
+
+if app.config['PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'], x_proto=app.config['PROXY_COUNT'])
 
 # Static campaign data (no database needed)
 CAMPAIGNS = {
@@ -27,8 +81,8 @@ CAMPAIGNS = {
         
         This program alleviated immediate financial burdens and food insecurity while fostering hope and dignity among vulnerable mothers and families.
         ''',
-        'goal_amount': 4000000,  # ₦4,000,000
-        'raised_amount': 1950000,  # ₦1,950,000
+        'goal_amount': 4000000 * 100,  # ₦4,000,000 in kobo
+        'raised_amount': 1950000 * 100,  # ₦1,950,000 in kobo
         'currency': 'NGN',
         'main_image': 'campaigns/kubwa-hospital-outreach/main.jpg',
         'gallery_images': [
@@ -38,7 +92,7 @@ CAMPAIGNS = {
             'campaigns/kubwa-hospital-outreach/gallery-4.jpg',
             'campaigns/kubwa-hospital-outreach/gallery-5.jpg'
         ],
-        'impact_stats': {
+        'opening_impact': {  # Recorded once as impact events (see impact.py)
             'families_helped': 50,
             'bills_settled': 20,
             'food_bags_distributed': 200,
@@ -58,8 +112,8 @@ CAMPAIGNS = {
         
         The involvement of community leaders and the Nigerian Police Force Utako Division was instrumental in ensuring a smooth and safe experience for all participants. The event successfully attracted diverse attendees and strengthened community ties through shared experiences of joy and giving.
         ''',
-        'goal_amount': 1500000,  # ₦1,500,000
-        'raised_amount': 1050000,  # ₦1,050,000
+        'goal_amount': 1500000 * 100,  # ₦1,500,000 in kobo
+        'raised_amount': 1050000 * 100,  # ₦1,050,000 in kobo
         'currency': 'NGN',
         'main_image': 'campaigns/utako-food-drive/main.jpg',
         'gallery_images': [
@@ -69,7 +123,7 @@ CAMPAIGNS = {
             'campaigns/utako-food-drive/gallery-4.jpg',
             'campaigns/utako-food-drive/gallery-5.jpg'
         ],
-        'impact_stats': {
+        'opening_impact': {  # Recorded once as impact events (see impact.py)
             'families_served': 150,
             'food_packs_distributed': 200,
             'children_participated': 75,
@@ -91,8 +145,8 @@ CAMPAIGNS = {
         
         Our goal is to make a lasting impact on the lives of these young women through education, mentorship, and targeted welfare initiatives.
         ''',
-        'goal_amount': 2500000,  # ₦2,500,000
-        'raised_amount': 1000000,  # ₦1,000,000
+        'goal_amount': 2500000 * 100,  # ₦2,500,000 in kobo
+        'raised_amount': 1000000 * 100,  # ₦1,000,000 in kobo
         'currency': 'NGN',
         'main_image': 'campaigns/ss3-scholarship-program/main.jpg',
         'gallery_images': [
@@ -102,7 +156,7 @@ CAMPAIGNS = {
             'campaigns/ss3-scholarship-program/gallery-4.jpg',
             'campaigns/ss3-scholarship-program/gallery-5.jpg'
         ],
-        'impact_stats': {
+        'opening_impact': {  # Recorded once as impact events (see impact.py)
             'students_supported': 120,
             'exam_fees_sponsored': 85,
             'sensitization_sessions': 12,
@@ -113,15 +167,22 @@ CAMPAIGNS = {
     }
 }
 
+# Serve one copy of each photo however many times it was uploaded
+media.rewrite_campaign_images(CAMPAIGNS)
+
 # Foundation statistics
 FOUNDATION_STATS = {
     'total_campaigns': 3,
-    'total_raised': 4000000,  # ₦4,000,000
-    'lives_impacted': 320,    # Sum of all people helped across campaigns
+    'total_raised': 4000000 * 100,  # ₦4,000,000 in kobo
+    'currency': 'NGN',
+    'lives_impacted': 0,      # People helped across campaigns, kept up to date by impact.py
     'communities_served': 3,
     'active_volunteers': 25
 }
 
+# Impact totals, precomputed for the templates; keeps FOUNDATION_STATS['lives_impacted'] current
+impact = ImpactMetrics(app, FOUNDATION_STATS)
+
 # Partner organizations
 PARTNERS = [
     {
@@ -138,6 +199,161 @@ PARTNERS = [
     }
 ]
 
+# CAMPAIGN TOTALS (database aggregates, refreshed into the static campaign data)
+_totals_loaded_at = 0.0
+
+# Totals across all campaigns in the display currency, precomputed so pages never convert at render time
+CAMPAIGN_SUMMARY = {
+    'currency': Config.DISPLAY_CURRENCY,
+    'total_goal': 0,
+    'total_raised': 0
+}
+
+def update_display_totals():
+    """Convert every campaign's goal and raised amount into the display currency"""
+    rates = get_rate_table()
+    display_currency = app.config['DISPLAY_CURRENCY']
+    total_goal = 0
+    total_raised = 0
+    for campaign_data in CAMPAIGNS.values():
+        currency = campaign_data['currency']
+        total_goal += rates.convert(Money(campaign_data['goal_amount'], currency), display_currency).amount
+        total_raised += rates.convert(Money(campaign_data['raised_amount'], currency), display_currency).amount
+    
+    CAMPAIGN_SUMMARY.update(currency=display_currency, total_goal=total_goal, total_raised=total_raised)
+    FOUNDATION_STATS['total_raised'] = total_raised
+    FOUNDATION_STATS['currency'] = display_currency
+
+def refresh_campaign_totals():
+    """Copy raised amounts from the Campaign aggregates into CAMPAIGNS and FOUNDATION_STATS"""
+    global _totals_loaded_at
+    totals = load_campaign_totals()
+    currency_totals = load_currency_totals()
+    for campaign_id, campaign_data in CAMPAIGNS.items():
+        if campaign_id in totals:
+            campaign_data['raised_amount'] = totals[campaign_id]
+        campaign_data['raised_by_currency'] = currency_totals.get(campaign_id, {})
+    update_display_totals()
+    impact.load(CAMPAIGNS)
+    share_cards.update(CAMPAIGNS)
+    _totals_loaded_at = time.monotonic()
+
+def init_database():
+    """Create tables, seed missing campaign rows and load the current totals"""
+    with app.app_context():
+        try:
+            applied = upgrade_database()
+            for description in applied:
+                app.logger.info("Applied migration: %s", description)
+            ensure_campaign_rows(CAMPAIGNS)
+            ensure_opening_impact(CAMPAIGNS)
+            refresh_campaign_totals()
+            feed.rebuild(CAMPAIGNS)
+        except Exception as e:
+            app.logger.error("Database initialization failed, using static totals: %s", e)
+            update_display_totals()
+            # A later step may have failed after the rollups were loaded: don't add on top of them
+            impact.apply(opening_events(CAMPAIGNS), replace=True)
+            share_cards.update(CAMPAIGNS)
+
+@app.before_request
+def refresh_stale_totals():
+    """Pick up aggregates written by other processes (e.g. the donation importer)"""
+    global _totals_loaded_at
+    if request.endpoint in HEALTH_ENDPOINTS:
+        return
+    if time.monotonic() - _totals_loaded_at < app.config['CAMPAIGN_TOTALS_TTL']:
+        return
+    try:
+        refresh_campaign_totals()
+    except Exception as e:
+        _totals_loaded_at = time.monotonic()  # Don't retry on every request
+        app.logger.error("Failed to refresh campaign totals: %s", e)
+
+init_database()
+
+@app.before_request
+def start_background_workers():
+    """Start per-process background threads on the first request (after any fork)"""
+    start_mail_sender(app)
+    start_reconciler(app)
+    start_pledge_scheduler(app)
+    share_cards.start()
+    health.start()
+
+@app.after_request
+def cache_fingerprinted_assets(response):
+    """Fingerprinted static URLs never change content, so let browsers keep them forever"""
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+@health.warm_up
+def warm_up(before_fork=False):
+    """Build everything workers would otherwise build on first use.
+
+    Called once in the gunicorn master (preload_app, before_fork=True) so the
+    results live in memory shared copy-on-write by every forked worker, or by
+    the health prober when nothing warmed the process up front. Until it has
+    run, /readyz reports the worker as not ready.
+    """
+    assets.load()
+    critical.load()
+    get_rate_table().as_of
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+    
+    if before_fork:
+        # Never hand open database sockets to forked workers; when already serving, keep the pool
+        with app.app_context():
+            db.engine.dispose()
+
+@app.route('/media/<name>')
+def media_file(name):
+    """A unique campaign image by content hash, e.g. /media/3f2a...e1.jpg"""
+    return media.serve(name)
+
+@app.route('/img/<path:filename>')
+def resized_image(filename):
+    """Resized copy of a static image, e.g. /img/campaigns/x/main.jpg?w=480&fmt=webp"""
+    return images.serve(filename)
+
+# EARLY HINTS: critical resources per page beyond the shell (see hints.py)
+@hints.page('index')
+def index_hints():
+    return [preload(assets.asset_url('images/hero-main.jpg'), 'image')]
+
+@hints.page('about')
+def about_hints():
+    return [preload(assets.asset_url('images/about-hero.jpg'), 'image')]
+
+@hints.page('campaigns')
+def campaigns_hints():
+    # The first slide of the listing's hero
+    return [preload(images.image_url(CAMPAIGNS[1]['main_image'], 1280), 'image')]
+
+@hints.page('campaign')
+def campaign_hints(campaign_id):
+    if campaign_id not in CAMPAIGNS:
+        return []
+    image = CAMPAIGNS[campaign_id]['main_image']
+    return [
+        # Same candidates as the hero <img> in campaign.html, so the preload is reused
+        preload(images.image_url(image, 1280), 'image',
+                imagesrcset=images.image_srcset(image, [640, 960, 1280, 1920]),
+                imagesizes='(min-width: 1024px) 60vw, 100vw'),
+        # donate.js loads the Paystack inline script, which opens checkout in an iframe
+        preconnect('https://js.paystack.co'),
+        preconnect('https://checkout.paystack.com')
+    ]
+
+@hints.page('contact')
+def contact_hints():
+    return []
+
 # HOME PAGE
 @app.route('/')
 def index():
@@ -173,19 +389,14 @@ def campaigns():
         campaign_with_progress['progress_percentage'] = (campaign['raised_amount'] / campaign['goal_amount']) * 100 if campaign['goal_amount'] > 0 else 0
         all_campaigns.append(campaign_with_progress)
     
-    # Calculate additional stats for campaigns page
-    total_goal = sum(campaign['goal_amount'] for campaign in all_campaigns)
-    total_raised = sum(campaign['raised_amount'] for campaign in all_campaigns)
-    total_supporters = sum(campaign['impact_stats'].get('families_helped', 0) + 
-                          campaign['impact_stats'].get('families_served', 0) +
-                          campaign['impact_stats'].get('students_supported', 0) 
-                          for campaign in all_campaigns)
-    
+    # Calculate additional stats for campaigns page (money totals are precomputed in the display currency,
+    # people helped from the impact rollups)
     campaigns_stats = {
         'total_campaigns': len(all_campaigns),
-        'total_goal': total_goal,
-        'total_raised': total_raised,
-        'total_supporters': total_supporters
+        'total_goal': CAMPAIGN_SUMMARY['total_goal'],
+        'total_raised': CAMPAIGN_SUMMARY['total_raised'],
+        'currency': CAMPAIGN_SUMMARY['currency'],
+        'total_supporters': impact.people_helped()
     }
     
     return render_template('campaigns.html', 
@@ -233,10 +444,141 @@ def contact():
     
     return render_template('contact.html', contact=contact_info)
 
+EMAIL_PATTERN = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
+
+def contact_email():
+    """Normalised sender email from the contact form, for per-sender rate limits"""
+    data = request.get_json(silent=True) or request.form
+    email = (data.get('email') or '').strip().lower()
+    return email or None
+
+def validate_contact_form(data):
+    """Return (cleaned message, errors) for a contact form submission"""
+    message = {
+        'first_name': (data.get('first_name') or '').strip()[:50],
+        'last_name': (data.get('last_name') or '').strip()[:50],
+        'email': (data.get('email') or '').strip()[:254],
+        'phone': (data.get('phone') or '').strip()[:30],
+        'subject': (data.get('subject') or '').strip()[:100],
+        'message': (data.get('message') or '').strip()[:5000],
+        'referrer': (data.get('referrer') or '').strip()[:300]
+    }
+    errors = {}
+    if len(message['first_name']) < 2:
+        errors['first_name'] = 'Please enter your name'
+    if not EMAIL_PATTERN.match(message['email']):
+        errors['email'] = 'Please enter a valid email address'
+    if not message['subject']:
+        errors['subject'] = 'Please select a subject'
+    if len(message['message']) < 10:
+        errors['message'] = 'Please enter a message of at least 10 characters'
+    return message, errors
+
+def contact_dedupe_key(message, now=None):
+    """Identical submissions within the same hour share a key and are sent once; a later follow-up is new"""
+    hour = (now or datetime.utcnow()).strftime('%Y-%m-%d %H')
+    return dedupe_key_for('contact', message['email'], message['subject'], message['message'], hour)
+
+# CONTACT FORM SUBMISSION
+@app.route('/contact', methods=['POST'])
+@rate_limited(('contact_ip', client_ip), ('contact_email', contact_email), redirect_to=lambda: url_for('contact'))
+def contact_submit():
+    """Validate a contact message and queue it for delivery (no SMTP in the request)"""
+    wants_json = request.is_json
+    data = request.get_json(silent=True) or request.form
+    
+    # Honeypot field: real visitors never see or fill it
+    if data.get('website'):
+        app.logger.warning("Contact form honeypot triggered from %s", client_ip())
+        return jsonify(success=True) if wants_json else redirect(url_for('contact'))
+    
+    message, errors = validate_contact_form(data)
+    if errors:
+        if wants_json:
+            return jsonify(success=False, error='Please fix the errors in the form', errors=errors), 400
+        for error in errors.values():
+            flash(error, 'error')
+        return redirect(url_for('contact'))
+    
+    try:
+        enqueue_mail(
+            'contact',
+            app.config['CONTACT_RECIPIENT'],
+            f"[Website] {message['subject']} - {message['first_name']} {message['last_name']}".strip(),
+            render_template('email/contact_message.txt', message=message),
+            dedupe_key=contact_dedupe_key(message),
+            reply_to=message['email']
+        )
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Failed to queue contact message: %s", e)
+        if wants_json:
+            return jsonify(success=False, error='Unable to send your message right now. Please try again.'), 500
+        flash('Unable to send your message right now. Please try again.', 'error')
+        return redirect(url_for('contact'))
+    
+    if wants_json:
+        return jsonify(success=True)
+    flash("Thank you for reaching out. We'll get back to you within 24 hours.", 'success')
+    return redirect(url_for('contact'))
+
+def queue_donation_receipt(verification):
+    """Queue a receipt email for a verified donation (once per reference)"""
+    email = verification.get('customer_email')
+    if not email:
+        return
+    campaign_id = verification.get('campaign_id')
+    campaign_data = CAMPAIGNS.get(int(campaign_id)) if campaign_id else None
+    enqueue_mail(
+        'receipt',
+        email,
+        'Thank you for your donation to the Blak Shepard Foundation',
+        render_template('email/donation_receipt.txt', donation=verification,
+                        campaign=campaign_data or {'title': 'the Blak Shepard Foundation'}),
+        dedupe_key=f"receipt:{verification['reference']}"
+    )
+
+def donor_email():
+    """Normalised donor email from the submitted form, for per-donor rate limits"""
+    email = (request.form.get('email') or '').strip().lower()
+    return email or None
+
+def donation_idempotency_key(campaign_id, email, amount):
+    """Key identifying repeats of one donation: the form's token, or donor + campaign + amount"""
+    token = request.form.get('idempotency_key')
+    if token:
+        return dedupe_key_for('donation-form', token, email, campaign_id, amount.amount, amount.currency)
+    return dedupe_key_for('donation', email, campaign_id, amount.amount, amount.currency)
+
+def donation_form_page():
+    """Page to return a throttled donor to"""
+    campaign_id = request.form.get('campaign_id', type=int)
+    if campaign_id in CAMPAIGNS:
+        return url_for('campaign', campaign_id=campaign_id)
+    return url_for('campaigns')
+
+def wants_json_response():
+    """True when the client (e.g. donate.js) asked for JSON instead of redirects"""
+    return request.accept_mimetypes.best == 'application/json'
+
 # PAYMENT PROCESSING - FIXED VERSION
 @app.route('/process-donation', methods=['POST'])
+@rate_limited(('donation_ip', client_ip), ('donation_email', donor_email), redirect_to=donation_form_page)
 def process_donation():
-    """Handle donation form submission and redirect to Paystack"""
+    """Handle donation form submission and redirect to Paystack.
+
+    With Accept: application/json (inline checkout in donate.js) the Paystack
+    access code is returned instead, so the payment sheet opens in place.
+    """
+    wants_json = wants_json_response()
+    campaign_id = None
+    
+    def fail(message, redirect_url, status=400):
+        if wants_json:
+            return jsonify(success=False, error=message), status
+        flash(message, 'error')
+        return redirect(redirect_url)
+    
     try:
         # Get form data
         campaign_id = int(request.form.get('campaign_id'))
@@ -244,34 +586,33 @@ def process_donation():
         
         # Validate email
         if not email:
-            flash('Email address is required for donation receipt', 'error')
-            return redirect(url_for('campaign', campaign_id=campaign_id))
+            return fail('Email address is required for donation receipt', url_for('campaign', campaign_id=campaign_id))
+        
+        currency = request.form.get('currency', 'NGN')
         
-        # Handle custom amount or preset amount
+        # Handle custom amount or preset amount (converted exactly to minor units)
         if request.form.get('amount') == 'custom':
-            amount = float(request.form.get('custom_amount', 0))
+            amount = Money.from_major(request.form.get('custom_amount', 0), currency)
         else:
-            amount = float(request.form.get('amount', 0))
-            
-        currency = request.form.get('currency', 'NGN')
+            amount = Money.from_major(request.form.get('amount', 0), currency)
         
         # Validate campaign exists
         if campaign_id not in CAMPAIGNS:
-            flash('Invalid campaign selected', 'error')
-            return redirect(url_for('campaigns'))
+            return fail('Invalid campaign selected', url_for('campaigns'))
         
         # Validate input
-        if amount <= 0:
-            flash('Please enter a valid donation amount', 'error')
-            return redirect(url_for('campaign', campaign_id=campaign_id))
+        if amount.amount <= 0:
+            return fail('Please enter a valid donation amount', url_for('campaign', campaign_id=campaign_id))
         
-        if currency == 'NGN' and amount < 100:
-            flash('Minimum donation amount is ₦100', 'error')
-            return redirect(url_for('campaign', campaign_id=campaign_id))
+        if currency == 'NGN' and amount < Money.from_major(100, 'NGN'):
+            return fail('Minimum donation amount is ₦100', url_for('campaign', campaign_id=campaign_id))
         
         # Get campaign info
         campaign_data = CAMPAIGNS[campaign_id]
         
+        # Snapshot the FX rate at donation time (raises ValueError if we have no rate)
+        fx_rate = snapshot_rate(currency, campaign_data['currency'])
+        
         # Create donation data dictionary (NOT Transaction object)
         donation_data = {
             'amount': amount,
@@ -279,28 +620,78 @@ def process_donation():
             'campaign_id': campaign_id,
             'campaign_title': campaign_data['title'],
             'email': email,
-            'callback_url': url_for('paystack_callback', _external=True)
+            'callback_url': url_for('paystack_callback', _external=True),
+            'recurring': request.form.get('recurring') == 'monthly'
         }
         
-        # Initialize Paystack payment (using your existing function)
-        result = initialize_paystack_payment(donation_data)
+        def initialize():
+            # Initialize Paystack payment (using your existing function)
+            result = initialize_paystack_payment(donation_data)
+            if result['success']:
+                try:
+                    record_pending_donation(result['reference'], campaign_id, amount,
+                                            campaign_data['currency'], fx_rate)
+                except Exception as e:
+                    # The callback records the donation from Paystack's data if this fails
+                    db.session.rollback()
+                    app.logger.error("Failed to record pending donation %s: %s", result['reference'], e)
+            return result
+        
+        # Duplicate submissions wait for, then reuse, the first initialization
+        started = time.perf_counter()
+        result, replayed = run_once(donation_idempotency_key(campaign_id, email, amount), initialize,
+                                    is_valid=lambda response: is_donation_pending(response['reference']))
+        initialize_ms = (time.perf_counter() - started) * 1000
         
         if result['success']:
-            app.logger.info(f"Redirecting to Paystack: {result.get('authorization_url')}")
+            bind_reference(result['reference'])
+            link_reference(result['reference'])
+            if replayed:
+                app.logger.info("Reusing Paystack initialization %s for a duplicate submission",
+                                result['reference'], extra=SAMPLED)
+            if wants_json:
+                response = jsonify(
+                    success=True,
+                    reference=result['reference'],
+                    access_code=result['access_code'],
+                    authorization_url=result['authorization_url'],
+                    verify_url=url_for('verify_donation', reference=result['reference'])
+                )
+                response.headers['Server-Timing'] = f'initialize;dur={initialize_ms:.1f}'
+                return response
+            app.logger.info("Redirecting to Paystack: %s", result.get('authorization_url'), extra=SAMPLED)
             return redirect(result['authorization_url'])
         else:
-            app.logger.error(f"Payment initialization failed: {result.get('error')}")
-            flash(f"Payment failed: {result.get('error', 'Unknown error')}", 'error')
-            return redirect(url_for('donate_error'))
+            app.logger.error("Payment initialization failed: %s", result.get('error'))
+            return fail(f"Payment failed: {result.get('error', 'Unknown error')}", url_for('donate_error'), 502)
             
     except ValueError as e:
-        app.logger.error(f"Invalid amount: {str(e)}")
-        flash('Please enter a valid amount', 'error')
-        return redirect(url_for('campaign', campaign_id=campaign_id))
+        app.logger.error("Invalid amount: %s", e)
+        if campaign_id is None:
+            return fail('Invalid campaign selected', url_for('campaigns'))
+        return fail('Please enter a valid amount', url_for('campaign', campaign_id=campaign_id))
     except Exception as e:
-        app.logger.error(f"Donation processing error: {str(e)}")
-        flash('An error occurred processing your donation. Please try again.', 'error')
-        return redirect(url_for('donate_error'))
+        app.logger.error("Donation processing error: %s", e)
+        return fail('An error occurred processing your donation. Please try again.', url_for('donate_error'), 500)
+
+def finalize_donation(reference):
+    """Verify a donation with Paystack and record it; return the verification result"""
+    result = verify_paystack_payment(reference)
+    if result['success']:
+        try:
+            if complete_donation(reference, result['amount'], result['currency'], result.get('campaign_id')):
+                refresh_campaign_totals()
+                notify_donation(app)
+            if result.get('recurring') and create_pledge(result):
+                app.logger.info("Started a monthly pledge from %s", reference)
+            queue_donation_receipt(result)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Failed to record completed donation %s: %s", reference, e)
+        app.logger.info("Transaction %s completed successfully", reference)
+    else:
+        app.logger.error("Payment verification failed for reference: %s", reference)
+    return result
 
 # PAYMENT CALLBACK (using your existing callback logic)
 @app.route('/paystack/callback')
@@ -312,24 +703,77 @@ def paystack_callback():
         flash('Invalid payment response', 'error')
         return redirect(url_for('donate_error'))
     
-    app.logger.info(f"Processing Paystack callback for reference: {reference}")
+    bind_reference(reference)
+    link_reference(reference)
+    app.logger.info("Processing Paystack callback for reference: %s", reference, extra=SAMPLED)
     
-    # Verify payment with Paystack (using your existing function)
-    result = verify_paystack_payment(reference)
+    if finalize_donation(reference)['success']:
+        return redirect(url_for('donate_success', transaction_id=reference))
+    flash('Payment verification failed', 'error')
+    return redirect(url_for('donate_error'))
+
+@app.route('/paystack/webhook', methods=['POST'])
+def paystack_webhook():
+    """Paystack charge.success events: record donations whose donor never returned to the callback.
+
+    Recurring charges carry their pledge_id and are recorded with the link;
+    the scheduler's batch then only confirms them (see record_pledge_charges).
+    """
+    result = handle_paystack_webhook(request)
+    if result.get('error') == 'Invalid signature':
+        return '', 401
+    if result['success']:
+        link_reference(result['reference'])
+        try:
+            if complete_donation(result['reference'], result['amount'], result['currency'], result.get('campaign_id'),
+                                 result.get('pledge_id')):
+                refresh_campaign_totals()
+                notify_donation(app)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Failed to record webhook donation %s: %s", result['reference'], e)
+            return '', 500  # Paystack retries
+    return '', 200
+
+@app.route('/donate/verify/<reference>', methods=['POST'])
+def verify_donation(reference):
+    """JSON verification for the inline checkout once the payment sheet reports success"""
+    if not reference.startswith('BSF_'):
+        return jsonify(success=False, error='Unknown reference'), 404
+    link_reference(reference)
     
+    result = finalize_donation(reference)
     if result['success']:
-        app.logger.info(f"Transaction {reference} completed successfully")
-        return redirect(url_for('donate_success', transaction_id=reference))
-    else:
-        app.logger.error(f"Payment verification failed for reference: {reference}")
-        flash('Payment verification failed', 'error')
-        return redirect(url_for('donate_error'))
+        return jsonify(success=True, redirect_url=url_for('donate_success', transaction_id=reference))
+    return jsonify(success=False, error=result.get('error', 'Payment verification failed'),
+                   redirect_url=url_for('donate_error')), 402
+
+def record_checkout_timing(mode, duration_ms):
+    """Add a click-to-payment-sheet sample and log the percentiles every 50 samples"""
+    window = timing_window(f'checkout_{mode}')
+    window.add(duration_ms)
+    if window.total % 50 == 0:
+        app.logger.info("Checkout timing (%s): %s", mode, window.summary())
+
+@app.route('/donate/timing', methods=['POST'])
+def checkout_timing():
+    """Client-reported time from clicking Donate to the payment sheet appearing"""
+    data = request.get_json(silent=True) or {}
+    try:
+        duration = float(data.get('duration_ms'))
+    except (TypeError, ValueError):
+        return '', 400
+    mode = data.get('mode') if data.get('mode') in ('inline', 'redirect') else 'unknown'
+    if 0 <= duration < 600000:
+        record_checkout_timing(mode, duration)
+    return '', 204
 
 # SUCCESS PAGE
 # SUCCESS PAGE - FIXED VERSION
 @app.route('/donate/success/<transaction_id>')
 def donate_success(transaction_id):
     """Payment success page with real transaction data"""
+    link_reference(transaction_id)
     
     # Verify the payment again to get actual transaction details
     verification_result = verify_paystack_payment(transaction_id)
@@ -338,7 +782,8 @@ def donate_success(transaction_id):
         # Use real transaction data from Paystack
         transaction_info = {
             'transaction_id': transaction_id,
-            'amount': verification_result['amount'],  # Real amount from Paystack
+            'amount': verification_result['amount'],  # Real amount from Paystack (minor units)
+            'amount_major': Money(verification_result['amount'], verification_result['currency']).major,
             'currency': verification_result['currency'],
             'completed_at': datetime.now(),  # You could also use verification_result['transaction_date']
             'status': 'success'
@@ -357,7 +802,7 @@ def donate_success(transaction_id):
                              campaign=campaign_data)
     else:
         # If verification fails, redirect to error page
-        app.logger.error(f"Transaction verification failed for success page: {transaction_id}")
+        app.logger.error("Transaction verification failed for success page: %s", transaction_id)
         flash('Unable to verify transaction details', 'error')
         return redirect(url_for('donate_error'))
     
@@ -370,13 +815,13 @@ def donate_error():
 # TEST PAYSTACK CONNECTION (using your existing function)
 @app.route('/test-paystack')
 def test_paystack():
-    """Test Paystack connection"""
-    result = test_paystack_connection()
+    """Show the latest Paystack health probe (probing once if none has run yet)"""
+    result = health.results.get('paystack') or run_probe(app, 'paystack')
     
-    if result['success']:
-        flash(f"Paystack connected successfully! {result['message']}", 'success')
+    if result['ok']:
+        flash(f"Paystack connected successfully! ({result['latency_ms']:.0f} ms)", 'success')
     else:
-        flash(f"Paystack connection failed: {result['message']}", 'error')
+        flash(f"Paystack connection failed: {result['error']}", 'error')
     
     return redirect(url_for('index'))
 
@@ -387,7 +832,7 @@ def not_found_error(error):
 
 @app.errorhandler(500)
 def internal_error(error):
-    app.logger.error(f"Server Error: {error}")
+    app.logger.error("Server Error: %s", error)
     return render_template('404.html'), 500
 
 # TEMPLATE FILTERS (using your existing format_amount function)
@@ -406,7 +851,14 @@ def percentage_filter(value, decimals=1):
     except (ValueError, TypeError):
         return "0.0%"
 
+app.add_template_filter(time_ago, 'time_ago')
+
 # TEMPLATE GLOBALS
+@app.template_global()
+def idempotency_token():
+    """Fresh token for a form, so resubmissions of the same render are recognised"""
+    return uuid.uuid4().hex
+
 @app.template_global()
 def get_foundation_stats():
     """Make foundation stats available to all templates"""
@@ -419,7 +871,7 @@ if __name__ == '__main__':
     
     print("🌟 Blak Shepherd Foundation Server Starting...")
     print(f"📊 {FOUNDATION_STATS['total_campaigns']} campaigns loaded")
-    print(f"💰 ₦{FOUNDATION_STATS['total_raised']:,} total raised")
+    print(f"💰 {format_amount(FOUNDATION_STATS['total_raised'], FOUNDATION_STATS['currency'])} total raised")
     print(f"👥 {FOUNDATION_STATS['lives_impacted']} lives impacted")
     print(f"🤝 {len(PARTNERS)} partner organizations")
     print("💳 Paystack integration ready (Direct HTTP)")
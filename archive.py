@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Black Shepherd Foundation - Ledger Archival
+Keeps the Transaction table hot: settled donations older than
+ARCHIVE_AFTER_DAYS are moved, a whole month at a time, into gzipped JSON
+lines files under ARCHIVE_DIR (one file per month, every column kept).
+
+- Only settled rows (success, failed) move; pending ones stay for the
+  reconciler. A month is archived once its end is older than the age limit,
+  keyed like the exports on completed_at (created_at if never completed).
+- Each file is written and fsynced first; the rows are then deleted and the
+  file recorded in transaction_archive in one transaction. A crash in
+  between leaves a file that is not recorded; it is ignored and removed by
+  the next run, and the rows are archived again.
+- Aggregates are untouched: campaign totals, per-currency ledgers and the
+  reporting rollups are maintained on their own, and rebuilding the rollups
+  reads archived months too.
+- ledger_partitions() unions archived and live rows for reports and
+  exports, archived months first. Archived months are closed: the importer
+  rejects rows dated in them, so an old file re-imported is never counted
+  twice.
+
+Run it from cron (e.g. nightly); benchmark_archive.py measures the effect.
+
+Usage:
+    python archive.py run [--dry-run]     # archive every month past ARCHIVE_AFTER_DAYS
+    python archive.py list                # archived months
+    python archive.py verify              # check every file against its checksum and row count
+    python archive.py restore 2023-01     # move a month back into the ledger
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import DateTime, Numeric, delete, func, insert, inspect, select
+from leader import make_holder_id, release_lease, try_acquire_lease
+from ledger import period_start
+from models import db, Campaign, Transaction, TransactionArchive
+
+ARCHIVE_STATUSES = ('success', 'failed')
+COLUMNS = tuple(column.name for column in Transaction.__table__.columns)
+_DATETIME_COLUMNS = {column.name for column in Transaction.__table__.columns if isinstance(column.type, DateTime)}
+_DECIMAL_COLUMNS = {column.name for column in Transaction.__table__.columns if isinstance(column.type, Numeric)}
+_MOMENT = func.coalesce(Transaction.completed_at, Transaction.created_at)
+LEASE_SECONDS = 6 * 3600  # Longest an archive run may take before another can start
+
+def archive_dir():
+    """Where archive files live: ARCHIVE_DIR, or archive/ in the instance folder"""
+    return current_app.config['ARCHIVE_DIR'] or os.path.join(current_app.instance_path, 'archive')
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+def archive_cutoff(after_days, now=None):
+    """Months starting before this are archivable: the first month not wholly older than after_days"""
+    return period_start((now or datetime.utcnow()) - timedelta(days=after_days), 'month')
+
+def archive_horizon(session=None):
+    """End of the newest archived month (rows before it may be archived), or None"""
+    latest = (session or db.session).scalar(select(func.max(TransactionArchive.month)))
+    return next_month(latest) if latest else None
+
+def encode(row):
+    """A Transaction row as one JSON line"""
+    record = {}
+    for name in COLUMNS:
+        value = row[name]
+        if value is not None and name in _DATETIME_COLUMNS:
+            value = value.isoformat()
+        elif value is not None and name in _DECIMAL_COLUMNS:
+            value = str(value)
+        record[name] = value
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+def decode(line):
+    """Column values from one archived JSON line"""
+    record = json.loads(line)
+    for name in _DATETIME_COLUMNS:
+        if record.get(name):
+            record[name] = datetime.fromisoformat(record[name])
+    for name in _DECIMAL_COLUMNS:
+        if record.get(name) is not None:
+            record[name] = Decimal(record[name])
+    return record
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _settled_before(cutoff):
+    return Transaction.status.in_(ARCHIVE_STATUSES), _MOMENT < cutoff
+
+def archivable(cutoff):
+    """(rows, oldest moment) of settled transactions before cutoff"""
+    return db.session.execute(select(func.count(), func.min(_MOMENT)).where(*_settled_before(cutoff))).one()
+
+def remove_orphans(directory=None):
+    """Delete archive files that were never recorded (a run interrupted before its commit)"""
+    directory = directory or archive_dir()
+    recorded = set(db.session.execute(select(TransactionArchive.path)).scalars())
+    removed = 0
+    for root, _, files in os.walk(os.path.join(directory, 'transactions')):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), directory)
+            if relative not in recorded:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+class _MonthWriter:
+    """One month's archive file while it is being written"""
+
+    def __init__(self, directory, month):
+        self.month = month
+        self.relative = os.path.join('transactions', f'{month:%Y}', f'{month:%Y-%m}-{uuid.uuid4().hex[:8]}.jsonl.gz')
+        self.path = os.path.join(directory, self.relative)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Rows arrive in primary key order; each line is prefixed with its export order for finish()
+        self.unsorted = gzip.open(f'{self.path}.unsorted', 'wt', encoding='utf-8', compresslevel=1)
+        self.rows = self.successes = 0
+        self.first_id = self.last_id = None
+
+    def write(self, row):
+        self.unsorted.write(f"{row['moment']:%Y-%m-%dT%H:%M:%S.%f} {row['id']:015d}\t{encode(row)}")
+        self.rows += 1
+        self.successes += row['status'] == 'success'
+        self.first_id = row['id'] if self.first_id is None else min(self.first_id, row['id'])
+        self.last_id = row['id'] if self.last_id is None else max(self.last_id, row['id'])
+
+    def finish(self):
+        """Write the rows in export order (completion time, then id), fsync and move the file into place.
+
+        Sorting holds one month of lines in memory.
+        """
+        self.unsorted.close()
+        with gzip.open(f'{self.path}.unsorted', 'rt', encoding='utf-8') as f:
+            lines = sorted(f)
+        with gzip.open(f'{self.path}.tmp', 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.writelines(line.split('\t', 1)[1] for line in lines)
+        with open(f'{self.path}.tmp', 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(f'{self.path}.tmp', self.path)
+        os.remove(f'{self.path}.unsorted')
+
+    def discard(self):
+        self.unsorted.close()
+        for leftover in (f'{self.path}.unsorted', f'{self.path}.tmp', self.path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+def _move_month(writer, batch_size):
+    """Delete a written month from the ledger and record its file, in one transaction"""
+    month = writer.month
+    in_month = (*_settled_before(next_month(month)), _MOMENT >= month)
+    deleted = 0
+    for low in range(writer.first_id, writer.last_id + 1, batch_size):
+        deleted += db.session.execute(
+            delete(Transaction).where(Transaction.id.between(low, min(low + batch_size - 1, writer.last_id)),
+                                      *in_month)
+        ).rowcount
+    if deleted != writer.rows:
+        raise RuntimeError(f'{month:%Y-%m} changed while archiving ({deleted} rows to delete, {writer.rows} written)')
+    part = TransactionArchive(month=month, path=writer.relative, row_count=writer.rows,
+                              success_count=writer.successes, first_id=writer.first_id, last_id=writer.last_id,
+                              byte_size=os.path.getsize(writer.path), sha256=_sha256(writer.path))
+    db.session.add(part)
+    db.session.commit()
+    return part
+
+def archive(after_days, directory=None, batch_size=5000, now=None):
+    """Archive every month wholly older than after_days; return the new TransactionArchive rows.
+
+    One pass over the ledger in primary key order writes every month's file,
+    then each month is deleted and recorded in its own transaction.
+    """
+    directory = directory or archive_dir()
+    holder = make_holder_id()
+    if not try_acquire_lease('archive', holder, LEASE_SECONDS):
+        current_app.logger.warning("Another archive run holds the lease; skipping")
+        return []
+    writers = {}
+    try:
+        removed = remove_orphans(directory)
+        if removed:
+            current_app.logger.warning("Removed %d unrecorded archive files", removed)
+        cutoff = archive_cutoff(after_days, now)
+        last_id = db.session.scalar(select(func.max(Transaction.id))) or 0
+        after_id = 0
+        while after_id < last_id:
+            upper = min(after_id + batch_size, last_id)
+            rows = db.session.execute(
+                select(Transaction.__table__, _MOMENT.label('moment'))
+                .where(Transaction.id > after_id, Transaction.id <= upper, *_settled_before(cutoff))
+                .order_by(Transaction.id)
+            ).mappings()
+            for row in rows:
+                month = period_start(row['moment'], 'month')
+                if month not in writers:
+                    writers[month] = _MonthWriter(directory, month)
+                writers[month].write(row)
+            after_id = upper
+        db.session.rollback()  # End the read before the deletes
+
+        parts = []
+        for month in sorted(writers):
+            writer = writers.pop(month)
+            try:
+                writer.finish()
+                parts.append(_move_month(writer, batch_size))
+            except BaseException:
+                db.session.rollback()
+                writer.discard()
+                raise
+            current_app.logger.info("Archived %d transactions from %s", writer.rows, f'{month:%Y-%m}')
+        return parts
+    finally:
+        for writer in writers.values():
+            writer.discard()
+        release_lease('archive', holder)
+
+def read_part(path, directory=None):
+    """Column values of every row in one archived file (path relative to the archive directory)"""
+    with gzip.open(os.path.join(directory or archive_dir(), path), 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield decode(line)
+
+def archived_rows(start=None, end=None, campaign_id=None, status=None, directory=None, conn=None):
+    """Archived transactions, filtered like export_transactions_query (status None or 'all' for every one).
+
+    Successful rows are filtered on completed_at and the rest on created_at.
+    Reads through conn if given (e.g. inside a migration), else the session.
+    """
+    if status not in ARCHIVE_STATUSES + (None, 'all'):
+        return  # Pending rows are never archived
+    executor = conn if conn is not None else db.session
+    if not inspect(executor.connection() if conn is None else conn).has_table(TransactionArchive.__tablename__):
+        return
+    paths = select(TransactionArchive.path).order_by(TransactionArchive.month, TransactionArchive.id)
+    if start is not None:
+        paths = paths.where(TransactionArchive.month >= period_start(start, 'month'))
+    if end is not None and status == 'success':
+        paths = paths.where(TransactionArchive.month < end)
+    moment = 'completed_at' if status == 'success' else 'created_at'
+    for path in executor.execute(paths).scalars().all():
+        for record in read_part(path, directory):
+            if status not in (None, 'all') and record['status'] != status:
+                continue
+            if campaign_id is not None and record['campaign_id'] != campaign_id:
+                continue
+            when = record[moment] or record['created_at']
+            if (start is not None and when < start) or (end is not None and when >= end):
+                continue
+            yield record
+
+def ledger_partitions(start=None, end=None, campaign_id=None, status='success', batch_size=2000):
+    """Rows of export_transactions_query from the archive and then the live ledger, batch_size at a time.
+
+    Archived months all precede the live rows, except pending rows created
+    before the archive horizon (status 'all'), which follow them.
+    """
+    from ledger import export_transactions_query
+
+    campaign_currencies = dict(db.session.execute(select(Campaign.id, Campaign.currency)).all())
+    batch = []
+    for record in archived_rows(start, end, campaign_id, status):
+        batch.append((
+            record['transaction_id'], record['campaign_id'], record['status'], record['amount'],
+            record['currency'], record['campaign_amount'], campaign_currencies.get(record['campaign_id']),
+            record['fx_rate'], record['payment_method'], record['pledge_id'], record['created_at'],
+            record['completed_at']
+        ))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+    query = export_transactions_query(start, end, campaign_id, status)
+    yield from db.session.execute(query.execution_options(yield_per=batch_size)).partitions()
+
+def verify(directory=None):
+    """[(part, problem)] for every archived file that is missing or does not match its record"""
+    problems = []
+    for part in db.session.execute(select(TransactionArchive).order_by(TransactionArchive.month)).scalars():
+        path = os.path.join(directory or archive_dir(), part.path)
+        if not os.path.exists(path):
+            problems.append((part, 'missing'))
+        elif _sha256(path) != part.sha256:
+            problems.append((part, 'checksum mismatch'))
+        elif sum(1 for _ in read_part(part.path, directory)) != part.row_count:
+            problems.append((part, 'row count mismatch'))
+    return problems
+
+def restore_month(month, directory=None, batch_size=5000):
+    """Move an archived month back into the ledger; return the number of rows restored"""
+    directory = directory or archive_dir()
+    parts = db.session.execute(select(TransactionArchive).where(TransactionArchive.month == month)).scalars().all()
+    restored = 0
+    for part in parts:
+        batch = []
+        for record in read_part(part.path, directory):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                db.session.execute(insert(Transaction), batch)
+                restored += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Transaction), batch)
+            restored += len(batch)
+        db.session.delete(part)
+    db.session.commit()
+    for part in parts:
+        os.remove(os.path.join(directory, part.path))
+    return restored
+
+def main():
+    from app import app
+
+    parser = argparse.ArgumentParser(description='Move settled months of the ledger into archive files')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='archive every month past ARCHIVE_AFTER_DAYS')
+    run_parser.add_argument('--dry-run', action='store_true', help='only list the months that would move')
+    commands.add_parser('list', help='list archived months')
+    commands.add_parser('verify', help='check every archive file')
+    restore_parser = commands.add_parser('restore', help='move a month back into the ledger')
+    restore_parser.add_argument('month', type=lambda value: datetime.strptime(value, '%Y-%m'))
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.command == 'run':
+            cutoff = archive_cutoff(app.config['ARCHIVE_AFTER_DAYS'])
+            if args.dry_run:
+                rows, oldest = archivable(cutoff)
+                since = f" since {oldest:%Y-%m}" if oldest else ''
+                print(f"🗄️  {rows:,} settled transactions before {cutoff:%Y-%m} to archive{since}")
+                return
+            parts = archive(app.config['ARCHIVE_AFTER_DAYS'], batch_size=app.config['ARCHIVE_BATCH_SIZE'])
+            rows = sum(part.row_count for part in parts)
+            print(f"✅ Archived {rows:,} transactions from {len(parts)} months before {cutoff:%Y-%m}")
+        elif args.command == 'list':
+            parts = db.session.execute(select(TransactionArchive).order_by(TransactionArchive.month)).scalars()
+            print(f"🗄️  Archived months in {archive_dir()}")
+            for part in parts:
+                print(f"   {part.month:%Y-%m}  {part.row_count:>10,} rows  {part.byte_size / 1024:>10,.0f} KB  {part.path}")
+        elif args.command == 'verify':
+            problems = verify()
+            for part, problem in problems:
+                print(f"❌ {part.month:%Y-%m} {part.path}: {problem}")
+            if problems:
+                raise SystemExit(1)
+            print("✅ Every archive file matches its record")
+        else:
+            restored = restore_month(args.month, batch_size=app.config['ARCHIVE_BATCH_SIZE'])
+            print(f"✅ Restored {restored:,} transactions from {args.month:%Y-%m}")
+
+if __name__ == '__main__':
+    main()
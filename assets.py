@@ -0,0 +1,92 @@
+"""
+Static asset manifest.
+
+Maps every file under static/ to a short content hash so templates can emit
+fingerprinted URLs (/static/css/main.css?v=1a2b3c4d) that browsers may cache
+forever. The manifest is built once (python assets.py writes
+static/manifest.json) or computed at startup if the file is missing, and is
+shared by the server, the templates and any tooling that needs the asset list.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = 'manifest.json'
+IGNORED_NAMES = {'.DS_Store', MANIFEST_NAME, 'media-index.json'}
+
+def file_hash(path, length=12):
+    """Short SHA-256 content hash of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+def build_manifest(static_folder):
+    """Walk static_folder and return {relative path: {'hash', 'size'}}"""
+    manifest = {}
+    for root, _, files in os.walk(static_folder):
+        for name in sorted(files):
+            if name in IGNORED_NAMES or name.startswith('.'):
+                continue
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            manifest[relative] = {'hash': file_hash(path), 'size': os.path.getsize(path)}
+    return manifest
+
+def write_manifest(static_folder):
+    """Build the manifest and save it next to the assets"""
+    manifest = build_manifest(static_folder)
+    path = os.path.join(static_folder, MANIFEST_NAME)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return manifest
+
+def load_manifest(static_folder):
+    """Load static/manifest.json, or build the manifest in memory if it has not been generated"""
+    path = os.path.join(static_folder, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return build_manifest(static_folder)
+
+class AssetManifest:
+    """Lazily loaded manifest bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.entries = None
+        self.app = app
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['asset_manifest'] = self
+        app.add_template_global(self.asset_url, 'asset_url')
+
+    def load(self):
+        """Load (or reload) the manifest; safe to call in the gunicorn master before forking"""
+        self.entries = load_manifest(self.app.static_folder)
+        return self.entries
+
+    def get(self, filename):
+        if self.entries is None:
+            self.load()
+        return self.entries.get(filename)
+
+    def asset_url(self, filename):
+        """Fingerprinted static URL for templates"""
+        from flask import url_for
+        entry = self.get(filename)
+        if entry is None:
+            return url_for('static', filename=filename)
+        return url_for('static', filename=filename, v=entry['hash'])
+
+if __name__ == '__main__':
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    manifest = write_manifest(static_folder)
+    total = sum(entry['size'] for entry in manifest.values())
+    print(f"✅ Wrote {MANIFEST_NAME}: {len(manifest)} assets, {total / 1024 / 1024:.1f} MB")
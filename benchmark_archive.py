@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark ledger archival: latency of the hot Transaction queries on a
+seeded ledger of five years of donations, before and after archiving every
+settled month older than a year (see archive.py).
+
+Usage:
+    python benchmark_archive.py [rows] [database_url]
+
+Defaults to 10,000,000 rows in a temporary SQLite file; seeding that many
+takes a while, so pass a smaller count for a quick run. Pass a throwaway
+PostgreSQL URL to benchmark there instead. Each query is run several times
+and the median reported.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import func, insert, select, text
+from archive import archive, archived_rows
+from config import Config
+from database import init_db
+from ledger import (
+    export_transactions_query, pending_transactions_query, recent_donations_query, successful_totals_query
+)
+from migrations import upgrade
+from models import db, Campaign, Transaction
+
+CAMPAIGN_COUNT = 20
+YEARS = 5
+RUNS = 7
+
+def make_app(database_url, archive_dir):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['ARCHIVE_DIR'] = archive_dir
+    init_db(app)
+    return app
+
+def seed(rows, chunk_size=50_000):
+    """Donations spread evenly over YEARS years: mostly successful, some failed, a few pending"""
+    for campaign_id in range(1, CAMPAIGN_COUNT + 1):
+        if db.session.get(Campaign, campaign_id) is None:
+            db.session.add(Campaign(id=campaign_id, title=f'Archive bench {campaign_id}', description='Seeded',
+                                    goal_amount=10**12, raised_amount=0, currency='NGN'))
+    db.session.commit()
+
+    random.seed(47)
+    span = YEARS * 365 * 86400
+    start = datetime.utcnow() - timedelta(seconds=span)
+    for offset in range(0, rows, chunk_size):
+        batch = []
+        for i in range(offset, min(offset + chunk_size, rows)):
+            created_at = start + timedelta(seconds=span * i // rows)
+            status = random.choices(('success', 'failed', 'pending'), weights=(90, 8, 2))[0]
+            amount = random.randint(1000, 5000000) * 100
+            batch.append({
+                'transaction_id': f'ARCH_{i}', 'campaign_id': random.randint(1, CAMPAIGN_COUNT),
+                'amount': amount, 'currency': 'NGN', 'fx_rate': 1, 'campaign_amount': amount,
+                'payment_method': 'paystack', 'status': status, 'created_at': created_at,
+                'completed_at': created_at + timedelta(minutes=2) if status != 'pending' else None
+            })
+        db.session.execute(insert(Transaction), batch)
+        db.session.commit()
+
+def hot_queries(rows):
+    """(label, callable) for the queries the site and its jobs run against the live ledger"""
+    now = datetime.utcnow()
+    reference = f'ARCH_{rows - 10}'
+    return [
+        ('Lookup by reference', lambda: db.session.execute(
+            select(Transaction.status).where(Transaction.transaction_id == reference)).all()),
+        ('Recent donations (20)', lambda: db.session.execute(recent_donations_query(20)).all()),
+        ('Pending due for re-verification', lambda: db.session.execute(
+            pending_transactions_query(now - timedelta(minutes=30), 100)).all()),
+        ('Successful totals for one campaign', lambda: db.session.execute(successful_totals_query(7)).all()),
+        ('Export of the last 30 days', lambda: db.session.execute(
+            export_transactions_query(start=now - timedelta(days=30))).all()),
+        ('Failed donations this year (no index)', lambda: db.session.scalar(
+            select(func.count()).where(Transaction.status == 'failed',
+                                       Transaction.created_at >= now - timedelta(days=365)))),
+        ('Count of the ledger', lambda: db.session.scalar(select(func.count()).select_from(Transaction)))
+    ]
+
+def measure(rows):
+    timings = {}
+    for label, query in hot_queries(rows):
+        samples = []
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            query()
+            samples.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+        timings[label] = statistics.median(samples)
+    return timings
+
+def database_size(database_url):
+    if database_url.startswith('sqlite:///'):
+        return os.path.getsize(database_url[len('sqlite:///'):])
+    return db.session.scalar(text('SELECT pg_database_size(current_database())'))
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    url = sys.argv[2] if len(sys.argv) > 2 else None
+
+    print(f"⏱️  Ledger archive benchmark ({rows:,} donations over {YEARS} years)")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = url or f"sqlite:///{os.path.join(tmp, 'archive.db')}"
+        app = make_app(url, os.path.join(tmp, 'archive'))
+        with app.app_context():
+            upgrade()
+            started = time.perf_counter()
+            seed(rows)
+            print(f"🌱 Seeded in {time.perf_counter() - started:.1f}s")
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+            size_before = database_size(url)
+            before = measure(rows)
+
+            started = time.perf_counter()
+            parts = archive(365, batch_size=app.config['ARCHIVE_BATCH_SIZE'])
+            elapsed = time.perf_counter() - started
+            archived = sum(part.row_count for part in parts)
+            compressed = sum(part.byte_size for part in parts)
+            print(f"🗄️  Archived {archived:,} rows ({len(parts)} months) in {elapsed:.1f}s "
+                  f"({archived / elapsed:,.0f} rows/s) into {compressed / 2**20:,.1f} MB of files")
+            if url.startswith('sqlite'):
+                db.session.commit()
+                with db.engine.connect() as conn:
+                    conn.execution_options(isolation_level='AUTOCOMMIT').execute(text('VACUUM'))
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+            size_after = database_size(url)
+            after = measure(rows)
+
+            started = time.perf_counter()
+            cold = sum(1 for _ in archived_rows(status='success'))
+            cold_seconds = time.perf_counter() - started
+
+        print(f"\n{'Query':<40} {'Before':>10} {'After':>10}")
+        for label in before:
+            print(f"{label:<40} {before[label]:>8.2f}ms {after[label]:>8.2f}ms")
+        print(f"\n💾 Database: {size_before / 2**20:,.0f} MB -> {size_after / 2**20:,.0f} MB")
+        print(f"📖 Reading the archive: {cold:,} successful rows in {cold_seconds:.1f}s "
+              f"({cold / cold_seconds:,.0f} rows/s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark donation writes per second (record pending + complete, the two
+writes of a real donation) against one or more databases, with several
+threads sharing the tuned engine, and print the pool checkout metrics.
+
+Usage:
+    python benchmark_db_writes.py [donations] [threads] [database_url ...]
+
+Without URLs it compares a temporary SQLite file with the default rollback
+journal and with WAL. Pass a PostgreSQL URL to include it (tables are
+created if missing; benchmark rows use the BENCH_ reference prefix).
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from flask import Flask
+from config import Config
+from database import init_db, pool_stats
+from ledger import ensure_campaign_rows, record_pending_donation, complete_donation
+from models import db, Transaction
+from money import Money
+
+BENCH_CAMPAIGN = {
+    'title': 'Benchmark campaign',
+    'description': 'Rows written by benchmark_db_writes.py',
+    'goal_amount': 100_000_000 * 100,
+    'raised_amount': 0,
+    'currency': 'NGN'
+}
+
+def make_app(database_url, overrides=None):
+    """Minimal app bound to database_url with the production engine tuning"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config.update(overrides or {})
+    init_db(app)
+    with app.app_context():
+        db.create_all()
+        ensure_campaign_rows({999: BENCH_CAMPAIGN})
+    return app
+
+def write_donations(app, worker, count, run_id):
+    with app.app_context():
+        for i in range(count):
+            reference = f'BENCH_{run_id}_{worker}_{i}'
+            amount = Money(500000 + i, 'NGN')
+            record_pending_donation(reference, 999, amount, 'NGN', 1)
+            complete_donation(reference, amount.amount, 'NGN')
+        db.session.remove()
+
+def run(label, app, donations, threads):
+    run_id = int(time.time() * 1000)
+    per_thread = donations // threads
+    workers = [threading.Thread(target=write_donations, args=(app, n, per_thread, run_id)) for n in range(threads)]
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        stats = pool_stats()
+        Transaction.query.filter(Transaction.transaction_id.like(f'BENCH_{run_id}_%')).delete(synchronize_session=False)
+        db.session.commit()
+
+    written = per_thread * threads
+    print(f"\n🗄️  {label}")
+    print(f"   Donations/s:  {written / elapsed:,.0f} ({written:,} in {elapsed:.2f}s, {threads} threads)")
+    print(f"   Checkouts:    {stats.get('checkouts', 0):,}, new connections {stats.get('connects', 0)}, "
+          f"peak in use {stats.get('peak_checked_out', 0)}")
+    print(f"   Wait:         avg {stats.get('wait_avg_ms', 0)} ms, max {stats.get('wait_max_ms', 0)} ms")
+    print(f"   Hold:         avg {stats.get('hold_avg_ms', 0)} ms, max {stats.get('hold_max_ms', 0)} ms")
+
+def main():
+    donations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    urls = sys.argv[3:]
+
+    print(f"⏱️  Donation write benchmark ({donations:,} donations)")
+    print("=" * 50)
+
+    if urls:
+        for url in urls:
+            run(url.split('@')[-1], make_app(url), donations, threads)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rollback_journal = make_app(f"sqlite:///{os.path.join(tmp, 'delete.db')}",
+                                    {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'})
+        run('SQLite, rollback journal (synchronous=FULL)', rollback_journal, donations, threads)
+        wal = make_app(f"sqlite:///{os.path.join(tmp, 'wal.db')}")
+        run('SQLite, WAL (synchronous=NORMAL)', wal, donations, threads)
+
+if __name__ == '__main__':
+    main()
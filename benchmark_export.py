@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark the donation export: rows per second and peak memory of the
+streamed export (server-side cursor, yield_per) against loading every row
+first, over a temporary ledger of synthetic donations.
+
+Usage:
+    python benchmark_export.py [rows] [database_url]
+
+Each export runs in its own process so peak RSS is measured separately;
+output goes to /dev/null. Without a URL a temporary SQLite file is seeded.
+Pass a PostgreSQL URL to seed (BENCH_ references) and export there instead.
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import insert
+from config import Config
+from database import init_db
+from ledger import ensure_campaign_rows, export_transactions_query
+from models import db, Transaction
+from reporting import EXPORT_FORMATS, export_batches
+
+BENCH_CAMPAIGN = {
+    'title': 'Benchmark campaign',
+    'description': 'Rows written by benchmark_export.py',
+    'goal_amount': 100_000_000 * 100,
+    'raised_amount': 0,
+    'currency': 'NGN'
+}
+
+def make_app(database_url):
+    """Minimal app bound to database_url with the production engine tuning"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    init_db(app)
+    return app
+
+def seed(app, rows):
+    with app.app_context():
+        db.create_all()
+        ensure_campaign_rows({999: BENCH_CAMPAIGN})
+        start = datetime.utcnow() - timedelta(days=365)
+        for offset in range(0, rows, 10000):
+            db.session.execute(insert(Transaction), [{
+                'transaction_id': f'BENCH_{n}', 'campaign_id': 999, 'amount': 100000 + n % 997 * 50,
+                'currency': 'NGN', 'fx_rate': 1, 'campaign_amount': 100000 + n % 997 * 50,
+                'payment_method': 'paystack', 'status': 'success',
+                'created_at': start + timedelta(seconds=n * 30), 'completed_at': start + timedelta(seconds=n * 30)
+            } for n in range(offset, min(rows, offset + 10000))])
+            db.session.commit()
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def export(database_url, mode):
+    """Run one export in this process and print its measurements as JSON"""
+    app = make_app(database_url)
+    fmt = 'jsonl' if mode.endswith('jsonl') else 'csv'
+    stream, _ = EXPORT_FORMATS[fmt]
+    with app.app_context():
+        db.session.execute(db.select(1))  # Connect before measuring
+        baseline = peak_rss_mb()
+        query = export_transactions_query(campaign_id=999)
+        started = time.perf_counter()
+        rows = 0
+
+        def counted(batches):
+            nonlocal rows
+            for batch in batches:
+                rows += len(batch)
+                yield batch
+
+        if mode.startswith('stream'):
+            batches = export_batches(query, app.config['REPORT_EXPORT_BATCH_SIZE'])
+        else:
+            # The naive export: fetch every row, then write them out
+            batches = iter(list(export_batches(query, 10 ** 9)))
+        with open(os.devnull, 'w') as out:
+            for chunk in stream(counted(batches)):
+                out.write(chunk)
+        elapsed = time.perf_counter() - started
+    print(json.dumps({'rows': rows, 'seconds': elapsed, 'baseline_mb': baseline, 'peak_mb': peak_rss_mb()}))
+
+def run(database_url, mode, label):
+    output = subprocess.run([sys.executable, __file__, '--export', database_url, mode],
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"\n📤 {label}")
+    print(f"   Rows/s:    {result['rows'] / result['seconds']:,.0f} ({result['rows']:,} in {result['seconds']:.2f}s)")
+    print(f"   Peak RSS:  {result['peak_mb']:,.0f} MB ({result['peak_mb'] - result['baseline_mb']:+,.0f} MB "
+          f"over {result['baseline_mb']:,.0f} MB after start-up)")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    url = sys.argv[2] if len(sys.argv) > 2 else None
+
+    print(f"⏱️  Donation export benchmark ({rows:,} donations)")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = url or f"sqlite:///{os.path.join(tmp, 'export.db')}"
+        app = make_app(url)
+        started = time.perf_counter()
+        seed(app, rows)
+        print(f"🌱 Seeded in {time.perf_counter() - started:.1f}s")
+        try:
+            run(url, 'stream-csv', f"Streamed CSV (yield_per={Config.REPORT_EXPORT_BATCH_SIZE})")
+            run(url, 'stream-jsonl', f"Streamed JSONL (yield_per={Config.REPORT_EXPORT_BATCH_SIZE})")
+            run(url, 'all-csv', 'CSV after loading every row')
+        finally:
+            with app.app_context():
+                Transaction.query.filter(Transaction.transaction_id.like('BENCH_%')).delete(synchronize_session=False)
+                db.session.commit()
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--export':
+        export(sys.argv[2], sys.argv[3])
+    else:
+        main()
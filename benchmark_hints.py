@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark first contentful paint with and without the preload Link headers
+(hints.py) in a headless Chrome throttled to slow 3G, cache disabled.
+
+Usage:
+    python benchmark_hints.py [chrome_binary] [runs]
+
+Uses the DevTools pipe driver from benchmark_offline.py; pass the Chrome or
+chrome-headless-shell binary, or set CHROME. The development server cannot
+send 103 responses, so this measures the Link headers on the final
+response; behind a server or CDN that turns them into Early Hints the
+resources start even earlier (by the time the view takes to render).
+The service worker is switched off so every visit hits the network.
+"""
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+from benchmark_offline import DOWNLOAD, LATENCY_MS, Browser, Page
+from testing import setup_app
+
+PAGES = ('/', '/campaigns', '/campaign/1')
+
+FCP = """new Promise(done => new PerformanceObserver(list => {
+    const entry = list.getEntries().find(entry => entry.name === 'first-contentful-paint');
+    if (entry) done(entry.startTime);
+}).observe({type: 'paint', buffered: true}))"""
+
+def measure(page, url, runs):
+    """Median (FCP ms, load ms) over cold visits"""
+    paints, loads = [], []
+    for _ in range(runs):
+        page.browser.send('Network.clearBrowserCache', session=page.session)
+        loads.append(page.visit(url))
+        paints.append(page.evaluate(FCP, timeout=120))
+    return statistics.median(paints), statistics.median(loads)
+
+def main():
+    binary = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('CHROME') or next(
+        (path for path in map(shutil.which, ('chrome-headless-shell', 'chromium', 'google-chrome')) if path), None)
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    if not binary:
+        print("❌ No Chrome found; pass the binary or set CHROME")
+        return
+
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    print(f"⏱️  First contentful paint over slow 3G ({LATENCY_MS} ms, {DOWNLOAD * 8 // 1024} kbit/s), "
+          f"median of {runs}")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'hints-bench.db', SERVICE_WORKER_ENABLED='false')
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        for path in PAGES:
+            app.test_client().get(path)
+
+        profile = tempfile.mkdtemp(prefix='bench-chrome-')
+        browser = Browser(binary, profile)
+        try:
+            page = Page(browser)
+            browser.send('Network.setCacheDisabled', {'cacheDisabled': True}, session=page.session)
+            results = {}
+            for enabled in (False, True):
+                app.config['EARLY_HINTS_ENABLED'] = enabled
+                results[enabled] = {path: measure(page, base_url + path, runs) for path in PAGES}
+        finally:
+            browser.close()
+            shutil.rmtree(profile, ignore_errors=True)
+            server.shutdown()
+
+    print(f"\n{'Page':<14} {'FCP without':>12} {'FCP with':>10} {'Load without':>13} {'Load with':>10}")
+    for path in PAGES:
+        (fcp_off, load_off), (fcp_on, load_on) = results[False][path], results[True][path]
+        print(f"{path:<14} {fcp_off:>10,.0f}ms {fcp_on:>8,.0f}ms {load_off:>11,.0f}ms {load_on:>8,.0f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark logging overhead per request: the previous setup (f-strings into
+Flask's synchronous stream handler) against logs.py (lazy %-formatting, JSON
+through a queue drained by a background thread, sampling of noisy lines).
+
+Each simulated request logs what a donation redirect logs: three info lines
+and one disabled debug line with a payload. Several threads log at once into
+a sink that takes sink_latency_us per write, standing in for a busy stdout
+pipe or log shipper.
+
+Usage:
+    python benchmark_logging.py [requests] [threads] [sink_latency_us]
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from logs import SAMPLED, QueuedLogging, log_context, make_target_handler
+
+class SlowSink:
+    """File that takes latency seconds per write"""
+
+    def __init__(self, path, latency):
+        self.file = open(path, 'w')
+        self.latency = latency
+
+    def write(self, data):
+        if self.latency:
+            time.sleep(self.latency)
+        self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+def payload(reference):
+    return {'reference': reference, 'amount': 500000, 'currency': 'NGN', 'metadata': {'campaign_id': 1}}
+
+def eager_request(logger, reference):
+    logger.info(f"Initializing Paystack payment for reference: {reference}")
+    logger.debug(f"Paystack payload: {payload(reference)}")
+    logger.info(f"Paystack payment initialized successfully: {reference}")
+    logger.info(f"Redirecting to Paystack: https://checkout.paystack.com/{reference}")
+
+def lazy_request(logger, reference):
+    with log_context(request_id=reference[-8:], reference=reference):
+        logger.info("Initializing Paystack payment for reference: %s", reference, extra=SAMPLED)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Paystack payload: %s", payload(reference))
+        logger.info("Paystack payment initialized successfully: %s", reference, extra=SAMPLED)
+        logger.info("Redirecting to Paystack: https://checkout.paystack.com/%s", reference, extra=SAMPLED)
+
+def run(label, logger, log_request, requests, threads):
+    per_thread = requests // threads
+    timings = [[] for _ in range(threads)]
+
+    def work(n):
+        for i in range(per_thread):
+            started = time.perf_counter()
+            log_request(logger, f'BSF_1_{n}_{i:08x}')
+            timings[n].append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    samples = sorted(t for per_worker in timings for t in per_worker)
+    mean_us = sum(samples) / len(samples) * 1e6
+    p99_us = samples[int(len(samples) * 0.99)] * 1e6
+    print(f"   {label:<28} {mean_us:>9.1f} µs {p99_us:>10.1f} µs {len(samples) / elapsed:>10,.0f} req/s")
+    return mean_us
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = (int(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1e6
+
+    print(f"📝 Logging overhead: {requests} requests, {threads} threads, "
+          f"{latency * 1e6:.0f} µs per sink write")
+    print(f"\n   {'setup':<28} {'mean/req':>12} {'p99/req':>13} {'throughput':>14}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        current = make_target_handler('text', SlowSink(os.path.join(tmp, 'current.log'), latency))
+        baseline = run('current (sync, f-strings)', make_logger('bench.current', current),
+                       eager_request, requests, threads)
+
+        results = {}
+        for label, rate in (('queued JSON, all lines', 1.0), ('queued JSON, 10% sampled', 0.1)):
+            queued = QueuedLogging(make_target_handler('json', SlowSink(os.path.join(tmp, f'{rate}.log'), latency)),
+                                   queue_size=1_000_000, sample_rate=rate)
+            queued.start()
+            results[label] = run(label, make_logger(f'bench.queued.{rate}', queued.handler),
+                                 lazy_request, requests, threads)
+            drain_started = time.perf_counter()
+            queued.stop()
+            stats = queued.stats()
+            print(f"   {'':<28} drained in {time.perf_counter() - drain_started:.2f}s after the run, "
+                  f"{stats['dropped_sampled']:,} sampled out, {stats['dropped_full']:,} dropped")
+
+    print()
+    for label, mean_us in results.items():
+        print(f"✅ {label}: {mean_us / baseline:.0%} of the current per-request logging cost")
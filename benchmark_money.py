@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark formatting and summing donation amounts over a large ledger,
+comparing integer minor units (money.py) with the old float handling.
+
+Usage:
+    python benchmark_money.py [rows]
+"""
+import random
+import sys
+import time
+from array import array
+from money import Money, format_minor, sum_minor
+
+def timed(label, func, rows):
+    """Run func once and print throughput"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<38} {elapsed * 1000:9.1f} ms  {rows / elapsed / 1e6:7.2f} M rows/s")
+    return result
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    random.seed(42)
+
+    print(f"💰 Money benchmark over {rows:,} ledger rows")
+    print("=" * 50)
+
+    minor_list = [random.randint(10000, 50000000) for _ in range(rows)]
+    minor_array = array('q', minor_list)
+    float_list = [amount / 100 for amount in minor_list]
+    monies = [Money(amount, 'NGN') for amount in minor_list]
+
+    print("\n➕ Summation")
+    exact = timed('sum_minor(list of int)', lambda: sum_minor(minor_list), rows)
+    timed('sum_minor(array q)', lambda: sum_minor(minor_array), rows)
+    timed('Money.sum(list of Money)', lambda: Money.sum(monies, 'NGN'), rows)
+    floated = timed('sum(list of float) [old]', lambda: sum(float_list), rows)
+    drift = abs(round(floated * 100) - exact)
+    print(f"   float drift after {rows:,} rows: {drift} kobo (integer sum is exact)")
+
+    print("\n🧾 Formatting")
+    sample = minor_list[:min(rows, 200_000)]
+    sample_floats = float_list[:len(sample)]
+    timed('format_minor(int)', lambda: [format_minor(a, 'NGN') for a in sample], len(sample))
+    timed('f"{float:,.2f}" [old]', lambda: [f"₦{a:,.2f}" for a in sample_floats], len(sample))
+
+    print("\n📦 Memory per amount")
+    print(f"   array('q'): {minor_array.itemsize} bytes, Money: {sys.getsizeof(monies[0])} bytes, "
+          f"float: {sys.getsizeof(float_list[0])} bytes")
+
+if __name__ == '__main__':
+    main()
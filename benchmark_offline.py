@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark repeat visits with and without the service worker (offline.py):
+bytes served and load time of a campaign page in a headless Chrome throttled
+to a slow 3G connection, and whether the page still opens offline.
+
+Usage:
+    python benchmark_offline.py [chrome_binary]
+
+The browser is driven over the DevTools protocol on a pipe (no extra Python
+packages); pass the Chrome or chrome-headless-shell binary, or set CHROME.
+Each mode runs in a fresh profile: a first visit fills the caches, then the
+same campaign page, the campaign list and the page again are visited. Bytes
+are counted by the server, so background refreshes by the worker are
+included. Throttling is applied to the page and to the service worker.
+"""
+import json
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from testing import setup_app
+
+# Slow 3G as in Chrome DevTools (latency ms, bytes/s)
+LATENCY_MS = 400
+DOWNLOAD = 400 * 1024 // 8
+UPLOAD = 400 * 1024 // 8
+VISITS = ('/campaign/1', '/campaigns', '/campaign/1')
+
+class ByteCounter:
+    """WSGI middleware counting requests and response body bytes"""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes = 0
+        self.last_request = time.monotonic()
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.requests += 1
+            self.last_request = time.monotonic()
+        body = self.app(environ, start_response)
+        try:
+            for chunk in body:
+                with self.lock:
+                    self.bytes += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.bytes = 0
+
+    def wait_idle(self, quiet=1.0, timeout=30):
+        """Wait until no request has arrived for `quiet` seconds (background refreshes done)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and time.monotonic() - self.last_request < quiet:
+            time.sleep(0.1)
+
+class Browser:
+    """Headless Chrome spoken to over --remote-debugging-pipe (NUL-separated JSON on fds 3 and 4)"""
+
+    def __init__(self, binary, profile):
+        commands_read, self.commands = os.pipe()
+        self.results, results_write = os.pipe()
+
+        def use_pipes():
+            os.dup2(commands_read, 3)
+            os.dup2(results_write, 4)
+
+        self.process = subprocess.Popen(
+            [binary, '--headless', '--remote-debugging-pipe', f'--user-data-dir={profile}', '--no-sandbox',
+             '--no-first-run', '--disable-gpu', '--disable-background-networking', 'about:blank'],
+            preexec_fn=use_pipes, close_fds=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        os.close(commands_read)
+        os.close(results_write)
+        self.next_id = 0
+        self.pending = {}
+        self.events = queue.Queue()
+        self.lock = threading.Lock()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        buffer = b''
+        while True:
+            data = os.read(self.results, 1 << 16)
+            if not data:
+                return
+            buffer += data
+            *messages, buffer = buffer.split(b'\0')
+            for raw in messages:
+                message = json.loads(raw)
+                if 'id' in message:
+                    self.pending.pop(message['id']).put(message)
+                else:
+                    self.events.put(message)
+
+    def send(self, method, params=None, session=None, timeout=60):
+        with self.lock:
+            self.next_id += 1
+            message_id = self.next_id
+            reply = self.pending[message_id] = queue.Queue()
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session:
+            message['sessionId'] = session
+        os.write(self.commands, json.dumps(message).encode() + b'\0')
+        result = reply.get(timeout=timeout)
+        if 'error' in result:
+            raise RuntimeError(f"{method}: {result['error'].get('message')}")
+        return result.get('result', {})
+
+    def wait_for(self, method, session=None, timeout=120, on_event=None):
+        deadline = time.monotonic() + timeout
+        while True:
+            event = self.events.get(timeout=max(0.01, deadline - time.monotonic()))
+            if on_event:
+                on_event(event)
+            if event['method'] == method and (session is None or event.get('sessionId') == session):
+                return event
+
+    def close(self):
+        try:
+            self.send('Browser.close', timeout=5)
+        except Exception:
+            self.process.kill()
+        self.process.wait(timeout=10)
+
+class Page:
+    """One throttled tab, plus throttling for any service worker that starts"""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.throttled = set()
+        browser.send('Target.setDiscoverTargets', {'discover': True})
+        target = browser.send('Target.createTarget', {'url': 'about:blank'})['targetId']
+        self.session = self._attach(target)
+        browser.send('Page.enable', session=self.session)
+
+    def _attach(self, target_id):
+        session = self.browser.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})['sessionId']
+        self.browser.send('Network.enable', session=session)
+        self.browser.send('Network.emulateNetworkConditions', {
+            'offline': False, 'latency': LATENCY_MS, 'downloadThroughput': DOWNLOAD, 'uploadThroughput': UPLOAD
+        }, session=session)
+        self.throttled.add(target_id)
+        return session
+
+    def _on_event(self, event):
+        info = event.get('params', {}).get('targetInfo', {})
+        if (event['method'] == 'Target.targetCreated' and info.get('type') == 'service_worker'
+                and info['targetId'] not in self.throttled):
+            threading.Thread(target=self._attach, args=(info['targetId'],), daemon=True).start()
+
+    def visit(self, url):
+        """Navigate and return the load time in ms (navigation start to the end of the load event)"""
+        self.browser.send('Page.navigate', {'url': url}, session=self.session)
+        self.browser.wait_for('Page.loadEventFired', self.session, on_event=self._on_event)
+        # loadEventEnd is only set once the load handlers have returned
+        return self.evaluate("new Promise(done => setTimeout(() => "
+                             "done(performance.getEntriesByType('navigation')[0].loadEventEnd)))")
+
+    def evaluate(self, expression, timeout=60):
+        result = self.browser.send('Runtime.evaluate', {'expression': expression, 'awaitPromise': True,
+                                                        'returnByValue': True}, session=self.session, timeout=timeout)
+        return result['result'].get('value')
+
+def run(binary, base_url, counter, service_worker):
+    """Cold visit then the repeat visits, each (path, bytes, requests, load ms); returns (cold, repeats, page)"""
+    profile = tempfile.mkdtemp(prefix='bench-chrome-')
+    browser = Browser(binary, profile)
+    browser.profile = profile
+    try:
+        page = Page(browser)
+        counter.reset()
+        cold_ms = page.visit(base_url + VISITS[0])
+        if service_worker:
+            page.evaluate('navigator.serviceWorker.ready.then(() => true)')
+        counter.wait_idle()
+        cold = (VISITS[0], counter.bytes, counter.requests, cold_ms)
+        repeats = []
+        for path in VISITS:
+            counter.reset()
+            load_ms = page.visit(base_url + path)
+            counter.wait_idle()
+            repeats.append((path, counter.bytes, counter.requests, load_ms))
+        return cold, repeats, page
+    except Exception:
+        browser.close()
+        shutil.rmtree(profile, ignore_errors=True)
+        raise
+
+def main():
+    binary = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('CHROME') or next(
+        (path for path in map(shutil.which, ('chrome-headless-shell', 'chromium', 'google-chrome')) if path), None)
+    if not binary:
+        print("❌ No Chrome found; pass the binary or set CHROME")
+        return
+
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    print(f"⏱️  Repeat visits over slow 3G ({LATENCY_MS} ms, {DOWNLOAD * 8 // 1024} kbit/s)")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'offline-bench.db')
+        counter = ByteCounter(app.wsgi_app)
+        app.wsgi_app = counter
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        app.test_client().get(VISITS[0])
+
+        results = {}
+        for service_worker in (False, True):
+            app.config['SERVICE_WORKER_ENABLED'] = service_worker
+            cold, repeats, page = run(binary, base_url, counter, service_worker)
+            results[service_worker] = (cold, repeats, page)
+
+        print(f"\n{'Visit':<16} {'No worker':>22} {'Service worker':>22}")
+        (cold_off, repeats_off, _), (cold_on, repeats_on, page_on) = results[False], results[True]
+        rows = [('first ' + cold_off[0], cold_off, cold_on)] + [
+            (f'then {off[0]}', off, on) for off, on in zip(repeats_off, repeats_on)]
+        for label, off, on in rows:
+            print(f"{label:<16} {off[1] / 1024:>8,.1f} KB {off[3]:>8,.0f} ms {on[1] / 1024:>8,.1f} KB {on[3]:>8,.0f} ms")
+        total_off = sum(row[1] for row in repeats_off)
+        total_on = sum(row[1] for row in repeats_on)
+        print(f"\n📉 Repeat visits: {total_off / 1024:,.1f} KB -> {total_on / 1024:,.1f} KB served; "
+              f"{sum(row[3] for row in repeats_off):,.0f} -> {sum(row[3] for row in repeats_on):,.0f} ms to load")
+
+        expected = page_on.evaluate('document.title')
+        server.shutdown()
+        server.server_close()
+        try:
+            page_on.visit(base_url + VISITS[0])
+            title = page_on.evaluate('document.title')
+        except Exception:
+            title = None
+        ok = title == expected
+        print(f"{'✅' if ok else '❌'} Offline with the worker: {title if ok else 'page did not open'}")
+        for _, _, page in results.values():
+            page.browser.close()
+            shutil.rmtree(page.browser.profile, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
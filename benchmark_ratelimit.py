@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark rate limiter overhead per request and memory use with a large
+number of distinct keys, for the in-memory and shared (mmap) backends.
+
+Usage:
+    python benchmark_ratelimit.py [distinct_keys]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from ratelimit import MemoryBackend, SharedBackend, RateLimiter
+
+RULES = {'donation_ip': '10/minute', 'donation_email': '5/minute'}
+
+def per_request_overhead(limiter, requests=200_000, keys=10_000):
+    """Average time for one request's verdict (two bucket checks)"""
+    start = time.perf_counter()
+    for i in range(requests):
+        key = i % keys
+        limiter.check((('donation_ip', f'10.0.{key >> 8}.{key & 255}'), ('donation_email', f'donor{key}@example.com')))
+    return (time.perf_counter() - start) / requests
+
+def fill(limiter, keys):
+    """Touch `keys` distinct keys once"""
+    for i in range(keys):
+        limiter.hit('donation_ip', f'key-{i}')
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    print(f"🚦 Rate limiter benchmark ({keys:,} distinct keys)")
+    print("=" * 50)
+
+    # In-memory backend
+    tracemalloc.start()
+    memory_limiter = RateLimiter(MemoryBackend(max_keys=keys), RULES)
+    fill(memory_limiter, keys)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    overhead = per_request_overhead(memory_limiter)
+    print(f"\n🧠 MemoryBackend")
+    print(f"   Per request:  {overhead * 1e6:.2f} µs")
+    print(f"   Memory:       {current / 1024 / 1024:.1f} MiB for {len(memory_limiter.backend):,} keys "
+          f"({current / max(len(memory_limiter.backend), 1):.0f} bytes/key)")
+
+    # Shared backend: memory is the fixed slot table, whatever the key count
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ratelimit.bin')
+        shared_limiter = RateLimiter(SharedBackend(path, slots=1 << 21), RULES)
+        start = time.perf_counter()
+        fill(shared_limiter, keys)
+        fill_time = time.perf_counter() - start
+        overhead = per_request_overhead(shared_limiter)
+        print(f"\n🔗 SharedBackend (mmap, {shared_limiter.backend.slots:,} slots)")
+        print(f"   Per request:  {overhead * 1e6:.2f} µs")
+        print(f"   Fill:         {keys / fill_time / 1e3:.0f} k keys/s")
+        print(f"   Memory:       {os.path.getsize(path) / 1024 / 1024:.1f} MiB fixed, shared by all workers")
+
+if __name__ == '__main__':
+    main()
@@ -15,10 +15,169 @@ class Config:
     SQLALCHEMY_DATABASE_URI = database_url or 'sqlite:///blackshepherd.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Engine tuning (see database.py). Production gets a bigger pool than local development
+    is_production = os.environ.get('FLASK_ENV') == 'production'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5 if is_production else 2))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5 if is_production else 2))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # seconds waiting for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'off')  # 'off', 'session' or 'transaction'
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 15000))  # ms, 0 to disable
+    DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'blackshepherd')
+    DB_QUERY_CACHE_SIZE = int(os.environ.get('DB_QUERY_CACHE_SIZE', 1000))  # compiled SQL statements
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # ms
+    SQLITE_CACHE_KB = int(os.environ.get('SQLITE_CACHE_KB', 16384))
+    SQLITE_MMAP_BYTES = int(os.environ.get('SQLITE_MMAP_BYTES', 64 * 1024 * 1024))
+    
+    # Logging (see logs.py): JSON lines through a background queue
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # 'json' or 'text'
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # records dropped beyond this
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1 if is_production else 1.0))  # noisy info lines kept
+    
+    # Tracing (see tracing.py): 'file', 'otlp' or 'off'
+    TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'off' if is_production else 'file')
+    TRACING_FILE = os.environ.get('TRACING_FILE', '/tmp/blackshepherd-traces.jsonl')
+    TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+    TRACING_SERVICE_NAME = os.environ.get('TRACING_SERVICE_NAME', 'blackshepherd')
+    TRACING_QUEUE_SIZE = int(os.environ.get('TRACING_QUEUE_SIZE', 10000))  # spans dropped beyond this
+    TRACING_BATCH_SIZE = int(os.environ.get('TRACING_BATCH_SIZE', 512))
+    TRACING_EXPORT_INTERVAL = float(os.environ.get('TRACING_EXPORT_INTERVAL', 2))  # seconds
+    TRACING_MAX_SPANS = int(os.environ.get('TRACING_MAX_SPANS', 500))  # per request
+    
+    # Seconds before campaign totals are re-read from the database
+    CAMPAIGN_TOTALS_TTL = int(os.environ.get('CAMPAIGN_TOTALS_TTL', 60))
+    
+    # Multi-currency totals: display currency and FX rate table (JSON file, or built-in stub)
+    DISPLAY_CURRENCY = os.environ.get('DISPLAY_CURRENCY', 'NGN')
+    FX_RATES_FILE = os.environ.get('FX_RATES_FILE')
+    FX_RATES_TTL = int(os.environ.get('FX_RATES_TTL', 3600))
+    
+    # Recent-donations ticker and top-campaigns leaderboard (see feed.py), kept in memory per worker
+    FEED_SIZE = int(os.environ.get('FEED_SIZE', 20))  # donations kept in the ring buffer
+    LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 5))
+    FEED_REFRESH_SECONDS = int(os.environ.get('FEED_REFRESH_SECONDS', 10))  # pick up other workers' donations
+    FEED_CACHE_SECONDS = int(os.environ.get('FEED_CACHE_SECONDS', 15))  # /donations/recent.json max-age
+    FEED_GRACE_SECONDS = int(os.environ.get('FEED_GRACE_SECONDS', 30))  # re-read window for late commits
+    FEED_CATCH_UP_LIMIT = int(os.environ.get('FEED_CATCH_UP_LIMIT', 1000))  # rows per catch-up query page
+    
+    # Number of reverse proxies in front of the app (Render uses one) for client IPs
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 0))
+    
+    # Rate limiting: 'memory' (per process) or 'shared' (mmap file shared by all workers)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_SHARED_PATH = os.environ.get('RATE_LIMIT_SHARED_PATH', '/tmp/blackshepherd-ratelimit.bin')
+    RATE_LIMIT_SHARED_SLOTS = int(os.environ.get('RATE_LIMIT_SHARED_SLOTS', 1 << 20))
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+    RATE_LIMITS = {
+        'donation_ip': os.environ.get('RATE_LIMIT_DONATION_IP', '10/minute'),
+        'donation_email': os.environ.get('RATE_LIMIT_DONATION_EMAIL', '5/minute'),
+        'contact_ip': os.environ.get('RATE_LIMIT_CONTACT_IP', '5/hour'),
+        'contact_email': os.environ.get('RATE_LIMIT_CONTACT_EMAIL', '3/hour')
+    }
+    
+    # Outgoing mail (contact messages and donation receipts go through the outbox)
+    MAIL_ENABLED = os.environ.get('MAIL_ENABLED', 'true').lower() == 'true'
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 25))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'false').lower() == 'true'
+    MAIL_USE_SSL = os.environ.get('MAIL_USE_SSL', 'false').lower() == 'true'
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'Blak Shepard Foundation <no-reply@blakshepard.org>')
+    MAIL_TIMEOUT = int(os.environ.get('MAIL_TIMEOUT', 15))
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 50))
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 8))
+    MAIL_RETRY_BASE = int(os.environ.get('MAIL_RETRY_BASE', 30))  # seconds
+    MAIL_RETRY_CAP = int(os.environ.get('MAIL_RETRY_CAP', 3600))  # seconds
+    MAIL_POLL_INTERVAL = int(os.environ.get('MAIL_POLL_INTERVAL', 10))
+    MAIL_IDLE_TIMEOUT = int(os.environ.get('MAIL_IDLE_TIMEOUT', 60))
+    MAIL_CLAIM_TIMEOUT = int(os.environ.get('MAIL_CLAIM_TIMEOUT', 300))
+    MAIL_RETENTION_DAYS = int(os.environ.get('MAIL_RETENTION_DAYS', 90))  # delivered messages kept this long
+    CONTACT_RECIPIENT = os.environ.get('CONTACT_RECIPIENT', 'blakshepherdwef@gmail.com')
+    
+    # Duplicate donation submissions (double clicks, retries) reuse the first Paystack initialization
+    IDEMPOTENCY_WINDOW = int(os.environ.get('IDEMPOTENCY_WINDOW', 600))  # seconds a response is replayed
+    IDEMPOTENCY_LOCK_TTL = int(os.environ.get('IDEMPOTENCY_LOCK_TTL', 45))  # longer than the Paystack timeout
+    IDEMPOTENCY_WAIT = int(os.environ.get('IDEMPOTENCY_WAIT', 35))  # seconds a duplicate waits for the original
+    IDEMPOTENCY_PURGE_INTERVAL = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL', 300))
+    
+    # Re-verification of donations left pending (donor closed the tab before the callback)
+    RECONCILE_ENABLED = os.environ.get('RECONCILE_ENABLED', 'true').lower() == 'true'
+    RECONCILE_INTERVAL = int(os.environ.get('RECONCILE_INTERVAL', 60))  # seconds between passes
+    RECONCILE_MIN_AGE = int(os.environ.get('RECONCILE_MIN_AGE', 15))  # minutes before a pending donation is checked
+    RECONCILE_BATCH_SIZE = int(os.environ.get('RECONCILE_BATCH_SIZE', 50))
+    RECONCILE_MAX_BATCHES = int(os.environ.get('RECONCILE_MAX_BATCHES', 20))  # per pass
+    RECONCILE_CONCURRENCY = int(os.environ.get('RECONCILE_CONCURRENCY', 4))
+    RECONCILE_RATE = os.environ.get('RECONCILE_RATE', '60/minute')  # Paystack verify calls budget
+    RECONCILE_RETRY_BASE = int(os.environ.get('RECONCILE_RETRY_BASE', 300))  # seconds
+    RECONCILE_RETRY_CAP = int(os.environ.get('RECONCILE_RETRY_CAP', 21600))  # seconds
+    RECONCILE_GIVE_UP_AFTER = int(os.environ.get('RECONCILE_GIVE_UP_AFTER', 48))  # hours until abandoned donations fail
+    RECONCILE_LEASE_TTL = int(os.environ.get('RECONCILE_LEASE_TTL', 180))  # seconds
+    
+    # On-demand image resizing (/img/<path>?w=&fmt=)
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', '/tmp/blackshepherd-image-cache')
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_MB', 512)) * 1024 * 1024
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))  # resize processes per web worker
+    IMAGE_RENDER_TIMEOUT = int(os.environ.get('IMAGE_RENDER_TIMEOUT', 30))  # seconds
+    
+    # Early Hints (see hints.py): critical resources announced before each page renders
+    EARLY_HINTS_ENABLED = os.environ.get('EARLY_HINTS_ENABLED', 'true').lower() == 'true'  # 103 and Link headers
+    
+    # Campaign share cards (see sharecards.py): og:image rendered in the background
+    SHARE_CARD_DIR = os.environ.get('SHARE_CARD_DIR', '/tmp/blackshepherd-share-cards')
+    SHARE_CARD_BUCKET = int(os.environ.get('SHARE_CARD_BUCKET', 5))  # percent of the goal between re-renders
+    SHARE_CARD_WORKERS = int(os.environ.get('SHARE_CARD_WORKERS', 1))  # render processes per web worker
+    
+    # Service worker (see offline.py): precached app shell, cached pages and images for repeat visits
+    SERVICE_WORKER_ENABLED = os.environ.get('SERVICE_WORKER_ENABLED', 'true').lower() == 'true'  # false unregisters it
+    SW_IMAGE_CACHE_ENTRIES = int(os.environ.get('SW_IMAGE_CACHE_ENTRIES', 120))  # images kept per browser
+    SW_IMAGE_CACHE_MAX_BYTES = int(os.environ.get('SW_IMAGE_CACHE_MAX_MB', 16)) * 1024 * 1024
+    
+    # Health checks (see health.py): /readyz reads results probed in the background
+    HEALTH_PROBES_ENABLED = os.environ.get('HEALTH_PROBES_ENABLED', 'true').lower() == 'true'
+    HEALTH_PROBE_INTERVAL = int(os.environ.get('HEALTH_PROBE_INTERVAL', 10))  # seconds, database and mail
+    HEALTH_PAYSTACK_INTERVAL = int(os.environ.get('HEALTH_PAYSTACK_INTERVAL', 60))  # seconds
+    HEALTH_PROBE_TIMEOUT = int(os.environ.get('HEALTH_PROBE_TIMEOUT', 5))  # seconds
+    HEALTH_STALE_AFTER = int(os.environ.get('HEALTH_STALE_AFTER', 90))  # seconds without fresh results
+    HEALTH_CRITICAL = os.environ.get('HEALTH_CRITICAL', 'database')  # checks that must pass to be ready
+    HEALTH_MAIL_MAX_DELAY = int(os.environ.get('HEALTH_MAIL_MAX_DELAY', 900))  # seconds a due message may wait
+    
+    # Admin reporting (see reporting.py): charts from rollups, streamed exports
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # basic auth password or bearer token; unset hides /admin
+    REPORT_EXPORT_BATCH_SIZE = int(os.environ.get('REPORT_EXPORT_BATCH_SIZE', 2000))  # rows per cursor fetch
+    REPORT_MAX_POINTS = int(os.environ.get('REPORT_MAX_POINTS', 1000))  # periods per chart
+    IMPACT_BATCH_SIZE = int(os.environ.get('IMPACT_BATCH_SIZE', 1000))  # impact events per import transaction
+    
+    # Ledger archival (see archive.py): settled months moved to compressed files
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')  # default: <instance>/archive; must be durable storage
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 730))  # whole months older than this
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 5000))  # rows per fetch and per delete
+    
+    # Donation import settings
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+    
     # Paystack configuration
     PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY')
     PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY')
     PAYSTACK_WEBHOOK_SECRET = os.environ.get('PAYSTACK_WEBHOOK_SECRET')
+    PAYSTACK_API_URL = os.environ.get('PAYSTACK_API_URL', 'https://api.paystack.co')  # paystack_stub.py locally
+    
+    # Recurring pledges (see recurring.py): saved authorizations charged by one elected worker
+    PLEDGES_ENABLED = os.environ.get('PLEDGES_ENABLED', 'true').lower() == 'true'
+    PLEDGE_INTERVAL = int(os.environ.get('PLEDGE_INTERVAL', 300))  # seconds between scheduler passes
+    PLEDGE_BATCH_SIZE = int(os.environ.get('PLEDGE_BATCH_SIZE', 500))
+    PLEDGE_MAX_BATCHES = int(os.environ.get('PLEDGE_MAX_BATCHES', 200))  # per pass
+    PLEDGE_CONCURRENCY = int(os.environ.get('PLEDGE_CONCURRENCY', 16))
+    PLEDGE_CHARGE_RATE = os.environ.get('PLEDGE_CHARGE_RATE', '20/second')  # Paystack charge calls budget
+    PLEDGE_RETRY_DAYS = [int(days) for days in os.environ.get('PLEDGE_RETRY_DAYS', '1,3,7').split(',')]  # dunning
+    PLEDGE_ERROR_RETRY = int(os.environ.get('PLEDGE_ERROR_RETRY', 900))  # seconds, when a charge's outcome is unknown
+    PLEDGE_LEASE_TTL = int(os.environ.get('PLEDGE_LEASE_TTL', 300))  # seconds
     
     # Site settings
     SITE_NAME = os.environ.get('SITE_NAME', 'Black Shepherd Foundation')
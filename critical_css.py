@@ -0,0 +1,283 @@
+"""
+Critical CSS for first paint.
+
+For each page, renders it, collects the tags, classes and ids used above the
+fold (everything up to the end of the first content section: navbar and
+hero) and keeps the rules of fonts.css and main.css that can match them,
+minus interaction states like :hover. base.html inlines that CSS and loads
+the full stylesheets asynchronously, so first paint waits on no stylesheet
+request.
+
+Output goes to static/css/critical/<endpoint>.css, stamped with a hash of the
+stylesheets and the templates that page renders (base.html and its own); a
+stale or missing file makes that page fall back to blocking stylesheets.
+Rebuild after changing CSS, base.html or a page's template:
+
+    python critical_css.py
+"""
+
+import gzip
+import hashlib
+import os
+import re
+from html.parser import HTMLParser
+from markupsafe import Markup
+
+STYLESHEETS = ('css/fonts.css', 'css/main.css')
+CRITICAL_DIR = 'css/critical'
+BASE_TEMPLATE = 'base.html'
+# endpoint -> (path of a page that represents it, content sections after the navbar above the fold, template)
+PAGES = {
+    'index': ('/', 1, 'index.html'),
+    'about': ('/about', 1, 'about.html'),
+    'campaigns': ('/campaigns', 1, 'campaigns.html'),
+    'campaign': ('/campaign/1', 2, 'campaign.html'),  # breadcrumb, then the hero
+    'contact': ('/contact', 1, 'contact.html'),
+}
+# Selectors that only apply after user interaction are not needed for first paint
+INTERACTION_STATES = re.compile(r':(hover|focus|focus-within|focus-visible|active|visited)\b')
+
+def split_rules(css):
+    """Split a stylesheet into top-level (prelude, body) pairs; comments are dropped"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    rules = []
+    depth = 0
+    start = 0
+    prelude = None
+    quote = None
+    for position, char in enumerate(css):
+        if quote:
+            if char == quote and css[position - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude = css[start:position].strip()
+                start = position + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, css[start:position].strip()))
+                start = position + 1
+        elif char == ';' and depth == 0:
+            # Statement at-rules such as @import or @charset
+            statement = css[start:position].strip()
+            if statement:
+                rules.append((statement, None))
+            start = position + 1
+    return rules
+
+def minify(body):
+    return re.sub(r'\s*([;:,{}])\s*', r'\1', re.sub(r'\s+', ' ', body)).strip().rstrip(';')
+
+def selector_matches(selector, used):
+    """Whether every compound of a selector only needs tags, classes and ids present in the page"""
+    if INTERACTION_STATES.search(selector):
+        return False
+    selector = re.sub(r'::?[a-zA-Z-]+(\((?:[^()]|\([^()]*\))*\))?', '', selector)
+    selector = re.sub(r'\[[^\]]*\]', '', selector)
+    for compound in re.split(r'\s*[\s>+~]\s*', selector.strip()):
+        if not compound:
+            continue
+        tag = re.match(r'^[a-zA-Z][a-zA-Z0-9-]*', compound)
+        if tag and tag.group(0).lower() not in used['tags']:
+            return False
+        if any(name not in used['classes'] for name in re.findall(r'\.(-?[_a-zA-Z][\w-]*)', compound)):
+            return False
+        if any(name not in used['ids'] for name in re.findall(r'#(-?[_a-zA-Z][\w-]*)', compound)):
+            return False
+    return True
+
+def filter_rules(rules, used):
+    """Rules (as minified CSS) that can apply to the used tags/classes/ids"""
+    kept = []
+    keyframes = {}
+    for prelude, body in rules:
+        if body is None:
+            kept.append(f'{prelude};')
+        elif prelude.startswith('@keyframes') or prelude.startswith('@-webkit-keyframes'):
+            keyframes[prelude.split()[-1]] = f'{prelude}{{{minify(body)}}}'
+        elif prelude.startswith('@font-face'):
+            kept.append(f'@font-face{{{minify(body)}}}')
+        elif prelude.startswith(('@media', '@supports')):
+            inner = filter_rules(split_rules(body), used)
+            if inner:
+                kept.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            continue
+        else:
+            selectors = [s.strip() for s in prelude.split(',') if selector_matches(s, used)]
+            if selectors:
+                kept.append(f"{','.join(selectors)}{{{minify(body)}}}")
+    css = ''.join(kept)
+    # Animations referenced by the kept rules
+    css += ''.join(rule for name, rule in keyframes.items() if re.search(rf'\b{re.escape(name)}\b', css))
+    return css
+
+class FoldCollector(HTMLParser):
+    """Collect tags, classes and ids up to the end of the first content sections"""
+
+    VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+    def __init__(self, sections):
+        super().__init__()
+        self.used = {'tags': {'html', 'body', 'head'}, 'classes': set(), 'ids': set()}
+        self.sections = sections
+        self.closed_sections = 0
+        self._section_depth = None
+        self._depth = 0
+        self.first_image = None
+
+    @property
+    def done(self):
+        return self.closed_sections >= self.sections
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        self.used['tags'].add(tag)
+        attrs = dict(attrs)
+        self.used['classes'].update((attrs.get('class') or '').split())
+        if attrs.get('id'):
+            self.used['ids'].add(attrs['id'])
+        if self.first_image is None and self._section_depth is not None:
+            # The LCP candidate: first image or CSS background image in the fold
+            background = re.search(r"url\(['\"]?([^'\")]+)", attrs.get('style') or '')
+            self.first_image = attrs.get('src') if tag == 'img' else background and background.group(1)
+        if tag in self.VOID_TAGS:
+            return
+        self._depth += 1
+        if tag in ('section', 'header') and self._section_depth is None:
+            self._section_depth = self._depth
+
+    def handle_endtag(self, tag):
+        if self.done or tag in self.VOID_TAGS:
+            return
+        if self._depth == self._section_depth:
+            self.closed_sections += 1
+            self._section_depth = None
+        self._depth -= 1
+
+def fold_of(html, sections=1):
+    collector = FoldCollector(sections)
+    collector.feed(html)
+    return collector
+
+def template_dir(app):
+    return os.path.join(app.root_path, app.template_folder)
+
+def sources_hash(static_folder, template_folder, template):
+    """Hash of every input a page's critical CSS depends on: the stylesheets, base.html and its template"""
+    digest = hashlib.sha256()
+    paths = [os.path.join(static_folder, name) for name in STYLESHEETS]
+    paths += [os.path.join(template_folder, name) for name in (BASE_TEMPLATE, template)]
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def stylesheet_rules(static_folder):
+    rules = []
+    for name in STYLESHEETS:
+        path = os.path.join(static_folder, name)
+        if os.path.exists(path):
+            with open(path) as f:
+                rules.extend(split_rules(f.read()))
+    return rules
+
+def build(app):
+    """Write static/css/critical/<endpoint>.css for every page; return {endpoint: (fold, css)}"""
+    rules = stylesheet_rules(app.static_folder)
+    output_dir = os.path.join(app.static_folder, CRITICAL_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Render pages as they are without critical CSS
+    app.extensions['critical_css']._styles = {}
+    results = {}
+    client = app.test_client()
+    for endpoint, (path, sections, template) in PAGES.items():
+        response = client.get(path)
+        if response.status_code != 200:
+            continue
+        fold = fold_of(response.get_data(as_text=True), sections)
+        css = filter_rules(rules, fold.used)
+        stamp = sources_hash(app.static_folder, template_dir(app), template)
+        with open(os.path.join(output_dir, f'{endpoint}.css'), 'w') as f:
+            f.write(f'/* {stamp} */\n{css}\n')
+        results[endpoint] = (fold, css)
+    return results
+
+class CriticalCSS:
+    """Inline critical CSS per endpoint, bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self._styles = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['critical_css'] = self
+        app.add_template_global(self.critical_css, 'critical_css')
+
+    def load(self):
+        """Read the built files, skipping any built from different stylesheets or templates"""
+        styles = {}
+        directory = os.path.join(self.app.static_folder, CRITICAL_DIR)
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                endpoint, extension = os.path.splitext(name)
+                if extension != '.css' or endpoint not in PAGES:
+                    continue
+                stamp = sources_hash(self.app.static_folder, template_dir(self.app), PAGES[endpoint][2])
+                with open(os.path.join(directory, name)) as f:
+                    header, _, css = f.read().partition('\n')
+                if header == f'/* {stamp} */':
+                    styles[endpoint] = Markup(css.strip())
+                else:
+                    self.app.logger.warning("Stale critical CSS for %s; run python critical_css.py", endpoint)
+        self._styles = styles
+        return styles
+
+    def critical_css(self, endpoint):
+        """Inline CSS for an endpoint ('' if none was built)"""
+        if self._styles is None:
+            self.load()
+        return self._styles.get(endpoint, '')
+
+def gzip_size(data):
+    if isinstance(data, str):
+        data = data.encode()
+    return len(gzip.compress(data, 9))
+
+if __name__ == '__main__':
+    from app import app, assets, critical
+
+    results = build(app)
+    # Fingerprint new files and pick up the new CSS before measuring
+    assets.load()
+    critical.load()
+
+    full_css = ''.join(open(os.path.join(app.static_folder, name)).read() for name in STYLESHEETS)
+    client = app.test_client()
+    print("🎨 Critical CSS (bytes gzipped; render-blocking = CSS the first paint waits for)")
+    print(f"   Full stylesheets: {gzip_size(full_css):,} B, previously all render-blocking "
+          f"plus Google Fonts and Font Awesome from third-party hosts")
+    print(f"\n   {'page':<10} {'HTML':>8} {'inlined':>8} {'blocking':>9} {'font':>8} {'LCP image':>10}")
+    for endpoint, (fold, css) in results.items():
+        html = client.get(PAGES[endpoint][0]).get_data()
+        font_bytes = 0
+        for link in re.findall(rb'<link rel="preload" href="([^"]+)" as="font"', html):
+            font_bytes += len(client.get(link.decode()).get_data())
+        image_bytes = 0
+        if fold.first_image:
+            image = client.get(fold.first_image, headers={'Accept': 'image/webp'})
+            image_bytes = len(image.get_data()) if image.status_code == 200 else 0
+        blocking = 0 if critical.critical_css(endpoint) else gzip_size(full_css)
+        print(f"   {endpoint:<10} {gzip_size(html):>8,} {gzip_size(css):>8,} {blocking:>9,} "
+              f"{font_bytes:>8,} {image_bytes:>10,}")
+    print(f"\n💾 Wrote static/{CRITICAL_DIR}/ for {len(results)} pages")
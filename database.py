@@ -0,0 +1,194 @@
+"""
+Database engine tuning.
+
+Builds SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings for the backend in
+use and attaches per-connection hooks:
+
+- PostgreSQL: a bounded QueuePool with pre-ping and recycle so connections
+  dropped by Render or a proxy are replaced instead of failing a request.
+  DB_PGBOUNCER=transaction hands pooling to PgBouncer (NullPool, no session
+  level startup options); DB_PGBOUNCER=session keeps a small local pool.
+- SQLite: WAL journal, relaxed fsync and a busy timeout so the web workers,
+  importer and mail sender can write to the same file.
+
+Every engine also records pool checkout metrics (waits, hold times, new
+connections, invalidations) available through pool_stats().
+"""
+
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, NullPool, StaticPool
+from models import db
+
+def _is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+def engine_options(config):
+    """SQLAlchemy create_engine() options for the configured database"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = {'query_cache_size': config['DB_QUERY_CACHE_SIZE']}
+
+    if _is_sqlite(uri):
+        options['connect_args'] = {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000, 'check_same_thread': False}
+        if uri in ('sqlite://', 'sqlite:///:memory:'):
+            options['poolclass'] = StaticPool
+        else:
+            options['poolclass'] = MeteredQueuePool
+        return options
+
+    connect_args = {
+        'connect_timeout': config['DB_CONNECT_TIMEOUT'],
+        'application_name': config['DB_APPLICATION_NAME'],
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10,
+        'keepalives_count': 3
+    }
+    pgbouncer = config['DB_PGBOUNCER']
+    if pgbouncer != 'transaction' and config['DB_STATEMENT_TIMEOUT']:
+        # PgBouncer in transaction mode rejects startup parameters it doesn't track
+        connect_args['options'] = f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"
+    options['connect_args'] = connect_args
+    options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+
+    if pgbouncer == 'transaction':
+        # Server connections are shared per transaction; holding them here would defeat that
+        options['poolclass'] = NullPool
+        return options
+
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE'],
+        pool_use_lifo=True  # Lets surplus connections idle out and be recycled
+    )
+    return options
+
+class PoolMetrics:
+    """Counters for one engine's connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('checked_out_at', None)
+        if started is None:
+            return
+        held = time.perf_counter() - started
+        with self._lock:
+            self.checked_out -= 1
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            checkouts = self.checkouts or 1
+            return {
+                'checkouts': self.checkouts,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'wait_avg_ms': round(self.wait_total / checkouts * 1000, 3),
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'hold_avg_ms': round(self.hold_total / checkouts * 1000, 3),
+                'hold_max_ms': round(self.hold_max * 1000, 3)
+            }
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that reports how long callers wait for a connection"""
+
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+def _set_sqlite_pragmas(config):
+    pragmas = [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT']}",
+        f"PRAGMA cache_size=-{config['SQLITE_CACHE_KB']}",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_BYTES']}",
+        'PRAGMA temp_store=MEMORY'
+    ]
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+_metrics = {}
+
+def install_engine_hooks(engine, config):
+    """Attach SQLite pragmas and pool metrics to an engine"""
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _set_sqlite_pragmas(config))
+
+    metrics = PoolMetrics()
+    for name in ('connect', 'checkout', 'checkin', 'invalidate'):
+        event.listen(engine, name, getattr(metrics, f'on_{name}'))
+    if isinstance(engine.pool, MeteredQueuePool):
+        engine.pool.metrics = metrics
+    _metrics[engine] = metrics
+    return metrics
+
+def init_db(app):
+    """Configure the engine options, bind db to the app and attach the hooks"""
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS still win over the tuned defaults
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    db.init_app(app)
+    with app.app_context():
+        install_engine_hooks(db.engine, app.config)
+
+def pool_stats(engine=None):
+    """Pool metrics for an engine (default: the current app's)"""
+    engine = engine or db.engine
+    metrics = _metrics.get(engine)
+    stats = metrics.snapshot() if metrics else {}
+    stats['pool'] = engine.pool.status()
+    return stats
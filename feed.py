@@ -0,0 +1,249 @@
+"""
+Recent donations and the top-campaigns leaderboard.
+
+Both live in memory in each worker and are read in O(1): a fixed-size ring
+buffer (deque) of anonymised donations (campaign, amount, time; never the
+donor or the reference) and per-campaign totals whose ranking is recomputed
+only when a donation arrives.
+
+They are built from the ledger at startup and then follow it incrementally:
+catch_up() reads the donations completed since the last one seen, through
+the partial index on completed_at (keyset-paged), and adds each exactly
+once. The donation success paths (callback, inline verify, webhook, reconciler, recurring
+charges) call it right after they commit, and pages reading the feed call it
+at most every FEED_REFRESH_SECONDS, which is how donations completed by
+other workers arrive. Rows are re-read for FEED_GRACE_SECONDS behind the
+newest one, so a donation that commits late is still picked up; references
+seen within that window are remembered to skip repeats. Donations inserted
+already complete with an earlier date (importer.py) are found by id instead:
+every successful row above the highest id read so far. Those count towards
+the leaderboard but are too old for the ticker.
+
+/donations/recent.json serves both, serialised once per change, with an
+ETag hashed from the body so it means the same thing in every worker.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from itertools import chain
+from datetime import datetime, timedelta
+from flask import Response, request
+from fx import get_rate_table
+from ledger import (
+    completed_since_query, inserted_since_query, last_transaction_id, load_donation_counts, recent_donations_query
+)
+from models import db
+from money import Money, format_minor
+
+class DonationFeed:
+    """Ring buffer of recent donations and a per-campaign leaderboard, bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.titles = {}
+        self._recent = deque()
+        self._totals = {}  # campaign_id -> [raised in the display currency, donation count]
+        self._ranking = ()
+        self._seen = {}  # reference -> completed_at, within the grace window
+        self._watermark = None
+        self._last_id = 0  # highest ledger id read
+        self._checked_at = 0.0
+        self._version = 0  # bumped on every change, local to this worker
+        self._cached = None  # (version, JSON body, ETag)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self._recent = deque(maxlen=app.config['FEED_SIZE'])
+        app.extensions['donation_feed'] = self
+        app.add_template_global(self.recent_donations, 'recent_donations')
+        app.add_template_global(self.top_campaigns, 'top_campaigns')
+        app.add_url_rule('/donations/recent.json', 'recent_donations_json', self.serve)
+
+    def _display(self, amount, currency):
+        display_currency = self.app.config['DISPLAY_CURRENCY']
+        return get_rate_table().convert(Money(amount, currency), display_currency).amount
+
+    def _rank(self):
+        ranking = sorted(self._totals.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        self._ranking = tuple(
+            {'campaign_id': campaign_id, 'title': self.titles.get(campaign_id, ''),
+             'raised': raised, 'donations': count}
+            for campaign_id, (raised, count) in ranking[:self.app.config['LEADERBOARD_SIZE']]
+        )
+
+    def rebuild(self, campaigns):
+        """Load the ring buffer and the totals from the ledger (at startup)"""
+        self.titles = {campaign_id: data['title'] for campaign_id, data in campaigns.items()}
+        with self._lock:
+            last_id = last_transaction_id()
+            totals = {campaign_id: [0, 0] for campaign_id in campaigns}
+            for (campaign_id, currency), (raised, count) in load_donation_counts().items():
+                if campaign_id in totals:
+                    totals[campaign_id][0] += self._display(raised, currency)
+                    totals[campaign_id][1] += count
+            transactions = db.session.execute(recent_donations_query(self._recent.maxlen)).scalars().all()
+            watermark = transactions[0].completed_at if transactions else None
+            # Everything in the grace window is already in the totals (same snapshot)
+            seen = {}
+            if watermark is not None:
+                for row in self._rows_since(watermark - timedelta(seconds=self.app.config['FEED_GRACE_SECONDS'])):
+                    seen[row.transaction_id] = row.completed_at
+
+            self._totals = totals
+            self._recent.clear()
+            for transaction in reversed(transactions):
+                self._recent.appendleft(self._entry(transaction.campaign_id, int(transaction.amount),
+                                                    transaction.currency, transaction.completed_at))
+            self._seen = seen
+            self._watermark = watermark
+            self._last_id = last_id
+            self._rank()
+            self._changed()
+        self._checked_at = time.monotonic()
+
+    def _entry(self, campaign_id, amount, currency, completed_at):
+        return {'campaign_id': campaign_id, 'title': self.titles.get(campaign_id, ''),
+                'amount': amount, 'currency': currency, 'completed_at': completed_at}
+
+    def _rows_since(self, since):
+        """Successful donations completed after since, read in keyset pages"""
+        limit = self.app.config['FEED_CATCH_UP_LIMIT']
+        after_id = 0
+        while True:
+            rows = db.session.execute(completed_since_query(since, limit, after_id)).all()
+            yield from rows
+            if len(rows) < limit:
+                return
+            since, after_id = rows[-1].completed_at, rows[-1].id
+
+    def _rows_inserted_since(self, after_id):
+        """Successful donations with an id above after_id, read in pages"""
+        limit = self.app.config['FEED_CATCH_UP_LIMIT']
+        while True:
+            rows = db.session.execute(inserted_since_query(after_id, limit)).all()
+            yield from rows
+            if len(rows) < limit:
+                return
+            after_id = rows[-1].id
+
+    def _prune_seen(self):
+        if self._watermark is None:
+            return
+        horizon = self._watermark - timedelta(seconds=self.app.config['FEED_GRACE_SECONDS'])
+        self._seen = {reference: at for reference, at in self._seen.items() if at >= horizon}
+
+    def _changed(self):
+        self._version += 1
+
+    def catch_up(self):
+        """Add donations completed since the last one seen (any worker); return how many were new"""
+        if not self._lock.acquire(blocking=False):
+            return 0  # Another thread is already catching up
+        try:
+            self._checked_at = time.monotonic()
+            since = None
+            if self._watermark is not None:
+                since = self._watermark - timedelta(seconds=self.app.config['FEED_GRACE_SECONDS'])
+            added = 0
+            rows = chain(self._rows_since(since), self._rows_inserted_since(self._last_id))
+            for row_id, reference, campaign_id, amount, currency, completed_at in rows:
+                self._last_id = max(self._last_id, row_id)
+                if reference in self._seen:
+                    continue
+                self._seen[reference] = completed_at
+                if since is None or completed_at >= since:
+                    # Older ones (imported by id) only count towards the leaderboard
+                    self._recent.appendleft(self._entry(campaign_id, int(amount), currency, completed_at))
+                totals = self._totals.setdefault(campaign_id, [0, 0])
+                totals[0] += self._display(int(amount), currency)
+                totals[1] += 1
+                if self._watermark is None or completed_at > self._watermark:
+                    self._watermark = completed_at
+                added += 1
+            if added:
+                self._prune_seen()
+                self._rank()
+                self._changed()
+            return added
+        finally:
+            self._lock.release()
+
+    def catch_up_if_stale(self):
+        if time.monotonic() - self._checked_at >= self.app.config['FEED_REFRESH_SECONDS']:
+            try:
+                self.catch_up()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error("Failed to refresh the donation feed: %s", e)
+
+    def recent_donations(self, limit=None):
+        """Most recent donations first (template global)"""
+        self.catch_up_if_stale()
+        recent = self._recent
+        return list(recent)[:limit] if limit else list(recent)
+
+    def top_campaigns(self):
+        """Campaigns ranked by amount raised in the display currency (template global)"""
+        self.catch_up_if_stale()
+        return self._ranking
+
+    def _serialise(self):
+        display_currency = self.app.config['DISPLAY_CURRENCY']
+        # Snapshot: catch_up may appendleft from another thread while this iterates
+        recent, ranking = tuple(self._recent), self._ranking
+        return json.dumps({
+            'recent': [{
+                'campaign_id': entry['campaign_id'], 'campaign': entry['title'],
+                'amount': format_minor(entry['amount'], entry['currency']),
+                'completed_at': entry['completed_at'].isoformat() + 'Z' if entry['completed_at'] else None
+            } for entry in recent],
+            'leaderboard': [{
+                'campaign_id': entry['campaign_id'], 'campaign': entry['title'],
+                'raised': format_minor(entry['raised'], display_currency), 'donations': entry['donations']
+            } for entry in ranking]
+        }, separators=(',', ':')).encode()
+
+    def serve(self):
+        """JSON of both, built once per change, with a short public cache and an ETag"""
+        self.catch_up_if_stale()
+        version, cached = self._version, self._cached
+        if cached is None or cached[0] != version:
+            body = self._serialise()
+            cached = self._cached = (version, body, f'"{hashlib.sha256(body).hexdigest()[:16]}"')
+        _, body, etag = cached
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+        response.headers['ETag'] = etag
+        response.cache_control.public = True
+        response.cache_control.max_age = self.app.config['FEED_CACHE_SECONDS']
+        return response
+
+def notify_donation(app):
+    """Pull newly completed donations into the feed (call after the donation is committed)"""
+    feed = app.extensions.get('donation_feed')
+    if feed is None:
+        return
+    try:
+        feed.catch_up()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error("Failed to update the donation feed: %s", e)
+
+def time_ago(moment, now=None):
+    """'just now', '5 minutes ago', '3 hours ago', '2 days ago'"""
+    if moment is None:
+        return ''
+    seconds = max(0, ((now or datetime.utcnow()) - moment).total_seconds())
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if count != 1 else ''} ago"
+    return 'just now'
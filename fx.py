@@ -0,0 +1,111 @@
+"""
+Foreign-exchange rates for multi-currency totals.
+
+Rates are held as "units of the base currency per one unit of a currency"
+(in major units) and loaded from a local JSON file or from the built-in
+provider stub. The table is cached and reloaded once it expires. Donations
+snapshot the rate when they are made, so totals never depend on today's rate.
+
+Rate file format:
+    {"base": "NGN", "as_of": "2025-01-01", "rates": {"USD": "1550", "GHS": "100"}}
+"""
+
+import json
+import threading
+import time
+from decimal import Decimal
+from money import Money, get_exponent, scale_minor
+
+# Indicative rates used when no rate file is configured (NGN per unit)
+STUB_RATES = {
+    'NGN': '1',
+    'USD': '1550',
+    'GHS': '100',
+    'ZAR': '85',
+    'KES': '12',
+    'EUR': '1680',
+    'GBP': '1960'
+}
+
+def stub_provider():
+    """Provider stub returning fixed indicative rates against NGN"""
+    return {'base': 'NGN', 'as_of': None, 'rates': dict(STUB_RATES)}
+
+def file_provider(path):
+    """Build a provider that reads rates from a local JSON file"""
+    def load():
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return load
+
+class RateTable:
+    """Cached FX rate table that reloads from its provider after ttl seconds"""
+
+    def __init__(self, provider=stub_provider, ttl=3600):
+        self.provider = provider
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._rates = None
+        self._base = None
+        self._as_of = None
+        self._loaded_at = 0.0
+
+    def _load(self):
+        data = self.provider()
+        base = data.get('base', 'NGN')
+        rates = {code: Decimal(str(rate)) for code, rate in data['rates'].items()}
+        rates[base] = Decimal(1)
+        self._rates, self._base, self._as_of = rates, base, data.get('as_of')
+        self._loaded_at = time.monotonic()
+
+    def _fresh_rates(self):
+        if self._rates is None or time.monotonic() - self._loaded_at >= self.ttl:
+            with self._lock:
+                if self._rates is None or time.monotonic() - self._loaded_at >= self.ttl:
+                    try:
+                        self._load()
+                    except Exception:
+                        if self._rates is None:
+                            raise
+                        # Keep serving the stale table rather than failing donations
+                        self._loaded_at = time.monotonic()
+        return self._rates
+
+    @property
+    def as_of(self):
+        self._fresh_rates()
+        return self._as_of
+
+    def rate(self, from_currency, to_currency):
+        """Major-unit rate converting from_currency into to_currency"""
+        if from_currency == to_currency:
+            return Decimal(1)
+        rates = self._fresh_rates()
+        try:
+            return rates[from_currency] / rates[to_currency]
+        except KeyError as e:
+            raise ValueError(f'No FX rate for {e.args[0]}')
+
+    def convert(self, money, to_currency, rate=None):
+        """Convert Money into to_currency, using a snapshotted rate when given"""
+        return convert_minor(money.amount, money.currency, to_currency,
+                             rate if rate is not None else self.rate(money.currency, to_currency))
+
+def convert_minor(amount_minor, from_currency, to_currency, rate):
+    """Convert integer minor units with a major-unit rate, rounding half up"""
+    if from_currency == to_currency:
+        return Money(amount_minor, to_currency)
+    exponent_shift = get_exponent(to_currency) - get_exponent(from_currency)
+    numerator, denominator = Decimal(rate).scaleb(exponent_shift).as_integer_ratio()
+    return Money(scale_minor(amount_minor, numerator, denominator), to_currency)
+
+_rate_table = None
+
+def get_rate_table():
+    """Return the process-wide rate table configured from Config"""
+    global _rate_table
+    if _rate_table is None:
+        from config import Config
+        provider = file_provider(Config.FX_RATES_FILE) if Config.FX_RATES_FILE else stub_provider
+        _rate_table = RateTable(provider, ttl=Config.FX_RATES_TTL)
+    return _rate_table
@@ -0,0 +1,136 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app, campaign data, compiled templates and asset manifest are loaded
+once in the master (preload_app). The garbage collector is disabled while
+that happens (from the moment gunicorn reads this file, since the preload
+runs before any server hook) and everything is frozen with gc.freeze()
+before forking, so collections in the workers never touch (and copy) the
+shared pages.
+
+Worker and thread counts are derived from the CPU cores and the memory
+limit unless WEB_CONCURRENCY / GUNICORN_THREADS are set.
+
+Rolling reloads:
+    kill -HUP <master>   new workers with the same preloaded code, old ones drained
+    kill -USR2 <master>  start a new master with new code alongside the old one,
+                         then kill -TERM <old master> once it is healthy
+Workers are also recycled gradually through max_requests with jitter.
+
+Each worker logs its unique (unshared) RSS right after fork and again every
+MEMORY_REPORT_INTERVAL requests and at exit. Set GC_FREEZE=false to compare.
+"""
+
+import gc
+import os
+
+# Gunicorn preloads the app (Arbiter.setup) before calling on_starting, so the
+# collector has to be switched off here, when the config is read, to keep it
+# from touching the objects being loaded.
+GC_FREEZE = os.environ.get('GC_FREEZE', 'true').lower() == 'true'
+if GC_FREEZE:
+    gc.disable()
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _memory_limit_bytes():
+    """Container memory limit (cgroup v2/v1), falling back to physical memory"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max' and int(value) < 1 << 60:
+                return int(value)
+        except (OSError, ValueError):
+            pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def unique_rss_mb(pid='self'):
+    """Private (unshared) resident memory of a process in MB, from /proc smaps_rollup"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            private_kb = sum(
+                int(line.split()[1]) for line in f
+                if line.startswith(('Private_Clean:', 'Private_Dirty:'))
+            )
+        return private_kb / 1024
+    except OSError:
+        return None
+
+def _auto_workers():
+    cores = _cpu_count()
+    by_cpu = cores * 2 + 1
+    memory = _memory_limit_bytes()
+    if memory is None:
+        return by_cpu
+    worker_memory = int(os.environ.get('WORKER_MEMORY_MB', 150)) * 1024 * 1024
+    master_reserve = int(os.environ.get('MASTER_MEMORY_MB', 100)) * 1024 * 1024
+    by_memory = (memory - master_reserve) // worker_memory
+    return max(1, min(by_cpu, by_memory))
+
+# Server socket
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Workers: threads cover the time requests spend waiting on Paystack
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY') or _auto_workers())
+threads = int(os.environ.get('GUNICORN_THREADS') or (4 if _cpu_count() <= 2 else 2))
+preload_app = True
+
+# Paystack calls time out after 30s; leave room before the worker is killed
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycle workers gradually so they never all restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+MEMORY_REPORT_INTERVAL = int(os.environ.get('MEMORY_REPORT_INTERVAL', 500))
+
+def when_ready(server):
+    """Everything is loaded: move it to the permanent generation before forking"""
+    if GC_FREEZE:
+        gc.freeze()
+        gc.enable()  # The master's own later allocations are collected as usual
+    server.log.info(f"Master ready: {workers} workers x {threads} threads, "
+                    f"gc frozen objects: {gc.get_freeze_count()}, master RSS {unique_rss_mb() or 0:.1f} MB")
+
+def post_fork(server, worker):
+    """Workers inherit the enabled collector; frozen startup objects stay shared"""
+    worker.requests_served = 0
+
+    # Drop any pooled connection inherited from the master without closing its socket
+    from models import db
+    with worker.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} booted: unique RSS {unique_rss_mb() or 0:.1f} MB")
+
+def post_request(worker, req, environ, resp):
+    worker.requests_served = getattr(worker, 'requests_served', 0) + 1
+    if MEMORY_REPORT_INTERVAL and worker.requests_served % MEMORY_REPORT_INTERVAL == 0:
+        worker.log.info(f"Worker {worker.pid} after {worker.requests_served} requests: "
+                        f"unique RSS {unique_rss_mb() or 0:.1f} MB")
+
+def worker_exit(server, worker):
+    server.log.info(f"Worker {worker.pid} exiting after {getattr(worker, 'requests_served', 0)} requests: "
+                    f"unique RSS {unique_rss_mb(worker.pid) or 0:.1f} MB")
@@ -0,0 +1,204 @@
+"""
+Liveness and readiness.
+
+/healthz answers as long as the process can serve a request. /readyz tells a
+load balancer whether this worker should get traffic. It never checks
+anything itself: a background prober in each worker checks the database,
+Paystack and the mail queue on an interval, records each check's outcome and
+latency, and /readyz only reads the latest results.
+
+A worker is ready once warm-up (templates, asset manifest, critical CSS,
+FX rates) has finished, the first round of probes is in, every check named
+in HEALTH_CRITICAL passed and the results are not stale. Checks that are not
+critical (by default Paystack and mail) are reported but do not take the
+worker out of rotation: a Paystack outage should not take the site down.
+With HEALTH_PROBES_ENABLED=false (tests and scripts) nothing is probed and
+readiness only follows warm-up.
+"""
+
+import json
+import os
+import threading
+import time
+from functools import wraps
+import requests
+from flask import Response
+from sqlalchemy import text
+from models import db
+from mailer import outbox_backlog, mail_sender_running
+
+HEALTH_ENDPOINTS = {'healthz', 'readyz'}
+
+def probe_database(app):
+    with app.app_context():
+        try:
+            db.session.execute(text('SELECT 1'))
+        finally:
+            db.session.remove()
+    return {}
+
+def probe_paystack(app):
+    """Smallest authenticated Paystack call: one page of one bank"""
+    if not app.config['PAYSTACK_SECRET_KEY']:
+        raise RuntimeError('PAYSTACK_SECRET_KEY not set')
+    response = requests.get(
+        f"{app.config['PAYSTACK_API_URL']}/bank",
+        params={'perPage': 1},
+        headers={'Authorization': f"Bearer {app.config['PAYSTACK_SECRET_KEY']}"},
+        timeout=app.config['HEALTH_PROBE_TIMEOUT']
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f'HTTP {response.status_code}')
+    return {}
+
+def probe_mail(app):
+    """The sender thread is running and nothing due has waited longer than HEALTH_MAIL_MAX_DELAY"""
+    with app.app_context():
+        try:
+            due, oldest_seconds = outbox_backlog()
+        finally:
+            db.session.remove()
+    details = {'due': due, 'oldest_due_seconds': round(oldest_seconds)}
+    if app.config['MAIL_ENABLED'] and not mail_sender_running():
+        raise RuntimeError('mail sender is not running')
+    if oldest_seconds > app.config['HEALTH_MAIL_MAX_DELAY']:
+        raise RuntimeError(f'{due} messages due, oldest {oldest_seconds:.0f}s')
+    return details
+
+# name -> (probe, config key of its interval)
+PROBES = {
+    'database': (probe_database, 'HEALTH_PROBE_INTERVAL'),
+    'paystack': (probe_paystack, 'HEALTH_PAYSTACK_INTERVAL'),
+    'mail': (probe_mail, 'HEALTH_PROBE_INTERVAL'),
+}
+
+def run_probe(app, name):
+    """Run one probe; return its result with the latency in ms"""
+    probe = PROBES[name][0]
+    started = time.perf_counter()
+    try:
+        details = probe(app)
+        result = {'ok': True, **details}
+    except Exception as e:
+        result = {'ok': False, 'error': str(e)[:200]}
+    result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    result['checked_at'] = int(time.time())
+    return result
+
+class HealthMonitor:
+    """Warm-up state and background dependency probes, bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.warm = False
+        self.warming = False
+        # (results, results as JSON, monotonic time of the last round), replaced as a whole
+        self._snapshot = ({}, b'{}', None)
+        self._warm_up = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.critical = [name.strip() for name in app.config['HEALTH_CRITICAL'].split(',') if name.strip()]
+        app.extensions['health'] = self
+        app.add_url_rule('/healthz', 'healthz', self.healthz)
+        app.add_url_rule('/readyz', 'readyz', self.readyz)
+
+    def warm_up(self, function):
+        """Decorator for the app's warm-up: tracks it and lets the prober run it if nobody else did"""
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            self.warming = True
+            try:
+                result = function(*args, **kwargs)
+                self.warm = True
+                return result
+            finally:
+                self.warming = False
+        self._warm_up = wrapper
+        return wrapper
+
+    def start(self):
+        """Start this process's prober thread (again after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._snapshot = ({}, b'{}', None)
+                self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        if not self.warm and not self.warming and self._warm_up is not None:
+            # Nobody warmed this process up front (e.g. the development server)
+            try:
+                self._warm_up()
+            except Exception as e:
+                self.app.logger.error("Warm-up failed: %s", e)
+        if not self.app.config['HEALTH_PROBES_ENABLED']:
+            return
+        due = {name: 0.0 for name in PROBES}
+        while True:
+            self.probe_due(due)
+            time.sleep(max(0.1, min(due.values()) - time.monotonic()))
+
+    def probe_due(self, due):
+        """Run every probe whose interval has passed and publish the results"""
+        now = time.monotonic()
+        results = dict(self.results)
+        for name, (_, interval_key) in PROBES.items():
+            if due[name] <= now:
+                results[name] = run_probe(self.app, name)
+                due[name] = now + self.app.config[interval_key]
+                if not results[name]['ok']:
+                    self.app.logger.warning("Health check %s failed: %s", name, results[name]['error'])
+        # Serialised once here so /readyz only concatenates bytes
+        self._snapshot = (results, json.dumps(results, separators=(',', ':')).encode(), time.monotonic())
+
+    @property
+    def results(self):
+        return self._snapshot[0]
+
+    def readiness(self, snapshot=None):
+        """(ready, reason) from the cached state"""
+        results, _, probed_at = snapshot or self._snapshot
+        if not self.warm:
+            return False, 'warming up' if self.warming else 'not warmed up'
+        if not self.app.config['HEALTH_PROBES_ENABLED']:
+            return True, 'ready (probes disabled)'
+        if probed_at is None:
+            return False, 'waiting for the first probes'
+        if time.monotonic() - probed_at > self.app.config['HEALTH_STALE_AFTER']:
+            return False, 'probe results are stale'
+        failed = [name for name in self.critical if not results.get(name, {}).get('ok')]
+        if failed:
+            return False, f"failing: {', '.join(failed)}"
+        return True, 'ready'
+
+    def healthz(self):
+        return Response(b'ok', 200, mimetype='text/plain', headers={'Cache-Control': 'no-store'})
+
+    def readyz(self):
+        self.start()
+        snapshot = self._snapshot
+        ready, reason = self.readiness(snapshot)
+        body = b'{"status":"%s","checks":%s}' % (reason.encode(), snapshot[1])
+        return Response(body, 200 if ready else 503, mimetype='application/json',
+                        headers={'Cache-Control': 'no-store'})
+
+if __name__ == '__main__':
+    from app import app
+
+    print("🩺 Probing dependencies...")
+    failed = False
+    for name in PROBES:
+        result = run_probe(app, name)
+        failed = failed or (name in app.extensions['health'].critical and not result['ok'])
+        status = '✅' if result['ok'] else '❌'
+        print(f"{status} {name:<10} {result['latency_ms']:>8.1f} ms  {result.get('error', '')}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,108 @@
+"""
+Early Hints and preload headers for HTML pages.
+
+Without hints the browser learns about main.css, main.js, the logo and the
+hero image only as it parses the HTML, which arrives after the view has
+rendered. For each page route the critical resources are known up front:
+the shell below plus whatever the route registers (the hero or campaign
+image, third-party origins to preconnect to), all resolved through the
+asset manifest so the URLs are the fingerprinted ones the page uses.
+
+Before the view runs, servers that expose the wsgi.early_hints callable are
+asked to send them as a 103 Early Hints response. Every page response also
+carries them as Link headers, which browsers act on as soon as headers
+arrive and which proxies and CDNs can turn into 103s themselves.
+
+Pages with inlined critical CSS (critical_css.py) paint from the HTML alone,
+so for them only the font preload and the preconnects are sent: any other
+preload shares a slow connection with the HTML and delays first paint
+(benchmark_hints.py). The full set is sent when a page has no critical CSS
+and its stylesheets block rendering.
+
+Links are computed once per endpoint and arguments and kept in memory.
+"""
+
+from flask import g, request
+
+# Preloaded on every page: (static file, destination, extra parameters)
+SHELL = (
+    ('fonts/inter-latin.woff2', 'font', 'type="font/woff2"; crossorigin'),
+    ('css/fonts.css', 'style', ''),
+    ('css/main.css', 'style', ''),
+    ('js/main.js', 'script', ''),
+    ('images/logo.png', 'image', ''),
+)
+# Memoised link sets; past this many (e.g. probes of unknown campaign ids) the memo starts over
+MAX_MEMO = 1000
+
+def preload(url, destination, **params):
+    """Link value preloading url, e.g. preload(u, 'image', imagesrcset=..., imagesizes=...)"""
+    extra = ''.join(f'; {name}="{value}"' for name, value in params.items())
+    return f'<{url}>; rel=preload; as={destination}{extra}'
+
+def preconnect(origin):
+    return f'<{origin}>; rel=preconnect'
+
+class EarlyHints:
+    """Per-route critical resources bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.pages = {}  # endpoint -> function(**view_args) returning extra link values
+        self._memo = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['early_hints'] = self
+        app.before_request(self._send_early_hints)
+        app.after_request(self._add_link_headers)
+
+    def page(self, endpoint):
+        """Register a page endpoint; the decorated function returns its own link values"""
+        def decorator(f):
+            self.pages[endpoint] = f
+            return f
+        return decorator
+
+    def shell_links(self):
+        assets = self.app.extensions['asset_manifest']
+        links = []
+        for filename, destination, extra in SHELL:
+            link = preload(assets.asset_url(filename), destination)
+            links.append(f'{link}; {extra}' if extra else link)
+        return links
+
+    def links(self, endpoint, view_args):
+        """Link values for a page request (memoised per endpoint and arguments)"""
+        key = (endpoint, tuple(sorted(view_args.items())))
+        links = self._memo.get(key)
+        if links is None:
+            links = self.shell_links() + list(self.pages[endpoint](**view_args) or ())
+            critical = self.app.extensions.get('critical_css')
+            if critical is not None and critical.critical_css(endpoint):
+                links = [link for link in links if 'as=font' in link or 'rel=preconnect' in link]
+            if len(self._memo) >= MAX_MEMO:
+                self._memo.clear()
+            self._memo[key] = links
+        return links
+
+    def _send_early_hints(self):
+        if (not self.app.config['EARLY_HINTS_ENABLED'] or request.method != 'GET'
+                or request.endpoint not in self.pages):
+            return
+        g.early_hints = self.links(request.endpoint, request.view_args or {})
+        send = request.environ.get('wsgi.early_hints')
+        if callable(send):
+            try:
+                send([('Link', link) for link in g.early_hints])
+            except Exception as e:
+                # The hints are only an optimisation; the Link headers still go out
+                self.app.logger.warning("Early hints failed: %s", e)
+
+    def _add_link_headers(self, response):
+        links = g.pop('early_hints', None)
+        if links and response.status_code == 200 and response.mimetype == 'text/html':
+            response.headers.add('Link', ', '.join(links))
+        return response
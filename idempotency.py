@@ -0,0 +1,145 @@
+"""
+Idempotent, single-flight execution of expensive requests.
+
+A request carrying an idempotency key claims an IdempotencyKey row before
+doing its work (e.g. initializing a Paystack transaction). Duplicates that
+arrive while the work is in flight - from the same worker or any other -
+wait for it instead of repeating it, and duplicates that arrive afterwards
+get the stored response until the key expires. The row insert is the lock,
+so this works across gunicorn workers and hosts sharing the database.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from leader import make_holder_id
+from models import db, IdempotencyKey
+
+_owner = None
+
+# Events for flights led by this process, so local duplicates wake immediately
+_local_flights = {}
+_local_lock = threading.Lock()
+_last_purge = 0.0
+
+def _owner_id():
+    global _owner
+    if _owner is None:
+        _owner = make_holder_id()
+    return _owner
+
+def _claim(key, is_valid):
+    """Try to become the leader for key; return ('claimed'|'cached'|'busy', response)"""
+    config = current_app.config
+    now = datetime.utcnow()
+    owner = _owner_id()
+    try:
+        db.session.execute(insert(IdempotencyKey).values(
+            key=key, state='in_flight', owner=owner, created_at=now,
+            locked_until=now + timedelta(seconds=config['IDEMPOTENCY_LOCK_TTL']),
+            expires_at=now + timedelta(seconds=config['IDEMPOTENCY_WINDOW'])
+        ))
+        db.session.commit()
+        return 'claimed', None
+    except IntegrityError:
+        db.session.rollback()
+
+    row = db.session.execute(
+        select(IdempotencyKey).where(IdempotencyKey.key == key).execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    if row is None:
+        return 'busy', None  # Released between our insert and read; try again
+
+    if row.state == 'done' and row.expires_at > now:
+        response = json.loads(row.response)
+        if is_valid is None or is_valid(response):
+            return 'cached', response
+    elif row.state == 'in_flight' and row.locked_until > now:
+        return 'busy', None
+
+    # Expired, no longer valid, or the leader died: take the key over
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key, IdempotencyKey.state == row.state, IdempotencyKey.owner == row.owner)
+        .values(state='in_flight', owner=owner, response=None,
+                locked_until=now + timedelta(seconds=config['IDEMPOTENCY_LOCK_TTL']),
+                expires_at=now + timedelta(seconds=config['IDEMPOTENCY_WINDOW']))
+    )
+    db.session.commit()
+    return ('claimed', None) if result.rowcount == 1 else ('busy', None)
+
+def _finish(key, response):
+    """Store the leader's response, or release the key so a retry can run"""
+    owner = _owner_id()
+    if response is None:
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.owner == owner))
+    else:
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key, IdempotencyKey.owner == owner)
+            .values(state='done', response=json.dumps(response))
+        )
+    db.session.commit()
+
+def purge_expired_keys():
+    """Delete expired keys, at most once per IDEMPOTENCY_PURGE_INTERVAL per process"""
+    global _last_purge
+    if time.monotonic() - _last_purge < current_app.config['IDEMPOTENCY_PURGE_INTERVAL']:
+        return 0
+    _last_purge = time.monotonic()
+    result = db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow(), IdempotencyKey.state == 'done')
+    )
+    db.session.commit()
+    return result.rowcount
+
+def run_once(key, compute, is_valid=None):
+    """Run compute() once per key; return (response, replayed).
+
+    compute returns a result dict. Only successful results ({'success': True})
+    are stored; a failure releases the key so the donor can retry. is_valid
+    can reject a stored response that should no longer be replayed. If the
+    in-flight leader does not finish within IDEMPOTENCY_WAIT seconds a failure
+    result is returned rather than starting a second flight.
+    """
+    config = current_app.config
+    deadline = time.monotonic() + config['IDEMPOTENCY_WAIT']
+    poll = 0.05
+
+    while True:
+        outcome, response = _claim(key, is_valid)
+        if outcome == 'claimed':
+            break
+        if outcome == 'cached':
+            return response, True
+        if time.monotonic() > deadline:
+            return {'success': False, 'error': 'This request is already being processed. Please wait a moment.'}, False
+
+        with _local_lock:
+            event = _local_flights.get(key)
+        if event is not None:
+            event.wait(max(deadline - time.monotonic(), 0))
+        else:
+            time.sleep(poll)
+        poll = min(poll * 2, 0.5)
+
+    event = threading.Event()
+    with _local_lock:
+        _local_flights[key] = event
+    try:
+        result = compute()
+        _finish(key, result if result.get('success') else None)
+        purge_expired_keys()
+        return result, False
+    except Exception:
+        db.session.rollback()
+        _finish(key, None)
+        raise
+    finally:
+        with _local_lock:
+            _local_flights.pop(key, None)
+        event.set()
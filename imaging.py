@@ -0,0 +1,279 @@
+"""
+On-demand image resizing for static photos.
+
+/img/<path>?w=480&fmt=webp serves a resized, transcoded copy of an image
+under static/. Variants are produced on first request in a process pool and
+stored in a size-bounded disk cache keyed by the source content hash and the
+parameters, evicting least recently used files. Concurrent misses for the
+same variant are coalesced: threads in a worker share one future and other
+workers wait on a file lock, so each variant is rendered once.
+
+Widths snap up to a fixed ladder (so arbitrary ?w= values cannot fill the
+cache) and are never larger than the source. Templates use image_url() and
+image_srcset(), which add the source hash as ?v= so hits can be cached
+forever by browsers.
+"""
+
+import fcntl
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+WIDTHS = (160, 320, 480, 640, 960, 1280, 1600, 1920)
+SOURCE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 78, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'image/png', {'optimize': True}),
+}
+# Bump when the rendering below changes, so old variants are not served
+RENDER_VERSION = 1
+
+def snap_width(width):
+    """Smallest ladder width >= width (the largest one for anything bigger)"""
+    for candidate in WIDTHS:
+        if candidate >= width:
+            return candidate
+    return WIDTHS[-1]
+
+def render_variant(source_path, dest_path, width, fmt):
+    """Resize and encode one variant (runs in a pool process); return the output size in bytes"""
+    from PIL import Image, ImageOps
+
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(source_path) as image:
+        # Let the JPEG decoder downscale by 2/4/8 before we resample
+        image.draft('RGB', (width, width * 4))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        tmp_path = f'{dest_path}.{os.getpid()}.tmp'
+        image.save(tmp_path, pil_format, **options)
+    os.replace(tmp_path, dest_path)
+    return os.path.getsize(dest_path)
+
+class DiskCache:
+    """Directory of rendered variants bounded to max_bytes with LRU eviction by mtime"""
+
+    # Hits refresh a file's mtime at most this often (seconds), to keep hits cheap
+    TOUCH_INTERVAL = 3600
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key, fmt):
+        return os.path.join(self.directory, key[:2], f'{key}.{fmt}')
+
+    def touch(self, path):
+        """Mark a hit as recently used"""
+        try:
+            if time.time() - os.stat(path).st_mtime > self.TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith('.tmp'):
+                    # Left behind by a crashed render
+                    if time.time() - stat.st_mtime > 600:
+                        os.unlink(path)
+                    continue
+                if not name.endswith('.lock'):
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def added(self, size):
+        """Account for a new variant and evict old ones once over max_bytes"""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry[1] for entry in self._scan())
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other workers write here too, so evict from a fresh scan, down to 90%
+        entries = sorted(self._scan())
+        total = sum(entry[1] for entry in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+class ImageResizer:
+    """Resizing endpoint support bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self._cache = None
+        self._pool = None
+        self._pool_pid = None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._source_hashes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['image_resizer'] = self
+        app.add_template_global(self.image_url, 'image_url')
+        app.add_template_global(self.image_srcset, 'image_srcset')
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = DiskCache(self.app.config['IMAGE_CACHE_DIR'], self.app.config['IMAGE_CACHE_MAX_BYTES'])
+        return self._cache
+
+    def _get_pool(self):
+        # One pool per worker process, created after gunicorn forks
+        if self._pool is None or self._pool_pid != os.getpid():
+            # forkserver: pool processes never inherit this worker's threads and locks
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['imaging', 'PIL.Image'])
+            self._pool = ProcessPoolExecutor(self.app.config['IMAGE_WORKERS'], mp_context=context)
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def source_path(self, filename):
+        """Absolute path of a resizable static image, or None"""
+        if os.path.splitext(filename)[1].lower() not in SOURCE_EXTENSIONS:
+            return None
+        path = safe_join(self.app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def source_hash(self, filename, path):
+        """Content hash of a source image: from the asset manifest, else hashed once per mtime"""
+        manifest = self.app.extensions.get('asset_manifest')
+        entry = manifest.get(filename) if manifest else None
+        stat = os.stat(path)
+        if entry and entry['size'] == stat.st_size:
+            return entry['hash']
+
+        from assets import file_hash
+        memo_key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._source_hashes.get(memo_key)
+        if digest is None:
+            digest = self._source_hashes[memo_key] = file_hash(path)
+        return digest
+
+    def choose_format(self, fmt):
+        if fmt in FORMATS:
+            return fmt
+        # 'auto': WebP where the browser accepts it
+        return 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+
+    def variant(self, path, source_hash, width, fmt):
+        """Path of the rendered variant, rendering it (once, across threads and workers) on a miss"""
+        key = hashlib.sha256(f'{source_hash}:{width}:{fmt}:{RENDER_VERSION}'.encode()).hexdigest()[:32]
+        dest = self.cache.path_for(key, fmt)
+        if os.path.exists(dest):
+            self.cache.touch(dest)
+            return dest
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result(timeout=self.app.config['IMAGE_RENDER_TIMEOUT'])
+
+        try:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(f'{dest}.lock', 'w') as lock_file:
+                # Another worker may be rendering the same variant right now
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if not os.path.exists(dest):
+                        size = self._get_pool().submit(render_variant, path, dest, width, fmt).result(
+                            timeout=self.app.config['IMAGE_RENDER_TIMEOUT'])
+                        self.cache.added(size)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+            try:
+                os.unlink(f'{dest}.lock')
+            except OSError:
+                pass
+            future.set_result(dest)
+            return dest
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def serve(self, filename):
+        """Response for /img/<filename>?w=&fmt=&v="""
+        path = self.source_path(filename)
+        if path is None:
+            abort(404)
+        width = snap_width(request.args.get('w', WIDTHS[-1], type=int) or WIDTHS[-1])
+        requested_format = request.args.get('fmt', 'auto')
+        fmt = self.choose_format(requested_format)
+        source_hash = self.source_hash(filename, path)
+
+        try:
+            variant = self.variant(path, source_hash, width, fmt)
+        except Exception as e:
+            self.app.logger.error("Image resize failed for %s: %s", filename, e)
+            abort(500)
+
+        # send_file hands the open file to the server's file wrapper (sendfile under gunicorn)
+        response = send_file(variant, mimetype=FORMATS[fmt][1], conditional=True,
+                             etag=f'{source_hash}-{width}-{fmt}', max_age=86400)
+        if request.args.get('v') == source_hash:
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        if requested_format not in FORMATS:
+            response.vary.add('Accept')
+        return response
+
+    def image_url(self, filename, width, fmt='auto'):
+        """Fingerprinted URL of a resized static image (plain static URL if it cannot be resized)"""
+        media = self.app.extensions.get('media_store')
+        if media:
+            # Duplicate uploads share one set of variants
+            filename = media.canonical(filename)
+        path = self.source_path(filename)
+        if path is None:
+            return url_for('static', filename=filename)
+        return url_for('resized_image', filename=filename, w=snap_width(width), fmt=fmt,
+                       v=self.source_hash(filename, path))
+
+    def image_srcset(self, filename, widths, fmt='auto'):
+        """srcset attribute value with one resized URL per width"""
+        return ', '.join(f'{self.image_url(filename, width, fmt)} {snap_width(width)}w' for width in widths)
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Black Shepherd Foundation - Impact Metrics
+What each campaign achieved, recorded as events and read as rollups.
+
+- Registry: METRICS names every metric (label, and whether it counts people
+  towards "lives impacted"). Events in unknown metrics are rejected.
+- Events: outreach staff record impact_event rows (campaign, metric,
+  quantity, date) from /admin/impact, a CSV import or the CLI. An optional
+  source_key makes a record idempotent. A campaign's opening figures are
+  recorded once as events too (ensure_opening_impact).
+- Rollups: every record adds its quantities to impact_rollup rows per metric
+  and campaign at daily, monthly and all-time grain, in the same
+  transaction, so the rollups are never behind the events. One narrow row
+  per (grain, metric, campaign, period): pages read only the all-time rows,
+  a few dozen however many millions of events there are.
+- Reads: ImpactMetrics keeps the all-time totals in memory, precomputed into
+  what the templates show (campaign_impact, people_helped) and the
+  foundation's lives_impacted. It adds each record incrementally and reloads
+  with the campaign totals, which is how other workers' records arrive.
+
+The admin page needs ADMIN_TOKEN (see reporting.py).
+
+Usage:
+    python impact.py metrics                      # list the registered metrics
+    python impact.py record 2 families_served 40 [--date 2025-12-25] [--note ...]
+    python impact.py import outreach.csv          # campaign_id,metric,quantity,date[,source_key,note]
+    python impact.py rebuild                      # recompute every rollup from the events
+"""
+
+import argparse
+import csv
+import threading
+from datetime import datetime
+from flask import flash, jsonify, redirect, render_template, request, url_for
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from ledger import period_start, upsert_sums
+from models import db, ImpactEvent, ImpactRollup
+from reporting import admin_required
+
+# Metric registry: key -> label, and whether its quantity is a count of people helped.
+# Only one people metric per campaign is flagged, so nobody is counted twice
+# (the mothers and children supported are among the families).
+METRICS = {
+    'families_helped': {'label': 'Families Assisted', 'lives': True},
+    'bills_settled': {'label': 'Hospital Bills Settled', 'lives': False},
+    'food_bags_distributed': {'label': 'Food Bags Distributed', 'lives': False},
+    'mothers_supported': {'label': 'Mothers Supported', 'lives': False},
+    'families_served': {'label': 'Families Served', 'lives': True},
+    'food_packs_distributed': {'label': 'Food Packs Distributed', 'lives': False},
+    'children_participated': {'label': 'Children Participated', 'lives': False},
+    'hygiene_packages': {'label': 'Hygiene Packages', 'lives': False},
+    'students_supported': {'label': 'Students Supported', 'lives': True},
+    'exam_fees_sponsored': {'label': 'Exam Fees Sponsored', 'lives': False},
+    'sensitization_sessions': {'label': 'Sensitization Sessions', 'lives': False},
+    'toiletries_distributed': {'label': 'Toiletries Distributed', 'lives': False},
+}
+
+# Rollup grains; 'total' has a single period starting at TOTAL_PERIOD
+IMPACT_GRAINS = ('day', 'month', 'total')
+TOTAL_PERIOD = datetime(1970, 1, 1)
+
+def validate_event(campaign_id, metric, quantity, occurred_at, campaign_ids=None):
+    """Raise ValueError unless this is a recordable event"""
+    if metric not in METRICS:
+        raise ValueError(f'Unknown metric: {metric!r}')
+    if campaign_ids is not None and campaign_id not in campaign_ids:
+        raise ValueError(f'Unknown campaign: {campaign_id!r}')
+    if not isinstance(quantity, int) or quantity <= 0:
+        raise ValueError(f'Quantity must be a positive whole number, not {quantity!r}')
+    if occurred_at > datetime.utcnow():
+        raise ValueError(f'Date is in the future: {occurred_at:%Y-%m-%d}')
+
+def impact_period(moment, grain):
+    """Start of the rollup period containing moment"""
+    return TOTAL_PERIOD if grain == 'total' else period_start(moment, grain)
+
+def add_impact(buckets, campaign_id, metric, occurred_at, quantity):
+    """Accumulate one event into rollup deltas keyed by (grain, metric, campaign_id, period_start)"""
+    for grain in IMPACT_GRAINS:
+        key = (grain, metric, campaign_id, impact_period(occurred_at, grain))
+        total, count = buckets.get(key, (0, 0))
+        buckets[key] = (total + quantity, count + 1)
+
+def record_events(events, campaign_ids=None):
+    """Store impact events and add them to the rollups in one transaction; return those recorded.
+
+    events are dicts with campaign_id, metric, quantity and occurred_at, and
+    optionally source_key, note and recorded_by. Events whose source_key is
+    already recorded (or repeated in events) are skipped.
+    """
+    for event in events:
+        validate_event(event['campaign_id'], event['metric'], event['quantity'], event['occurred_at'], campaign_ids)
+
+    for attempt in range(2):
+        keys = {event['source_key'] for event in events if event.get('source_key')}
+        existing = set(db.session.execute(
+            select(ImpactEvent.source_key).where(ImpactEvent.source_key.in_(keys))
+        ).scalars()) if keys else set()
+
+        rows = []
+        for event in events:
+            key = event.get('source_key')
+            if key:
+                if key in existing:
+                    continue
+                existing.add(key)
+            rows.append({
+                'campaign_id': event['campaign_id'], 'metric': event['metric'], 'quantity': event['quantity'],
+                'occurred_at': event['occurred_at'], 'source_key': key or None, 'note': event.get('note'),
+                'recorded_by': event.get('recorded_by'), 'recorded_at': datetime.utcnow()
+            })
+        if not rows:
+            return []
+
+        buckets = {}
+        for row in rows:
+            add_impact(buckets, row['campaign_id'], row['metric'], row['occurred_at'], row['quantity'])
+        try:
+            db.session.execute(insert(ImpactEvent), rows)
+            upsert_sums(ImpactRollup.__table__, ('grain', 'metric', 'campaign_id', 'period_start'),
+                        ('total', 'event_count'), [
+                            {'grain': grain, 'metric': metric, 'campaign_id': campaign_id, 'period_start': start,
+                             'total': total, 'event_count': count}
+                            for (grain, metric, campaign_id, start), (total, count) in buckets.items()
+                        ])
+            db.session.commit()
+            return rows
+        except IntegrityError:
+            # Another writer recorded one of the source keys first; skip it and try again
+            db.session.rollback()
+            if attempt:
+                raise
+
+def opening_events(campaigns):
+    """Each campaign's opening_impact figures as events, dated on the campaign"""
+    return [
+        {'campaign_id': campaign_id, 'metric': metric, 'quantity': quantity, 'occurred_at': data['date'],
+         'source_key': f'opening-{campaign_id}-{metric}', 'note': 'Opening figure', 'recorded_by': 'seed'}
+        for campaign_id, data in campaigns.items()
+        for metric, quantity in data.get('opening_impact', {}).items()
+    ]
+
+def ensure_opening_impact(campaigns):
+    """Record the opening figures once; return the events recorded now"""
+    return record_events(opening_events(campaigns))
+
+def load_impact_totals():
+    """All-time totals as {campaign_id: {metric: total}}, from the rollups"""
+    totals = {}
+    rows = db.session.execute(
+        select(ImpactRollup.campaign_id, ImpactRollup.metric, ImpactRollup.total)
+        .where(ImpactRollup.grain == 'total')
+    )
+    for campaign_id, metric, total in rows:
+        totals.setdefault(campaign_id, {})[metric] = int(total)
+    return totals
+
+def impact_by_period(grain, since, campaign_id=None):
+    """[(period_start, metric, total)] at day or month grain from since, newest first"""
+    query = (
+        select(ImpactRollup.period_start, ImpactRollup.metric, func.sum(ImpactRollup.total))
+        .where(ImpactRollup.grain == grain, ImpactRollup.period_start >= since)
+        .group_by(ImpactRollup.period_start, ImpactRollup.metric)
+        .order_by(ImpactRollup.period_start.desc(), ImpactRollup.metric)
+    )
+    if campaign_id is not None:
+        query = query.where(ImpactRollup.campaign_id == campaign_id)
+    return [(start, metric, int(total)) for start, metric, total in db.session.execute(query)]
+
+def rebuild_impact_rollups(conn, batch_size=5000):
+    """Recompute every rollup from the impact events; return the number of rollup rows"""
+    table = ImpactRollup.__table__
+    conn.execute(table.delete())
+    buckets = {}
+    result = conn.execution_options(yield_per=batch_size).execute(
+        select(ImpactEvent.campaign_id, ImpactEvent.metric, ImpactEvent.occurred_at, ImpactEvent.quantity)
+    )
+    for campaign_id, metric, occurred_at, quantity in result:
+        add_impact(buckets, campaign_id, metric, occurred_at, quantity)
+    if buckets:
+        conn.execute(table.insert(), [
+            {'grain': grain, 'metric': metric, 'campaign_id': campaign_id, 'period_start': start,
+             'total': total, 'event_count': count}
+            for (grain, metric, campaign_id, start), (total, count) in buckets.items()
+        ])
+    return len(buckets)
+
+def parse_event(fields, recorded_by=None):
+    """An event dict from form, JSON or CSV fields (strings allowed); raises ValueError"""
+    try:
+        campaign_id = int(fields['campaign_id'])
+        quantity = int(fields['quantity'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('campaign_id and quantity must be whole numbers')
+    date = fields.get('date') or fields.get('occurred_at')
+    return {
+        'campaign_id': campaign_id, 'metric': (fields.get('metric') or '').strip(), 'quantity': quantity,
+        'occurred_at': datetime.fromisoformat(date) if date else datetime.utcnow(),
+        'source_key': (fields.get('source_key') or '').strip() or None,
+        'note': (fields.get('note') or '').strip()[:200] or None, 'recorded_by': recorded_by
+    }
+
+class ImpactMetrics:
+    """Precomputed impact totals for templates, and the admin page to record events, bound to a Flask app"""
+
+    def __init__(self, app=None, stats=None):
+        self.app = app
+        self.stats = stats if stats is not None else {}  # Foundation figures; lives_impacted is kept here
+        self.titles = {}
+        self._totals = {}  # campaign_id -> {metric: total}
+        self._impact = {}  # campaign_id -> [{'metric', 'label', 'total'}] in registry order
+        self._people = {}  # campaign_id -> people helped
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['impact'] = self
+        app.add_template_global(self.campaign_impact, 'campaign_impact')
+        app.add_template_global(self.people_helped, 'people_helped')
+        app.add_url_rule('/admin/impact', 'admin_impact', admin_required(self.admin), methods=['GET', 'POST'])
+
+    def load(self, campaigns=None):
+        """Replace the totals with the rollups (at startup and with every campaign totals refresh)"""
+        if campaigns is not None:
+            self.titles = {campaign_id: data['title'] for campaign_id, data in campaigns.items()}
+        totals = load_impact_totals()
+        with self._lock:
+            self._totals = totals
+            self._precompute(totals)
+
+    def apply(self, rows, replace=False):
+        """Add freshly recorded events to the totals (with replace, make them the only totals)"""
+        with self._lock:
+            totals = {} if replace else {campaign_id: dict(metrics) for campaign_id, metrics in self._totals.items()}
+            for row in rows:
+                metrics = totals.setdefault(row['campaign_id'], {})
+                metrics[row['metric']] = metrics.get(row['metric'], 0) + row['quantity']
+            self._totals = totals
+            self._precompute(totals)
+
+    def _precompute(self, totals):
+        self._impact = {
+            campaign_id: [{'metric': metric, 'label': spec['label'], 'total': metrics[metric]}
+                          for metric, spec in METRICS.items() if metrics.get(metric)]
+            for campaign_id, metrics in totals.items()
+        }
+        self._people = {
+            campaign_id: sum(total for metric, total in metrics.items() if METRICS.get(metric, {}).get('lives'))
+            for campaign_id, metrics in totals.items()
+        }
+        self.stats['lives_impacted'] = sum(self._people.values())
+
+    def campaign_impact(self, campaign_id):
+        """Metrics a campaign has recorded, with labels and totals"""
+        return self._impact.get(campaign_id, [])
+
+    def people_helped(self, campaign_id=None):
+        """People a campaign (or the whole foundation) has helped"""
+        if campaign_id is None:
+            return sum(self._people.values())
+        return self._people.get(campaign_id, 0)
+
+    def record(self, events, recorded_by=None):
+        """Validate, store and apply events; return those recorded (not already seen)"""
+        for event in events:
+            event.setdefault('recorded_by', recorded_by)
+        rows = record_events(events, set(self.titles) or None)
+        if rows:
+            self.apply(rows)
+            self.app.logger.info("Recorded %d impact events", len(rows))
+        return rows
+
+    def admin(self):
+        """Totals per campaign, recent events and a form to record one; JSON posts record several"""
+        recorder = request.authorization.username if request.authorization else 'admin'
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) if request.is_json else request.form
+            fields = payload if isinstance(payload, list) else [payload or {}]
+            try:
+                rows = self.record([parse_event(item, recorder) for item in fields])
+            except ValueError as e:
+                if request.is_json:
+                    return jsonify({'error': str(e)}), 400
+                flash(str(e), 'error')
+                return redirect(url_for('admin_impact'))
+            if request.is_json:
+                return jsonify({'recorded': len(rows), 'lives_impacted': self.people_helped()})
+            flash(f"Recorded {len(rows)} event{'s' if len(rows) != 1 else ''}", 'success')
+            return redirect(url_for('admin_impact'))
+
+        this_year = datetime.utcnow().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        events = db.session.execute(
+            select(ImpactEvent).order_by(ImpactEvent.id.desc()).limit(50)
+        ).scalars().all()
+        return render_template('admin_impact.html', metrics=METRICS, titles=self.titles,
+                               impact={campaign_id: self.campaign_impact(campaign_id) for campaign_id in self.titles},
+                               monthly=impact_by_period('month', this_year), events=events,
+                               today=datetime.utcnow().date().isoformat())
+
+def import_events(path, batch_size, campaign_ids=None):
+    """Record events from a CSV file in batches; return (read, recorded)"""
+    read = recorded = 0
+    with open(path, newline='') as f:
+        batch = []
+        for fields in csv.DictReader(f):
+            batch.append(parse_event(fields, 'import'))
+            read += 1
+            if len(batch) >= batch_size:
+                recorded += len(record_events(batch, campaign_ids))
+                batch = []
+        if batch:
+            recorded += len(record_events(batch, campaign_ids))
+    return read, recorded
+
+def main():
+    from app import app, CAMPAIGNS
+
+    parser = argparse.ArgumentParser(description='Impact events and rollups')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('metrics', help='list the registered metrics')
+    record_parser = commands.add_parser('record', help='record one event')
+    record_parser.add_argument('campaign_id', type=int)
+    record_parser.add_argument('metric', choices=METRICS)
+    record_parser.add_argument('quantity', type=int)
+    record_parser.add_argument('--date')
+    record_parser.add_argument('--note')
+    record_parser.add_argument('--source-key')
+    import_parser = commands.add_parser('import', help='record events from a CSV file')
+    import_parser.add_argument('path')
+    commands.add_parser('rebuild', help='recompute every rollup from the events')
+    args = parser.parse_args()
+
+    if args.command == 'metrics':
+        print("📏 Impact metrics")
+        for metric, spec in METRICS.items():
+            print(f"   {metric:<24} {spec['label']}{' (people)' if spec['lives'] else ''}")
+        return
+
+    with app.app_context():
+        try:
+            if args.command == 'record':
+                rows = record_events([parse_event(vars(args), 'cli')], set(CAMPAIGNS))
+                print(f"✅ Recorded {len(rows)} event" if rows else "ℹ️  Already recorded")
+            elif args.command == 'import':
+                read, recorded = import_events(args.path, app.config['IMPACT_BATCH_SIZE'], set(CAMPAIGNS))
+                print(f"✅ Recorded {recorded:,} of {read:,} events ({read - recorded:,} already recorded)")
+            else:
+                with db.engine.begin() as conn:
+                    count = rebuild_impact_rollups(conn)
+                print(f"✅ Rebuilt {count:,} rollup rows from the events")
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+
+if __name__ == '__main__':
+    main()
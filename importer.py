@@ -0,0 +1,272 @@
+"""
+Black Shepherd Foundation - Donation Import Tool
+Imports offline and bank-transfer donations (e.g. collected at the Utako Food
+Drive) from a CSV or JSONL file into the Transaction ledger.
+
+- Rows are streamed, validated and inserted in chunked transactions, so memory
+  use depends on the batch size and not on the size of the file
+- Campaign aggregates and reporting rollups are updated once per batch, in the
+  same transaction
+- Rows are keyed by their external reference, so re-running an import never
+  double counts a donation; rows dated in archived months are rejected, as
+  their references are no longer in the ledger (see archive.py)
+- Progress is checkpointed after every committed batch; an interrupted import
+  resumes where it stopped
+
+Expected columns (CSV header or JSONL keys):
+    reference, campaign_id, amount, currency, date, status, payment_method,
+    fx_rate (optional: rate into the campaign currency on the donation date)
+
+Usage:
+    python importer.py donations.csv
+    python importer.py donations.jsonl --batch-size 1000
+"""
+
+import argparse
+import csv
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert
+from models import db, Campaign, Transaction
+from ledger import add_rollup, apply_campaign_deltas
+from archive import archive_horizon
+from fx import get_rate_table, convert_minor
+from money import to_minor_units
+
+VALID_STATUSES = ('success', 'pending', 'failed')
+
+def read_rows(path, start_line=0):
+    """Yield (line_number, row) pairs from a CSV or JSONL file, skipping rows up to start_line"""
+    is_jsonl = path.endswith('.jsonl') or path.endswith('.ndjson')
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if is_jsonl:
+            for line_number, line in enumerate(f, 1):
+                if line_number <= start_line or not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {'_error': f'Invalid JSON: {e.msg}'}
+        else:
+            for line_number, row in enumerate(csv.DictReader(f), 1):
+                if line_number <= start_line:
+                    continue
+                yield line_number, row
+
+def parse_date(value):
+    """Parse an ISO date or datetime into naive UTC, defaulting to now when empty"""
+    if not value:
+        return datetime.utcnow()
+    try:
+        moment = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid date: {value!r}')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def validate_row(row, campaign_currencies, archived_before=None):
+    """Turn a raw import row into Transaction column values, raising ValueError if invalid.
+
+    Rows dated before archived_before fall in archived (closed) months.
+    """
+    if '_error' in row:
+        raise ValueError(row['_error'])
+
+    reference = str(row.get('reference') or row.get('transaction_id') or '').strip()
+    if not reference:
+        raise ValueError('Missing reference')
+    if len(reference) > 100:
+        raise ValueError('Reference is longer than 100 characters')
+
+    try:
+        campaign_id = int(row.get('campaign_id'))
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid campaign_id: {row.get("campaign_id")!r}')
+    if campaign_id not in campaign_currencies:
+        raise ValueError(f'Unknown campaign_id: {campaign_id}')
+    campaign_currency = campaign_currencies[campaign_id]
+
+    currency = str(row.get('currency') or 'NGN').strip().upper()
+    amount_minor = to_minor_units(row.get('amount', ''), currency)
+    if amount_minor <= 0:
+        raise ValueError('Amount must be positive')
+
+    status = str(row.get('status') or 'success').strip().lower()
+    if status not in VALID_STATUSES:
+        raise ValueError(f'Invalid status: {status!r}')
+
+    # Use the rate recorded with the donation if given, else today's rate
+    if row.get('fx_rate'):
+        try:
+            fx_rate = Decimal(str(row['fx_rate']).strip())
+        except InvalidOperation:
+            raise ValueError(f'Invalid fx_rate: {row["fx_rate"]!r}')
+        if not fx_rate.is_finite() or fx_rate <= 0:
+            raise ValueError(f'Invalid fx_rate: {row["fx_rate"]!r}')
+    else:
+        fx_rate = get_rate_table().rate(currency, campaign_currency)
+
+    payment_method = str(row.get('payment_method') or 'bank_transfer').strip()[:20]
+    created_at = parse_date(row.get('date'))
+    if archived_before is not None and created_at < archived_before:
+        raise ValueError(f'Date {created_at:%Y-%m-%d} is in an archived month (before {archived_before:%Y-%m})')
+
+    return {
+        'transaction_id': reference,
+        'campaign_id': campaign_id,
+        'amount': amount_minor,
+        'currency': currency,
+        'fx_rate': fx_rate,
+        'campaign_amount': convert_minor(amount_minor, currency, campaign_currency, fx_rate).amount,
+        'status': status,
+        'payment_method': payment_method,
+        'created_at': created_at,
+        'completed_at': created_at if status == 'success' else None
+    }
+
+def load_checkpoint(checkpoint_path):
+    """Return the last committed line number and the size of the rejects file at that point"""
+    if not os.path.exists(checkpoint_path):
+        return 0, 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    return checkpoint.get('line', 0), checkpoint.get('rejects_size', 0)
+
+def save_checkpoint(checkpoint_path, line_number, rejects_size=0):
+    """Atomically record the last committed line number and how much of the rejects file it covers"""
+    tmp_path = f'{checkpoint_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'line': line_number, 'rejects_size': rejects_size,
+                   'updated_at': datetime.utcnow().isoformat()}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def flush_batch(batch):
+    """Insert one batch of validated rows and update campaign aggregates in a single transaction.
+
+    Returns (inserted, duplicates).
+    """
+    references = [row['transaction_id'] for row in batch]
+    existing = {
+        ref for (ref,) in db.session.query(Transaction.transaction_id)
+        .filter(Transaction.transaction_id.in_(references))
+    }
+
+    new_rows = []
+    deltas = defaultdict(int)
+    currency_deltas = defaultdict(lambda: (0, 0))
+    rollups = {}
+    for row in batch:
+        reference = row['transaction_id']
+        if reference in existing:
+            continue
+        existing.add(reference)  # Also drops repeats within the same batch
+
+        new_rows.append(row)
+
+        if row['status'] == 'success':
+            deltas[row['campaign_id']] += row['campaign_amount']
+            amount, count = currency_deltas[(row['campaign_id'], row['currency'])]
+            currency_deltas[(row['campaign_id'], row['currency'])] = (amount + row['amount'], count + 1)
+            add_rollup(rollups, row['campaign_id'], row['currency'], row['completed_at'],
+                       row['amount'], row['campaign_amount'])
+
+    try:
+        if new_rows:
+            db.session.execute(insert(Transaction), new_rows)
+        apply_campaign_deltas(deltas, currency_deltas, rollups)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(new_rows), len(batch) - len(new_rows)
+
+def import_donations(path, batch_size=500, resume=True, progress=None):
+    """Stream donations from path into the ledger.
+
+    Invalid rows are written to <path>.rejects.jsonl instead of stopping the
+    import; on resume the file is cut back to the checkpoint, so rows read
+    again are not rejected twice. Returns a summary dictionary.
+    """
+    checkpoint_path = f'{path}.checkpoint'
+    rejects_path = f'{path}.rejects.jsonl'
+    start_line, rejects_size = load_checkpoint(checkpoint_path) if resume else (0, 0)
+
+    campaign_currencies = dict(db.session.query(Campaign.id, Campaign.currency))
+    archived_before = archive_horizon()
+    summary = {
+        'success': True,
+        'resumed_from': start_line,
+        'imported': 0,
+        'duplicates': 0,
+        'rejected': 0
+    }
+
+    batch = []
+    last_line = start_line
+    with open(rejects_path, 'a' if start_line else 'w', encoding='utf-8') as rejects:
+        rejects.truncate(min(rejects_size, rejects.tell()))
+        for line_number, row in read_rows(path, start_line):
+            try:
+                batch.append(validate_row(row, campaign_currencies, archived_before))
+            except ValueError as e:
+                summary['rejected'] += 1
+                rejects.write(json.dumps({'line': line_number, 'error': str(e), 'row': row}, default=str) + '\n')
+            last_line = line_number
+
+            if len(batch) >= batch_size:
+                inserted, duplicates = flush_batch(batch)
+                summary['imported'] += inserted
+                summary['duplicates'] += duplicates
+                rejects.flush()
+                save_checkpoint(checkpoint_path, last_line, rejects.tell())
+                batch = []
+                if progress:
+                    progress(summary, last_line)
+
+        if batch:
+            inserted, duplicates = flush_batch(batch)
+            summary['imported'] += inserted
+            summary['duplicates'] += duplicates
+        rejects.flush()
+        save_checkpoint(checkpoint_path, last_line, rejects.tell())
+
+    if not summary['rejected'] and os.path.getsize(rejects_path) == 0:
+        os.remove(rejects_path)
+
+    summary['last_line'] = last_line
+    return summary
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Import offline donations into the Transaction ledger')
+    parser.add_argument('path', help='CSV or JSONL file of donations')
+    parser.add_argument('--batch-size', type=int, default=None, help='Rows per database transaction')
+    parser.add_argument('--restart', action='store_true', help='Ignore any saved checkpoint')
+    args = parser.parse_args()
+
+    from app import app
+
+    def report(summary, line_number):
+        print(f"   ... line {line_number:,}: {summary['imported']:,} imported, "
+              f"{summary['duplicates']:,} duplicates, {summary['rejected']:,} rejected")
+
+    with app.app_context():
+        batch_size = args.batch_size or app.config['IMPORT_BATCH_SIZE']
+        print(f"📥 Importing donations from {args.path} (batch size {batch_size})")
+        summary = import_donations(args.path, batch_size=batch_size, resume=not args.restart, progress=report)
+
+    if summary['resumed_from']:
+        print(f"⏩ Resumed after line {summary['resumed_from']:,}")
+    print(f"✅ Imported: {summary['imported']:,}")
+    print(f"🔁 Duplicates skipped: {summary['duplicates']:,}")
+    if summary['rejected']:
+        print(f"⚠️  Rejected: {summary['rejected']:,} (see {args.path}.rejects.jsonl)")
+
+if __name__ == '__main__':
+    main()
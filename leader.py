@@ -0,0 +1,51 @@
+"""
+Leader election for background jobs.
+
+A job is run by whichever worker holds its SchedulerLease row. Leases are
+taken and renewed with guarded UPDATEs, so this works on SQLite and
+PostgreSQL across processes and hosts; a leader that dies simply stops
+renewing and another worker takes over once the lease expires.
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from models import db, SchedulerLease
+
+def make_holder_id():
+    """Identity of this process for lease ownership"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+def try_acquire_lease(name, holder, ttl):
+    """Take or renew the named lease for ttl seconds; return True if holder is now the leader"""
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name,
+               or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now))
+        .values(holder=holder, expires_at=now + timedelta(seconds=ttl))
+    )
+    if result.rowcount == 1:
+        db.session.commit()
+        return True
+
+    db.session.add(SchedulerLease(name=name, holder=holder, expires_at=now + timedelta(seconds=ttl)))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Someone else holds an unexpired lease
+        db.session.rollback()
+        return False
+
+def release_lease(name, holder):
+    """Give up the lease early (e.g. on shutdown) so another worker can take over"""
+    db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+        .values(expires_at=datetime.utcnow())
+    )
+    db.session.commit()
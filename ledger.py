@@ -0,0 +1,471 @@
+from datetime import datetime
+from sqlalchemy import bindparam, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Campaign, CampaignCurrencyTotal, DonationRollup, Pledge, Transaction
+from fx import get_rate_table, convert_minor
+
+def ensure_campaign_rows(campaigns):
+    """Create a Campaign row for every static campaign that has none yet"""
+    existing_ids = {row[0] for row in db.session.query(Campaign.id).all()}
+    created = 0
+
+    for campaign_id, campaign_data in campaigns.items():
+        if campaign_id in existing_ids:
+            continue
+
+        # The static raised_amount becomes the opening balance of the ledger
+        db.session.add(Campaign(
+            id=campaign_id,
+            title=campaign_data['title'],
+            description=campaign_data['description'],
+            goal_amount=campaign_data['goal_amount'],
+            raised_amount=campaign_data['raised_amount'],
+            currency=campaign_data['currency'],
+            is_active=True,
+            created_at=campaign_data.get('date', datetime.utcnow())
+        ))
+        db.session.add(CampaignCurrencyTotal(
+            campaign_id=campaign_id,
+            currency=campaign_data['currency'],
+            raised_amount=campaign_data['raised_amount'],
+            donation_count=0
+        ))
+        created += 1
+
+    if created:
+        db.session.commit()
+
+    return created
+
+def upsert_sum(table, keys, sums):
+    """Add sums to the row identified by keys, creating it if needed"""
+    dialect = db.session.get_bind().dialect.name
+    values = {**keys, **sums}
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(table).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + statement.excluded[column] for column in sums}
+        )
+        db.session.execute(statement)
+        return
+
+    result = db.session.execute(
+        update(table)
+        .where(*(table.c[column] == value for column, value in keys.items()))
+        .values({column: table.c[column] + value for column, value in sums.items()})
+    )
+    if not result.rowcount:
+        db.session.execute(table.insert().values(**values))
+
+def upsert_sums(table, keys, sums, rows):
+    """upsert_sum for many rows (dicts of the keys and sums columns), in one statement where supported"""
+    dialect = db.session.get_bind().dialect.name
+    if not rows:
+        return
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + statement.excluded[column] for column in sums}
+        )
+        db.session.execute(statement, rows)
+        return
+
+    for row in rows:
+        upsert_sum(table, {column: row[column] for column in keys}, {column: row[column] for column in sums})
+
+def _upsert_currency_total(campaign_id, currency, amount, count):
+    """Add to a per-currency ledger row, creating it if needed"""
+    upsert_sum(CampaignCurrencyTotal.__table__, {'campaign_id': campaign_id, 'currency': currency},
+                {'raised_amount': amount, 'donation_count': count})
+
+# Reporting rollups (see reporting.py), finest first
+ROLLUP_GRAINS = ('hour', 'day', 'month')
+
+def period_start(moment, grain):
+    """Start of the hour, day or month containing moment"""
+    if grain == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if grain == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def add_rollup(rollups, campaign_id, currency, completed_at, amount, campaign_amount):
+    """Accumulate one successful donation into rollup deltas keyed by (campaign_id, currency, hour)"""
+    key = (campaign_id, currency, period_start(completed_at, 'hour'))
+    previous_amount, previous_campaign_amount, previous_count = rollups.get(key, (0, 0, 0))
+    rollups[key] = (previous_amount + amount, previous_campaign_amount + campaign_amount, previous_count + 1)
+
+def rollup_buckets(rollups):
+    """Spread hourly rollup deltas over every grain: {(grain, period_start, campaign_id, currency): sums}"""
+    buckets = {}
+    for (campaign_id, currency, hour), (amount, campaign_amount, count) in rollups.items():
+        for grain in ROLLUP_GRAINS:
+            key = (grain, period_start(hour, grain), campaign_id, currency)
+            previous_amount, previous_campaign_amount, previous_count = buckets.get(key, (0, 0, 0))
+            buckets[key] = (previous_amount + amount, previous_campaign_amount + campaign_amount,
+                            previous_count + count)
+    return buckets
+
+def apply_campaign_deltas(deltas, currency_deltas=None, rollups=None):
+    """Add minor-unit amounts to the campaign aggregates, one statement per campaign/currency.
+
+    deltas maps campaign_id to an amount already converted into the campaign
+    currency; currency_deltas maps (campaign_id, currency) to (amount, count)
+    in the donation's own currency; rollups holds the same donations by hour
+    (see add_rollup) and updates one reporting row per grain and bucket.
+    """
+    for campaign_id, delta in deltas.items():
+        if not delta:
+            continue
+        db.session.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id)
+            .values(raised_amount=Campaign.raised_amount + delta)
+        )
+
+    for (campaign_id, currency), (amount, count) in (currency_deltas or {}).items():
+        _upsert_currency_total(campaign_id, currency, amount, count)
+
+    for key, (amount, campaign_amount, count) in rollup_buckets(rollups or {}).items():
+        grain, start, campaign_id, currency = key
+        upsert_sum(DonationRollup.__table__,
+                    {'grain': grain, 'campaign_id': campaign_id, 'currency': currency, 'period_start': start},
+                    {'amount': amount, 'campaign_amount': campaign_amount, 'donation_count': count})
+
+def load_campaign_totals():
+    """Return the current raised_amount aggregate for every campaign"""
+    rows = db.session.query(Campaign.id, Campaign.raised_amount).all()
+    return {campaign_id: int(raised or 0) for campaign_id, raised in rows}
+
+def load_currency_totals():
+    """Return {campaign_id: {currency: raised minor units}} from the per-currency ledgers"""
+    totals = {}
+    rows = db.session.query(
+        CampaignCurrencyTotal.campaign_id,
+        CampaignCurrencyTotal.currency,
+        CampaignCurrencyTotal.raised_amount
+    ).all()
+    for campaign_id, currency, raised in rows:
+        totals.setdefault(campaign_id, {})[currency] = int(raised or 0)
+    return totals
+
+def _status(value):
+    """Status rendered as a literal so the planner can match the partial indexes"""
+    return bindparam('status', value, literal_execute=True)
+
+def successful_totals_query(campaign_id):
+    """Per-currency totals of successful donations to one campaign (for reconciliation; live rows only)"""
+    return (
+        select(Transaction.currency, func.sum(Transaction.amount), func.sum(Transaction.campaign_amount), func.count())
+        .where(Transaction.campaign_id == campaign_id, Transaction.status == _status('success'))
+        .group_by(Transaction.currency)
+    )
+
+def pending_transactions_query(older_than, limit, due_at=None):
+    """Oldest pending Paystack donations created before older_than (and due for re-verification at due_at).
+
+    Pending offline donations (e.g. bank transfers from importer.py) are not
+    Paystack's to verify and are left alone.
+    """
+    query = select(Transaction).where(Transaction.status == _status('pending'), Transaction.created_at < older_than,
+                                      Transaction.payment_method == 'paystack')
+    if due_at is not None:
+        query = query.where(or_(Transaction.next_verify_at.is_(None), Transaction.next_verify_at <= due_at))
+    return query.order_by(Transaction.created_at).limit(limit)
+
+def oldest_pending_created_at():
+    """Creation time of the oldest pending Paystack donation, or None"""
+    return db.session.scalar(
+        select(func.min(Transaction.created_at))
+        .where(Transaction.status == _status('pending'), Transaction.payment_method == 'paystack')
+    )
+
+def recent_donations_query(limit, campaign_id=None):
+    """Most recently completed donations, overall or for one campaign"""
+    query = select(Transaction).where(Transaction.status == _status('success'))
+    if campaign_id is not None:
+        query = query.where(Transaction.campaign_id == campaign_id)
+    return query.order_by(Transaction.completed_at.desc()).limit(limit)
+
+def completed_since_query(since, limit, after_id=0):
+    """Donations completed after (since, after_id), oldest first, keyset-paged (anonymous columns only)"""
+    query = select(Transaction.id, Transaction.transaction_id, Transaction.campaign_id, Transaction.amount,
+                   Transaction.currency, Transaction.completed_at).where(Transaction.status == _status('success'))
+    if since is not None:
+        query = query.where(tuple_(Transaction.completed_at, Transaction.id) > tuple_(since, after_id))
+    return query.order_by(Transaction.completed_at, Transaction.id).limit(limit)
+
+def inserted_since_query(after_id, limit):
+    """Successful donations with an id above after_id, oldest first (e.g. imported ones, whatever their date)"""
+    return (
+        select(Transaction.id, Transaction.transaction_id, Transaction.campaign_id, Transaction.amount,
+               Transaction.currency, Transaction.completed_at)
+        .where(Transaction.id > after_id, Transaction.status == _status('success'))
+        .order_by(Transaction.id)
+        .limit(limit)
+    )
+
+def last_transaction_id():
+    """Highest Transaction id in the ledger (0 when empty)"""
+    return db.session.scalar(select(func.max(Transaction.id))) or 0
+
+def load_donation_counts():
+    """Return {(campaign_id, currency): (raised minor units, donation count)} from the per-currency ledgers"""
+    rows = db.session.query(
+        CampaignCurrencyTotal.campaign_id,
+        CampaignCurrencyTotal.currency,
+        CampaignCurrencyTotal.raised_amount,
+        CampaignCurrencyTotal.donation_count
+    ).all()
+    return {(campaign_id, currency): (int(raised or 0), int(count or 0))
+            for campaign_id, currency, raised, count in rows}
+
+EXPORT_STATUSES = ('success', 'pending', 'failed', 'all')
+
+def export_transactions_query(start=None, end=None, campaign_id=None, status='success'):
+    """Transactions to export, oldest first; successful ones by completion time, the rest by creation"""
+    if status not in EXPORT_STATUSES:
+        raise ValueError(f'Unknown status: {status!r}')
+    query = (
+        select(Transaction.transaction_id, Transaction.campaign_id, Transaction.status, Transaction.amount,
+               Transaction.currency, Transaction.campaign_amount, Campaign.currency, Transaction.fx_rate,
+               Transaction.payment_method, Transaction.pledge_id, Transaction.created_at, Transaction.completed_at)
+        .join(Campaign, Campaign.id == Transaction.campaign_id)
+    )
+    moment = Transaction.completed_at if status == 'success' else Transaction.created_at
+    if status != 'all':
+        query = query.where(Transaction.status == _status(status))
+    if start is not None:
+        query = query.where(moment >= start)
+    if end is not None:
+        query = query.where(moment < end)
+    if campaign_id is not None:
+        query = query.where(Transaction.campaign_id == campaign_id)
+    return query.order_by(moment, Transaction.id)
+
+def is_donation_pending(reference):
+    """True unless the donation has already succeeded or failed (unknown references count as pending)"""
+    status = db.session.scalar(select(Transaction.status).where(Transaction.transaction_id == reference))
+    return status in (None, 'pending')
+
+def snapshot_rate(currency, campaign_currency):
+    """Rate converting a donation currency into the campaign currency right now"""
+    return get_rate_table().rate(currency, campaign_currency)
+
+def record_pending_donation(reference, campaign_id, amount, campaign_currency, rate, payment_method='paystack'):
+    """Insert a pending Transaction with the FX rate snapshotted at donation time"""
+    db.session.add(Transaction(
+        transaction_id=reference,
+        campaign_id=campaign_id,
+        amount=amount.amount,
+        currency=amount.currency,
+        fx_rate=rate,
+        campaign_amount=convert_minor(amount.amount, amount.currency, campaign_currency, rate).amount,
+        payment_method=payment_method,
+        status='pending'
+    ))
+    db.session.commit()
+
+def complete_donation(reference, amount, currency, campaign_id=None, pledge_id=None):
+    """Mark a donation successful and add it to the campaign aggregates exactly once.
+
+    The verified amount from Paystack is authoritative. A donation with no
+    pending row (e.g. recording failed at initialization, or a pledge charge
+    whose webhook beat the scheduler's batch) is inserted here, linked to
+    pledge_id if given. Returns True if this call completed the donation.
+    """
+    transaction = Transaction.query.filter_by(transaction_id=reference).first()
+
+    if transaction is None:
+        campaign = db.session.get(Campaign, int(campaign_id)) if campaign_id else None
+        if campaign is None:
+            return False
+        rate = snapshot_rate(currency, campaign.currency)
+        transaction = Transaction(
+            transaction_id=reference, campaign_id=campaign.id, currency=currency,
+            amount=amount, fx_rate=rate, payment_method='paystack', status='pending',
+            pledge_id=int(pledge_id) if pledge_id else None
+        )
+        db.session.add(transaction)
+        db.session.flush()
+    elif transaction.status != 'pending':
+        return False
+
+    campaign_currency = transaction.campaign.currency
+    campaign_amount = convert_minor(amount, currency, campaign_currency, transaction.fx_rate or 1).amount
+
+    # Guarded update so concurrent callbacks/webhooks cannot count a donation twice
+    completed_at = datetime.utcnow()
+    result = db.session.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction.id, Transaction.status == 'pending')
+        .values(status='success', amount=amount, currency=currency,
+                campaign_amount=campaign_amount, completed_at=completed_at)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return False
+
+    rollups = {}
+    add_rollup(rollups, transaction.campaign_id, currency, completed_at, amount, campaign_amount)
+    apply_campaign_deltas(
+        {transaction.campaign_id: campaign_amount},
+        {(transaction.campaign_id, currency): (amount, 1)},
+        rollups
+    )
+    db.session.commit()
+    return True
+
+def _claim_pending(transaction_ids, **values):
+    """Move pending transactions to a final state; return the ids this call changed"""
+    statement = (
+        update(Transaction)
+        .where(Transaction.id.in_(transaction_ids), Transaction.status == 'pending')
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.get_bind().dialect.update_returning:
+        return set(db.session.execute(statement.returning(Transaction.id)).scalars())
+
+    claimed = set()
+    for transaction_id in transaction_ids:
+        result = db.session.execute(statement.where(Transaction.id == transaction_id))
+        if result.rowcount == 1:
+            claimed.add(transaction_id)
+    return claimed
+
+def complete_donations(verified):
+    """Bulk complete_donation for pending rows verified in the background.
+
+    verified is a list of (transaction, amount, currency) with Paystack's
+    amounts. Rows completed concurrently elsewhere (callback, webhook) are
+    skipped; aggregates are applied once per campaign/currency. Returns the
+    number of donations completed.
+    """
+    if not verified:
+        return 0
+    by_id = {transaction.id: (transaction, amount, currency) for transaction, amount, currency in verified}
+    completed_at = datetime.utcnow()
+    claimed = _claim_pending(list(by_id), status='success', completed_at=completed_at)
+    campaign_currencies = dict(db.session.query(Campaign.id, Campaign.currency).all())
+
+    rows, deltas, currency_deltas, rollups = [], {}, {}, {}
+    for transaction_id in claimed:
+        transaction, amount, currency = by_id[transaction_id]
+        campaign_currency = campaign_currencies[transaction.campaign_id]
+        campaign_amount = convert_minor(amount, currency, campaign_currency, transaction.fx_rate or 1).amount
+        rows.append({'id': transaction_id, 'amount': amount, 'currency': currency,
+                     'campaign_amount': campaign_amount, 'last_verify_error': None})
+        deltas[transaction.campaign_id] = deltas.get(transaction.campaign_id, 0) + campaign_amount
+        previous_amount, previous_count = currency_deltas.get((transaction.campaign_id, currency), (0, 0))
+        currency_deltas[(transaction.campaign_id, currency)] = (previous_amount + amount, previous_count + 1)
+        add_rollup(rollups, transaction.campaign_id, currency, completed_at, amount, campaign_amount)
+
+    if rows:
+        db.session.execute(update(Transaction), rows)
+        apply_campaign_deltas(deltas, currency_deltas, rollups)
+    db.session.commit()
+    return len(rows)
+
+def fail_donations(failures):
+    """Mark pending donations failed; failures maps transaction id to the reason"""
+    if not failures:
+        return 0
+    claimed = _claim_pending(list(failures), status='failed')
+    if claimed:
+        db.session.execute(update(Transaction), [
+            {'id': transaction_id, 'last_verify_error': failures[transaction_id][:200]} for transaction_id in claimed
+        ])
+    db.session.commit()
+    return len(claimed)
+
+def due_pledges_query(due_at, limit):
+    """Active and past-due pledges whose next charge is due at due_at, oldest first"""
+    return (
+        select(Pledge)
+        .where(Pledge.status.in_(bindparam('statuses', ['active', 'past_due'], expanding=True, literal_execute=True)),
+               Pledge.next_charge_at <= due_at)
+        .order_by(Pledge.next_charge_at)
+        .limit(limit)
+    )
+
+def insert_new_transactions(rows):
+    """Bulk insert Transaction rows, skipping references already in the ledger; return those inserted"""
+    if not rows:
+        return set()
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql.insert if dialect == 'postgresql' else sqlite.insert)(Transaction)
+        statement = statement.on_conflict_do_nothing(index_elements=['transaction_id'])
+        return set(db.session.execute(statement.returning(Transaction.transaction_id), rows).scalars())
+
+    existing = set(db.session.scalars(select(Transaction.transaction_id).where(
+        Transaction.transaction_id.in_([row['transaction_id'] for row in rows]))))
+    rows = [row for row in rows if row['transaction_id'] not in existing]
+    if rows:
+        db.session.execute(insert(Transaction), rows)
+    return {row['transaction_id'] for row in rows}
+
+def record_pledge_charges(charges):
+    """Insert a Transaction per recurring charge attempt and add the successes to the aggregates.
+
+    charges is a list of dicts with pledge, reference, amount, currency,
+    status ('success' or 'failed') and error. Everything goes out as one
+    bulk insert plus one aggregate update per campaign/currency; the caller
+    commits, together with its pledge updates. A reference already in the
+    ledger (the charge.success webhook can get there before the batch) was
+    counted when it was recorded, so it only gains its pledge link.
+    """
+    if not charges:
+        return 0
+    now = datetime.utcnow()
+    campaign_currencies = dict(db.session.query(Campaign.id, Campaign.currency).all())
+    rates = {}
+    rows = []
+    for charge in charges:
+        pledge, amount, currency = charge['pledge'], charge['amount'], charge['currency']
+        campaign_currency = campaign_currencies[pledge.campaign_id]
+        if (currency, campaign_currency) not in rates:
+            rates[(currency, campaign_currency)] = snapshot_rate(currency, campaign_currency)
+        rate = rates[(currency, campaign_currency)]
+        succeeded = charge['status'] == 'success'
+        rows.append({
+            'transaction_id': charge['reference'], 'campaign_id': pledge.campaign_id, 'pledge_id': pledge.id,
+            'amount': amount, 'currency': currency, 'fx_rate': rate,
+            'campaign_amount': convert_minor(amount, currency, campaign_currency, rate).amount,
+            'payment_method': 'paystack', 'status': charge['status'], 'created_at': now,
+            'completed_at': now if succeeded else None,
+            'last_verify_error': None if succeeded else (charge.get('error') or '')[:200]
+        })
+
+    inserted = insert_new_transactions(rows)
+    linked = [{'reference': row['transaction_id'], 'pledge': row['pledge_id']}
+              for row in rows if row['transaction_id'] not in inserted]
+    if linked:
+        db.session.execute(
+            update(Transaction.__table__)
+            .where(Transaction.transaction_id == bindparam('reference'), Transaction.pledge_id.is_(None))
+            .values(pledge_id=bindparam('pledge')),
+            linked
+        )
+
+    deltas, currency_deltas, rollups = {}, {}, {}
+    for row in rows:
+        if row['status'] != 'success' or row['transaction_id'] not in inserted:
+            continue
+        campaign_id, currency, amount, campaign_amount = (row['campaign_id'], row['currency'], row['amount'],
+                                                          row['campaign_amount'])
+        deltas[campaign_id] = deltas.get(campaign_id, 0) + campaign_amount
+        previous_amount, previous_count = currency_deltas.get((campaign_id, currency), (0, 0))
+        currency_deltas[(campaign_id, currency)] = (previous_amount + amount, previous_count + 1)
+        add_rollup(rollups, campaign_id, currency, now, amount, campaign_amount)
+
+    apply_campaign_deltas(deltas, currency_deltas, rollups)
+    return len(inserted)
@@ -0,0 +1,208 @@
+"""
+Structured, non-blocking logging.
+
+app.logger records go onto an in-memory queue; a background thread formats
+them as one JSON object per line and writes them out, so requests never wait
+on stdout or a log shipper. Messages use %-style arguments, which are only
+formatted (in the background thread) when the level is enabled.
+
+Every record carries the current correlation fields: a request_id per
+request (X-Request-ID when a proxy sets one) and the Paystack reference once
+a donation has one, so a donation can be followed across the initialize,
+callback, verify and reconcile log lines. Info lines on hot paths are logged
+with extra=SAMPLED and kept at LOG_SAMPLE_RATE, deciding per reference so a
+sampled donation keeps all its lines.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+_context = contextvars.ContextVar('log_context', default={})
+
+# Marks an info line as noisy: kept at LOG_SAMPLE_RATE
+SAMPLED = {'sampled': True}
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sampled'}
+
+def bind(**fields):
+    """Add correlation fields to every later record in this context; return a reset token"""
+    return _context.set({**_context.get(), **fields})
+
+def unbind(token):
+    _context.reset(token)
+
+@contextmanager
+def log_context(**fields):
+    """Correlation fields for the records logged inside the block"""
+    token = bind(**fields)
+    try:
+        yield
+    finally:
+        unbind(token)
+
+def bind_reference(reference):
+    """Correlate the rest of this request with a Paystack reference"""
+    if reference:
+        bind(reference=reference)
+
+class ContextFilter(logging.Filter):
+    """Copy the correlation fields onto the record before it leaves the calling thread"""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records logged with extra=SAMPLED"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or self.rate >= 1:
+            return True
+        reference = getattr(record, 'reference', None)
+        if reference:
+            # Same decision for every line of one donation
+            keep = zlib.crc32(reference.encode()) % 10000 < self.rate * 10000
+        else:
+            keep = random.random() < self.rate
+        if not keep:
+            self.dropped += 1
+        return keep
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue records without formatting them; drop (and count) when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens in the listener thread; only tracebacks are
+        # rendered now, while their frames still exist
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class QueuedLogging:
+    """The queue handler, its listener thread and the counters, for one process"""
+
+    def __init__(self, target, queue_size, sample_rate):
+        self.target = target
+        self.queue_size = queue_size
+        self.handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+        self.handler.addFilter(ContextFilter())
+        self.sampler = SamplingFilter(sample_rate)
+        self.handler.addFilter(self.sampler)
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.listener is None:
+                self.listener = QueueListener(self.handler.queue, self.target, respect_handler_level=True)
+                self.listener.start()
+
+    def stop(self):
+        """Flush everything queued and stop the listener thread"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def after_fork(self):
+        # The listener thread does not survive a fork, and the queue's locks
+        # may have been held by it: start over with a fresh queue
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.listener = None
+        self._lock = threading.Lock()
+        self.start()
+
+    def stats(self):
+        return {
+            'queued': self.handler.queue.qsize(),
+            'dropped_full': self.handler.dropped,
+            'dropped_sampled': self.sampler.dropped,
+        }
+
+def make_target_handler(log_format, stream=None):
+    handler = logging.StreamHandler(stream or sys.stdout)
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s: %(message)s'))
+    return handler
+
+def init_logging(app):
+    """Send app.logger through a queue to a JSON stream handler drained in the background"""
+    queued = QueuedLogging(make_target_handler(app.config['LOG_FORMAT']),
+                           app.config['LOG_QUEUE_SIZE'], app.config['LOG_SAMPLE_RATE'])
+
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(queued.handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    app.logger.propagate = False
+    app.extensions['logging'] = queued
+
+    queued.start()
+    os.register_at_fork(after_in_child=queued.after_fork)
+    atexit.register(queued.stop)
+
+    @app.before_request
+    def bind_request_id():
+        g.log_context_token = bind(request_id=request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16],
+                                   path=request.path)
+
+    @app.teardown_request
+    def unbind_request_id(exc):
+        token = g.pop('log_context_token', None) if has_request_context() else None
+        if token is not None:
+            unbind(token)
+
+    return queued
@@ -0,0 +1,288 @@
+"""
+Persistent outbox and background SMTP sender.
+
+Requests never talk to SMTP. They write an OutboxMessage row (deduplicated by
+a key such as a hash of the contact form and the hour, or the Paystack
+reference for a receipt) and return. A background thread in each worker
+claims due messages in batches, delivers them over one reused SMTP
+connection and retries failures with exponential backoff. Claims are
+guarded updates, so several workers can run senders against the same
+outbox without double sending. Delivered messages are deleted after
+MAIL_RETENTION_DAYS.
+"""
+
+import hashlib
+import random
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from models import db, OutboxMessage
+
+def dedupe_key_for(*parts):
+    """Stable dedupe key from message parts (case and whitespace insensitive)"""
+    normalised = '\x1f'.join(' '.join(str(part or '').lower().split()) for part in parts)
+    return hashlib.sha256(normalised.encode('utf-8')).hexdigest()
+
+def enqueue_mail(kind, to_address, subject, body, dedupe_key=None, reply_to=None):
+    """Write a message to the outbox; return False if an identical message is already queued or sent"""
+    message = OutboxMessage(
+        kind=kind,
+        dedupe_key=dedupe_key or dedupe_key_for(kind, to_address, subject, body),
+        to_address=to_address,
+        reply_to=reply_to,
+        subject=subject,
+        body=body
+    )
+    db.session.add(message)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+    if _sender is not None:
+        _sender.wake()
+    return True
+
+class SMTPConnection:
+    """One SMTP connection reused across batches and closed after sitting idle"""
+
+    def __init__(self, config):
+        self.config = config
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        config = self.config
+        smtp_class = smtplib.SMTP_SSL if config['MAIL_USE_SSL'] else smtplib.SMTP
+        smtp = smtp_class(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=config['MAIL_TIMEOUT'])
+        if config['MAIL_USE_TLS'] and not config['MAIL_USE_SSL']:
+            smtp.starttls()
+        if config['MAIL_USERNAME']:
+            smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        return smtp
+
+    def send(self, message):
+        """Send an EmailMessage, reconnecting once if the pooled connection has dropped"""
+        for attempt in (1, 2):
+            if self._smtp is None:
+                self._smtp = self._connect()
+            try:
+                self._smtp.send_message(message)
+                self._last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                if attempt == 2:
+                    raise
+
+    def close_if_idle(self, idle_seconds):
+        if self._smtp is not None and time.monotonic() - self._last_used > idle_seconds:
+            self.close()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._smtp = None
+
+def build_email(outbox_message, sender):
+    """Turn an outbox row into an EmailMessage"""
+    email = EmailMessage()
+    email['From'] = sender
+    email['To'] = outbox_message.to_address
+    email['Subject'] = outbox_message.subject
+    email['Message-ID'] = make_msgid(idstring=outbox_message.dedupe_key[:16])
+    if outbox_message.reply_to:
+        email['Reply-To'] = outbox_message.reply_to
+    email.set_content(outbox_message.body)
+    return email
+
+def backoff_delay(attempts, base, cap):
+    """Exponential backoff with jitter, in seconds"""
+    delay = min(cap, base * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+def claim_batch(batch_size, stale_after):
+    """Claim up to batch_size due messages for this sender; return their rows"""
+    now = datetime.utcnow()
+
+    # Messages stuck in 'sending' belonged to a worker that died mid-batch
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.status == 'sending', OutboxMessage.claimed_at < now - timedelta(seconds=stale_after))
+        .values(status='queued')
+    )
+
+    candidate_ids = [
+        message_id for (message_id,) in db.session.query(OutboxMessage.id)
+        .filter(OutboxMessage.status == 'queued', OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.next_attempt_at)
+        .limit(batch_size)
+    ]
+    if not candidate_ids:
+        db.session.commit()
+        return []
+
+    claim_token = uuid.uuid4().hex
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(candidate_ids), OutboxMessage.status == 'queued')
+        .values(status='sending', claimed_at=now, claim_token=claim_token)
+    )
+    db.session.commit()
+
+    # Another sender may have won some of the candidates
+    return OutboxMessage.query.filter_by(claim_token=claim_token, status='sending').all()
+
+def purge_sent(retention_days):
+    """Delete messages delivered more than retention_days ago; return how many"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = OutboxMessage.query.filter(OutboxMessage.status == 'sent', OutboxMessage.sent_at < cutoff) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def outbox_backlog():
+    """Number of messages due for delivery and the age in seconds of the oldest one"""
+    now = datetime.utcnow()
+    due, oldest = db.session.query(db.func.count(OutboxMessage.id), db.func.min(OutboxMessage.next_attempt_at)) \
+        .filter(OutboxMessage.status == 'queued', OutboxMessage.next_attempt_at <= now).one()
+    return due, (now - oldest).total_seconds() if oldest else 0.0
+
+# Seconds between purges of delivered messages by each sender
+PURGE_INTERVAL = 3600
+
+# Errors meaning the server is unreachable: the rest of the batch would fail the same way
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+def record_failure(message, error, config, permanent=False):
+    """Schedule a retry with backoff, or give up after MAIL_MAX_ATTEMPTS"""
+    message.attempts += 1
+    message.last_error = str(error)[:500]
+    if permanent or message.attempts >= config['MAIL_MAX_ATTEMPTS']:
+        message.status = 'failed'
+    else:
+        message.status = 'queued'
+        message.next_attempt_at = datetime.utcnow() + timedelta(
+            seconds=backoff_delay(message.attempts, config['MAIL_RETRY_BASE'], config['MAIL_RETRY_CAP'])
+        )
+
+def deliver_batch(messages, connection, config):
+    """Send claimed messages and record results in one commit; return (sent, failed)"""
+    sent = failed = 0
+    for index, message in enumerate(messages):
+        try:
+            connection.send(build_email(message, config['MAIL_DEFAULT_SENDER']))
+            message.status = 'sent'
+            message.sent_at = datetime.utcnow()
+            message.last_error = None
+            sent += 1
+        except smtplib.SMTPRecipientsRefused as e:
+            record_failure(message, e, config, permanent=True)
+            failed += 1
+        except CONNECTION_ERRORS as e:
+            connection.close()
+            for pending in messages[index:]:
+                record_failure(pending, e, config)
+            failed += len(messages) - index
+            break
+        except (smtplib.SMTPException, OSError) as e:
+            record_failure(message, e, config)
+            failed += 1
+    db.session.commit()
+    return sent, failed
+
+def drain_outbox(app, connection=None):
+    """Deliver every due message now (used by the sender thread and scripts); return counts"""
+    totals = {'sent': 0, 'failed': 0}
+    owns_connection = connection is None
+    connection = connection or SMTPConnection(app.config)
+    try:
+        with app.app_context():
+            while True:
+                messages = claim_batch(app.config['MAIL_BATCH_SIZE'], app.config['MAIL_CLAIM_TIMEOUT'])
+                if not messages:
+                    break
+                sent, failed = deliver_batch(messages, connection, app.config)
+                totals['sent'] += sent
+                totals['failed'] += failed
+    finally:
+        if owns_connection:
+            connection.close()
+    return totals
+
+class MailSender:
+    """Background thread draining the outbox for one worker process"""
+
+    def __init__(self, app):
+        self.app = app
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._connection = SMTPConnection(app.config)
+        self._purged_at = 0.0
+        self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        interval = self.app.config['MAIL_POLL_INTERVAL']
+        while not self._stop.is_set():
+            try:
+                drain_outbox(self.app, self._connection)
+            except Exception as e:
+                self.app.logger.error("Mail sender error: %s", e)
+            if time.monotonic() - self._purged_at > PURGE_INTERVAL:
+                self._purge()
+            self._connection.close_if_idle(self.app.config['MAIL_IDLE_TIMEOUT'])
+            self._wake.wait(interval)
+            self._wake.clear()
+        self._connection.close()
+
+    def _purge(self):
+        self._purged_at = time.monotonic()
+        try:
+            with self.app.app_context():
+                deleted = purge_sent(self.app.config['MAIL_RETENTION_DAYS'])
+            if deleted:
+                self.app.logger.info("Purged %d delivered messages from the outbox", deleted)
+        except Exception as e:
+            self.app.logger.error("Outbox purge failed: %s", e)
+
+_sender = None
+_sender_lock = threading.Lock()
+
+def mail_sender_running():
+    """Whether this process's sender thread is alive"""
+    return _sender is not None and _sender._thread.is_alive()
+
+def start_mail_sender(app):
+    """Start this process's sender thread once (call after fork, never in the gunicorn master)"""
+    global _sender
+    if _sender is not None or not app.config['MAIL_ENABLED']:
+        return _sender
+    with _sender_lock:
+        if _sender is None:
+            sender = MailSender(app)
+            sender.start()
+            _sender = sender
+    return _sender
@@ -0,0 +1,313 @@
+"""
+Content-addressed media store for campaign photos.
+
+Indexes every image under static/campaigns by SHA-256 and a 64-bit
+perceptual difference hash (dHash). Byte-identical files, and images whose
+dHashes differ by at most a few bits (the same photo re-encoded, resized or
+re-saved by WhatsApp), form one group with a single canonical file: the
+highest-resolution copy. Campaign image references are rewritten to the
+canonical files, and /media/<hash>.<ext> serves each unique image under one
+immutable URL.
+
+The scan streams the directory tree in bounded chunks over a process pool
+and reuses index entries whose size and mtime are unchanged, so re-indexing a
+large directory only fingerprints new files. Run it at deploy time (like
+assets.py); without static/media-index.json the app indexes in-process at
+startup:
+
+    python media.py [--threshold 5] [--workers 4] [--prune]
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from flask import abort, send_file, url_for
+
+INDEX_NAME = 'media-index.json'
+MEDIA_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+NEAR_DUPLICATE_BITS = 5
+HASH_BANDS = 8  # dHash split into 8-bit bands to find near-duplicate candidates
+
+def iter_media_files(root):
+    """Yield image paths under root, depth first, without listing the whole tree up front"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS:
+                    yield entry.path
+
+def dhash(image):
+    """64-bit difference hash of a PIL image"""
+    from PIL import Image
+
+    small = image.convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            left = pixels[row * 9 + column]
+            value = (value << 1) | (left > pixels[row * 9 + column + 1])
+    return value
+
+def fingerprint(path):
+    """Content and perceptual fingerprint of one file (runs in a pool process)"""
+    from PIL import Image, ImageOps
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    stat = os.stat(path)
+    entry = {'sha256': digest.hexdigest(), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+             'width': None, 'height': None, 'dhash': None}
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):  # EXIF orientation rotates by 90 degrees
+                width, height = height, width
+            entry['width'], entry['height'] = width, height
+            # Decode JPEGs at 1/8 scale: the hash only needs a 9x8 thumbnail
+            image.draft('L', (64, 64))
+            entry['dhash'] = f'{dhash(ImageOps.exif_transpose(image)):016x}'
+    except Exception:
+        pass  # Not decodable: still deduplicated by content hash
+    return entry
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def group_duplicates(files, threshold=NEAR_DUPLICATE_BITS):
+    """Map each non-canonical file to its group's canonical file"""
+    paths = sorted(files)
+    parent = {path: path for path in paths}
+
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    by_content = {}
+    bands = {}
+    for path in paths:
+        entry = files[path]
+        first = by_content.setdefault(entry['sha256'], path)
+        if first != path:
+            union(first, path)
+            continue
+        if entry['dhash'] is None:
+            continue
+        # Any two hashes within `threshold` bits share at least one unchanged band
+        value = int(entry['dhash'], 16)
+        for band in range(HASH_BANDS):
+            bucket = bands.setdefault((band, (value >> (band * 8)) & 0xFF), [])
+            for other in bucket:
+                if hamming(value, int(files[other]['dhash'], 16)) <= threshold:
+                    union(other, path)
+            bucket.append(path)
+
+    groups = {}
+    for path in paths:
+        groups.setdefault(find(path), []).append(path)
+
+    canonical = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        # Highest resolution wins, then the plain campaign names (main/gallery-N), then the shortest path
+        best = max(members, key=lambda p: ((files[p]['width'] or 0) * (files[p]['height'] or 0),
+                                           os.path.basename(p).startswith(('main', 'gallery-')),
+                                           -len(p)))
+        for member in members:
+            if member != best:
+                canonical[member] = best
+    return canonical
+
+def scan(static_folder, subdirectory='campaigns', previous=None, workers=None, chunk_size=256,
+         threshold=NEAR_DUPLICATE_BITS):
+    """Index static_folder/subdirectory; return {'files', 'canonical'} with static-relative paths"""
+    root = os.path.join(static_folder, subdirectory)
+    previous_files = (previous or {}).get('files', {})
+    files = {}
+
+    paths = iter_media_files(root)
+    # workers=1 fingerprints in-process (used when the app builds a missing index at startup)
+    pool = ProcessPoolExecutor(workers) if workers != 1 else None
+    fingerprint_all = pool.map if pool else map
+    try:
+        while True:
+            chunk = list(islice(paths, chunk_size))
+            if not chunk:
+                break
+            pending = []
+            for path in chunk:
+                relative = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                old = previous_files.get(relative)
+                stat = os.stat(path)
+                if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+                    files[relative] = old
+                else:
+                    pending.append((relative, path))
+            for (relative, _), entry in zip(pending, fingerprint_all(fingerprint, [path for _, path in pending])):
+                files[relative] = entry
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return {'version': 1, 'threshold': threshold, 'files': files,
+            'canonical': group_duplicates(files, threshold)}
+
+def write_index(static_folder, index):
+    path = os.path.join(static_folder, INDEX_NAME)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def load_index(static_folder):
+    path = os.path.join(static_folder, INDEX_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+class MediaStore:
+    """Canonical media lookups bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.index = None
+        self._by_name = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['media_store'] = self
+        app.add_template_global(self.media_url, 'media_url')
+
+    def load(self):
+        """Load static/media-index.json, or scan if it has not been built yet"""
+        index = load_index(self.app.static_folder)
+        if index is None:
+            index = scan(self.app.static_folder, workers=1)
+        self.index = index
+        self._by_name = {}
+        for path, entry in index['files'].items():
+            if path not in index['canonical']:
+                self._by_name[self.content_name(path)] = path
+        return index
+
+    def _ensure_loaded(self):
+        if self.index is None:
+            self.load()
+
+    def content_name(self, path):
+        entry = self.index['files'][path]
+        return f"{entry['sha256'][:20]}{os.path.splitext(path)[1].lower()}"
+
+    def canonical(self, path):
+        """Static-relative path of the canonical copy of an image (itself if unique or unknown)"""
+        self._ensure_loaded()
+        return self.index['canonical'].get(path, path)
+
+    def canonical_list(self, paths):
+        """Canonical paths with duplicates collapsed, keeping first-seen order"""
+        seen = []
+        for path in paths:
+            canonical = self.canonical(path)
+            if canonical not in seen:
+                seen.append(canonical)
+        return seen
+
+    def rewrite_campaign_images(self, campaigns):
+        """Point every campaign's main and gallery images at canonical files"""
+        for campaign in campaigns.values():
+            campaign['main_image'] = self.canonical(campaign['main_image'])
+            gallery = self.canonical_list(campaign.get('gallery_images', []))
+            campaign['gallery_images'] = [image for image in gallery if image != campaign['main_image']] or gallery
+
+    def media_url(self, path):
+        """One content-addressed URL per unique image (plain static URL for unindexed files)"""
+        path = self.canonical(path)
+        if path not in self.index['files']:
+            return url_for('static', filename=path)
+        return url_for('media_file', name=self.content_name(path))
+
+    def serve(self, name):
+        """Response for /media/<name>"""
+        self._ensure_loaded()
+        path = self._by_name.get(name)
+        if path is None:
+            abort(404)
+        response = send_file(os.path.join(self.app.static_folder, path), conditional=True,
+                             etag=name, max_age=31536000)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+def prune(static_folder, index):
+    """Delete non-canonical copies from disk; return bytes freed"""
+    freed = 0
+    for path in index['canonical']:
+        full_path = os.path.join(static_folder, path)
+        if os.path.exists(full_path):
+            freed += os.path.getsize(full_path)
+            os.unlink(full_path)
+    for path in index['canonical']:
+        index['files'].pop(path, None)
+    index['canonical'] = {}
+    return freed
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Index and deduplicate campaign media')
+    parser.add_argument('--threshold', type=int, default=NEAR_DUPLICATE_BITS,
+                        help='max dHash bit difference for near-duplicates')
+    parser.add_argument('--workers', type=int, default=None, help='fingerprinting processes (default: cores)')
+    parser.add_argument('--prune', action='store_true', help='delete non-canonical copies from static/')
+    args = parser.parse_args()
+
+    static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    started = time.perf_counter()
+    previous = load_index(static_folder)
+    if previous and previous.get('threshold') != args.threshold:
+        previous = None
+    index = scan(static_folder, previous=previous, workers=args.workers, threshold=args.threshold)
+    elapsed = time.perf_counter() - started
+
+    files = index['files']
+    duplicate_bytes = sum(files[path]['size'] for path in index['canonical'])
+    total_bytes = sum(entry['size'] for entry in files.values())
+    print(f"🖼️  Indexed {len(files)} images ({total_bytes / 1024 / 1024:.1f} MB) in {elapsed:.1f}s")
+
+    groups = {}
+    for path, canonical in index['canonical'].items():
+        groups.setdefault(canonical, []).append(path)
+    for canonical, copies in sorted(groups.items()):
+        print(f"\n✅ {canonical}")
+        for copy in copies:
+            exact = files[copy]['sha256'] == files[canonical]['sha256']
+            print(f"   {'=' if exact else '≈'} {copy}")
+    print(f"\n📦 {len(index['canonical'])} duplicates, {duplicate_bytes / 1024 / 1024:.1f} MB reclaimable")
+
+    if args.prune:
+        freed = prune(static_folder, index)
+        print(f"🗑️  Removed duplicates, freed {freed / 1024 / 1024:.1f} MB")
+    write_index(static_folder, index)
+    print(f"💾 Wrote static/{INDEX_NAME}")
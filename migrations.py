@@ -0,0 +1,171 @@
+"""
+Black Shepherd Foundation - Schema Migrations
+Small, ordered schema migrations recorded in a schema_version table.
+
+A fresh database is created straight from the models and stamped with the
+latest version; an existing database has every newer step applied once, in
+order. Steps run in one transaction, so on a large live PostgreSQL ledger
+create new indexes CONCURRENTLY by hand first; the steps skip existing ones.
+Run directly to upgrade the configured database:
+
+    python migrations.py
+"""
+
+from sqlalchemy import inspect, text
+from models import (
+    db, Campaign, CampaignCurrencyTotal, DonationRollup, ImpactEvent, ImpactRollup, Pledge, Transaction,
+    TransactionArchive
+)
+from money import CURRENCY_EXPONENTS
+from reporting import rebuild_rollups
+
+def _minor_units_sql(column):
+    """SQL expression converting a float major-unit column to integer minor units"""
+    cases = ' '.join(f"WHEN '{code}' THEN {10 ** exponent}" for code, exponent in CURRENCY_EXPONENTS.items())
+    return f'CAST(ROUND({column} * CASE currency {cases} ELSE 100 END) AS BIGINT)'
+
+def _rebuild_sqlite_table(conn, table, conversions):
+    """Recreate a SQLite table from its model definition, copying rows through conversions"""
+    old_name = f'_{table.name}_old'
+    old_columns = {column['name'] for column in inspect(conn).get_columns(table.name)}
+
+    # Keep foreign keys in other tables pointing at the new table name
+    conn.execute(text('PRAGMA legacy_alter_table=ON'))
+    conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"'))
+    conn.execute(text('PRAGMA legacy_alter_table=OFF'))
+    table.create(conn)
+
+    columns = [column.name for column in table.columns if column.name in old_columns]
+    select_list = ', '.join(conversions.get(name, f'"{name}"') for name in columns)
+    column_list = ', '.join(f'"{name}"' for name in columns)
+    conn.execute(text(f'INSERT INTO "{table.name}" ({column_list}) SELECT {select_list} FROM "{old_name}"'))
+    conn.execute(text(f'DROP TABLE "{old_name}"'))
+
+def amounts_to_minor_units(conn):
+    """Store campaign and transaction amounts as BIGINT minor units instead of FLOAT"""
+    campaign_conversions = {
+        'goal_amount': _minor_units_sql('goal_amount'),
+        'raised_amount': _minor_units_sql('raised_amount')
+    }
+    transaction_conversions = {'amount': _minor_units_sql('amount')}
+
+    if conn.dialect.name == 'postgresql':
+        for table, conversions in ((Campaign.__table__, campaign_conversions),
+                                   (Transaction.__table__, transaction_conversions)):
+            alterations = ', '.join(
+                f'ALTER COLUMN {column} TYPE BIGINT USING {expression}'
+                for column, expression in conversions.items()
+            )
+            conn.execute(text(f'ALTER TABLE "{table.name}" {alterations}'))
+    else:
+        _rebuild_sqlite_table(conn, Campaign.__table__, campaign_conversions)
+        _rebuild_sqlite_table(conn, Transaction.__table__, transaction_conversions)
+
+def _add_column_if_missing(conn, table_name, column_name, ddl_type):
+    """Add a column unless a rebuilt table already has it"""
+    columns = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    if column_name not in columns:
+        conn.execute(text(f'ALTER TABLE "{table_name}" ADD COLUMN {column_name} {ddl_type}'))
+
+def per_currency_ledgers(conn):
+    """Add FX snapshot columns and seed per-currency ledgers from existing totals"""
+    _add_column_if_missing(conn, 'transaction', 'fx_rate', 'NUMERIC(20, 10)')
+    _add_column_if_missing(conn, 'transaction', 'campaign_amount', 'BIGINT')
+    conn.execute(text(
+        'UPDATE "transaction" SET fx_rate = 1, campaign_amount = amount WHERE campaign_amount IS NULL'
+    ))
+
+    # Existing totals were recorded in each campaign's own currency
+    CampaignCurrencyTotal.__table__.create(conn, checkfirst=True)
+    conn.execute(text(
+        'INSERT INTO campaign_currency_total (campaign_id, currency, raised_amount, donation_count) '
+        'SELECT id, currency, COALESCE(raised_amount, 0), 0 FROM campaign'
+    ))
+
+def transaction_indexes(conn):
+    """Index the Transaction ledger for totals, pending-by-age and recent donations"""
+    for index in Transaction.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    # Give the planner statistics for the new indexes straight away
+    conn.execute(text('ANALYZE "transaction"'))
+
+def transaction_verification_state(conn):
+    """Track re-verification attempts and backoff on pending transactions"""
+    _add_column_if_missing(conn, 'transaction', 'verify_attempts', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column_if_missing(conn, 'transaction', 'next_verify_at', 'TIMESTAMP')
+    _add_column_if_missing(conn, 'transaction', 'last_verify_error', 'VARCHAR(200)')
+
+def recurring_pledges(conn):
+    """Pledge table and the link from recurring charges to their pledge"""
+    Pledge.__table__.create(conn, checkfirst=True)
+    _add_column_if_missing(conn, 'transaction', 'pledge_id', 'INTEGER REFERENCES pledge (id)')
+
+def donation_rollups(conn):
+    """Hourly, daily and monthly donation rollups, backfilled from the ledger"""
+    DonationRollup.__table__.create(conn, checkfirst=True)
+    rebuild_rollups(conn)
+
+def impact_events(conn):
+    """Impact event store and its rollups (opening figures are recorded at startup)"""
+    ImpactEvent.__table__.create(conn, checkfirst=True)
+    ImpactRollup.__table__.create(conn, checkfirst=True)
+
+def transaction_archive(conn):
+    """Record of the ledger months moved into archive files"""
+    TransactionArchive.__table__.create(conn, checkfirst=True)
+
+# (version, description, step) - append new steps, never reorder or edit old ones
+MIGRATIONS = [
+    (1, 'Store amounts as integer minor units', amounts_to_minor_units),
+    (2, 'Per-currency campaign ledgers and FX rate snapshots', per_currency_ledgers),
+    (3, 'Transaction ledger indexes', transaction_indexes),
+    (4, 'Pending transaction re-verification state', transaction_verification_state),
+    (5, 'Recurring pledges', recurring_pledges),
+    (6, 'Donation reporting rollups', donation_rollups),
+    (7, 'Impact events and rollups', impact_events),
+    (8, 'Transaction archive', transaction_archive),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(conn):
+    """Return the recorded schema version, or None if the database is unversioned"""
+    if 'schema_version' not in inspect(conn).get_table_names():
+        return None
+    return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+def upgrade():
+    """Bring the database schema up to date and create any missing tables"""
+    applied = []
+
+    with db.engine.begin() as conn:
+        version = current_version(conn)
+        if version is None:
+            existing_tables = inspect(conn).get_table_names()
+            conn.execute(text('CREATE TABLE schema_version (version INTEGER NOT NULL)'))
+            # A database created before versioning starts at 0; a new one needs no steps
+            version = 0 if 'campaign' in existing_tables else LATEST_VERSION
+            conn.execute(text('INSERT INTO schema_version (version) VALUES (:v)'), {'v': version})
+
+        for step_version, description, step in MIGRATIONS:
+            if step_version <= version:
+                continue
+            step(conn)
+            conn.execute(text('UPDATE schema_version SET version = :v'), {'v': step_version})
+            applied.append(description)
+
+    db.create_all()
+    return applied
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        applied = upgrade()
+
+    if applied:
+        print("✅ Applied migrations:")
+        for description in applied:
+            print(f"   - {description}")
+    else:
+        print("✅ Database schema is up to date")
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from money import Money, format_minor
 
 db = SQLAlchemy()
 
@@ -8,8 +9,8 @@ class Campaign(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    goal_amount = db.Column(db.Float, nullable=False)
-    raised_amount = db.Column(db.Float, default=0.0)
+    goal_amount = db.Column(db.BigInteger, nullable=False)  # Minor units (kobo)
+    raised_amount = db.Column(db.BigInteger, default=0)  # Minor units (kobo)
     currency = db.Column(db.String(3), default='NGN')
     is_active = db.Column(db.Boolean, default=True)
     image_filename = db.Column(db.String(255))
@@ -28,6 +29,11 @@ class Campaign(db.Model):
             return 0
         return min((self.raised_amount / self.goal_amount) * 100, 100)
     
+    @property
+    def raised(self):
+        """Raised amount as Money"""
+        return Money(int(self.raised_amount or 0), self.currency)
+    
     @property
     def image_url(self):
         """Get full image URL"""
@@ -35,21 +41,226 @@ class Campaign(db.Model):
             return f'/static/images/campaigns/{self.image_filename}'
         return '/static/images/campaigns/default.jpg'
 
+class CampaignCurrencyTotal(db.Model):
+    """Per-currency ledger of amounts raised for a campaign, in native minor units"""
+    __table_args__ = (db.UniqueConstraint('campaign_id', 'currency'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id'), nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+    raised_amount = db.Column(db.BigInteger, nullable=False, default=0)
+    donation_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CampaignCurrencyTotal {self.campaign_id} {format_minor(int(self.raised_amount), self.currency)}>'
+
+class DonationRollup(db.Model):
+    """Successful donations summed per campaign and currency over an hour, day or month (see reporting.py)"""
+    __table_args__ = (
+        # One row per bucket; also serves per-campaign series
+        db.UniqueConstraint('grain', 'campaign_id', 'currency', 'period_start'),
+        # Series across all campaigns
+        db.Index('ix_donation_rollup_period', 'grain', 'period_start'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    grain = db.Column(db.String(5), nullable=False)  # hour, day, month
+    period_start = db.Column(db.DateTime, nullable=False)  # UTC
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id'), nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False, default=0)  # Minor units of currency
+    campaign_amount = db.Column(db.BigInteger, nullable=False, default=0)  # Minor units of the campaign currency
+    donation_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DonationRollup {self.grain} {self.period_start:%Y-%m-%d %H:%M} {format_minor(int(self.amount), self.currency)}>'
+
+class ImpactEvent(db.Model):
+    """Something a campaign achieved, in one of the metrics registered in impact.py"""
+    __table_args__ = (
+        # Recent events per campaign, for the admin page
+        db.Index('ix_impact_event_campaign_occurred', 'campaign_id', 'occurred_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id'), nullable=False)
+    metric = db.Column(db.String(40), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    occurred_at = db.Column(db.DateTime, nullable=False)  # UTC date of the outreach
+    source_key = db.Column(db.String(100), unique=True)  # Optional external key; recording it twice is a no-op
+    note = db.Column(db.String(200))
+    recorded_by = db.Column(db.String(100))
+    recorded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ImpactEvent {self.campaign_id} {self.metric} +{self.quantity}>'
+
+class ImpactRollup(db.Model):
+    """Impact event quantities summed per metric and campaign by day, month and all time"""
+    __table_args__ = (
+        db.UniqueConstraint('grain', 'metric', 'campaign_id', 'period_start'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    grain = db.Column(db.String(5), nullable=False)  # day, month, total
+    metric = db.Column(db.String(40), nullable=False)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id'), nullable=False)
+    period_start = db.Column(db.DateTime, nullable=False)  # UTC; a fixed epoch for the all-time total
+    total = db.Column(db.BigInteger, nullable=False, default=0)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ImpactRollup {self.grain} {self.period_start:%Y-%m-%d} {self.metric} {self.total}>'
+
 class Transaction(db.Model):
     """Transaction/Donation model - completely anonymous"""
+    # Designed around the hot queries in ledger.py (see test_query_plans.py).
+    # Postgres gets covering and partial indexes; SQLite the partial ones only.
+    __table_args__ = (
+        # Per-campaign totals and the campaign foreign key
+        db.Index('ix_transaction_campaign_status', 'campaign_id', 'status', 'currency',
+                 postgresql_include=['amount', 'campaign_amount']),
+        # Pending donations by age, for reconciliation
+        db.Index('ix_transaction_pending_created', 'created_at',
+                 postgresql_where=db.text("status = 'pending'"), sqlite_where=db.text("status = 'pending'")),
+        # Recent successful donations, overall and per campaign
+        db.Index('ix_transaction_success_completed', 'completed_at',
+                 postgresql_where=db.text("status = 'success'"), sqlite_where=db.text("status = 'success'")),
+        db.Index('ix_transaction_campaign_success_completed', 'campaign_id', 'completed_at',
+                 postgresql_where=db.text("status = 'success'"), sqlite_where=db.text("status = 'success'")),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)  # Minor units (kobo, cents)
     currency = db.Column(db.String(3), nullable=False)
     campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id'), nullable=False)
     
+    # Rate converting `currency` into the campaign currency, snapshotted at donation time
+    fx_rate = db.Column(db.Numeric(20, 10), default=1)
+    campaign_amount = db.Column(db.BigInteger)  # Minor units of the campaign currency
+    
     # Payment tracking
     transaction_id = db.Column(db.String(100), unique=True)
     payment_method = db.Column(db.String(20))  # 'stripe' or 'flutterwave'
     status = db.Column(db.String(20), default='pending')  # pending, success, failed
+    pledge_id = db.Column(db.Integer, db.ForeignKey('pledge.id'))  # Set on recurring charges
+    
+    # Background re-verification of donations left pending (see reconcile.py)
+    verify_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_verify_at = db.Column(db.DateTime)
+    last_verify_error = db.Column(db.String(200))
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
     
+    @property
+    def money(self):
+        """Amount as Money"""
+        return Money(int(self.amount), self.currency)
+    
+    def __repr__(self):
+        return f'<Transaction {format_minor(int(self.amount), self.currency)} to {self.campaign.title}>'
+
+class TransactionArchive(db.Model):
+    """A month of settled transactions moved out of the ledger into a compressed file (see archive.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.DateTime, nullable=False, index=True)  # UTC start of the month
+    path = db.Column(db.String(255), unique=True, nullable=False)  # Relative to ARCHIVE_DIR
+    row_count = db.Column(db.Integer, nullable=False)
+    success_count = db.Column(db.Integer, nullable=False)
+    first_id = db.Column(db.Integer, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False)
+    byte_size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TransactionArchive {self.month:%Y-%m} {self.row_count} rows>'
+
+class Pledge(db.Model):
+    """Recurring donation charged monthly against a saved Paystack authorization (see recurring.py)"""
+    __table_args__ = (
+        # Pledges due for a charge, for the scheduler
+        db.Index('ix_pledge_due', 'next_charge_at',
+                 postgresql_where=db.text("status IN ('active', 'past_due')"),
+                 sqlite_where=db.text("status IN ('active', 'past_due')")),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id'), nullable=False)
+    email = db.Column(db.String(254), nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)  # Minor units per charge
+    currency = db.Column(db.String(3), nullable=False)
+    interval_months = db.Column(db.Integer, nullable=False, default=1)
+    
+    # Reusable authorization from the verification of the first donation
+    source_reference = db.Column(db.String(100), unique=True, nullable=False)
+    authorization_code = db.Column(db.String(100), nullable=False)
+    card_last4 = db.Column(db.String(4))
+    card_expires = db.Column(db.String(7))  # MM/YYYY
+    
+    # Schedule and dunning
+    status = db.Column(db.String(20), nullable=False, default='active')  # active, past_due, lapsed, cancelled
+    cycles = db.Column(db.Integer, nullable=False, default=0)  # Successful recurring charges
+    failed_attempts = db.Column(db.Integer, nullable=False, default=0)  # Declines in the current cycle
+    next_charge_at = db.Column(db.DateTime, nullable=False)
+    last_charged_at = db.Column(db.DateTime)
+    last_charge_error = db.Column(db.String(200))
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def money(self):
+        """Amount per charge as Money"""
+        return Money(int(self.amount), self.currency)
+    
+    def __repr__(self):
+        return f'<Pledge {format_minor(int(self.amount), self.currency)} monthly ({self.status})>'
+
+class OutboxMessage(db.Model):
+    """Email waiting to be delivered by the background mail sender"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # contact, receipt, dunning
+    dedupe_key = db.Column(db.String(64), unique=True, nullable=False)
+    to_address = db.Column(db.String(254), nullable=False)
+    reply_to = db.Column(db.String(254))
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    
+    # Delivery state
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    claim_token = db.Column(db.String(32))
+    last_error = db.Column(db.String(500))
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<OutboxMessage {self.kind} to {self.to_address} ({self.status})>'
+
+class SchedulerLease(db.Model):
+    """Time-limited leadership of a background job, so only one worker runs it"""
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<SchedulerLease {self.name} held by {self.holder}>'
+
+class IdempotencyKey(db.Model):
+    """Claim and stored response for an idempotent request (see idempotency.py)"""
+    key = db.Column(db.String(64), primary_key=True)
+    state = db.Column(db.String(20), nullable=False)  # in_flight, done
+    owner = db.Column(db.String(100), nullable=False)
+    response = db.Column(db.Text)  # JSON
+    locked_until = db.Column(db.DateTime, nullable=False)  # In-flight claim is abandoned after this
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Stored response is replayed until this
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
     def __repr__(self):
-        return f'<Transaction {self.currency}{self.amount} to {self.campaign.title}>'
\ No newline at end of file
+        return f'<IdempotencyKey {self.key[:12]} {self.state}>'
@@ -0,0 +1,200 @@
+"""
+Integer minor-unit money handling.
+
+Amounts are stored and summed as integers in the currency's minor unit
+(kobo, cents, pesewas...). Conversion from user input goes through Decimal so
+values like 100.29 become exactly 10029 instead of being truncated by float
+math.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Number of minor-unit decimal places per currency
+CURRENCY_EXPONENTS = {
+    'NGN': 2,
+    'USD': 2,
+    'GHS': 2,
+    'ZAR': 2,
+    'KES': 2,
+    'EUR': 2,
+    'GBP': 2
+}
+
+CURRENCY_SYMBOLS = {
+    'NGN': '₦',
+    'USD': '$',
+    'GHS': 'GH₵',
+    'ZAR': 'R',
+    'KES': 'KSh',
+    'EUR': '€',
+    'GBP': '£'
+}
+
+_FAST_FORMAT_LIMIT = 10 ** 13
+
+def get_exponent(currency):
+    """Return the minor-unit exponent for a currency, raising ValueError if unknown"""
+    try:
+        return CURRENCY_EXPONENTS[currency]
+    except KeyError:
+        raise ValueError(f'Unsupported currency: {currency}')
+
+def _parse_decimal(amount):
+    """Parse a user-supplied amount ("1,000.50", 100.29, Decimal) into a finite Decimal"""
+    if isinstance(amount, Decimal):
+        value = amount
+    else:
+        try:
+            value = Decimal(str(amount).replace(',', '').strip())
+        except InvalidOperation:
+            raise ValueError(f'Invalid amount: {amount!r}')
+    if not value.is_finite():
+        raise ValueError(f'Invalid amount: {amount!r}')
+    return value
+
+def to_minor_units(amount, currency):
+    """Convert a major-unit amount to integer minor units without rounding.
+
+    Raises ValueError for unknown currencies or amounts with more decimal
+    places than the currency allows.
+    """
+    minor = _parse_decimal(amount).scaleb(get_exponent(currency))
+    if minor != minor.to_integral_value():
+        raise ValueError(f'Amount {amount} has too many decimal places for {currency}')
+    return int(minor)
+
+def round_minor_units(amount, currency):
+    """Convert a major-unit amount to integer minor units, rounding half up"""
+    minor = _parse_decimal(amount).scaleb(get_exponent(currency))
+    return int(minor.to_integral_value(rounding=ROUND_HALF_UP))
+
+def scale_minor(amount_minor, numerator, denominator=1):
+    """Multiply an integer minor amount by a fraction, rounding half up with integer math only"""
+    product = amount_minor * numerator
+    if product >= 0:
+        return (2 * product + denominator) // (2 * denominator)
+    return -((-2 * product + denominator) // (2 * denominator))
+
+def sum_minor(amounts):
+    """Exactly sum an iterable or buffer (list, array('q')) of integer minor amounts"""
+    return sum(amounts)
+
+def format_minor(amount_minor, currency):
+    """Format integer minor units with the currency symbol, e.g. 10029 NGN -> ₦100.29"""
+    exponent = CURRENCY_EXPONENTS.get(currency, 2)
+    symbol = CURRENCY_SYMBOLS.get(currency, currency)
+    if exponent == 2 and -_FAST_FORMAT_LIMIT < amount_minor < _FAST_FORMAT_LIMIT:
+        # Below the limit n / 100 is within 0.001 of the exact value, so the
+        # C float formatter rounds it back to exactly the right two digits
+        return f"{symbol}{amount_minor / 100:,.2f}" if amount_minor >= 0 else f"-{symbol}{-amount_minor / 100:,.2f}"
+    sign = '-' if amount_minor < 0 else ''
+    if not exponent:
+        return f"{sign}{symbol}{abs(amount_minor):,}"
+    major, minor = divmod(abs(amount_minor), 10 ** exponent)
+    return f"{sign}{symbol}{major:,}.{minor:0{exponent}d}"
+
+class Money:
+    """Immutable amount of money held as integer minor units"""
+    __slots__ = ('amount', 'currency')
+
+    def __init__(self, amount, currency='NGN'):
+        if isinstance(amount, bool) or not isinstance(amount, int):
+            raise TypeError('Money amounts must be integer minor units')
+        get_exponent(currency)
+        object.__setattr__(self, 'amount', amount)
+        object.__setattr__(self, 'currency', currency)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Money is immutable')
+
+    @classmethod
+    def from_major(cls, amount, currency='NGN'):
+        """Build from a major-unit value such as '100.29', rounding half up to the minor unit"""
+        return cls(round_minor_units(amount, currency), currency)
+
+    @classmethod
+    def zero(cls, currency='NGN'):
+        return cls(0, currency)
+
+    @classmethod
+    def sum(cls, items, currency='NGN'):
+        """Sum Money values of one currency"""
+        total = 0
+        for item in items:
+            if item.currency != currency:
+                raise ValueError(f'Cannot add {item.currency} to {currency}')
+            total += item.amount
+        return cls(total, currency)
+
+    @property
+    def major(self):
+        """The amount in major units as an exact Decimal"""
+        return Decimal(self.amount).scaleb(-CURRENCY_EXPONENTS[self.currency])
+
+    def _check(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        if other.currency != self.currency:
+            raise ValueError(f'Currency mismatch: {self.currency} and {other.currency}')
+        return other
+
+    def __add__(self, other):
+        if self._check(other) is NotImplemented:
+            return NotImplemented
+        return Money(self.amount + other.amount, self.currency)
+
+    def __sub__(self, other):
+        if self._check(other) is NotImplemented:
+            return NotImplemented
+        return Money(self.amount - other.amount, self.currency)
+
+    def __neg__(self):
+        return Money(-self.amount, self.currency)
+
+    def __mul__(self, factor):
+        """Multiply by an int, or by a Decimal/str rate with half-up rounding"""
+        if isinstance(factor, int) and not isinstance(factor, bool):
+            return Money(self.amount * factor, self.currency)
+        if isinstance(factor, (Decimal, str)):
+            numerator, denominator = Decimal(factor).as_integer_ratio()
+            return Money(scale_minor(self.amount, numerator, denominator), self.currency)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.amount == other.amount and self.currency == other.currency
+
+    def __lt__(self, other):
+        if self._check(other) is NotImplemented:
+            return NotImplemented
+        return self.amount < other.amount
+
+    def __le__(self, other):
+        if self._check(other) is NotImplemented:
+            return NotImplemented
+        return self.amount <= other.amount
+
+    def __gt__(self, other):
+        if self._check(other) is NotImplemented:
+            return NotImplemented
+        return self.amount > other.amount
+
+    def __ge__(self, other):
+        if self._check(other) is NotImplemented:
+            return NotImplemented
+        return self.amount >= other.amount
+
+    def __hash__(self):
+        return hash((self.amount, self.currency))
+
+    def __bool__(self):
+        return self.amount != 0
+
+    def __repr__(self):
+        return f'<Money {self.currency} {self.major}>'
+
+    def __str__(self):
+        return format_minor(self.amount, self.currency)
@@ -0,0 +1,116 @@
+"""
+Service worker for donors on slow or flaky mobile networks.
+
+/sw.js is generated from templates/sw.js with the same asset manifest the
+templates use, so the precached app shell (stylesheets, scripts, fonts, the
+logo) is exactly the fingerprinted URLs pages ask for, and a deploy that
+changes any of them changes the worker and its cache names. The worker:
+
+- serves the app shell cache-first (it is fingerprinted, so never stale);
+- serves the public pages (home, about, the campaign list and each campaign)
+  stale-while-revalidate: the cached copy at once, refreshed in the
+  background for the next visit, the network when nothing is cached;
+- keeps images in a cache bounded by entry count and bytes, evicting the
+  least recently used (cache-first for fingerprinted URLs, otherwise
+  stale-while-revalidate);
+- never touches anything else, and never /process-donation, /paystack/*,
+  /donate/*, /contact or /admin, or a non-GET request.
+
+Pages that showed flashed messages are sent with Cache-Control: no-store,
+which the worker respects, so a one-off error is not replayed from cache.
+With SERVICE_WORKER_ENABLED off, /sw.js serves a worker that deletes its
+caches and unregisters itself.
+"""
+
+import fnmatch
+import hashlib
+import json
+import re
+from flask import make_response, render_template, request
+from flask.globals import request_ctx
+
+# Manifest entries precached as the app shell
+APP_SHELL = ('css/fonts.css', 'css/main.css', 'js/*.js', 'fonts/*.woff2', 'images/logo.png')
+# Endpoints served stale-while-revalidate
+PAGE_ENDPOINTS = ('index', 'about', 'campaigns', 'campaign')
+# Path prefixes the worker must never cache or answer
+NEVER_CACHE = ('/process-donation', '/paystack/', '/donate/', '/contact', '/admin', '/sw.js')
+IMAGE_PREFIXES = ('/static/', '/img/', '/media/')
+
+def rule_pattern(rule):
+    """Anchored regex source for a URL rule, usable by JavaScript ('/campaign/<int:id>' -> ^/campaign/\\d+$)"""
+    parts = []
+    position = 0
+    for match in re.finditer(r'<(?:(\w+)(?:\([^)]*\))?:)?\w+>', rule):
+        parts.append(re.escape(rule[position:match.start()]))
+        parts.append(r'\d+' if match.group(1) == 'int' else '[^/]+')
+        position = match.end()
+    parts.append(re.escape(rule[position:]))
+    return '^' + ''.join(parts) + '$'
+
+class ServiceWorker:
+    """Generated /sw.js bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self._scripts = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['service_worker'] = self
+        app.add_url_rule('/sw.js', 'service_worker', self.serve)
+        app.after_request(self._no_store_flashed)
+
+    def precache_urls(self):
+        """Fingerprinted URLs of the app shell, from the asset manifest"""
+        assets = self.app.extensions['asset_manifest']
+        if assets.entries is None:
+            assets.load()
+        names = sorted(name for name in assets.entries
+                       if any(fnmatch.fnmatchcase(name, pattern) for pattern in APP_SHELL))
+        return [assets.asset_url(name) for name in names]
+
+    def page_patterns(self):
+        return [rule_pattern(rule.rule) for rule in self.app.url_map.iter_rules()
+                if rule.endpoint in PAGE_ENDPOINTS and 'GET' in rule.methods]
+
+    def settings(self):
+        """Everything the worker needs; the version changes whenever any of it does"""
+        config = self.app.config
+        settings = {
+            'precache': self.precache_urls(),
+            'pages': self.page_patterns(),
+            'never': list(NEVER_CACHE),
+            'images': {'prefixes': list(IMAGE_PREFIXES), 'max_entries': config['SW_IMAGE_CACHE_ENTRIES'],
+                       'max_bytes': config['SW_IMAGE_CACHE_MAX_BYTES']},
+            'fallback': '/'
+        }
+        encoded = json.dumps(settings, sort_keys=True).encode()
+        settings['version'] = hashlib.sha256(encoded).hexdigest()[:12]
+        return settings
+
+    def script(self):
+        """Rendered worker source, built once per process (the manifest does not change while running)"""
+        enabled = self.app.config['SERVICE_WORKER_ENABLED']
+        if enabled not in self._scripts:
+            settings = self.settings() if enabled else {'version': 'off'}
+            body = render_template('sw.js', enabled=enabled, settings=settings)
+            self._scripts[enabled] = (body, hashlib.sha256(body.encode()).hexdigest()[:16])
+        return self._scripts[enabled]
+
+    def serve(self):
+        """Response for /sw.js: revalidated on every update check"""
+        body, etag = self.script()
+        response = make_response(body)
+        response.mimetype = 'application/javascript'
+        response.cache_control.no_cache = True
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    def _no_store_flashed(self, response):
+        # A page that consumed flashed messages is a one-off view; keep it out of the worker's cache
+        if request_ctx.flashes:
+            response.cache_control.no_store = True
+        return response
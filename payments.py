@@ -1,23 +1,28 @@
 import requests
 import hashlib
 import hmac
+import secrets
 import time
 import json
 from config import Config
 from flask import current_app
+from logs import SAMPLED, bind_reference
+from tracing import trace_span
+from money import Money, CURRENCY_SYMBOLS, format_minor, scale_minor
 
 def initialize_paystack_payment(donation_data):
     """Initialize payment with Paystack using direct HTTP requests"""
     try:
-        # Convert amount to kobo (Paystack uses kobo for NGN)
-        if donation_data['currency'] == 'NGN':
-            amount_in_minor = int(donation_data['amount'] * 100)  # Convert to kobo
-        else:
-            amount_in_minor = int(donation_data['amount'] * 100)  # Convert to cents
+        # Paystack expects integer minor units (kobo for NGN, cents for USD)
+        amount = donation_data['amount']
+        if not isinstance(amount, Money):
+            amount = Money.from_major(amount, donation_data['currency'])
+        amount_in_minor = amount.amount
         
-        # Generate unique reference
+        # Generate unique reference (random suffix so same-second donations don't collide)
         timestamp = int(time.time())
-        reference = f'BSF_{donation_data["campaign_id"]}_{timestamp}'
+        reference = f'BSF_{donation_data["campaign_id"]}_{timestamp}_{secrets.token_hex(4)}'
+        bind_reference(reference)
         
         # Prepare payload for Paystack API
         payload = {
@@ -29,8 +34,9 @@ def initialize_paystack_payment(donation_data):
             'metadata': {
                 'campaign_id': donation_data['campaign_id'],
                 'campaign_title': donation_data['campaign_title'],
-                'original_amount': donation_data['amount'],
-                'donor_type': 'anonymous'
+                'original_amount': str(amount.major),
+                'donor_type': 'anonymous',
+                'recurring': bool(donation_data.get('recurring'))
             }
         }
         
@@ -41,22 +47,24 @@ def initialize_paystack_payment(donation_data):
             'Accept': 'application/json'
         }
         
-        current_app.logger.info(f"Initializing Paystack payment for reference: {reference}")
+        current_app.logger.info("Initializing Paystack payment for reference: %s", reference, extra=SAMPLED)
         
         # Make request to Paystack API
-        response = requests.post(
-            'https://api.paystack.co/transaction/initialize',
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
+        with trace_span('paystack POST /transaction/initialize', **{'http.method': 'POST'}) as span:
+            response = requests.post(
+                f'{Config.PAYSTACK_API_URL}/transaction/initialize',
+                json=payload,
+                headers=headers,
+                timeout=30
+            )
+            span.set('http.status_code', response.status_code)
         
         # Parse response
         if response.status_code == 200:
             data = response.json()
             
             if data.get('status'):
-                current_app.logger.info(f"Paystack payment initialized successfully: {reference}")
+                current_app.logger.info("Paystack payment initialized successfully: %s", reference, extra=SAMPLED)
                 return {
                     'success': True,
                     'reference': reference,
@@ -65,13 +73,13 @@ def initialize_paystack_payment(donation_data):
                 }
             else:
                 error_message = data.get('message', 'Payment initialization failed')
-                current_app.logger.error(f"Paystack initialization failed: {error_message}")
+                current_app.logger.error("Paystack initialization failed: %s", error_message)
                 return {
                     'success': False,
                     'error': error_message
                 }
         else:
-            current_app.logger.error(f"Paystack API error: HTTP {response.status_code}")
+            current_app.logger.error("Paystack API error: HTTP %s", response.status_code)
             try:
                 error_data = response.json()
                 error_message = error_data.get('message', f'HTTP {response.status_code} error')
@@ -96,13 +104,13 @@ def initialize_paystack_payment(donation_data):
             'error': 'Unable to connect to payment service. Please try again.'
         }
     except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"Paystack request error during initialization: {str(e)}")
+        current_app.logger.error("Paystack request error during initialization: %s", e)
         return {
             'success': False,
             'error': 'Payment service error. Please try again.'
         }
     except Exception as e:
-        current_app.logger.error(f"Unexpected error during payment initialization: {str(e)}")
+        current_app.logger.error("Unexpected error during payment initialization: %s", e)
         return {
             'success': False,
             'error': 'An unexpected error occurred. Please try again.'
@@ -110,6 +118,7 @@ def initialize_paystack_payment(donation_data):
 
 def verify_paystack_payment(reference):
     """Verify Paystack payment using direct HTTP requests"""
+    bind_reference(reference)
     try:
         # Set headers with authorization
         headers = {
@@ -118,28 +127,27 @@ def verify_paystack_payment(reference):
             'Accept': 'application/json'
         }
         
-        current_app.logger.info(f"Verifying Paystack payment for reference: {reference}")
+        current_app.logger.info("Verifying Paystack payment for reference: %s", reference, extra=SAMPLED)
         
         # Make request to verify transaction
-        response = requests.get(
-            f'https://api.paystack.co/transaction/verify/{reference}',
-            headers=headers,
-            timeout=30
-        )
+        with trace_span('paystack GET /transaction/verify', **{'http.method': 'GET'}) as span:
+            response = requests.get(
+                f'{Config.PAYSTACK_API_URL}/transaction/verify/{reference}',
+                headers=headers,
+                timeout=30
+            )
+            span.set('http.status_code', response.status_code)
         
         if response.status_code == 200:
             data = response.json()
             
             if data.get('status') and data['data']['status'] == 'success':
-                # Convert amount back from minor currency to major
-                if data['data']['currency'] == 'NGN':
-                    amount = data['data']['amount'] / 100  # Convert from kobo
-                else:
-                    amount = data['data']['amount'] / 100  # Convert from cents
+                # Paystack reports integer minor units; keep them as-is
+                amount = int(data['data']['amount'])
                 
                 metadata = data['data'].get('metadata', {})
                 
-                current_app.logger.info(f"Payment verification successful: {reference}")
+                current_app.logger.info("Payment verification successful: %s", reference, extra=SAMPLED)
                 
                 return {
                     'success': True,
@@ -150,27 +158,34 @@ def verify_paystack_payment(reference):
                     'campaign_id': metadata.get('campaign_id'),
                     'campaign_title': metadata.get('campaign_title'),
                     'transaction_date': data['data']['transaction_date'],
-                    'customer_email': data['data']['customer']['email']
+                    'customer_email': data['data']['customer']['email'],
+                    'recurring': bool(metadata.get('recurring')),
+                    'authorization': data['data'].get('authorization') or {}
                 }
             else:
                 transaction_status = data['data'].get('status', 'unknown')
-                current_app.logger.warning(f"Payment verification failed - status: {transaction_status}")
+                current_app.logger.warning("Payment verification failed - status: %s", transaction_status)
                 return {
                     'success': False,
+                    'status': transaction_status,
                     'error': f'Payment was not successful. Status: {transaction_status}'
                 }
         else:
-            current_app.logger.error(f"Paystack verify API error: HTTP {response.status_code}")
+            current_app.logger.error("Paystack verify API error: HTTP %s", response.status_code)
             try:
                 error_data = response.json()
                 error_message = error_data.get('message', 'Payment verification failed')
             except:
                 error_message = 'Payment verification failed'
             
-            return {
+            result = {
                 'success': False,
                 'error': error_message
             }
+            # Paystack answers 400/404 for references it has never seen
+            if response.status_code in (400, 404) and 'not found' in error_message.lower():
+                result['status'] = 'not_found'
+            return result
             
     except requests.exceptions.Timeout:
         current_app.logger.error("Paystack API timeout during verification")
@@ -185,80 +200,88 @@ def verify_paystack_payment(reference):
             'error': 'Unable to verify payment. Please contact support.'
         }
     except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"Paystack verify request error: {str(e)}")
+        current_app.logger.error("Paystack verify request error: %s", e)
         return {
             'success': False,
             'error': 'Payment verification failed. Please contact support.'
         }
     except Exception as e:
-        current_app.logger.error(f"Unexpected error during payment verification: {str(e)}")
+        current_app.logger.error("Unexpected error during payment verification: %s", e)
         return {
             'success': False,
             'error': 'Payment verification error. Please contact support.'
         }
 
-def test_paystack_connection():
-    """Test Paystack API connection using direct HTTP requests"""
+# Pooled connections for the recurring charge scheduler, which makes thousands of calls per pass
+_charge_session = requests.Session()
+_charge_session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=Config.PLEDGE_CONCURRENCY))
+_charge_session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=Config.PLEDGE_CONCURRENCY))
+
+def charge_authorization(charge):
+    """Charge a saved authorization (recurring pledge) without the donor present.
+
+    charge holds authorization_code, email, amount (Money), reference and
+    metadata. The result's status is Paystack's charge status ('success',
+    'failed', ...), 'duplicate' if the reference was already used, 'rejected'
+    if Paystack refused the request, or missing when the outcome is unknown
+    (timeouts, server errors) and the same reference should be retried.
+    """
+    reference = charge['reference']
     try:
-        # Test by fetching banks list (simple API call)
         headers = {
             'Authorization': f'Bearer {Config.PAYSTACK_SECRET_KEY}',
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
+        payload = {
+            'authorization_code': charge['authorization_code'],
+            'email': charge['email'],
+            'amount': charge['amount'].amount,
+            'currency': charge['amount'].currency,
+            'reference': reference,
+            'metadata': charge.get('metadata', {})
+        }
         
-        response = requests.get(
-            'https://api.paystack.co/bank',
-            headers=headers,
-            timeout=10
-        )
+        with trace_span('paystack POST /transaction/charge_authorization', **{'http.method': 'POST'}) as span:
+            response = _charge_session.post(
+                f'{Config.PAYSTACK_API_URL}/transaction/charge_authorization',
+                json=payload,
+                headers=headers,
+                timeout=30
+            )
+            span.set('http.status_code', response.status_code)
         
         if response.status_code == 200:
             data = response.json()
-            
-            if data.get('status'):
-                banks_count = len(data.get('data', []))
+            charge_data = data.get('data') or {}
+            status = charge_data.get('status', 'unknown')
+            if data.get('status') and status == 'success':
                 return {
                     'success': True,
-                    'message': f'Paystack connected successfully. Found {banks_count} supported banks.'
-                }
-            else:
-                return {
-                    'success': False,
-                    'message': f'Paystack API returned error: {data.get("message", "Unknown error")}'
+                    'reference': reference,
+                    'status': status,
+                    'amount': int(charge_data['amount']),
+                    'currency': charge_data['currency']
                 }
-        else:
-            try:
-                error_data = response.json()
-                error_message = error_data.get('message', f'HTTP {response.status_code}')
-            except:
-                error_message = f'HTTP {response.status_code}'
-            
             return {
                 'success': False,
-                'message': f'Paystack connection failed: {error_message}'
+                'reference': reference,
+                'status': status,
+                'error': charge_data.get('gateway_response') or data.get('message', 'Charge failed')
             }
-            
-    except requests.exceptions.Timeout:
-        return {
-            'success': False,
-            'message': 'Paystack connection timeout'
-        }
-    except requests.exceptions.ConnectionError:
-        return {
-            'success': False,
-            'message': 'Unable to connect to Paystack. Check internet connection.'
-        }
+        
+        try:
+            error_message = response.json().get('message', f'HTTP {response.status_code} error')
+        except ValueError:
+            error_message = f'HTTP {response.status_code} error'
+        result = {'success': False, 'reference': reference, 'error': error_message}
+        if response.status_code < 500:
+            result['status'] = 'duplicate' if 'duplicate' in error_message.lower() else 'rejected'
+        return result
+    
     except requests.exceptions.RequestException as e:
-        return {
-            'success': False,
-            'message': f'Paystack connection error: {str(e)}'
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'message': f'Unexpected connection error: {str(e)}'
-        }
+        current_app.logger.warning("Paystack charge request error for %s: %s", reference, e)
+        return {'success': False, 'reference': reference, 'error': f'Request error: {e.__class__.__name__}'}
 
 def handle_paystack_webhook(request):
     """Handle Paystack webhook notifications with signature verification"""
@@ -267,11 +290,11 @@ def handle_paystack_webhook(request):
         payload = request.get_data()
         signature = request.headers.get('X-Paystack-Signature')
         
-        # Verify webhook signature if webhook secret is configured
-        if hasattr(Config, 'PAYSTACK_WEBHOOK_SECRET') and Config.PAYSTACK_WEBHOOK_SECRET:
-            if not verify_webhook_signature(payload, signature, Config.PAYSTACK_WEBHOOK_SECRET):
-                current_app.logger.warning("Invalid Paystack webhook signature")
-                return {'success': False, 'error': 'Invalid signature'}
+        # Paystack signs webhooks with the secret key; never accept an unsigned event
+        secret = Config.PAYSTACK_WEBHOOK_SECRET or Config.PAYSTACK_SECRET_KEY
+        if not secret or not signature or not verify_webhook_signature(payload, signature, secret):
+            current_app.logger.warning("Invalid Paystack webhook signature")
+            return {'success': False, 'error': 'Invalid signature'}
         
         # Parse JSON data
         data = request.get_json()
@@ -279,17 +302,15 @@ def handle_paystack_webhook(request):
         if data and data.get('event') == 'charge.success':
             charge_data = data.get('data', {})
             reference = charge_data.get('reference')
+            bind_reference(reference)
             
             if reference and charge_data.get('status') == 'success':
-                # Convert amount from minor currency
-                if charge_data.get('currency') == 'NGN':
-                    amount = charge_data.get('amount', 0) / 100  # Convert from kobo
-                else:
-                    amount = charge_data.get('amount', 0) / 100  # Convert from cents
+                # Paystack reports integer minor units; keep them as-is
+                amount = int(charge_data.get('amount', 0))
                 
                 metadata = charge_data.get('metadata', {})
                 
-                current_app.logger.info(f"Webhook processed successfully for reference: {reference}")
+                current_app.logger.info("Webhook processed successfully for reference: %s", reference)
                 
                 return {
                     'success': True,
@@ -297,13 +318,14 @@ def handle_paystack_webhook(request):
                     'amount': amount,
                     'currency': charge_data.get('currency'),
                     'campaign_id': metadata.get('campaign_id'),
-                    'campaign_title': metadata.get('campaign_title')
+                    'campaign_title': metadata.get('campaign_title'),
+                    'pledge_id': metadata.get('pledge_id')
                 }
         
         return {'success': False, 'error': 'Unhandled webhook event'}
         
     except Exception as e:
-        current_app.logger.error(f"Paystack webhook error: {str(e)}")
+        current_app.logger.error("Paystack webhook error: %s", e)
         return {'success': False, 'error': str(e)}
 
 def verify_webhook_signature(payload, signature, secret):
@@ -316,7 +338,7 @@ def verify_webhook_signature(payload, signature, secret):
         ).hexdigest()
         return hmac.compare_digest(signature, expected_signature)
     except Exception as e:
-        current_app.logger.error(f"Webhook signature verification error: {str(e)}")
+        current_app.logger.error("Webhook signature verification error: %s", e)
         return False
 
 # Currency configurations for Paystack
@@ -330,31 +352,25 @@ SUPPORTED_CURRENCIES = [
 
 def get_currency_symbol(currency_code):
     """Get currency symbol for display"""
-    symbols = {
-        'NGN': '₦',
-        'USD': '$',
-        'GHS': 'GH₵',
-        'ZAR': 'R',
-        'KES': 'KSh',
-        'EUR': '€',
-        'GBP': '£'
-    }
-    return symbols.get(currency_code, currency_code)
+    return CURRENCY_SYMBOLS.get(currency_code, currency_code)
 
 def format_amount(amount, currency):
-    """Format amount with proper currency symbol"""
-    symbol = get_currency_symbol(currency)
-    return f"{symbol}{amount:,.2f}"
+    """Format a Money value or integer minor units with proper currency symbol"""
+    if isinstance(amount, Money):
+        return format_minor(amount.amount, amount.currency)
+    return format_minor(int(amount or 0), currency)
 
 def get_paystack_fees(amount, currency='NGN'):
-    """Calculate Paystack transaction fees for reference"""
+    """Calculate Paystack transaction fees (in minor units) for reference"""
+    if isinstance(amount, Money):
+        amount, currency = amount.amount, amount.currency
     if currency == 'NGN':
         # Paystack fees for NGN: 1.5% + ₦100 (capped at ₦2,000)
-        fee = (amount * 0.015) + 100
-        return min(fee, 2000)
+        fee = scale_minor(amount, 15, 1000) + 10000
+        return min(fee, 200000)
     else:
         # International cards: 3.9%
-        return amount * 0.039
+        return scale_minor(amount, 39, 1000)
 
 # Helper function to validate Paystack configuration
 def validate_paystack_config():
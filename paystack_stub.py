@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Paystack API, for development, tests and load runs.
+
+    python paystack_stub.py [--port 4010] [--latency-ms 20] [--decline-rate 0.05]
+    PAYSTACK_API_URL=http://127.0.0.1:4010 python app.py
+
+Implements the calls this app makes: transaction initialize, verify and
+charge_authorization, and the bank list. Transactions live in memory.
+Initialized transactions verify as successful card payments with a reusable
+authorization. Charges are declined for authorization codes starting with
+AUTH_decline, and otherwise at the decline rate (decided per reference, so
+reruns are reproducible). As on Paystack, a reference can only be used once.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def authorization_for(email):
+    """Reusable card authorization the stub hands out for a donor"""
+    return {
+        'authorization_code': f'AUTH_{zlib.crc32(email.encode()):08x}',
+        'card_type': 'visa', 'last4': '4081', 'exp_month': '12', 'exp_year': '2030',
+        'channel': 'card', 'reusable': True
+    }
+
+class PaystackStub(ThreadingHTTPServer):
+    """In-memory Paystack with configurable latency and decline rate"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, latency=0.0, decline_rate=0.0):
+        super().__init__(('127.0.0.1', port), PaystackStubHandler)
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.transactions = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        """Serve in a background thread; return the base URL"""
+        threading.Thread(target=self.serve_forever, name='paystack-stub', daemon=True).start()
+        return self.url
+
+    def record(self, reference, **transaction):
+        """Store a transaction; False if the reference was already used"""
+        with self.lock:
+            if reference in self.transactions:
+                return False
+            self.transactions[reference] = {
+                'reference': reference, 'transaction_date': datetime.utcnow().isoformat() + 'Z', **transaction
+            }
+            return True
+
+    def declines(self, reference, authorization_code):
+        if authorization_code.startswith('AUTH_decline'):
+            return True
+        return zlib.crc32(reference.encode()) % 10000 < self.decline_rate * 10000
+
+class PaystackStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def count(self, name):
+        with self.server.lock:
+            self.server.calls[name] = self.server.calls.get(name, 0) + 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def do_GET(self):
+        verify = re.match(r'^/transaction/verify/([^/?]+)$', self.path)
+        if verify:
+            self.count('verify')
+            transaction = self.server.transactions.get(verify.group(1))
+            if transaction is None:
+                return self.reply(400, {'status': False, 'message': 'Transaction reference not found'})
+            return self.reply(200, {'status': True, 'message': 'Verification successful', 'data': transaction})
+        if self.path.startswith('/bank'):
+            self.count('bank')
+            return self.reply(200, {'status': True, 'data': [{'name': 'Stub Bank', 'code': '000'}]})
+        self.reply(404, {'status': False, 'message': 'Not found'})
+
+    def do_POST(self):
+        payload = self.read_json()
+        if self.path == '/transaction/initialize':
+            self.count('initialize')
+            reference = payload['reference']
+            if not self.server.record(reference, status='success', amount=payload['amount'],
+                                      currency=payload.get('currency', 'NGN'),
+                                      metadata=payload.get('metadata', {}),
+                                      customer={'email': payload['email']},
+                                      authorization=authorization_for(payload['email'])):
+                return self.reply(400, {'status': False, 'message': 'Duplicate Transaction Reference'})
+            return self.reply(200, {'status': True, 'message': 'Authorization URL created', 'data': {
+                'authorization_url': f'{self.server.url}/checkout/{reference}',
+                'access_code': f'ACCESS_{reference}', 'reference': reference}})
+        if self.path == '/transaction/charge_authorization':
+            self.count('charge')
+            reference = payload['reference']
+            declined = self.server.declines(reference, payload['authorization_code'])
+            transaction = {
+                'status': 'failed' if declined else 'success', 'amount': payload['amount'],
+                'currency': payload.get('currency', 'NGN'), 'metadata': payload.get('metadata', {}),
+                'customer': {'email': payload['email']},
+                'gateway_response': 'Declined' if declined else 'Approved'
+            }
+            if not self.server.record(reference, **transaction):
+                return self.reply(400, {'status': False, 'message': 'Duplicate Transaction Reference'})
+            return self.reply(200, {'status': True, 'message': 'Charge attempted',
+                                    'data': {'reference': reference, **transaction}})
+        self.reply(404, {'status': False, 'message': 'Not found'})
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Paystack API stub')
+    parser.add_argument('--port', type=int, default=4010)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--decline-rate', type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub = PaystackStub(args.port, args.latency_ms / 1000, args.decline_rate)
+    print(f"🧪 Paystack stub on {stub.url} ({args.latency_ms:.0f} ms latency, "
+          f"{args.decline_rate:.0%} of charges declined)")
+    print(f"   PAYSTACK_API_URL={stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,249 @@
+"""
+Token-bucket rate limiting for abuse-prone endpoints.
+
+Each rule is a bucket of `capacity` tokens refilled continuously over
+`period` seconds. A request spends one token per key (client IP, donor
+email...) and is denied when any of its buckets is empty, in which case it
+spends none: a blocked client does not eat into its other allowances. Every
+check is a constant number of operations, whatever the number of tracked keys.
+
+Two backends are available:
+- MemoryBackend: per-process dict with LRU eviction, bounded by max_keys
+- SharedBackend: fixed-size slot table in a memory-mapped file, shared by
+  every gunicorn worker on the host. Slots are addressed by key hash and
+  locked individually, so memory stays fixed no matter how many keys appear
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, flash, redirect, request, url_for
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+RULE_PATTERN = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+def parse_rule(rule):
+    """Parse '5/minute' or '20/10minutes' into (capacity, period_seconds)"""
+    match = RULE_PATTERN.match(rule)
+    if not match:
+        raise ValueError(f'Invalid rate limit rule: {rule!r}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * PERIODS[unit]
+
+def _refill(tokens, updated_at, now, capacity, rate):
+    """Return the token count after refilling since updated_at"""
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+def _wait(buckets, levels):
+    """Seconds until every (key, capacity, rate) bucket at these token levels holds a token"""
+    return max(((1 - tokens) / rate for (_, _, rate), tokens in zip(buckets, levels) if tokens < 1), default=0.0)
+
+class MemoryBackend:
+    """In-process buckets with LRU eviction once max_keys is reached"""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now):
+        """Spend one token; return seconds to wait (0.0 when allowed)"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(capacity)
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = _refill(bucket[0], bucket[1], now, capacity, rate)
+                self._buckets.move_to_end(key)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def consume_all(self, buckets, now):
+        """Spend one token from every (key, capacity, rate) bucket if each has one, else none; return the wait"""
+        if len(buckets) == 1:
+            return self.consume(*buckets[0], now)
+        with self._lock:
+            levels = []
+            for key, capacity, rate in buckets:
+                bucket = self._buckets.get(key)
+                levels.append(float(capacity) if bucket is None else _refill(bucket[0], bucket[1], now, capacity, rate))
+            wait = _wait(buckets, levels)
+
+            for (key, _, _), tokens in zip(buckets, levels):
+                if key in self._buckets:
+                    self._buckets.move_to_end(key)
+                elif len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+                self._buckets[key] = (tokens if wait else tokens - 1, now)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+class SharedBackend:
+    """Buckets in a memory-mapped slot table shared across worker processes.
+
+    Each slot holds (key hash, tokens, updated_at). A key maps to exactly one
+    slot; if another key owns it the slot is reclaimed, which at worst
+    forgives a request for the evicted key. Size the table well above the
+    number of active keys to keep that rare.
+    """
+    SLOT = struct.Struct('<Qdd')
+    LOCK_STRIPES = 256
+
+    def __init__(self, path, slots=1 << 20):
+        self.path = path
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size != size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def _slot(self, key):
+        """(key hash, slot index) for a key"""
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+        return key_hash, key_hash % self.slots
+
+    def consume(self, key, capacity, rate, now):
+        """Spend one token; return seconds to wait (0.0 when allowed)"""
+        key_hash, slot = self._slot(key)
+        offset = slot * self.SLOT.size
+
+        # Threads share a process's fcntl locks, so also serialise them locally
+        with self._thread_locks[slot % self.LOCK_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.SLOT.size, offset)
+            try:
+                owner, tokens, updated_at = self.SLOT.unpack_from(self._map, offset)
+                if owner != key_hash:
+                    tokens = float(capacity)
+                else:
+                    tokens = _refill(tokens, updated_at, now, capacity, rate)
+
+                if tokens >= 1:
+                    self.SLOT.pack_into(self._map, offset, key_hash, tokens - 1, now)
+                    return 0.0
+                self.SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+                return (1 - tokens) / rate
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.SLOT.size, offset)
+
+    def consume_all(self, buckets, now):
+        """Spend one token from every (key, capacity, rate) bucket if each has one, else none; return the wait"""
+        if len(buckets) == 1:
+            return self.consume(*buckets[0], now)
+        slots = [self._slot(key) for key, _, _ in buckets]
+        # Locks are taken in slot order, so two checks over the same keys cannot deadlock
+        stripes = sorted({slot % self.LOCK_STRIPES for _, slot in slots})
+        thread_locks = [self._thread_locks[stripe] for stripe in stripes]
+        offsets = sorted({slot * self.SLOT.size for _, slot in slots})
+        for lock in thread_locks:
+            lock.acquire()
+        try:
+            for offset in offsets:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, self.SLOT.size, offset)
+            levels = []
+            for (key_hash, slot), (_, capacity, rate) in zip(slots, buckets):
+                owner, tokens, updated_at = self.SLOT.unpack_from(self._map, slot * self.SLOT.size)
+                levels.append(float(capacity) if owner != key_hash
+                              else _refill(tokens, updated_at, now, capacity, rate))
+            wait = _wait(buckets, levels)
+
+            for (key_hash, slot), tokens in zip(slots, levels):
+                self.SLOT.pack_into(self._map, slot * self.SLOT.size, key_hash, tokens if wait else tokens - 1, now)
+            return wait
+        finally:
+            for offset in offsets:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.SLOT.size, offset)
+            for lock in thread_locks:
+                lock.release()
+
+class RateLimiter:
+    """Named token-bucket rules evaluated against a backend"""
+
+    def __init__(self, backend, rules, clock=time.time):
+        self.backend = backend
+        self.clock = clock
+        self.rules = {}
+        for name, rule in rules.items():
+            capacity, period = parse_rule(rule)
+            self.rules[name] = (capacity, capacity / period)
+
+    def hit(self, rule_name, key):
+        """Consume a token for key under a rule; return seconds to wait, 0.0 if allowed"""
+        capacity, rate = self.rules[rule_name]
+        return self.backend.consume(f'{rule_name}:{key}', capacity, rate, self.clock())
+
+    def wait(self, rule_name, key):
+        """Block until a token for key is available (budgets for background jobs)"""
+        while True:
+            delay = self.hit(rule_name, key)
+            if not delay:
+                return
+            time.sleep(delay)
+
+    def check(self, hits):
+        """Consume a token for every (rule, key) pair if all allow, else none; return the longest wait"""
+        buckets = []
+        for rule_name, key in hits:
+            if key:
+                capacity, rate = self.rules[rule_name]
+                buckets.append((f'{rule_name}:{key}', capacity, rate))
+        return self.backend.consume_all(buckets, self.clock()) if buckets else 0.0
+
+_limiter = None
+
+def get_limiter():
+    """Return the process-wide limiter configured from the app config"""
+    global _limiter
+    if _limiter is None:
+        config = current_app.config
+        if config['RATE_LIMIT_BACKEND'] == 'shared':
+            backend = SharedBackend(config['RATE_LIMIT_SHARED_PATH'], config['RATE_LIMIT_SHARED_SLOTS'])
+        else:
+            backend = MemoryBackend(config['RATE_LIMIT_MAX_KEYS'])
+        _limiter = RateLimiter(backend, config['RATE_LIMITS'])
+    return _limiter
+
+def client_ip():
+    """Client IP address (ProxyFix rewrites remote_addr when behind a trusted proxy)"""
+    return request.remote_addr or 'unknown'
+
+def rate_limited(*rules, redirect_to=None):
+    """Decorate a view so that it is denied before any work when a bucket is empty.
+
+    rules are (rule_name, key_function) pairs; key functions read the
+    request and return the key, or None to skip that rule.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_app.config['RATE_LIMIT_ENABLED']:
+                retry_after = get_limiter().check((name, key_func()) for name, key_func in rules)
+                if retry_after:
+                    current_app.logger.warning("Rate limit exceeded on %s from %s", request.endpoint, client_ip())
+                    if request.accept_mimetypes.best == 'application/json':
+                        response = current_app.json.response(success=False, error='Too many requests. Please try again shortly.')
+                        response.status_code = 429
+                    else:
+                        flash('Too many attempts. Please wait a moment and try again.', 'error')
+                        response = redirect(redirect_to() if redirect_to else request.referrer or url_for('index'))
+                    response.headers['Retry-After'] = str(int(retry_after) + 1)
+                    return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+"""
+Background re-verification of pending donations.
+
+A donation stays 'pending' if the donor closes the tab before Paystack
+redirects to /paystack/callback. One elected worker (see leader.py)
+periodically picks pending transactions older than RECONCILE_MIN_AGE in
+batches, verifies them concurrently with Paystack within a shared call
+budget, and applies the outcomes in bulk: successes complete the donation
+and update the campaign aggregates, definitive failures are closed, and
+anything else is retried later with exponential backoff.
+
+Run once by hand with:
+
+    python reconcile.py
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from feed import notify_donation
+from ledger import pending_transactions_query, complete_donations, fail_donations, oldest_pending_created_at
+from logs import log_context
+from tracing import link_reference, trace_span
+from leader import make_holder_id, try_acquire_lease, release_lease
+from mailer import backoff_delay
+from models import db, Transaction
+from payments import verify_paystack_payment
+from recurring import create_pledge
+from ratelimit import MemoryBackend, RateLimiter
+
+LEASE_NAME = 'reconcile-pending'
+
+# Paystack states that will never turn into a successful charge
+FINAL_FAILURE_STATUSES = {'failed', 'reversed'}
+
+_stats = {
+    'runs': 0,
+    'last_run_at': None,
+    'last_run_seconds': 0.0,
+    'checked': 0,
+    'completed': 0,
+    'failed': 0,
+    'retried': 0,
+    'lag_seconds': 0.0
+}
+_stats_lock = threading.Lock()
+
+def reconcile_stats():
+    """Counters for the reconciler; lag_seconds is how far past RECONCILE_MIN_AGE the oldest pending donation is"""
+    with _stats_lock:
+        return dict(_stats)
+
+def make_verify_limiter(config):
+    """Token bucket budgeting Paystack verify calls made by the reconciler"""
+    return RateLimiter(MemoryBackend(max_keys=1), {'paystack_verify': config['RECONCILE_RATE']})
+
+def apply_results(transactions, results, config, now):
+    """Sort verification results into completions, failures and retries and write them in bulk"""
+    completed, failures, retries = [], {}, []
+    give_up_before = now - timedelta(hours=config['RECONCILE_GIVE_UP_AFTER'])
+
+    for transaction, result in zip(transactions, results):
+        status = result.get('status')
+        if result.get('success'):
+            completed.append((transaction, int(result['amount']), result['currency']))
+        elif status in FINAL_FAILURE_STATUSES:
+            failures[transaction.id] = f'Paystack status: {status}'
+        elif status and transaction.created_at < give_up_before:
+            # Abandoned or never started on Paystack's side for too long
+            failures[transaction.id] = f'Gave up after {config["RECONCILE_GIVE_UP_AFTER"]}h, Paystack status: {status}'
+        else:
+            attempts = transaction.verify_attempts + 1
+            delay = backoff_delay(attempts, config['RECONCILE_RETRY_BASE'], config['RECONCILE_RETRY_CAP'])
+            retries.append({
+                'id': transaction.id,
+                'verify_attempts': attempts,
+                'next_verify_at': now + timedelta(seconds=delay),
+                'last_verify_error': (result.get('error') or status or 'unknown')[:200]
+            })
+
+    completed_count = complete_donations(completed)
+    for result in results:
+        if result.get('success') and result.get('recurring'):
+            # The donor never came back to the callback, where the pledge would have started
+            create_pledge(result)
+    failed_count = fail_donations(failures)
+    if retries:
+        db.session.execute(update(Transaction), retries)
+        db.session.commit()
+    return completed_count, failed_count, len(retries)
+
+def update_lag(config):
+    """Recompute the reconciliation lag metric"""
+    oldest = oldest_pending_created_at()
+    lag = 0.0
+    if oldest is not None:
+        age = (datetime.utcnow() - oldest).total_seconds()
+        lag = max(0.0, age - config['RECONCILE_MIN_AGE'] * 60)
+    with _stats_lock:
+        _stats['lag_seconds'] = lag
+    return lag
+
+def reconcile_pending(app, verify=verify_paystack_payment, limiter=None, holder=None):
+    """Run one reconciliation pass; return counts. With a holder, stop if the lease is lost."""
+    config = app.config
+    limiter = limiter or make_verify_limiter(config)
+    totals = {'checked': 0, 'completed': 0, 'failed': 0, 'retried': 0}
+    started = time.monotonic()
+
+    def verify_one(reference):
+        limiter.wait('paystack_verify', 'reconciler')
+        with app.app_context(), log_context(reference=reference), trace_span('reconcile verify'):
+            link_reference(reference)
+            return verify(reference)
+
+    with app.app_context(), ThreadPoolExecutor(config['RECONCILE_CONCURRENCY'], thread_name_prefix='reconcile') as pool:
+        for _ in range(config['RECONCILE_MAX_BATCHES']):
+            if holder and not try_acquire_lease(LEASE_NAME, holder, config['RECONCILE_LEASE_TTL']):
+                break
+            now = datetime.utcnow()
+            batch = db.session.execute(pending_transactions_query(
+                now - timedelta(minutes=config['RECONCILE_MIN_AGE']), config['RECONCILE_BATCH_SIZE'], due_at=now
+            )).scalars().all()
+            if not batch:
+                break
+
+            results = list(pool.map(verify_one, [transaction.transaction_id for transaction in batch]))
+            completed, failed, retried = apply_results(batch, results, config, now)
+            totals['checked'] += len(batch)
+            totals['completed'] += completed
+            totals['failed'] += failed
+            totals['retried'] += retried
+
+        lag = update_lag(config)
+        if totals['checked']:
+            app.logger.info("Reconciled pending donations: %s, lag %.0fs", totals, lag)
+        if totals['completed']:
+            notify_donation(app)
+        db.session.remove()
+
+    with _stats_lock:
+        _stats['runs'] += 1
+        _stats['last_run_at'] = datetime.utcnow().isoformat()
+        _stats['last_run_seconds'] = round(time.monotonic() - started, 3)
+        for key, value in totals.items():
+            _stats[key] += value
+    return totals
+
+class Reconciler:
+    """Background thread that runs reconciliation passes while this worker holds the lease"""
+
+    def __init__(self, app):
+        self.app = app
+        self.holder = make_holder_id()
+        self.limiter = make_verify_limiter(app.config)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='reconciler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._thread.join(timeout)
+        with self.app.app_context():
+            release_lease(LEASE_NAME, self.holder)
+
+    def _run(self):
+        interval = self.app.config['RECONCILE_INTERVAL']
+        while not self._stop.wait(interval):
+            try:
+                with self.app.app_context():
+                    is_leader = try_acquire_lease(LEASE_NAME, self.holder, self.app.config['RECONCILE_LEASE_TTL'])
+                if is_leader:
+                    reconcile_pending(self.app, limiter=self.limiter, holder=self.holder)
+            except Exception as e:
+                self.app.logger.error("Reconciler error: %s", e)
+
+_reconciler = None
+_reconciler_lock = threading.Lock()
+
+def start_reconciler(app):
+    """Start this process's reconciler thread once (after fork); only the lease holder does work"""
+    global _reconciler
+    if _reconciler is not None or not app.config['RECONCILE_ENABLED'] or not app.config['PAYSTACK_SECRET_KEY']:
+        return _reconciler
+    with _reconciler_lock:
+        if _reconciler is None:
+            reconciler = Reconciler(app)
+            reconciler.start()
+            _reconciler = reconciler
+    return _reconciler
+
+if __name__ == '__main__':
+    from app import app
+
+    print("🔄 Re-verifying pending donations...")
+    with app.app_context():
+        holder = make_holder_id()
+        if not try_acquire_lease(LEASE_NAME, holder, app.config['RECONCILE_LEASE_TTL']):
+            print("⏳ Another worker is reconciling right now")
+            raise SystemExit(0)
+    try:
+        totals = reconcile_pending(app, holder=holder)
+    finally:
+        with app.app_context():
+            release_lease(LEASE_NAME, holder)
+
+    stats = reconcile_stats()
+    print(f"✅ Checked {totals['checked']}: {totals['completed']} completed, "
+          f"{totals['failed']} failed, {totals['retried']} retry later")
+    print(f"⏱️  Reconciliation lag: {stats['lag_seconds']:.0f}s")
@@ -0,0 +1,311 @@
+"""
+Recurring pledges.
+
+A donor who ticks "give monthly" gets a Pledge once their first donation
+verifies: Paystack's verification returns a reusable card authorization,
+which is charged again every interval_months without the donor present.
+
+One elected worker (see leader.py) runs the scheduler. Each pass picks due
+pledges in batches, charges them concurrently within a shared call budget
+and writes every batch in bulk: a Transaction per charge attempt, the
+campaign aggregates once, and the pledges' new schedule.
+
+Charge references are derived from the pledge, its cycle and the attempt,
+so a charge whose outcome was lost (a timeout, or a crash before the batch
+was written) is retried with the same reference. Paystack then rejects it
+as a duplicate and the scheduler verifies it instead of charging twice.
+
+Declines move a pledge to past_due and retry after each of PLEDGE_RETRY_DAYS
+(dunning), emailing the donor on the first decline; once the retries run out
+the pledge lapses and the donor is told so.
+
+Run one pass by hand with:
+
+    python recurring.py
+"""
+
+import calendar
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app, render_template
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from feed import notify_donation
+from ledger import due_pledges_query, record_pledge_charges
+from leader import make_holder_id, try_acquire_lease, release_lease
+from logs import log_context
+from mailer import enqueue_mail
+from models import db, Pledge, Transaction
+from payments import charge_authorization, verify_paystack_payment
+from ratelimit import MemoryBackend, RateLimiter
+from tracing import link_reference, trace_span
+
+LEASE_NAME = 'charge-pledges'
+
+_stats = {
+    'runs': 0,
+    'last_run_at': None,
+    'last_run_seconds': 0.0,
+    'charged': 0,
+    'declined': 0,
+    'lapsed': 0,
+    'deferred': 0
+}
+_stats_lock = threading.Lock()
+
+def pledge_stats():
+    """Counters for the scheduler; deferred counts charges whose outcome was unknown and will be retried"""
+    with _stats_lock:
+        return dict(_stats)
+
+def add_months(moment, months):
+    """Same day and time months later, clamped to the end of shorter months"""
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+def next_charge_after(pledge, moment):
+    """First scheduled charge date after moment, anchored on the pledge's start (missed cycles are skipped)"""
+    months = (moment.year - pledge.created_at.year) * 12 + moment.month - pledge.created_at.month
+    months = max(pledge.interval_months, months - months % pledge.interval_months)
+    while add_months(pledge.created_at, months) <= moment:
+        months += pledge.interval_months
+    return add_months(pledge.created_at, months)
+
+def charge_reference(pledge):
+    """Reference for the pledge's next charge attempt, the same until its outcome is recorded"""
+    return f'BSF_{pledge.campaign_id}_P{pledge.id}_{pledge.cycles + 1}_{pledge.failed_attempts}'
+
+def create_pledge(verification, interval_months=1):
+    """Start a pledge from a verified first donation with a reusable authorization; None if not possible.
+
+    Keyed on the donation's reference, so repeated verifications (callback,
+    inline verify, reconciler) create it once.
+    """
+    authorization = verification.get('authorization') or {}
+    if not authorization.get('reusable') or not authorization.get('authorization_code'):
+        return None
+    reference = verification['reference']
+    campaign_id = verification.get('campaign_id') or db.session.scalar(
+        db.select(Transaction.campaign_id).where(Transaction.transaction_id == reference))
+    if not campaign_id or not verification.get('customer_email'):
+        return None
+
+    now = datetime.utcnow()
+    expires = (f"{authorization['exp_month']}/{authorization['exp_year']}"
+               if authorization.get('exp_month') and authorization.get('exp_year') else None)
+    pledge = Pledge(
+        campaign_id=int(campaign_id), email=verification['customer_email'],
+        amount=int(verification['amount']), currency=verification['currency'],
+        interval_months=interval_months, source_reference=reference,
+        authorization_code=authorization['authorization_code'],
+        card_last4=authorization.get('last4'), card_expires=expires,
+        next_charge_at=add_months(now, interval_months), created_at=now
+    )
+    db.session.add(pledge)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    db.session.execute(update(Transaction).where(Transaction.transaction_id == reference).values(pledge_id=pledge.id))
+    db.session.commit()
+    return pledge
+
+def make_charge_limiter(config):
+    """Token bucket budgeting Paystack charge calls made by the scheduler"""
+    return RateLimiter(MemoryBackend(max_keys=1), {'paystack_charge': config['PLEDGE_CHARGE_RATE']})
+
+def resolve_duplicate(result, verify):
+    """A duplicate reference was charged before but never recorded: ask Paystack how it went"""
+    verification = verify(result['reference'])
+    if verification.get('success'):
+        return {**verification, 'success': True, 'status': 'success'}
+    if verification.get('status') in ('failed', 'reversed', 'abandoned'):
+        return {'success': False, 'reference': result['reference'], 'status': 'failed',
+                'error': f"Paystack status: {verification['status']}"}
+    # Still unknown: retry the same reference later
+    return {'success': False, 'reference': result['reference'], 'error': verification.get('error', 'unverified')}
+
+DUNNING_SUBJECTS = {
+    'pledge_declined': 'Your monthly donation to the Blak Shepard Foundation could not be charged',
+    'pledge_lapsed': 'Your monthly donation to the Blak Shepard Foundation has stopped',
+}
+
+def notify_donor(kind, pledge, reference, error=None):
+    """Queue a dunning email (once per charge attempt)"""
+    enqueue_mail(
+        'dunning',
+        pledge.email,
+        DUNNING_SUBJECTS[kind],
+        render_template(f'email/{kind}.txt', pledge=pledge, error=error),
+        dedupe_key=f'{kind}:{reference}'
+    )
+
+def apply_charge_results(pledges, references, results, config, now):
+    """Record a batch of charge outcomes: transactions and aggregates, pledge schedules, dunning"""
+    charges, updates, notices = [], [], []
+    counts = {'charged': 0, 'declined': 0, 'lapsed': 0, 'deferred': 0}
+    retry_days = config['PLEDGE_RETRY_DAYS']
+
+    for pledge, reference, result in zip(pledges, references, results):
+        status = result.get('status')
+        if result.get('success'):
+            charges.append({'pledge': pledge, 'reference': reference, 'amount': int(result['amount']),
+                            'currency': result['currency'], 'status': 'success'})
+            updates.append({'id': pledge.id, 'status': 'active', 'cycles': pledge.cycles + 1,
+                            'failed_attempts': 0, 'last_charged_at': now, 'last_charge_error': None,
+                            'next_charge_at': next_charge_after(pledge, now)})
+            counts['charged'] += 1
+        elif status and status != 'duplicate':
+            error = (result.get('error') or status)[:200]
+            charges.append({'pledge': pledge, 'reference': reference, 'amount': pledge.amount,
+                            'currency': pledge.currency, 'status': 'failed', 'error': error})
+            attempts = pledge.failed_attempts + 1
+            if attempts > len(retry_days):
+                updates.append({'id': pledge.id, 'status': 'lapsed', 'failed_attempts': attempts,
+                                'last_charge_error': error})
+                notices.append(('pledge_lapsed', pledge, reference, error))
+                counts['lapsed'] += 1
+            else:
+                updates.append({'id': pledge.id, 'status': 'past_due', 'failed_attempts': attempts,
+                                'last_charge_error': error,
+                                'next_charge_at': now + timedelta(days=retry_days[attempts - 1])})
+                if attempts == 1:
+                    notices.append(('pledge_declined', pledge, reference, error))
+            counts['declined'] += 1
+        else:
+            # Outcome unknown: same reference again soon, without counting it as a decline
+            updates.append({'id': pledge.id, 'last_charge_error': (result.get('error') or 'unknown')[:200],
+                            'next_charge_at': now + timedelta(seconds=config['PLEDGE_ERROR_RETRY'])})
+            counts['deferred'] += 1
+
+    record_pledge_charges(charges)
+    if updates:
+        db.session.execute(update(Pledge), updates)
+    db.session.commit()
+
+    for kind, pledge, reference, error in notices:
+        try:
+            notify_donor(kind, pledge, reference, error)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error("Failed to queue %s email for pledge %s: %s", kind, pledge.id, e)
+    return counts
+
+def charge_due_pledges(app, charge=charge_authorization, verify=verify_paystack_payment, limiter=None, holder=None):
+    """Run one scheduler pass; return counts. With a holder, stop if the lease is lost."""
+    config = app.config
+    limiter = limiter or make_charge_limiter(config)
+    totals = {'charged': 0, 'declined': 0, 'lapsed': 0, 'deferred': 0}
+    started = time.monotonic()
+
+    def charge_one(request):
+        limiter.wait('paystack_charge', 'scheduler')
+        with app.app_context(), log_context(reference=request['reference']), trace_span('pledge charge'):
+            link_reference(request['reference'])
+            result = charge(request)
+            if result.get('status') == 'duplicate':
+                result = resolve_duplicate(result, verify)
+            return result
+
+    with app.app_context(), ThreadPoolExecutor(config['PLEDGE_CONCURRENCY'], thread_name_prefix='pledges') as pool:
+        for _ in range(config['PLEDGE_MAX_BATCHES']):
+            if holder and not try_acquire_lease(LEASE_NAME, holder, config['PLEDGE_LEASE_TTL']):
+                break
+            now = datetime.utcnow()
+            batch = db.session.execute(due_pledges_query(now, config['PLEDGE_BATCH_SIZE'])).scalars().all()
+            if not batch:
+                break
+
+            references = [charge_reference(pledge) for pledge in batch]
+            requests = [{
+                'authorization_code': pledge.authorization_code,
+                'email': pledge.email,
+                'amount': pledge.money,
+                'reference': reference,
+                'metadata': {'campaign_id': pledge.campaign_id, 'pledge_id': pledge.id, 'cycle': pledge.cycles + 1}
+            } for pledge, reference in zip(batch, references)]
+            results = list(pool.map(charge_one, requests))
+            for key, value in apply_charge_results(batch, references, results, config, now).items():
+                totals[key] += value
+
+        if totals['charged'] or totals['declined'] or totals['deferred']:
+            app.logger.info("Charged recurring pledges: %s", totals)
+        if totals['charged']:
+            notify_donation(app)
+        db.session.remove()
+
+    with _stats_lock:
+        _stats['runs'] += 1
+        _stats['last_run_at'] = datetime.utcnow().isoformat()
+        _stats['last_run_seconds'] = round(time.monotonic() - started, 3)
+        for key, value in totals.items():
+            _stats[key] += value
+    return totals
+
+class PledgeScheduler:
+    """Background thread that charges due pledges while this worker holds the lease"""
+
+    def __init__(self, app):
+        self.app = app
+        self.holder = make_holder_id()
+        self.limiter = make_charge_limiter(app.config)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='pledge-scheduler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._thread.join(timeout)
+        with self.app.app_context():
+            release_lease(LEASE_NAME, self.holder)
+
+    def _run(self):
+        interval = self.app.config['PLEDGE_INTERVAL']
+        while not self._stop.wait(interval):
+            try:
+                with self.app.app_context():
+                    is_leader = try_acquire_lease(LEASE_NAME, self.holder, self.app.config['PLEDGE_LEASE_TTL'])
+                if is_leader:
+                    charge_due_pledges(self.app, limiter=self.limiter, holder=self.holder)
+            except Exception as e:
+                self.app.logger.error("Pledge scheduler error: %s", e)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def start_pledge_scheduler(app):
+    """Start this process's scheduler thread once (after fork); only the lease holder charges"""
+    global _scheduler
+    if _scheduler is not None or not app.config['PLEDGES_ENABLED'] or not app.config['PAYSTACK_SECRET_KEY']:
+        return _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            scheduler = PledgeScheduler(app)
+            scheduler.start()
+            _scheduler = scheduler
+    return _scheduler
+
+if __name__ == '__main__':
+    from app import app
+
+    print("🔁 Charging due recurring pledges...")
+    with app.app_context():
+        holder = make_holder_id()
+        if not try_acquire_lease(LEASE_NAME, holder, app.config['PLEDGE_LEASE_TTL']):
+            print("⏳ Another worker is charging pledges right now")
+            raise SystemExit(0)
+    try:
+        totals = charge_due_pledges(app, holder=holder)
+    finally:
+        with app.app_context():
+            release_lease(LEASE_NAME, holder)
+
+    stats = pledge_stats()
+    print(f"✅ {totals['charged']} charged, {totals['declined']} declined ({totals['lapsed']} lapsed), "
+          f"{totals['deferred']} to retry, in {stats['last_run_seconds']:.1f}s")
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Black Shepherd Foundation - Donation Reporting
+Charts and exports for admins, served from the ledger without scanning it.
+
+- Rollups: successful donations are summed per campaign and currency at
+  hourly, daily and monthly grain in the donation_rollup table. Every write
+  path that completes a donation (callback/webhook, reconciler, recurring
+  charges, importer) adds to them through apply_campaign_deltas, in the same
+  transaction as the campaign aggregates, so they are never double counted
+  and never behind. Charts read a handful of rollup rows per period.
+- Exports: /admin/reports/export.csv and .jsonl stream transactions through
+  a server-side cursor (yield_per), one batch of rows at a time, so exporting
+  millions of rows runs in constant memory (see benchmark_export.py).
+  Archived months are read from their files first (see archive.py).
+
+The admin pages need ADMIN_TOKEN, sent as the password of HTTP basic auth or
+as a bearer token; without it they do not exist.
+
+Usage:
+    python reporting.py rebuild                  # recompute every rollup from the ledger
+    python reporting.py series day 2025-01-01 2025-02-01 [campaign_id]
+    python reporting.py export donations.csv [--format jsonl] [--status all]
+"""
+
+import argparse
+import csv
+import hmac
+import io
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, abort, current_app, render_template, request, stream_with_context
+from sqlalchemy import func, select
+from archive import archived_rows, ledger_partitions
+from fx import get_rate_table
+from ledger import (
+    EXPORT_STATUSES, ROLLUP_GRAINS, add_rollup, period_start, rollup_buckets
+)
+from models import db, Campaign, DonationRollup, Transaction
+from money import Money, get_exponent
+
+EXPORT_COLUMNS = (
+    'reference', 'campaign_id', 'status', 'amount', 'currency', 'campaign_amount', 'campaign_currency',
+    'fx_rate', 'payment_method', 'pledge_id', 'created_at', 'completed_at'
+)
+DEFAULT_SPANS = {'hour': timedelta(hours=48), 'day': timedelta(days=30), 'month': timedelta(days=365)}
+
+def next_period(start, grain):
+    """Start of the period after the one starting at start"""
+    if grain == 'hour':
+        return start + timedelta(hours=1)
+    if grain == 'day':
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def rebuild_rollups(conn, batch_size=5000):
+    """Recompute every rollup from the Transaction ledger and its archive; return the number of rollup rows"""
+    table = DonationRollup.__table__
+    conn.execute(table.delete())
+    rollups = {}
+    result = conn.execution_options(yield_per=batch_size).execute(
+        select(Transaction.campaign_id, Transaction.currency, Transaction.amount, Transaction.campaign_amount,
+               func.coalesce(Transaction.completed_at, Transaction.created_at))
+        .where(Transaction.status == 'success')
+    )
+    for campaign_id, currency, amount, campaign_amount, completed_at in result:
+        add_rollup(rollups, campaign_id, currency, completed_at, int(amount),
+                   int(amount if campaign_amount is None else campaign_amount))
+    for record in archived_rows(status='success', conn=conn):
+        amount, campaign_amount = record['amount'], record['campaign_amount']
+        add_rollup(rollups, record['campaign_id'], record['currency'],
+                   record['completed_at'] or record['created_at'], int(amount),
+                   int(amount if campaign_amount is None else campaign_amount))
+
+    buckets = rollup_buckets(rollups)
+    if buckets:
+        conn.execute(table.insert(), [
+            {'grain': grain, 'period_start': start, 'campaign_id': campaign_id, 'currency': currency,
+             'amount': amount, 'campaign_amount': campaign_amount, 'donation_count': count}
+            for (grain, start, campaign_id, currency), (amount, campaign_amount, count) in buckets.items()
+        ])
+    return len(buckets)
+
+def series(grain, start, end, campaign_id=None, display_currency='NGN', max_points=1000):
+    """Donations per period from the rollups: per currency, plus a total in the display currency"""
+    if grain not in ROLLUP_GRAINS:
+        raise ValueError(f'Unknown grain: {grain!r}')
+    periods = []
+    period = period_start(start, grain)
+    while period < end:
+        periods.append(period)
+        if len(periods) > max_points:
+            raise ValueError(f'More than {max_points} {grain}s; pick a coarser grain or a shorter range')
+        period = next_period(period, grain)
+
+    query = (
+        select(DonationRollup.period_start, DonationRollup.currency,
+               func.sum(DonationRollup.amount), func.sum(DonationRollup.donation_count))
+        .where(DonationRollup.grain == grain, DonationRollup.period_start >= period_start(start, grain),
+               DonationRollup.period_start < end)
+        .group_by(DonationRollup.period_start, DonationRollup.currency)
+    )
+    if campaign_id is not None:
+        query = query.where(DonationRollup.campaign_id == campaign_id)
+
+    index = {period: position for position, period in enumerate(periods)}
+    by_currency = {}
+    total = [0] * len(periods)
+    donations = [0] * len(periods)
+    rates = get_rate_table()
+    for period, currency, amount, count in db.session.execute(query):
+        position = index[period]
+        currency_series = by_currency.setdefault(currency, {'amount': [0] * len(periods),
+                                                            'donations': [0] * len(periods)})
+        currency_series['amount'][position] = int(amount)
+        currency_series['donations'][position] = int(count)
+        total[position] += rates.convert(Money(int(amount), currency), display_currency).amount
+        donations[position] += int(count)
+
+    return {
+        'grain': grain, 'campaign_id': campaign_id, 'display_currency': display_currency,
+        'periods': [period.isoformat() for period in periods],
+        'total': total, 'donations': donations, 'currencies': by_currency
+    }
+
+def _major(amount, exponent):
+    """Minor units as a decimal string in major units ('12345', 2 -> '123.45')"""
+    if amount is None:
+        return ''
+    if not exponent:
+        return str(amount)
+    units, fraction = divmod(abs(int(amount)), 10 ** exponent)
+    return f"{'-' if amount < 0 else ''}{units}.{fraction:0{exponent}d}"
+
+def export_batches(query, batch_size):
+    """Export records in batches of batch_size, read through a server-side cursor"""
+    return format_batches(db.session.execute(query.execution_options(yield_per=batch_size)).partitions())
+
+def format_batches(partitions):
+    """Export records from batches of export_transactions_query rows"""
+    exponents = {}
+    for partition in partitions:
+        batch = []
+        for (reference, campaign_id, status, amount, currency, campaign_amount, campaign_currency, fx_rate,
+             payment_method, pledge_id, created_at, completed_at) in partition:
+            if currency not in exponents:
+                exponents[currency] = get_exponent(currency)
+            if campaign_currency not in exponents:
+                exponents[campaign_currency] = get_exponent(campaign_currency)
+            batch.append((
+                reference, campaign_id, status, _major(amount, exponents[currency]), currency,
+                _major(campaign_amount, exponents[campaign_currency]), campaign_currency,
+                '' if fx_rate is None else str(fx_rate), payment_method or '', pledge_id or '',
+                created_at.isoformat() if created_at else '', completed_at.isoformat() if completed_at else ''
+            ))
+        yield batch
+
+def stream_csv(batches):
+    """CSV text, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_jsonl(batches):
+    """JSON lines, one chunk per batch"""
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, record)), separators=(',', ':')) + '\n'
+                      for record in batch)
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson')
+}
+
+def parse_date(value):
+    """YYYY-MM-DD or an ISO timestamp from a query string; None if empty"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f'Invalid date: {value!r}')
+
+def admin_required(view):
+    """Require ADMIN_TOKEN (basic auth password or bearer token); 404 when none is configured"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config['ADMIN_TOKEN']
+        if not token:
+            abort(404)
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            offered = header[len('Bearer '):].strip()
+        else:
+            offered = request.authorization.password if request.authorization else None
+        if not offered or not hmac.compare_digest(offered.encode(), token.encode()):
+            return Response('Authentication required', 401,
+                            {'WWW-Authenticate': 'Basic realm="Black Shepherd admin"'})
+        if request.method == 'POST' and request.origin and request.origin != request.host_url.rstrip('/'):
+            abort(403)  # Browsers resend basic auth on cross-site form posts
+        response = current_app.make_response(view(*args, **kwargs))
+        response.headers['Cache-Control'] = 'private, no-store'
+        response.headers['X-Robots-Tag'] = 'noindex'
+        return response
+    return wrapper
+
+class ReportingAdmin:
+    """Admin report pages, chart data and exports, bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['reporting'] = self
+        app.add_url_rule('/admin/reports', 'admin_reports', admin_required(self.reports))
+        app.add_url_rule('/admin/reports/series.json', 'admin_report_series', admin_required(self.series_json))
+        app.add_url_rule('/admin/reports/export.<fmt>', 'admin_report_export', admin_required(self.export))
+
+    def filters(self):
+        """grain, start, end and campaign_id from the query string, with defaults"""
+        grain = request.args.get('grain', 'day')
+        if grain not in ROLLUP_GRAINS:
+            abort(400, f'Unknown grain: {grain!r}')
+        end = parse_date(request.args.get('end')) or next_period(period_start(datetime.utcnow(), grain), grain)
+        start = parse_date(request.args.get('start')) or period_start(end - DEFAULT_SPANS[grain], grain)
+        campaign_id = request.args.get('campaign_id', type=int)
+        return grain, start, end, campaign_id
+
+    def series(self):
+        grain, start, end, campaign_id = self.filters()
+        try:
+            return series(grain, start, end, campaign_id, self.app.config['DISPLAY_CURRENCY'],
+                          self.app.config['REPORT_MAX_POINTS'])
+        except ValueError as e:
+            abort(400, str(e))
+
+    def reports(self):
+        data = self.series()
+        campaigns = db.session.execute(select(Campaign.id, Campaign.title).order_by(Campaign.id)).all()
+        return render_template('admin_reports.html', data=data, campaigns=campaigns, grains=ROLLUP_GRAINS,
+                               formats=EXPORT_FORMATS, statuses=EXPORT_STATUSES, args=request.args)
+
+    def series_json(self):
+        return self.series()
+
+    def export(self, fmt):
+        """Stream transactions as CSV or JSON lines"""
+        if fmt not in EXPORT_FORMATS:
+            abort(404)
+        stream, mimetype = EXPORT_FORMATS[fmt]
+        status = request.args.get('status', 'success')
+        if status not in EXPORT_STATUSES:
+            abort(400, f'Unknown status: {status!r}')
+        batches = format_batches(ledger_partitions(
+            parse_date(request.args.get('start')), parse_date(request.args.get('end')),
+            request.args.get('campaign_id', type=int), status, self.app.config['REPORT_EXPORT_BATCH_SIZE']
+        ))
+        filename = f"donations-{status}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+        self.app.logger.info("Exporting %s donations as %s", status, fmt)
+        return Response(stream_with_context(stream(batches)), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+def main():
+    from app import app
+
+    parser = argparse.ArgumentParser(description='Donation rollups and exports')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('rebuild', help='recompute every rollup from the ledger')
+    series_parser = commands.add_parser('series', help='print donations per period')
+    series_parser.add_argument('grain', choices=ROLLUP_GRAINS)
+    series_parser.add_argument('start', type=datetime.fromisoformat)
+    series_parser.add_argument('end', type=datetime.fromisoformat)
+    series_parser.add_argument('campaign_id', type=int, nargs='?')
+    export_parser = commands.add_parser('export', help='write transactions to a file')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    export_parser.add_argument('--status', choices=EXPORT_STATUSES, default='success')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.command == 'rebuild':
+            with db.engine.begin() as conn:
+                count = rebuild_rollups(conn)
+            print(f"✅ Rebuilt {count:,} rollup rows from the ledger")
+        elif args.command == 'series':
+            data = series(args.grain, args.start, args.end, args.campaign_id, app.config['DISPLAY_CURRENCY'],
+                          app.config['REPORT_MAX_POINTS'])
+            print(f"📊 Donations per {args.grain} ({data['display_currency']})")
+            for period, total, count in zip(data['periods'], data['total'], data['donations']):
+                print(f"   {period}  {total / 10 ** get_exponent(data['display_currency']):>16,.2f}  {count:>7,}")
+        else:
+            stream, _ = EXPORT_FORMATS[args.format]
+            rows = 0
+
+            def counted(batches):
+                nonlocal rows
+                for batch in batches:
+                    rows += len(batch)
+                    yield batch
+
+            batches = format_batches(ledger_partitions(status=args.status,
+                                                       batch_size=app.config['REPORT_EXPORT_BATCH_SIZE']))
+            with open(args.path, 'w', newline='') as f:
+                f.writelines(stream(counted(batches)))
+            print(f"✅ Exported {rows:,} donations to {args.path}")
+
+if __name__ == '__main__':
+    main()
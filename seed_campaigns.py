@@ -8,6 +8,7 @@ This script will:
 
 from app import app, db
 from models import Campaign
+from payments import format_amount
 from datetime import datetime
 
 def update_campaigns():
@@ -32,8 +33,8 @@ def update_campaigns():
                 over 10,000 families have access to clean water. Each well costs approximately ₦200,000 
                 and can serve up to 500 people for over 20 years. Your support brings life-saving water 
                 to communities that need it most.''',
-                'goal_amount': 5000000.0,  # ₦5 million goal
-                'raised_amount': 1500000.0,  # ₦1.5 million raised
+                'goal_amount': 5000000 * 100,  # ₦5 million goal (kobo)
+                'raised_amount': 1500000 * 100,  # ₦1.5 million raised (kobo)
                 'currency': 'NGN',
                 'image_filename': 'water.jpg',
                 'is_active': True
@@ -46,8 +47,8 @@ def update_campaigns():
                 Your donation covers tuition fees, textbooks, uniforms, and transportation for girls 
                 who would otherwise be unable to attend school. Just ₦50,000 sponsors one girl for 
                 a full academic year, giving her the chance to build a brighter future.''',
-                'goal_amount': 3000000.0,  # ₦3 million goal
-                'raised_amount': 1000000.0,  # ₦1 million raised (as you specified)
+                'goal_amount': 3000000 * 100,  # ₦3 million goal (kobo)
+                'raised_amount': 1000000 * 100,  # ₦1 million raised (kobo)
                 'currency': 'NGN',
                 'image_filename': 'education.jpg',
                 'is_active': True
@@ -60,8 +61,8 @@ def update_campaigns():
                 medications, and health education. Each outreach costs ₦500,000 and reaches approximately 
                 1,000 people. Help us expand healthcare access to the most vulnerable communities 
                 across Nigeria.''',
-                'goal_amount': 4000000.0,  # ₦4 million goal
-                'raised_amount': 1500000.0,  # ₦1.5 million raised
+                'goal_amount': 4000000 * 100,  # ₦4 million goal (kobo)
+                'raised_amount': 1500000 * 100,  # ₦1.5 million raised (kobo)
                 'currency': 'NGN',
                 'image_filename': 'healthcare.jpg',
                 'is_active': True
@@ -85,8 +86,8 @@ def update_campaigns():
             # Calculate and display progress
             progress = (campaign_data['raised_amount'] / campaign_data['goal_amount']) * 100
             print(f"✅ Added: {campaign_data['title']}")
-            print(f"   Goal: ₦{campaign_data['goal_amount']:,.0f}")
-            print(f"   Raised: ₦{campaign_data['raised_amount']:,.0f}")
+            print(f"   Goal: {format_amount(campaign_data['goal_amount'], 'NGN')}")
+            print(f"   Raised: {format_amount(campaign_data['raised_amount'], 'NGN')}")
             print(f"   Progress: {progress:.1f}%")
             print()
         
@@ -106,14 +107,14 @@ def update_campaigns():
         
         print(f"\n📊 Final Database Summary:")
         print(f"   Total Campaigns: {total_campaigns}")
-        print(f"   Total Goal Amount: ₦{total_goal:,.0f}")
-        print(f"   Total Raised: ₦{total_raised:,.0f}")
+        print(f"   Total Goal Amount: {format_amount(total_goal, 'NGN')}")
+        print(f"   Total Raised: {format_amount(total_raised, 'NGN')}")
         print(f"   Overall Progress: {(total_raised/total_goal*100):.1f}%")
         
         print("\n💰 Breakdown of ₦4,000,000 raised:")
         for campaign in all_campaigns:
             percentage_of_total = (campaign.raised_amount / total_raised) * 100
-            print(f"   • {campaign.title}: ₦{campaign.raised_amount:,.0f} ({percentage_of_total:.0f}%)")
+            print(f"   • {campaign.title}: {format_amount(campaign.raised_amount, 'NGN')} ({percentage_of_total:.0f}%)")
         
         print("\n✨ Your website now shows:")
         print("   - 3 Active Campaigns")
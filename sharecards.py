@@ -0,0 +1,278 @@
+"""
+Social share cards for campaign links.
+
+Each campaign gets a 1200x630 card composed from its main image, its title
+and its progress, referenced by the og:image/twitter:image tags on its page.
+Cards are rendered in a process pool only when a campaign's progress moves
+into a new bucket (SHARE_CARD_BUCKET percent), never in a request: pages
+read the current card's URL from memory and keep pointing at the previous
+card (or the plain main image) until the new one has been written.
+
+Files are content-addressed: the name is a hash of everything drawn (source
+image hash, title, bucket, goal, RENDER_VERSION), so a card never changes
+once written, can be cached forever, and workers that reach the same state
+find the file instead of rendering it again. Only a handful of cards exist
+per campaign (one per bucket reached), so the directory is not evicted.
+
+Nothing is rendered until start() has run in the process (the first request
+of each worker): importing the app in the gunicorn master only picks up
+cards already on disk, so the master never owns a pool or its threads when
+it forks.
+
+    python sharecards.py        # render the cards for the current totals
+"""
+
+import fcntl
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin
+from flask import abort, request, send_from_directory, url_for
+from money import format_minor
+
+CARD_SIZE = (1200, 630)
+MARGIN = 60
+BRAND_COLOR = (255, 107, 53)  # --primary-color in main.css
+TITLE_FONT = 'fonts/inter-latin.woff2'
+LOGO = 'images/logo.png'
+DEFAULT_IMAGE = 'images/hero-main.jpg'  # og:image for pages without a campaign
+# Bump when the drawing below changes, so old cards are not reused
+RENDER_VERSION = 1
+_KEY = re.compile(r'^[0-9a-f]{32}$')
+
+def progress_bucket(raised, goal, step):
+    """Percent funded rounded down to a multiple of step, capped at 100"""
+    if goal <= 0:
+        return 0
+    percent = min(100, raised * 100 // goal)
+    return percent - percent % step
+
+def card_key(source_hash, title, bucket, goal_text):
+    """Content address of a card: changes whenever anything drawn on it does"""
+    return hashlib.sha256(f'{source_hash}:{title}:{bucket}:{goal_text}:{RENDER_VERSION}'.encode()).hexdigest()[:32]
+
+def _font(path, size, weight):
+    from PIL import ImageFont
+    try:
+        font = ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default(size)
+    try:
+        font.set_variation_by_axes([weight])
+    except OSError:
+        pass  # Not a variable font: draw at its own weight
+    return font
+
+def _wrap(draw, text, font, width, max_lines):
+    """Greedy word wrap to max_lines, ending in an ellipsis if the text does not fit"""
+    lines = []
+    words = text.split()
+    while words and len(lines) < max_lines:
+        line = words.pop(0)
+        while words and draw.textlength(f'{line} {words[0]}', font=font) <= width:
+            line = f'{line} {words.pop(0)}'
+        lines.append(line)
+    if words:
+        while lines[-1] and draw.textlength(f'{lines[-1]}…', font=font) > width:
+            lines[-1] = lines[-1][:-1]
+        lines[-1] = f'{lines[-1].rstrip()}…'
+    return lines
+
+def render_card(source_path, dest_path, title, bucket, goal_text, font_path, logo_path):
+    """Compose and write one card (runs in a pool process); return its size, or None if another worker has it"""
+    from PIL import Image, ImageDraw, ImageOps
+
+    with open(f'{dest_path}.lock', 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        if os.path.exists(dest_path):
+            return os.path.getsize(dest_path)
+
+        width, height = CARD_SIZE
+        with Image.open(source_path) as image:
+            image.draft('RGB', (width * 2, height * 2))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            card = ImageOps.fit(image, CARD_SIZE, Image.LANCZOS, centering=(0.5, 0.4))
+
+        # Darken the lower two thirds so white text reads over any photo
+        shade = Image.linear_gradient('L').resize(CARD_SIZE).point(lambda v: min(220, max(0, (v - 70) * 3 // 2)))
+        card.paste((0, 0, 0), (0, 0, width, height), shade)
+
+        with Image.open(logo_path) as logo:
+            logo = logo.convert('RGB')
+            logo.thumbnail((88, 88))
+        mask = Image.new('L', logo.size, 0)
+        ImageDraw.Draw(mask).ellipse((0, 0, logo.width - 1, logo.height - 1), fill=255)
+        card.paste(logo, (MARGIN, MARGIN - 12), mask)
+
+        draw = ImageDraw.Draw(card)
+        title_font = _font(font_path, 64, 800)
+        detail_font = _font(font_path, 32, 600)
+        bar_top = height - MARGIN - 18
+        detail_top = bar_top - 58
+        lines = _wrap(draw, title, title_font, width - 2 * MARGIN, 2)
+        top = detail_top - 20 - 76 * len(lines)
+        for n, line in enumerate(lines):
+            draw.text((MARGIN, top + 76 * n), line, font=title_font, fill=(255, 255, 255))
+        draw.text((MARGIN, detail_top), f'{bucket}% funded  ·  Goal {goal_text}', font=detail_font,
+                  fill=(255, 255, 255))
+
+        track = (MARGIN, bar_top, width - MARGIN, bar_top + 18)
+        draw.rounded_rectangle(track, radius=9, fill=(255, 255, 255))
+        filled = MARGIN + (width - 2 * MARGIN) * bucket // 100
+        if filled > MARGIN + 18:
+            draw.rounded_rectangle((MARGIN, bar_top, filled, bar_top + 18), radius=9, fill=BRAND_COLOR)
+
+        tmp_path = f'{dest_path}.{os.getpid()}.tmp'
+        card.save(tmp_path, 'JPEG', quality=85, optimize=True, progressive=True)
+        os.replace(tmp_path, dest_path)
+    try:
+        os.unlink(f'{dest_path}.lock')
+    except OSError:
+        pass
+    return os.path.getsize(dest_path)
+
+class ShareCards:
+    """Per-campaign share cards bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self._current = {}  # campaign_id -> key of the newest card on disk
+        self._pending = {}  # key -> Future of its render
+        self._main_images = {}
+        self._campaigns = None  # the latest campaigns passed to update(), rendered for on start()
+        self._pool = None
+        self._pid = None
+        self._lock = threading.RLock()  # a render may finish before add_done_callback returns
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['share_cards'] = self
+        app.add_template_global(self.share_image_url, 'share_image_url')
+        app.add_url_rule('/share/<key>.jpg', 'share_card', self.serve)
+
+    @property
+    def directory(self):
+        return self.app.config['SHARE_CARD_DIR']
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f'{key}.jpg')
+
+    def _get_pool(self):
+        if self._pool is None:
+            # forkserver: pool processes never inherit this process's threads and locks
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['sharecards', 'PIL.Image'])
+            self._pool = ProcessPoolExecutor(self.app.config['SHARE_CARD_WORKERS'], mp_context=context)
+        return self._pool
+
+    def _card(self, campaign):
+        """(key, render arguments) for a campaign's current progress, or None without a main image"""
+        static_folder = self.app.static_folder
+        source_path = os.path.join(static_folder, campaign.get('main_image') or '')
+        if not campaign.get('main_image') or not os.path.isfile(source_path):
+            return None
+        assets = self.app.extensions['asset_manifest']
+        entry = assets.get(campaign['main_image'])
+        if entry is None:
+            from assets import file_hash
+            source_hash = file_hash(source_path)
+        else:
+            source_hash = entry['hash']
+        bucket = progress_bucket(campaign['raised_amount'], campaign['goal_amount'],
+                                 self.app.config['SHARE_CARD_BUCKET'])
+        goal_text = format_minor(campaign['goal_amount'], campaign['currency']).removesuffix('.00')
+        key = card_key(source_hash, campaign['title'], bucket, goal_text)
+        return key, (source_path, self.path_for(key), campaign['title'], bucket, goal_text,
+                     os.path.join(static_folder, TITLE_FONT), os.path.join(static_folder, LOGO))
+
+    def start(self):
+        """Allow renders in this process (call after fork) and render the cards the totals need"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Renders submitted before a fork belong to the parent's pool
+                self._pool, self._pending, self._pid = None, {}, os.getpid()
+                if self._campaigns is not None:
+                    self.update(self._campaigns)
+
+    def update(self, campaigns):
+        """Point each campaign at the card for its progress, rendering it in the background if missing.
+
+        Called whenever totals are refreshed; cheap when no campaign changed bucket.
+        Before start() only cards already on disk are picked up.
+        """
+        with self._lock:
+            self._campaigns = campaigns
+            for campaign_id, campaign in campaigns.items():
+                self._main_images[campaign_id] = campaign.get('main_image')
+                card = self._card(campaign)
+                if card is None or self._current.get(campaign_id) == card[0]:
+                    continue
+                key, arguments = card
+                if os.path.exists(self.path_for(key)):
+                    self._current[campaign_id] = key
+                elif self._pid == os.getpid() and key not in self._pending:
+                    try:
+                        os.makedirs(self.directory, exist_ok=True)
+                        future = self._get_pool().submit(render_card, *arguments)
+                    except Exception as e:
+                        self.app.logger.error("Could not queue the share card for campaign %s: %s", campaign_id, e)
+                        continue
+                    self._pending[key] = future
+                    future.add_done_callback(lambda future, campaign_id=campaign_id, key=key:
+                                             self._rendered(campaign_id, key, future))
+
+    def _rendered(self, campaign_id, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            error = future.exception()
+            if error is not None:
+                self.app.logger.error("Share card for campaign %s failed: %s", campaign_id, error)
+            elif os.path.exists(self.path_for(key)):
+                self._current[campaign_id] = key
+            # Otherwise another worker is rendering it; the next update picks up its file
+
+    def wait(self, timeout=60):
+        """Block until submitted renders finish (for the CLI and tests)"""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def card_key(self, campaign_id):
+        return self._current.get(campaign_id)
+
+    def share_image_url(self, campaign_id=None):
+        """Absolute og:image URL: the campaign's card, else its main image, else the site image"""
+        key = self._current.get(campaign_id)
+        if key is not None:
+            return url_for('share_card', key=key, _external=True)
+        image = self._main_images.get(campaign_id) or DEFAULT_IMAGE
+        return urljoin(request.host_url, self.app.extensions['asset_manifest'].asset_url(image))
+
+    def serve(self, key):
+        """Response for /share/<key>.jpg; cards never change, so cache them forever"""
+        if not _KEY.match(key):
+            abort(404)
+        response = send_from_directory(self.directory, f'{key}.jpg', mimetype='image/jpeg', max_age=31536000)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+if __name__ == '__main__':
+    from app import app, CAMPAIGNS, share_cards
+
+    share_cards.start()
+    share_cards.wait()
+    for campaign_id in CAMPAIGNS:
+        key = share_cards.card_key(campaign_id)
+        print(f"{'✅' if key else '❌'} Campaign {campaign_id}: {share_cards.path_for(key) if key else 'no card'}")
@@ -272,56 +272,53 @@ document.addEventListener('DOMContentLoaded', function() {
         const formData = new FormData(contactForm);
         const data = Object.fromEntries(formData.entries());
         
-        // Add timestamp and user agent for spam detection
-        data.submitted_at = new Date().toISOString();
-        data.user_agent = navigator.userAgent;
         data.referrer = document.referrer;
         
-        // Simulate form submission (replace with actual endpoint)
-        setTimeout(() => {
-            // For demonstration - replace with actual fetch request
-            simulateFormSubmission(data)
-                .then(result => {
-                    if (result.success) {
-                        showSuccessMessage();
-                        contactForm.reset();
-                        
-                        // Analytics tracking
-                        if (typeof gtag !== 'undefined') {
-                            gtag('event', 'form_submit', {
-                                'form_name': 'contact_form',
-                                'subject': data.subject
-                            });
-                        }
-                    } else {
-                        throw new Error(result.error || 'Submission failed');
+        // Submit to the server; the message is queued and emailed in the background
+        submitContactForm(data)
+            .then(result => {
+                if (result.success) {
+                    showSuccessMessage();
+                    contactForm.reset();
+                    
+                    // Analytics tracking
+                    if (typeof gtag !== 'undefined') {
+                        gtag('event', 'form_submit', {
+                            'form_name': 'contact_form',
+                            'subject': data.subject
+                        });
                     }
-                })
-                .catch(error => {
-                    showFormError('Failed to send message. Please try again or contact us directly.');
-                    console.error('Form submission error:', error);
-                })
-                .finally(() => {
-                    // Reset button state
-                    submitBtn.querySelector('.btn-text').textContent = originalText;
-                    submitBtn.querySelector('.btn-icon').textContent = originalIcon;
-                    submitBtn.disabled = false;
-                    submitBtn.classList.remove('loading');
-                });
-        }, 1500); // Simulate network delay
+                } else {
+                    throw new Error(result.error || 'Submission failed');
+                }
+            })
+            .catch(error => {
+                showFormError(error.message || 'Failed to send message. Please try again or contact us directly.');
+                console.error('Form submission error:', error);
+            })
+            .finally(() => {
+                // Reset button state
+                submitBtn.querySelector('.btn-text').textContent = originalText;
+                submitBtn.querySelector('.btn-icon').textContent = originalIcon;
+                submitBtn.disabled = false;
+                submitBtn.classList.remove('loading');
+            });
     }
     
-    // Simulated form submission - replace with real implementation
-    function simulateFormSubmission(data) {
-        return new Promise((resolve) => {
-            // Simulate success/failure based on email domain for demo
-            const isValid = data.email && !data.email.includes('test-fail');
-            setTimeout(() => {
-                resolve({
-                    success: isValid,
-                    error: isValid ? null : 'Invalid submission'
-                });
-            }, 1000);
+    // Post the contact form to the /contact endpoint as JSON
+    function submitContactForm(data) {
+        return fetch(contactForm.getAttribute('action') || '/contact', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            body: JSON.stringify(data)
+        }).then(response => {
+            if (response.status === 429) {
+                return { success: false, error: 'Too many messages sent. Please try again later.' };
+            }
+            return response.json();
         });
     }
     
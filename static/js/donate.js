@@ -1,5 +1,9 @@
 // Donation Form Enhancements
 document.addEventListener('DOMContentLoaded', function() {
+    // These enhancements belong to the standalone donate page markup;
+    // campaign pages have their own form handlers
+    if (!document.querySelector('.donate-button')) return;
+    
     // Quick amount buttons functionality
     const quickAmountBtns = document.querySelectorAll('.quick-amount-btn');
     const amountRadios = document.querySelectorAll('input[name="amount"]');
@@ -338,4 +342,135 @@ function showNotification(message) {
             }
         }, 300);
     }, 3000);
-}
\ No newline at end of file
+}
+
+// Inline checkout: open the Paystack payment sheet in place instead of
+// redirecting. Forms opt in with data-inline-checkout; without JavaScript (or
+// if anything here fails) the form posts normally and redirects to Paystack.
+const PAYSTACK_INLINE_SRC = 'https://js.paystack.co/v2/inline.js';
+let paystackScriptPromise = null;
+
+function loadPaystackInline() {
+    if (window.PaystackPop) return Promise.resolve();
+    if (!paystackScriptPromise) {
+        paystackScriptPromise = new Promise((resolve, reject) => {
+            const script = document.createElement('script');
+            script.src = PAYSTACK_INLINE_SRC;
+            script.async = true;
+            script.onload = resolve;
+            script.onerror = () => {
+                paystackScriptPromise = null;
+                reject(new Error('Could not load Paystack'));
+            };
+            document.head.appendChild(script);
+        });
+    }
+    return paystackScriptPromise;
+}
+
+function reportCheckoutTiming(mode, startedAt) {
+    const duration = performance.now() - startedAt;
+    const body = JSON.stringify({ mode: mode, duration_ms: Math.round(duration) });
+    if (navigator.sendBeacon) {
+        navigator.sendBeacon('/donate/timing', new Blob([body], { type: 'application/json' }));
+    } else {
+        fetch('/donate/timing', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: body, keepalive: true });
+    }
+}
+
+function resetDonateButton(button, label) {
+    if (!button) return;
+    button.disabled = false;
+    button.classList.remove('loading');
+    const text = button.querySelector('.btn-text, .button-text');
+    if (text && label) text.textContent = label;
+}
+
+function showCheckoutError(form, message) {
+    const existing = form.querySelector('.form-error');
+    if (existing) existing.remove();
+    const errorDiv = document.createElement('div');
+    errorDiv.className = 'form-error flash-message flash-error';
+    errorDiv.textContent = message;
+    form.insertBefore(errorDiv, form.firstChild);
+}
+
+async function verifyInlinePayment(verifyUrl) {
+    const response = await fetch(verifyUrl, { method: 'POST', headers: { 'Accept': 'application/json' } });
+    const data = await response.json();
+    window.location.href = data.redirect_url || '/donate/error';
+}
+
+async function startInlineCheckout(form, button, startedAt) {
+    const label = button ? button.querySelector('.btn-text, .button-text')?.textContent : null;
+    
+    // Fetch the access code and the Paystack script in parallel
+    const scriptReady = loadPaystackInline().catch(() => null);
+    const response = await fetch(form.action, {
+        method: 'POST',
+        headers: { 'Accept': 'application/json' },
+        body: new FormData(form)
+    });
+    const data = await response.json().catch(() => ({ success: false }));
+    
+    if (!data.success) {
+        resetDonateButton(button, 'Donate Now');
+        if (response.status === 429 || data.error) {
+            showCheckoutError(form, data.error || 'Too many attempts. Please wait a moment and try again.');
+            return;
+        }
+        throw new Error('Initialization failed');
+    }
+    
+    await scriptReady;
+    if (!window.PaystackPop) {
+        // Paystack script blocked or offline: use the hosted payment page
+        reportCheckoutTiming('redirect', startedAt);
+        window.location.href = data.authorization_url;
+        return;
+    }
+    
+    let sheetShown = false;
+    const popup = new PaystackPop();
+    popup.resumeTransaction(data.access_code, {
+        onLoad: () => {
+            if (!sheetShown) {
+                sheetShown = true;
+                reportCheckoutTiming('inline', startedAt);
+            }
+        },
+        onSuccess: () => {
+            verifyInlinePayment(data.verify_url).catch(() => {
+                // The callback page verifies again on a plain navigation
+                window.location.href = `/paystack/callback?reference=${encodeURIComponent(data.reference)}`;
+            });
+        },
+        onCancel: () => resetDonateButton(button, label),
+        onError: () => {
+            window.location.href = data.authorization_url;
+        }
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('form[data-inline-checkout]');
+    if (!form || !window.fetch || !window.FormData) return;
+    
+    // Warm up the Paystack script once the donor starts filling the form
+    form.addEventListener('focusin', () => loadPaystackInline().catch(() => null), { once: true });
+    
+    form.addEventListener('submit', function(e) {
+        // Page validation ran first and may have rejected the submission
+        if (e.defaultPrevented) return;
+        e.preventDefault();
+        
+        const startedAt = performance.now();
+        const button = form.querySelector('button[type="submit"]');
+        if (button) button.disabled = true;
+        
+        startInlineCheckout(form, button, startedAt).catch(() => {
+            // Fall back to the regular redirect flow
+            form.submit();
+        });
+    });
+});
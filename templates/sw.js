@@ -0,0 +1,134 @@
+// Service worker generated by offline.py from the asset manifest; do not edit the served copy.
+{% if enabled %}
+const SETTINGS = {{ settings|tojson }};
+const SHELL_CACHE = `blackshepherd-shell-${SETTINGS.version}`;
+const PAGES_CACHE = `blackshepherd-pages-${SETTINGS.version}`;
+const IMAGES_CACHE = 'blackshepherd-images';
+const PAGE_PATTERNS = SETTINGS.pages.map(source => new RegExp(source));
+const PRECACHED = new Set(SETTINGS.precache.map(url => new URL(url, self.location).href));
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(SETTINGS.precache))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Drop the shell and pages of older deploys; the image cache is keyed by URL and kept
+    const current = new Set([SHELL_CACHE, PAGES_CACHE, IMAGES_CACHE]);
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names
+                .filter(name => name.startsWith('blackshepherd-') && !current.has(name))
+                .map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+    // Donations, payment callbacks, forms and admin always go to the network untouched
+    if (SETTINGS.never.some(prefix => url.pathname.startsWith(prefix))) return;
+
+    if (PRECACHED.has(url.href)) {
+        event.respondWith(caches.match(request, {cacheName: SHELL_CACHE}).then(cached => cached || fetch(request)));
+    } else if (request.mode === 'navigate' && PAGE_PATTERNS.some(pattern => pattern.test(url.pathname))) {
+        event.respondWith(stalePage(event));
+    } else if (request.destination === 'image' && SETTINGS.images.prefixes.some(prefix => url.pathname.startsWith(prefix))) {
+        event.respondWith(cachedImage(event));
+    }
+});
+
+function cacheable(response) {
+    // Same-origin 200s that were not redirected and did not opt out (flashed messages)
+    return response.ok && response.status === 200 && response.type === 'basic' && !response.redirected
+        && !/no-store/.test(response.headers.get('Cache-Control') || '');
+}
+
+async function stalePage(event) {
+    const cache = await caches.open(PAGES_CACHE);
+    const cached = await cache.match(event.request.url);
+    const refresh = fetch(event.request).then(response => {
+        if (cacheable(response)) {
+            event.waitUntil(cache.put(event.request.url, response.clone()).catch(() => null));
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(refresh.catch(() => null));
+        return cached;
+    }
+    try {
+        return await refresh;
+    } catch (error) {
+        // Offline with nothing cached for this page: the cached home page beats an error
+        return (await cache.match(new URL(SETTINGS.fallback, self.location).href)) || Response.error();
+    }
+}
+
+async function cachedImage(event) {
+    const request = event.request;
+    const cache = await caches.open(IMAGES_CACHE);
+    const cached = await cache.match(request);
+    const refresh = () => fetch(request).then(response => {
+        if (cacheable(response)) {
+            event.waitUntil(storeImage(cache, request, response.clone()));
+        }
+        return response;
+    });
+    if (!cached) return refresh();
+    if (new URL(request.url).searchParams.has('v')) {
+        // Re-inserting moves the entry to the end of the cache's key order: most recently used
+        event.waitUntil(cache.put(request, cached.clone()).catch(() => null));
+    } else {
+        event.waitUntil(refresh().catch(() => null));
+    }
+    return cached;
+}
+
+let trimming = Promise.resolve();
+
+function storeImage(cache, request, response) {
+    // Serialised so concurrent stores do not trim against a half-written cache
+    trimming = trimming
+        .then(() => cache.put(request, response))
+        .then(() => trimImages(cache))
+        .catch(() => null);
+    return trimming;
+}
+
+async function responseSize(response) {
+    const length = Number(response.headers.get('Content-Length'));
+    return length > 0 ? length : (await response.blob()).size;
+}
+
+async function trimImages(cache) {
+    // Keys come back least recently used first; drop from the front until both bounds hold
+    const keys = await cache.keys();
+    const sizes = await Promise.all(keys.map(key => cache.match(key).then(response => response ? responseSize(response) : 0)));
+    let total = sizes.reduce((sum, size) => sum + size, 0);
+    let count = keys.length;
+    for (let i = 0; i < keys.length && (count > SETTINGS.images.max_entries || total > SETTINGS.images.max_bytes); i++) {
+        await cache.delete(keys[i]);
+        total -= sizes[i];
+        count -= 1;
+    }
+}
+{% else %}
+// Disabled: remove the caches and unregister, so browsers fall back to plain HTTP caching
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names
+                .filter(name => name.startsWith('blackshepherd-'))
+                .map(name => caches.delete(name))))
+            .then(() => self.registration.unregister())
+    );
+});
+{% endif %}
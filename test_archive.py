@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test ledger archival against a throwaway database: settled months move into
+files and out of the Transaction table without changing any aggregate,
+exports and rollup rebuilds still see every donation, and archived months
+are closed to re-imports and can be restored.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+from testing import setup_app
+
+TOKEN = 'admin-test-token'
+
+def write_donations(path, count, now):
+    """Offline donations, one every few days over the last three years"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['reference', 'campaign_id', 'amount', 'currency', 'date', 'status'])
+        for n in range(count):
+            date = now - timedelta(days=3 * n, hours=n % 24)
+            status = 'failed' if n % 10 == 9 else 'pending' if n % 25 == 24 else 'success'
+            writer.writerow([f'ARC_{n}', 1 + n % 3, f'{2000 + n}.25', 'USD' if n % 5 == 0 else 'NGN',
+                             date.strftime('%Y-%m-%dT%H:%M:%S'), status])
+
+def snapshot():
+    """Every aggregate that archival must leave alone"""
+    from models import Campaign, CampaignCurrencyTotal, DonationRollup
+    return (
+        {row.id: row.raised_amount for row in Campaign.query},
+        {(row.campaign_id, row.currency): (row.raised_amount, row.donation_count)
+         for row in CampaignCurrencyTotal.query},
+        {(row.grain, row.period_start, row.campaign_id, row.currency): (row.amount, row.donation_count)
+         for row in DonationRollup.query}
+    )
+
+def check_archive_moves_settled_months(app, tmp):
+    """Old settled rows leave the table for verified files; aggregates and rebuilt rollups are unchanged"""
+    from archive import archive, archive_cutoff, verify
+    from importer import import_donations
+    from models import db, Transaction, TransactionArchive
+    from reporting import rebuild_rollups
+
+    print("\n🔍 Testing archival of settled months...")
+    path = os.path.join(tmp, 'offline.csv')
+    write_donations(path, 365, datetime.utcnow())
+    with app.app_context():
+        import_donations(path, batch_size=100, resume=False)
+        total = Transaction.query.count()
+        before = snapshot()
+        cutoff = archive_cutoff(365)
+        old_pending = Transaction.query.filter(Transaction.status == 'pending',
+                                               Transaction.created_at < cutoff).count()
+        parts = archive(365, batch_size=50)
+        archived = sum(part.row_count for part in parts)
+        leftover = Transaction.query.filter(Transaction.status != 'pending',
+                                            db.func.coalesce(Transaction.completed_at,
+                                                             Transaction.created_at) < cutoff).count()
+        remaining = Transaction.query.count()
+        after = snapshot()
+        with db.engine.begin() as conn:
+            rebuild_rollups(conn)
+        rebuilt = snapshot()
+        problems = verify()
+        months = TransactionArchive.query.count()
+    ok = (archived > 200 and leftover == 0 and remaining == total - archived and old_pending > 0
+          and before == after == rebuilt and not problems and months == len(parts) > 20)
+    print(f"{'✅' if ok else '❌'} Archived {archived} of {total} rows into {months} monthly files; "
+          f"{old_pending} old pending rows kept; aggregates and rebuilt rollups unchanged")
+    return ok
+
+def check_exports_union(app):
+    """Exports read archived months first, then the live ledger, as if nothing moved"""
+    from archive import archived_rows
+    from models import db, Transaction, TransactionArchive
+    print("\n🔍 Testing exports across the archive...")
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    response = client.get('/admin/reports/export.csv', headers=headers)
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    everything = client.get('/admin/reports/export.jsonl?status=all&campaign_id=2', headers=headers)
+    since = (datetime.utcnow() - timedelta(days=500)).date().isoformat()
+    recent = client.get(f'/admin/reports/export.csv?start={since}', headers=headers)
+    recent_rows = list(csv.DictReader(io.StringIO(recent.data.decode())))
+    with app.app_context():
+        archived_successes = db.session.scalar(db.select(db.func.sum(TransactionArchive.success_count)))
+        live_successes = Transaction.query.filter_by(status='success').count()
+        campaign_rows = (Transaction.query.filter_by(campaign_id=2).count()
+                         + sum(1 for _ in archived_rows(campaign_id=2)))
+    expected_recent = sum(1 for row in rows if row['completed_at'] >= since)
+    ok = (len(rows) == archived_successes + live_successes and len({row['reference'] for row in rows}) == len(rows)
+          and rows == sorted(rows, key=lambda row: row['completed_at'])
+          and len(everything.data.decode().splitlines()) == campaign_rows
+          and len(recent_rows) == expected_recent and 0 < expected_recent < len(rows))
+    print(f"{'✅' if ok else '❌'} CSV {len(rows)} donations ({archived_successes} archived); "
+          f"{len(recent_rows)} since {since}")
+    return ok
+
+def check_closed_months_and_restore(app, tmp):
+    """Re-importing archived months is rejected, orphans are removed, a month can be restored"""
+    from archive import archive_dir, remove_orphans, restore_month
+    from importer import import_donations
+    from models import Transaction, TransactionArchive
+    print("\n🔍 Testing closed months, orphans and restore...")
+    with app.app_context():
+        before = snapshot()
+        summary = import_donations(os.path.join(tmp, 'offline.csv'), batch_size=100, resume=False)
+        after_import = snapshot()
+        orphan = os.path.join(archive_dir(), 'transactions', '2001', '2001-01-deadbeef.jsonl.gz')
+        os.makedirs(os.path.dirname(orphan), exist_ok=True)
+        open(orphan, 'wb').close()
+        removed = remove_orphans()
+        part = TransactionArchive.query.order_by(TransactionArchive.month).first()
+        month, rows, path = part.month, part.row_count, os.path.join(archive_dir(), part.path)
+        live = Transaction.query.count()
+        restored = restore_month(month)
+        back = Transaction.query.count()
+    ok = (summary['imported'] == 0 and summary['rejected'] > 200 and before == after_import
+          and removed == 1 and not os.path.exists(orphan) and restored == rows and back == live + rows
+          and not os.path.exists(path))
+    print(f"{'✅' if ok else '❌'} Re-import rejected {summary['rejected']} rows; removed {removed} orphan; "
+          f"restored {restored} rows from {month:%Y-%m}")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Ledger Archive Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'archive-test.db', ARCHIVE_DIR=os.path.join(tmp, 'archive'), ADMIN_TOKEN=TOKEN)
+        results = [
+            check_archive_moves_settled_months(app, tmp),
+            check_exports_union(app),
+            check_closed_months_and_restore(app, tmp)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
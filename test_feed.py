@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test the recent-donations ticker and leaderboard against a throwaway
+database: they are rebuilt from the ledger, a webhook donation is added
+exactly once, catch-up pages through bursts, back-dated imports are
+counted, memory stays bounded and /donations/recent.json is served from a
+cached body with an ETag.
+"""
+import csv
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from testing import setup_app
+
+SECRET = 'sk_test_feed'
+
+def donate(app, count, prefix, amount=100000):
+    """Record count successful NGN donations spread over the first three campaigns"""
+    from ledger import complete_donation
+    with app.app_context():
+        for n in range(count):
+            complete_donation(f'BSF_{prefix}_{n}', amount, 'NGN', 1 + n % 3)
+
+def check_rebuild_from_ledger(app):
+    """After a restart the feed and leaderboard match the ledger"""
+    from app import CAMPAIGNS
+    print("\n🔍 Testing rebuild from the ledger...")
+    donate(app, 30, 'seed')
+    feed = app.extensions['donation_feed']
+    with app.app_context():
+        feed.rebuild(CAMPAIGNS)
+    recent = feed.recent_donations()
+    counts = {entry['campaign_id']: entry['donations'] for entry in feed.top_campaigns()}
+    ok = (len(recent) == app.config['FEED_SIZE'] and counts.get(1) == 10 and counts.get(2) == 10
+          and recent[0]['completed_at'] >= recent[-1]['completed_at']
+          and not any('reference' in entry or 'email' in entry for entry in recent))
+    print(f"{'✅' if ok else '❌'} {len(recent)} recent donations, leaderboard counts {counts}")
+    return ok
+
+def check_webhook_added_once(app):
+    """A signed charge.success webhook delivered twice adds one donation; unsigned ones are rejected"""
+    print("\n🔍 Testing the webhook consumer...")
+    feed = app.extensions['donation_feed']
+    before = {entry['campaign_id']: entry['donations'] for entry in feed.top_campaigns()}
+    payload = json.dumps({'event': 'charge.success', 'data': {
+        'reference': 'BSF_webhook_1', 'status': 'success', 'amount': 500000000, 'currency': 'NGN',
+        'metadata': {'campaign_id': 2}}}).encode()
+    signature = hmac.new(SECRET.encode(), payload, hashlib.sha512).hexdigest()
+    client = app.test_client()
+    statuses = [client.post('/paystack/webhook', data=payload, content_type='application/json',
+                            headers={'X-Paystack-Signature': signature}).status_code for _ in range(2)]
+    unsigned = client.post('/paystack/webhook', data=payload, content_type='application/json').status_code
+    after = {entry['campaign_id']: entry['donations'] for entry in feed.top_campaigns()}
+    newest = feed.recent_donations(1)[0]
+    ok = (statuses == [200, 200] and unsigned == 401 and after[2] == before[2] + 1
+          and newest['amount'] == 500000000 and feed.top_campaigns()[0]['campaign_id'] == 2)
+    print(f"{'✅' if ok else '❌'} Webhook {statuses}, unsigned {unsigned}; campaign 2 count "
+          f"{before[2]} -> {after[2]}, now ranked first")
+    return ok
+
+def check_burst_and_cached_json(app):
+    """A burst larger than a catch-up page is counted fully; the JSON is cached and its ETag is its content"""
+    print("\n🔍 Testing a burst and /donations/recent.json...")
+    feed = app.extensions['donation_feed']
+    total_before = sum(entry['donations'] for entry in feed.top_campaigns())
+    app.config['FEED_CATCH_UP_LIMIT'] = 7
+    donate(app, 50, 'burst', amount=50000)
+    with app.app_context():
+        added = feed.catch_up()
+    app.config['FEED_CATCH_UP_LIMIT'] = 1000
+    total_after = sum(entry['donations'] for entry in feed.top_campaigns())
+
+    client = app.test_client()
+    first = client.get('/donations/recent.json')
+    again = client.get('/donations/recent.json', headers={'If-None-Match': first.headers['ETag']})
+    feed._changed()  # e.g. another worker, or a restart: a new version with the same donations
+    other = client.get('/donations/recent.json', headers={'If-None-Match': first.headers['ETag']})
+    body = first.get_json()
+    content_etag = f'"{hashlib.sha256(first.data).hexdigest()[:16]}"'
+    ok = (added == 50 and total_after - total_before == 50 and len(feed._recent) == app.config['FEED_SIZE']
+          and len(body['recent']) == app.config['FEED_SIZE'] and again.status_code == 304
+          and other.status_code == 304 and first.headers['ETag'] == content_etag
+          and 'max-age' in first.headers['Cache-Control'] and first.data == feed._cached[1])
+    print(f"{'✅' if ok else '❌'} {added} added in pages of 7, buffer {len(feed._recent)}; "
+          f"JSON {first.status_code} then {again.status_code} ({first.headers['Cache-Control']})")
+    return ok
+
+def check_backdated_import_counted(app, tmp):
+    """Imported donations dated weeks ago reach the leaderboard once, without jumping the ticker"""
+    from importer import import_donations
+
+    print("\n🔍 Testing a back-dated import...")
+    feed = app.extensions['donation_feed']
+    before = {entry['campaign_id']: entry['donations'] for entry in feed.top_campaigns()}
+    newest = feed.recent_donations(1)[0]
+    path = os.path.join(tmp, 'transfers.csv')
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['reference', 'campaign_id', 'amount', 'currency', 'date', 'status'])
+        for n in range(5):
+            writer.writerow([f'TRF_feed_{n}', 3, '2500.00', 'NGN',
+                             (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%S'), 'success'])
+    with app.app_context():
+        import_donations(path, resume=False)
+        added, again = feed.catch_up(), feed.catch_up()
+    after = {entry['campaign_id']: entry['donations'] for entry in feed.top_campaigns()}
+    ok = (added == 5 and again == 0 and after[3] == before[3] + 5 and feed.recent_donations(1)[0] == newest)
+    print(f"{'✅' if ok else '❌'} {added} imported donations added, then {again}; campaign 3 count "
+          f"{before[3]} -> {after[3]}")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Donation Feed Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'feed-test.db', PAYSTACK_SECRET_KEY=SECRET, PAYSTACK_WEBHOOK_SECRET='')
+        results = [
+            check_rebuild_from_ledger(app),
+            check_webhook_added_once(app),
+            check_burst_and_cached_json(app),
+            check_backdated_import_counted(app, tmp)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
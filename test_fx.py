@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test FX rates and conversion: the rate table serves its cache until the
+TTL runs out, then reloads, and keeps the stale table if the provider
+fails; conversions round half up across currencies; and a donation keeps
+the rate snapshotted when it was made, however the table moves before it
+completes.
+"""
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from testing import setup_app
+
+class CountingProvider:
+    """Rate provider that counts loads and can be made to fail"""
+
+    def __init__(self, rates):
+        self.rates = dict(rates)
+        self.loads = 0
+        self.failing = False
+
+    def __call__(self):
+        self.loads += 1
+        if self.failing:
+            raise OSError('rate source unavailable')
+        return {'base': 'NGN', 'as_of': f'load {self.loads}', 'rates': dict(self.rates)}
+
+def write_rates(path, usd):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'base': 'NGN', 'as_of': '2025-01-01', 'rates': {'USD': usd, 'GHS': '100'}}, f)
+
+def check_rate_ttl():
+    """Rates come from the cache within the TTL and are reloaded after it"""
+    from fx import RateTable
+
+    print("\n🔍 Testing the rate table TTL...")
+    provider = CountingProvider({'USD': '1550'})
+    table = RateTable(provider, ttl=0.2)
+    first = table.rate('USD', 'NGN')
+    provider.rates['USD'] = '1600'
+    cached = [table.rate('USD', 'NGN') for _ in range(100)]
+    loads_within_ttl = provider.loads
+    time.sleep(0.25)
+    reloaded = table.rate('USD', 'NGN')
+    ok = (first == Decimal(1550) and set(cached) == {Decimal(1550)} and loads_within_ttl == 1
+          and reloaded == Decimal(1600) and provider.loads == 2)
+    print(f"{'✅' if ok else '❌'} {len(cached) + 1} lookups within the TTL cost {loads_within_ttl} load; "
+          f"after it {reloaded} NGN/USD in {provider.loads} loads")
+    return ok
+
+def check_stale_table_kept():
+    """A failing provider keeps the last table for another TTL; with no table yet it raises"""
+    from fx import RateTable
+
+    print("\n🔍 Testing a failing rate provider...")
+    provider = CountingProvider({'USD': '1550'})
+    table = RateTable(provider, ttl=0.2)
+    table.rate('USD', 'NGN')
+    provider.failing = True
+    time.sleep(0.25)
+    stale = table.rate('USD', 'NGN')
+    retries = [table.rate('USD', 'NGN') for _ in range(100)]
+    loads_after_failure = provider.loads
+
+    empty = RateTable(CountingProvider({}), ttl=0.2)
+    empty.provider.failing = True
+    try:
+        empty.rate('USD', 'NGN')
+        raised = False
+    except OSError:
+        raised = True
+    try:
+        table.rate('XYZ', 'NGN')
+        unknown = False
+    except ValueError:
+        unknown = True
+    ok = (stale == Decimal(1550) and set(retries) == {Decimal(1550)} and loads_after_failure == 2 and raised
+          and unknown)
+    print(f"{'✅' if ok else '❌'} Stale rate {stale} served, {loads_after_failure - 1} retry within the TTL; "
+          f"first load failure raised: {raised}; unknown currency refused: {unknown}")
+    return ok
+
+def check_conversion_rounding():
+    """Minor-unit conversions between currencies round half up and keep the target currency"""
+    from fx import RateTable, convert_minor
+    from money import Money
+
+    print("\n🔍 Testing conversion rounding...")
+    table = RateTable(CountingProvider({'USD': '1550', 'GHS': '100', 'EUR': '1680'}), ttl=3600)
+    results = {
+        '$10.00 -> NGN': (table.convert(Money(1000, 'USD'), 'NGN'), Money(1550000, 'NGN')),
+        '₦1.00 -> USD': (table.convert(Money(100, 'NGN'), 'USD'), Money(0, 'USD')),  # 0.0645 cents
+        '₦7.75 -> USD': (table.convert(Money(775, 'NGN'), 'USD'), Money(1, 'USD')),  # exactly 0.5 cents
+        '-₦7.75 -> USD': (table.convert(Money(-775, 'NGN'), 'USD'), Money(-1, 'USD')),
+        'GH₵1.55 -> USD': (table.convert(Money(155, 'GHS'), 'USD'), Money(10, 'USD')),
+        '€1.00 -> USD': (table.convert(Money(100, 'EUR'), 'USD'), Money(108, 'USD')),  # 108.39 cents
+        '$1.00 -> USD': (table.convert(Money(100, 'USD'), 'USD'), Money(100, 'USD')),
+        '$1.00 at 0.005': (convert_minor(100, 'USD', 'NGN', Decimal('0.005')), Money(1, 'NGN')),
+        '$1.00 snapshot': (table.convert(Money(100, 'USD'), 'NGN', rate=Decimal('1500')), Money(150000, 'NGN')),
+    }
+    wrong = {name: (str(got), str(want)) for name, (got, want) in results.items() if got != want}
+    ok = not wrong
+    print(f"{'✅' if ok else '❌'} {len(results) - len(wrong)}/{len(results)} conversions correct"
+          + (f"; wrong {wrong}" if wrong else ''))
+    return ok
+
+def check_donation_keeps_snapshot(app, rates_path):
+    """A pending USD donation completes at the rate it was made at, not today's"""
+    from ledger import complete_donation, record_pending_donation, snapshot_rate
+    from models import db, Campaign, Transaction
+    from money import Money
+
+    print("\n🔍 Testing the snapshotted donation rate...")
+    with app.app_context():
+        campaign = db.session.get(Campaign, 1)
+        raised_before = campaign.raised_amount or 0
+        rate = snapshot_rate('USD', campaign.currency)
+        record_pending_donation('BSF_fx_snapshot', campaign.id, Money(1000, 'USD'), campaign.currency, rate)
+
+        write_rates(rates_path, '1600')  # The TTL is 0, so the next lookup reloads
+        completed = complete_donation('BSF_fx_snapshot', 1000, 'USD')
+        transaction = db.session.scalar(db.select(Transaction).where(Transaction.transaction_id == 'BSF_fx_snapshot'))
+        raised = db.session.get(Campaign, 1).raised_amount - raised_before
+        rate_now = snapshot_rate('USD', campaign.currency)
+        ok = (campaign.currency == 'NGN' and rate == Decimal(1550) and completed
+              and transaction.fx_rate == Decimal(1550) and transaction.campaign_amount == 1550000
+              and raised == 1550000 and rate_now == Decimal(1600))
+        print(f"{'✅' if ok else '❌'} $10.00 made at {rate} completed as "
+              f"{Money(transaction.campaign_amount, campaign.currency)} with today's rate at {rate_now}")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - FX Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rates_path = os.path.join(tmp, 'rates.json')
+        write_rates(rates_path, '1550')
+        app = setup_app(tmp, 'fx-test.db', FX_RATES_FILE=rates_path, FX_RATES_TTL=0)
+        results = [
+            check_rate_ttl(),
+            check_stale_table_kept(),
+            check_conversion_rounding(),
+            check_donation_keeps_snapshot(app, rates_path)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test /healthz and /readyz against a throwaway database: readiness waits for
+warm-up and the first probes, follows the critical checks, and answers from
+cached results without touching any dependency.
+"""
+import tempfile
+import time
+from testing import setup_app
+
+def check_ready_after_warm_up(app):
+    """Not ready until warm-up and the first probe round finish, then ready"""
+    print("\n🔍 Testing readiness during start-up...")
+    client = app.test_client()
+    first = client.get('/readyz')
+    deadline = time.monotonic() + 15
+    response = first
+    while response.status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.get('/readyz')
+    live = client.get('/healthz')
+    checks = response.get_json()['checks']
+    ok = (first.status_code == 503 and response.status_code == 200 and live.status_code == 200
+          and checks['database']['ok'] and not checks['paystack']['ok'] and 'latency_ms' in checks['database'])
+    print(f"{'✅' if ok else '❌'} First /readyz {first.status_code} ({first.get_json()['status']}), "
+          f"then {response.status_code}; database {checks['database']['latency_ms']} ms, "
+          f"paystack (non-critical) failing: {checks['paystack'].get('error')}")
+    return ok
+
+def check_critical_failure_not_ready(app):
+    """A stuck mail queue takes the worker out of rotation; with probes off only warm-up counts"""
+    from datetime import datetime, timedelta
+    from health import PROBES
+    from models import db, OutboxMessage
+
+    print("\n🔍 Testing a failing critical check...")
+    with app.app_context():
+        db.session.add(OutboxMessage(kind='contact', dedupe_key='stuck', to_address='a@example.com',
+                                     subject='Stuck', body='Stuck',
+                                     next_attempt_at=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+    health = app.extensions['health']
+    health.probe_due({name: 0.0 for name in PROBES})
+    response = app.test_client().get('/readyz')
+    body = response.get_json()
+    app.config['HEALTH_PROBES_ENABLED'] = False
+    try:
+        unprobed = app.test_client().get('/readyz')
+    finally:
+        app.config['HEALTH_PROBES_ENABLED'] = True
+    ok = (response.status_code == 503 and body['status'] == 'failing: mail'
+          and body['checks']['mail']['error'].startswith('1 messages due')
+          and unprobed.status_code == 200 and unprobed.get_json()['status'] == 'ready (probes disabled)')
+    print(f"{'✅' if ok else '❌'} /readyz {response.status_code}: {body['status']} ({body['checks']['mail'].get('error')})")
+    return ok
+
+def check_readyz_is_cached(app):
+    """The view only reads the cached snapshot: microseconds per call"""
+    print("\n🔍 Testing /readyz cost...")
+    health = app.extensions['health']
+    calls = 20000
+    with app.test_request_context('/readyz'):
+        started = time.perf_counter()
+        for _ in range(calls):
+            health.readyz()
+        per_call_us = (time.perf_counter() - started) / calls * 1e6
+    ok = per_call_us < 100
+    print(f"{'✅' if ok else '❌'} {per_call_us:.1f} µs per /readyz view call")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Health Check Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Probes on, mail as a critical check
+        app = setup_app(tmp, 'health-test.db', HEALTH_PROBES_ENABLED='true', PAYSTACK_SECRET_KEY='',
+                        HEALTH_CRITICAL='database,mail', HEALTH_MAIL_MAX_DELAY=60)
+        results = [
+            check_ready_after_warm_up(app),
+            check_critical_failure_not_ready(app),
+            check_readyz_is_cached(app)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test Early Hints: every page announces its shell and route-specific
+critical resources as Link headers with the exact URLs the page uses,
+pages with inlined critical CSS preload only the font, campaign pages
+preconnect to Paystack, a server's wsgi.early_hints callable is given the
+hints before the view renders, and other responses get none.
+"""
+import html
+import re
+import tempfile
+from testing import setup_app
+
+def link_urls(response, rel):
+    return re.findall(rf'<([^>]+)>; rel={rel}', response.headers.get('Link', ''))
+
+def check_links_match_pages(app):
+    """Preloaded URLs are the ones each page references; Paystack preconnects only on campaign pages"""
+    print("\n🔍 Testing Link headers per route...")
+    client = app.test_client()
+    paths = ('/', '/about', '/campaigns', '/campaign/1', '/contact')
+    pages = {path: client.get(path) for path in paths}
+    missing = {path: [url for url in link_urls(response, 'preload') if url not in html.unescape(response.data.decode())]
+               for path, response in pages.items()}
+    preloads = {path: len(link_urls(response, 'preload')) for path, response in pages.items()}
+    others = [client.get('/campaign/99'), client.get('/sw.js'), client.get('/donations/recent.json'),
+              client.post('/process-donation', data={'campaign_id': '1'})]
+    campaign = pages['/campaign/1'].headers['Link']
+    ok = (not any(missing.values()) and min(preloads.values()) == 5 and preloads['/campaign/1'] == 6
+          and link_urls(pages['/campaign/1'], 'preconnect') == ['https://js.paystack.co', 'https://checkout.paystack.com']
+          and not link_urls(pages['/'], 'preconnect') and 'imagesrcset="' in campaign
+          and 'as=font; type="font/woff2"; crossorigin' in campaign
+          and not any('Link' in response.headers for response in others))
+    print(f"{'✅' if ok else '❌'} Preloads per page {preloads}; unreferenced {sum(map(len, missing.values()))}")
+    return ok
+
+def check_critical_pages_hint_font_only(app):
+    """Pages painting from inlined critical CSS only preload the font and keep their preconnects"""
+    print("\n🔍 Testing pages with critical CSS...")
+    hints = app.extensions['early_hints']
+    hints._memo.clear()
+    client = app.test_client()
+    pages = {path: client.get(path) for path in ('/', '/campaigns', '/campaign/1')}
+    preloads = {path: link_urls(response, 'preload') for path, response in pages.items()}
+    ok = (all(b'<style>' in response.data for response in pages.values())
+          and all(len(urls) == 1 and 'inter-latin.woff2' in urls[0] for urls in preloads.values())
+          and link_urls(pages['/campaign/1'], 'preconnect') == ['https://js.paystack.co', 'https://checkout.paystack.com'])
+    print(f"{'✅' if ok else '❌'} Preloads per page {dict((path, len(urls)) for path, urls in preloads.items())}")
+    return ok
+
+def check_early_hints_before_render(app):
+    """The server's early-hints callable gets the links before the template renders, and may fail safely"""
+    from flask import template_rendered
+    print("\n🔍 Testing 103 Early Hints...")
+    events = []
+
+    def early_hints(headers):
+        events.append(('hints', headers))
+
+    def rendered(sender, template, context, **extra):
+        events.append(('render', template.name))
+
+    def broken(headers):
+        raise OSError('client went away')
+
+    client = app.test_client()
+    with template_rendered.connected_to(rendered, app):
+        response = client.get('/campaign/2', environ_base={'wsgi.early_hints': early_hints})
+    failed = client.get('/campaign/2', environ_base={'wsgi.early_hints': broken})
+    hinted = events[0][1] if events and events[0][0] == 'hints' else []
+    ok = (events[0][0] == 'hints' and any(kind == 'render' for kind, _ in events[1:])
+          and all(name == 'Link' for name, _ in hinted) and ', '.join(value for _, value in hinted)
+          == response.headers['Link'] and failed.status_code == 200 and 'Link' in failed.headers)
+    print(f"{'✅' if ok else '❌'} {len(hinted)} hints sent before rendering {events[-1][1] if events else None}")
+    return ok
+
+def check_disabled_and_memoised(app):
+    """Links are computed once per page; EARLY_HINTS_ENABLED=false turns everything off"""
+    print("\n🔍 Testing memoisation and the off switch...")
+    hints = app.extensions['early_hints']
+    client = app.test_client()
+    calls = []
+    original = hints.pages['campaign']
+    hints.pages['campaign'] = lambda **view_args: calls.append(view_args) or original(**view_args)
+    hints._memo.clear()
+    try:
+        for _ in range(5):
+            client.get('/campaign/3')
+    finally:
+        hints.pages['campaign'] = original
+    sent = []
+    app.config['EARLY_HINTS_ENABLED'] = False
+    try:
+        off = client.get('/campaign/3', environ_base={'wsgi.early_hints': sent.append})
+    finally:
+        app.config['EARLY_HINTS_ENABLED'] = True
+    ok = calls == [{'campaign_id': 3}] and 'Link' not in off.headers and not sent and off.status_code == 200
+    print(f"{'✅' if ok else '❌'} Campaign links computed {len(calls)} time(s) for 5 requests; off switch honoured")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Early Hints Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'hints-test.db')
+        from app import warm_up
+        warm_up()  # so the background warm-up doesn't reload the critical CSS mid-test
+        critical = app.extensions['critical_css']
+        # Without critical CSS first: every stylesheet blocks rendering and the full set is sent
+        critical._styles = {}
+        results = [check_links_match_pages(app)]
+        critical.load()
+        results += [
+            check_critical_pages_hint_font_only(app),
+            check_early_hints_before_render(app),
+            check_disabled_and_memoised(app)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test single-flight donation initialization against the local Paystack stub
+and a throwaway database: concurrent submissions of one donation share a
+single Paystack call and reference, a later duplicate is replayed, a
+duplicate waits for a flight led by another worker, and a failed flight
+releases its key so the donor can retry.
+"""
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from testing import setup_app
+
+SUBMISSIONS = 8
+
+def start_app(tmp):
+    """Start a slow stub and import the app against it and a temporary database"""
+    from paystack_stub import PaystackStub
+
+    stub = PaystackStub(latency=0.3)
+    app = setup_app(tmp, 'idempotency-test.db', PAYSTACK_API_URL=stub.start(),
+                    PAYSTACK_SECRET_KEY='sk_test_idempotency', RATE_LIMIT_ENABLED='false', IDEMPOTENCY_WAIT=10)
+    return app, stub
+
+def submit(app, email, token='form-token-1'):
+    """Post the donation form as donate.js does; return the JSON response"""
+    response = app.test_client().post('/process-donation', headers={'Accept': 'application/json'}, data={
+        'campaign_id': '1', 'email': email, 'amount': '5000', 'currency': 'NGN', 'idempotency_key': token})
+    return response.get_json()
+
+def check_concurrent_submissions_share_one_flight(app, stub):
+    """Simultaneous submissions of one form make one Paystack call and get one reference"""
+    from models import db, Transaction
+
+    print(f"\n🔍 Testing {SUBMISSIONS} concurrent submissions of one donation...")
+    responses = [None] * SUBMISSIONS
+    start = threading.Barrier(SUBMISSIONS)
+
+    def run(n):
+        start.wait()
+        responses[n] = submit(app, 'single@example.com')
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(SUBMISSIONS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    references = {response['reference'] for response in responses if response and response.get('success')}
+    with app.app_context():
+        rows = db.session.scalar(db.select(db.func.count()).select_from(Transaction)
+                                 .where(Transaction.transaction_id.in_(references)))
+    ok = (all(response and response.get('success') for response in responses) and len(references) == 1
+          and stub.calls.get('initialize') == 1 and rows == 1)
+    print(f"{'✅' if ok else '❌'} {SUBMISSIONS} submissions: {len(references)} reference, "
+          f"{stub.calls.get('initialize', 0)} Paystack call, {rows} pending row")
+    return ok
+
+def check_later_duplicate_replayed(app, stub):
+    """A resubmission after the flight finished replays the stored response; a new form starts a new one"""
+    print("\n🔍 Testing a later duplicate...")
+    calls_before = stub.calls.get('initialize', 0)
+    first = submit(app, 'single@example.com')
+    again = submit(app, 'single@example.com')
+    fresh = submit(app, 'single@example.com', token='form-token-2')
+    ok = (first['reference'] == again['reference'] and fresh['reference'] != first['reference']
+          and stub.calls.get('initialize', 0) - calls_before == 1)
+    print(f"{'✅' if ok else '❌'} Replayed {again['reference']}; a new form got {fresh['reference']} "
+          f"with {stub.calls.get('initialize', 0) - calls_before} Paystack call")
+    return ok
+
+def check_waits_for_other_worker(app):
+    """A duplicate of a flight another worker leads waits for its response instead of running again"""
+    from idempotency import run_once
+    from models import db, IdempotencyKey
+
+    print("\n🔍 Testing a flight led by another worker...")
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add(IdempotencyKey(key='other-worker', state='in_flight', owner='worker-2', created_at=now,
+                                      locked_until=now + timedelta(seconds=45),
+                                      expires_at=now + timedelta(seconds=600)))
+        db.session.commit()
+
+    def finish_elsewhere():
+        time.sleep(0.3)
+        with app.app_context():
+            db.session.execute(db.update(IdempotencyKey).where(IdempotencyKey.key == 'other-worker')
+                               .values(state='done', response=json.dumps({'success': True, 'reference': 'BSF_w2'})))
+            db.session.commit()
+
+    computed = []
+    finisher = threading.Thread(target=finish_elsewhere)
+    finisher.start()
+    started = time.perf_counter()
+    with app.app_context():
+        result, replayed = run_once('other-worker', lambda: computed.append(1) or {'success': True})
+    waited = time.perf_counter() - started
+    finisher.join()
+    ok = result == {'success': True, 'reference': 'BSF_w2'} and replayed and not computed and waited >= 0.3
+    print(f"{'✅' if ok else '❌'} Waited {waited:.2f}s for the other worker's {result.get('reference')}, "
+          f"ran {len(computed)} times")
+    return ok
+
+def check_failure_releases_key(app):
+    """A failed or crashed flight stores nothing, so the next attempt runs"""
+    from idempotency import run_once
+
+    print("\n🔍 Testing a failed flight...")
+    attempts = []
+
+    def crash():
+        attempts.append('crash')
+        raise ConnectionError('Paystack unreachable')
+
+    with app.app_context():
+        failed, _ = run_once('retry-me', lambda: attempts.append('fail') or {'success': False, 'error': 'declined'})
+        try:
+            run_once('retry-me', crash)
+        except ConnectionError:
+            pass
+        succeeded, replayed = run_once('retry-me', lambda: attempts.append('ok') or {'success': True, 'n': 3})
+        again, again_replayed = run_once('retry-me', lambda: attempts.append('extra') or {'success': True})
+    ok = (failed['success'] is False and succeeded == {'success': True, 'n': 3} and not replayed
+          and again == succeeded and again_replayed and attempts == ['fail', 'crash', 'ok'])
+    print(f"{'✅' if ok else '❌'} Attempts {attempts}, then replayed {again}")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Idempotency Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app, stub = start_app(tmp)
+        results = [
+            check_concurrent_submissions_share_one_flight(app, stub),
+            check_later_duplicate_replayed(app, stub),
+            check_waits_for_other_worker(app),
+            check_failure_releases_key(app)
+        ]
+        stub.shutdown()
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test impact metrics against a throwaway database: the opening figures give
+the old totals, recorded events update the rollups and every precomputed
+figure at once (a repeated source key is a no-op), and the rollups equal a
+rebuild from the events while reads stay small with many events.
+"""
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from testing import setup_app
+
+TOKEN = 'admin-test-token'
+
+def check_opening_figures(app):
+    """Opening figures are recorded once and add up to the old hard-coded totals, also after a failed start"""
+    from unittest import mock
+    from app import FOUNDATION_STATS, CAMPAIGNS, feed, init_database
+    from impact import ensure_opening_impact
+    print("\n🔍 Testing the opening impact figures...")
+    client = app.test_client()
+    page = client.get('/campaign/3')
+    listing = client.get('/campaigns')
+    with app.app_context():
+        repeated = ensure_opening_impact(CAMPAIGNS)
+    # The rollups load, then a later start-up step fails and the static fallback runs
+    with mock.patch.object(feed, 'rebuild', side_effect=RuntimeError('feed unavailable')):
+        init_database()
+    fallback = FOUNDATION_STATS['lives_impacted']
+    init_database()
+    ok = (FOUNDATION_STATS['lives_impacted'] == 320 and fallback == 320 and repeated == [] and page.status_code == 200
+          and b'Exam Fees Sponsored' in page.data and b'85+' in page.data
+          and b'150 people helped' in listing.data)
+    print(f"{'✅' if ok else '❌'} {FOUNDATION_STATS['lives_impacted']} lives impacted; "
+          f"re-seeding recorded {len(repeated)} events")
+    return ok
+
+def check_recording(app):
+    """Recording updates rollups, campaign figures and lives_impacted; source keys dedupe"""
+    from app import FOUNDATION_STATS, impact
+    from models import ImpactRollup
+    print("\n🔍 Testing recorded events...")
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    anonymous = client.post('/admin/impact', json={'campaign_id': 2, 'metric': 'families_served', 'quantity': 5})
+    event = {'campaign_id': 2, 'metric': 'families_served', 'quantity': 30, 'date': '2025-12-25',
+             'source_key': 'utako-2025'}
+    first = client.post('/admin/impact', json=[event, {**event, 'metric': 'hygiene_packages', 'source_key': None}],
+                        headers=headers)
+    repeat = client.post('/admin/impact', json=event, headers=headers)
+    invalid = client.post('/admin/impact', json={**event, 'metric': 'smiles', 'source_key': None}, headers=headers)
+    form = client.post('/admin/impact', data={'campaign_id': '1', 'metric': 'bills_settled', 'quantity': '3'},
+                       auth=('staff', TOKEN))
+    with app.app_context():
+        day = ImpactRollup.query.filter_by(grain='day', metric='families_served',
+                                           period_start=datetime(2025, 12, 25)).one()
+    stats = {stat['metric']: stat['total'] for stat in impact.campaign_impact(2)}
+    ok = (anonymous.status_code == 401 and first.get_json()['recorded'] == 2
+          and repeat.get_json()['recorded'] == 0 and invalid.status_code == 400 and form.status_code == 302
+          and FOUNDATION_STATS['lives_impacted'] == 350 and impact.people_helped(2) == 180
+          and stats['hygiene_packages'] == 130 and day.total == 30 and day.event_count == 1
+          and {stat['metric']: stat['total'] for stat in impact.campaign_impact(1)}['bills_settled'] == 23)
+    print(f"{'✅' if ok else '❌'} Recorded {first.get_json()['recorded']}, repeat {repeat.get_json()['recorded']}; "
+          f"{FOUNDATION_STATS['lives_impacted']} lives impacted")
+    return ok
+
+def check_rollups_at_scale(app):
+    """Rollups equal a rebuild from the events; reads touch only the all-time rows"""
+    from app import impact
+    from impact import METRICS, load_impact_totals, rebuild_impact_rollups, record_events
+    from models import db, ImpactEvent, ImpactRollup
+    print("\n🔍 Testing rollups over many events...")
+    rng = random.Random(46)
+    now = datetime.utcnow()
+    metrics = list(METRICS)
+    started = time.perf_counter()
+    with app.app_context():
+        for batch in range(40):
+            record_events([{'campaign_id': rng.randint(1, 3), 'metric': rng.choice(metrics),
+                            'quantity': rng.randint(1, 20), 'occurred_at': now - timedelta(hours=rng.randint(0, 20000))}
+                           for _ in range(1000)])
+        recorded = time.perf_counter() - started
+
+        def table():
+            return {(row.grain, row.metric, row.campaign_id, row.period_start): (row.total, row.event_count)
+                    for row in ImpactRollup.query}
+
+        incremental = table()
+        with db.engine.begin() as conn:
+            rebuild_impact_rollups(conn)
+        rebuilt = table()
+        events = ImpactEvent.query.count()
+        started = time.perf_counter()
+        for _ in range(20):
+            totals = load_impact_totals()
+        read_ms = (time.perf_counter() - started) / 20 * 1000
+        impact.load()
+        expected = sum(total for metrics_totals in totals.values()
+                       for metric, total in metrics_totals.items() if METRICS[metric]['lives'])
+    total_rows = sum(1 for key in incremental if key[0] == 'total')
+    ok = (incremental == rebuilt and events > 40000 and total_rows <= 3 * len(METRICS)
+          and impact.people_helped() == expected and read_ms < 50)
+    print(f"{'✅' if ok else '❌'} {events:,} events recorded in {recorded:.1f}s; {len(incremental):,} rollup rows "
+          f"match a rebuild; totals read {total_rows} rows in {read_ms:.2f} ms")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Impact Metrics Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'impact-test.db', ADMIN_TOKEN=TOKEN)
+        results = [
+            check_opening_figures(app),
+            check_recording(app),
+            check_rollups_at_scale(app)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
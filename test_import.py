@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test the donation importer against a throwaway database: re-importing a
+file never double counts, an interrupted import resumes from its checkpoint
+without losing, repeating or re-rejecting rows, offsets are stored as UTC,
+and memory stays flat as the file grows.
+"""
+import csv
+import json
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from unittest import mock
+from testing import setup_app
+
+def write_csv(path, count, prefix, reject_every=0):
+    """count NGN donations over three campaigns; every reject_every-th row has no amount"""
+    start = datetime.utcnow() - timedelta(days=20)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['reference', 'campaign_id', 'amount', 'currency', 'date', 'status'])
+        for n in range(count):
+            amount = '' if reject_every and n % reject_every == reject_every - 1 else f'{500 + n % 50}.25'
+            writer.writerow([f'{prefix}_{n}', 1 + n % 3, amount, 'NGN',
+                             (start + timedelta(minutes=n)).strftime('%Y-%m-%dT%H:%M:%S'), 'success'])
+
+def ledger_state(prefix):
+    """(rows, summed amount) for the imported references and the campaigns' raised total"""
+    from sqlalchemy import func
+    from models import db, Campaign, Transaction
+    rows, amount = db.session.query(func.count(), func.coalesce(func.sum(Transaction.amount), 0)).filter(
+        Transaction.transaction_id.like(f'{prefix}_%')).one()
+    return rows, int(amount), int(db.session.scalar(db.select(func.sum(Campaign.raised_amount))))
+
+def check_reimport_is_idempotent(app, tmp):
+    """Importing the same file twice adds its donations once; offsets are converted to UTC"""
+    from importer import import_donations
+    from models import db, Transaction
+
+    print("\n🔍 Testing a repeated import...")
+    path = os.path.join(tmp, 'repeat.csv')
+    write_csv(path, 1000, 'REP')
+    with open(path, 'a', newline='') as f:
+        csv.writer(f).writerow(['REP_offset', 1, '1000', 'NGN', '2024-01-01T10:00+01:00', 'success'])
+    with app.app_context():
+        _, _, raised_before = ledger_state('REP')
+        first = import_donations(path, batch_size=128, resume=False)
+        after_first = ledger_state('REP')
+        second = import_donations(path, batch_size=128, resume=False)
+        after_second = ledger_state('REP')
+        offset = db.session.scalar(db.select(Transaction.created_at).where(Transaction.transaction_id == 'REP_offset'))
+        db.session.remove()
+    rows, amount, raised = after_first
+    ok = (first['imported'] == 1001 and second['imported'] == 0 and second['duplicates'] == 1001
+          and after_second == after_first and rows == 1001 and raised - raised_before == amount
+          and offset == datetime(2024, 1, 1, 9, 0))
+    print(f"{'✅' if ok else '❌'} First run {first['imported']} imported, second {second['duplicates']} duplicates; "
+          f"10:00+01:00 stored as {offset:%H:%M} UTC")
+    return ok
+
+def check_resume_after_interruption(app, tmp):
+    """A crash mid-import loses nothing on resume and lists every reject once"""
+    import importer
+
+    print("\n🔍 Testing resume after an interruption...")
+    path = os.path.join(tmp, 'resume.csv')
+    write_csv(path, 2000, 'RES', reject_every=10)
+    flush_batch, calls = importer.flush_batch, []
+
+    def crash_on_fifth(batch):
+        calls.append(len(batch))
+        if len(calls) == 5:
+            raise ConnectionError('database went away')
+        return flush_batch(batch)
+
+    with app.app_context():
+        _, _, raised_before = ledger_state('RES')
+        try:
+            with mock.patch('importer.flush_batch', crash_on_fifth):
+                importer.import_donations(path, batch_size=100)
+            crashed = False
+        except ConnectionError:
+            crashed = True
+        interrupted = ledger_state('RES')
+        resumed = importer.import_donations(path, batch_size=100)
+        rows, amount, raised = ledger_state('RES')
+        importer.db.session.remove()
+    with open(f'{path}.rejects.jsonl') as f:
+        rejected_lines = [json.loads(line)['line'] for line in f]
+    # Batches count valid rows: four committed batches of 100 end at line 444
+    ok = (crashed and interrupted[0] == 400 and resumed['resumed_from'] == 444 and rows == 1800
+          and raised - raised_before == amount and resumed['duplicates'] == 0
+          and sorted(rejected_lines) == list(range(10, 2001, 10)) and len(set(rejected_lines)) == 200)
+    print(f"{'✅' if ok else '❌'} Crashed after {interrupted[0]} rows, resumed after line {resumed['resumed_from']}: "
+          f"{rows} rows, {len(rejected_lines)} rejects listed")
+    return ok
+
+def check_memory_is_bounded(app, tmp):
+    """Peak memory of an import does not grow with the size of the file"""
+    from importer import import_donations
+    from models import db
+
+    print("\n🔍 Testing memory use...")
+    peaks = {}
+    for count in (2000, 20000):
+        path = os.path.join(tmp, f'memory-{count}.csv')
+        write_csv(path, count, f'MEM{count}')
+        with app.app_context():
+            tracemalloc.start()
+            summary = import_donations(path, batch_size=500, resume=False)
+            peaks[count] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            db.session.remove()
+        peaks[count] = (peaks[count], summary['imported'])
+    (small, small_rows), (large, large_rows) = peaks[2000], peaks[20000]
+    ok = small_rows == 2000 and large_rows == 20000 and large < small * 1.5
+    print(f"{'✅' if ok else '❌'} Peak {small / 1024:,.0f} KB for 2,000 rows, {large / 1024:,.0f} KB for 20,000")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Donation Import Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'import-test.db')
+        results = [
+            check_reimport_is_idempotent(app, tmp),
+            check_resume_after_interruption(app, tmp),
+            check_memory_is_bounded(app, tmp)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test the contact endpoint and background mail queue against a local SMTP sink.
+Runs entirely offline: a throwaway SQLite database and an SMTP server on
+127.0.0.1 that stores messages instead of delivering them.
+"""
+import socketserver
+import tempfile
+import threading
+from testing import setup_app
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that records every message it receives"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.messages = []
+        self.connections = 0
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 sink ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode(errors='replace').rstrip('\r\n')
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 sink')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip(' <>'))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline().decode(errors='replace')
+                    if data_line in ('.\r\n', '.\n', ''):
+                        break
+                    lines.append(data_line)
+                self.server.messages.append({'to': recipients, 'data': ''.join(lines)})
+                self.reply('250 OK queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+def check_contact_submission_is_queued_and_sent(app, sink):
+    """A valid contact message is queued, deduplicated within the hour and delivered once"""
+    from datetime import datetime, timedelta
+    from app import contact_dedupe_key
+    from mailer import drain_outbox
+    from models import OutboxMessage
+
+    client = app.test_client()
+    payload = {
+        'first_name': 'Ada',
+        'last_name': 'Obi',
+        'email': 'ada@example.com',
+        'subject': 'volunteering',
+        'message': 'I would like to volunteer at the next food drive.'
+    }
+    first = client.post('/contact', json=payload, headers={'Accept': 'application/json'})
+    repeat = client.post('/contact', json=payload, headers={'Accept': 'application/json'})
+    invalid = client.post('/contact', json={'email': 'nope'}, headers={'Accept': 'application/json'})
+
+    with app.app_context():
+        queued = OutboxMessage.query.filter_by(kind='contact').count()
+
+    now = datetime.utcnow().replace(minute=30)
+    follow_up = contact_dedupe_key(payload, now + timedelta(hours=1)) != contact_dedupe_key(payload, now)
+    totals = drain_outbox(app)
+    ok = (first.json['success'] and repeat.json['success'] and invalid.status_code == 400
+          and queued == 1 and follow_up and totals['sent'] == 1 and len(sink.messages) == 1
+          and 'volunteer at the next food drive' in sink.messages[0]['data'])
+    print(f"{'✅' if ok else '❌'} Contact message queued once and delivered ({totals})")
+    return ok
+
+def check_receipts_batch_over_one_connection(app, sink):
+    """Several receipts are delivered in one batch over a single SMTP connection"""
+    from mailer import enqueue_mail, drain_outbox
+
+    connections_before = sink.connections
+    messages_before = len(sink.messages)
+    with app.app_context():
+        for i in range(5):
+            enqueue_mail('receipt', f'donor{i}@example.com', 'Thank you', 'Receipt body', dedupe_key=f'receipt:TEST{i}')
+        duplicate = enqueue_mail('receipt', 'donor0@example.com', 'Thank you', 'Receipt body', dedupe_key='receipt:TEST0')
+
+    totals = drain_outbox(app)
+    ok = (not duplicate and totals['sent'] == 5 and len(sink.messages) - messages_before == 5
+          and sink.connections - connections_before == 1)
+    print(f"{'✅' if ok else '❌'} Receipts deduplicated and sent over one connection ({totals})")
+    return ok
+
+def check_failed_delivery_is_retried(app, sink):
+    """When SMTP is unreachable, messages are rescheduled with backoff instead of lost"""
+    from mailer import enqueue_mail, drain_outbox
+    from models import OutboxMessage
+
+    with app.app_context():
+        enqueue_mail('receipt', 'retry@example.com', 'Thank you', 'Receipt body', dedupe_key='receipt:RETRY')
+
+    port = app.config['MAIL_PORT']
+    app.config['MAIL_PORT'] = 1  # Nothing listens here
+    totals = drain_outbox(app)
+    app.config['MAIL_PORT'] = port
+
+    with app.app_context():
+        message = OutboxMessage.query.filter_by(dedupe_key='receipt:RETRY').one()
+        ok = (totals['failed'] == 1 and message.status == 'queued'
+              and message.attempts == 1 and message.next_attempt_at > message.created_at)
+    print(f"{'✅' if ok else '❌'} Unreachable SMTP schedules a retry (attempts={message.attempts})")
+    return ok
+
+def check_delivered_messages_are_purged(app, sink):
+    """Messages delivered longer ago than MAIL_RETENTION_DAYS are deleted; undelivered ones stay"""
+    from datetime import datetime, timedelta
+    from mailer import purge_sent
+    from models import OutboxMessage, db
+
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=app.config['MAIL_RETENTION_DAYS'] + 1)
+        OutboxMessage.query.filter_by(dedupe_key='receipt:TEST0').update({'sent_at': old})
+        db.session.commit()
+        before = OutboxMessage.query.count()
+        deleted = purge_sent(app.config['MAIL_RETENTION_DAYS'])
+        remaining = {message.dedupe_key for message in OutboxMessage.query}
+    ok = (deleted == 1 and len(remaining) == before - 1 and 'receipt:TEST0' not in remaining
+          and 'receipt:TEST1' in remaining and 'receipt:RETRY' in remaining)
+    print(f"{'✅' if ok else '❌'} Purged {deleted} expired message(s); {len(remaining)} kept")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Mail Queue Test")
+    print("=" * 50)
+
+    sink = SMTPSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The sender thread stays off: the test drains the outbox itself
+        app = setup_app(tmp, 'mail-test.db', MAIL_SERVER='127.0.0.1', MAIL_PORT=sink.server_address[1])
+        results = [
+            check_contact_submission_is_queued_and_sent(app, sink),
+            check_receipts_batch_over_one_connection(app, sink),
+            check_failed_delivery_is_retried(app, sink),
+            check_delivered_messages_are_purged(app, sink)
+        ]
+
+    sink.shutdown()
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
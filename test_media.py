@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test media deduplication on a throwaway static folder: byte-identical copies,
+re-encoded and downscaled copies, and genuinely different photos.
+"""
+import os
+import shutil
+import tempfile
+from PIL import Image, ImageDraw
+
+from media import group_duplicates, scan
+
+def make_photo(path, seed, size=(1200, 800)):
+    """A synthetic photo with distinct structure per seed"""
+    image = Image.new('RGB', size, (20 * seed % 255, 90, 160))
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        x = (seed * 97 + i * 131) % size[0]
+        y = (seed * 53 + i * 71) % size[1]
+        draw.ellipse((x, y, x + 180, y + 140), fill=((seed * 40 + i * 20) % 255, (i * 35) % 255, 255 - i * 15))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image.save(path, 'JPEG', quality=92)
+
+def setup_static(tmp):
+    static = os.path.join(tmp, 'static')
+    campaigns = os.path.join(static, 'campaigns')
+    make_photo(os.path.join(campaigns, 'a', 'main.jpg'), 1)
+    make_photo(os.path.join(campaigns, 'b', 'main.jpg'), 2)
+    make_photo(os.path.join(campaigns, 'c', 'gallery-1.jpg'), 3)
+    # Exact copy under another name
+    shutil.copy(os.path.join(campaigns, 'a', 'main.jpg'), os.path.join(campaigns, 'WhatsApp Image 1.jpg'))
+    # Same photo, downscaled and re-saved as WebP
+    with Image.open(os.path.join(campaigns, 'b', 'main.jpg')) as image:
+        image.resize((600, 400)).save(os.path.join(campaigns, 'b', 'gallery-2.webp'), 'WEBP', quality=60)
+    return static
+
+def check_duplicates_are_grouped(static):
+    """Exact and near-duplicates map to the highest-resolution copy; distinct photos stay apart"""
+    print("\n🔍 Testing duplicate grouping...")
+    index = scan(static, workers=2, chunk_size=2)
+    expected = {
+        'campaigns/WhatsApp Image 1.jpg': 'campaigns/a/main.jpg',
+        'campaigns/b/gallery-2.webp': 'campaigns/b/main.jpg',
+    }
+    if len(index['files']) == 5 and index['canonical'] == expected:
+        print("✅ 2 duplicates found, canonical copies kept")
+        return True
+    print(f"❌ Unexpected grouping: {index['canonical']}")
+    return False
+
+def check_rescan_reuses_entries(static):
+    """Unchanged files keep their entries; a new file is fingerprinted"""
+    print("\n🔍 Testing incremental rescan...")
+    first = scan(static, workers=1)
+    make_photo(os.path.join(static, 'campaigns', 'd', 'main.jpg'), 4)
+    second = scan(static, previous=first, workers=1)
+    reused = all(second['files'][path] is entry for path, entry in first['files'].items())
+    if reused and 'campaigns/d/main.jpg' in second['files']:
+        print("✅ Rescan reused existing entries")
+        return True
+    print("❌ Rescan did not reuse entries")
+    return False
+
+def check_threshold_zero_keeps_near_duplicates():
+    """With threshold 0 only identical hashes group"""
+    print("\n🔍 Testing threshold...")
+    files = {
+        'x.jpg': {'sha256': 'a', 'dhash': 'ffffffffffffffff', 'width': 10, 'height': 10},
+        'y.jpg': {'sha256': 'b', 'dhash': 'fffffffffffffffe', 'width': 20, 'height': 20},
+    }
+    if group_duplicates(files, threshold=0) == {} and group_duplicates(files, threshold=1) == {'x.jpg': 'y.jpg'}:
+        print("✅ Threshold respected")
+        return True
+    print("❌ Threshold ignored")
+    return False
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Media Deduplication Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        static = setup_static(tmp)
+        results = [
+            check_duplicates_are_grouped(static),
+            check_rescan_reuses_entries(static),
+            check_threshold_zero_keeps_near_duplicates()
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test integer minor-unit money: donor input parses to exact minor units or
+is rejected, rounding is half up (away from zero) in both the Decimal and
+the integer-only paths, formatting agrees with exact arithmetic on both
+sides of the fast-path limit, and Money refuses floats and mixed currencies.
+"""
+import random
+from decimal import Decimal
+
+def check_parsing(cases, rejected):
+    """Major-unit input converts to exact minor units; too many decimals or junk raise ValueError"""
+    from money import to_minor_units
+
+    print("\n🔍 Testing amount parsing...")
+    wrong = [(amount, currency, to_minor_units(amount, currency), minor) for amount, currency, minor in cases
+             if to_minor_units(amount, currency) != minor]
+    accepted = []
+    for amount, currency in rejected:
+        try:
+            accepted.append((amount, currency, to_minor_units(amount, currency)))
+        except ValueError:
+            pass
+    ok = not wrong and not accepted
+    print(f"{'✅' if ok else '❌'} {len(cases)} amounts parsed exactly, {len(rejected)} rejected"
+          + (f"; wrong {wrong}" if wrong else '') + (f"; accepted {accepted}" if accepted else ''))
+    return ok
+
+def check_half_up_rounding():
+    """round_minor_units, scale_minor and Money * rate all round half away from zero"""
+    from money import Money, round_minor_units, scale_minor
+
+    print("\n🔍 Testing half-up rounding...")
+    results = {
+        "round '1.005'": (round_minor_units('1.005', 'NGN'), 101),
+        "round '1.0049'": (round_minor_units('1.0049', 'NGN'), 100),
+        "round '-1.005'": (round_minor_units('-1.005', 'NGN'), -101),
+        "round '0.005'": (round_minor_units('0.005', 'USD'), 1),
+        "round 100.29": (round_minor_units(100.29, 'NGN'), 10029),
+        'scale 5 * 1/2': (scale_minor(5, 1, 2), 3),
+        'scale -5 * 1/2': (scale_minor(-5, 1, 2), -3),
+        'scale 7 * 1/3': (scale_minor(7, 1, 3), 2),
+        'scale 1 * 1/3': (scale_minor(1, 1, 3), 0),
+        'scale -1 * 2/3': (scale_minor(-1, 2, 3), -1),
+        "10029 * '1.5'": ((Money(10029) * '1.5').amount, 15044),
+        "-10029 * '1.5'": ((Money(-10029) * '1.5').amount, -15044),
+        "from_major '0.005'": (Money.from_major('0.005').amount, 1),
+    }
+    # The integer path agrees with Decimal half-up rounding on random fractions
+    rng = random.Random(7)
+    for _ in range(2000):
+        amount, numerator, denominator = rng.randint(-10 ** 9, 10 ** 9), rng.randint(1, 10 ** 6), rng.randint(1, 10 ** 6)
+        exact = round_minor_units(Decimal(amount * numerator) / Decimal(denominator) / 100, 'NGN')
+        if scale_minor(amount, numerator, denominator) != exact:
+            results[f'scale {amount} * {numerator}/{denominator}'] = (scale_minor(amount, numerator, denominator), exact)
+    wrong = {name: values for name, values in results.items() if values[0] != values[1]}
+    ok = not wrong
+    print(f"{'✅' if ok else '❌'} {len(results) - len(wrong)} roundings correct, 2,000 random fractions checked"
+          + (f"; wrong {wrong}" if wrong else ''))
+    return ok
+
+def check_formatting():
+    """The float fast path formats exactly like integer divmod, including at its limit"""
+    from money import _FAST_FORMAT_LIMIT, format_minor
+
+    print("\n🔍 Testing formatting...")
+    def exact(amount, symbol='₦'):
+        major, minor = divmod(abs(amount), 100)
+        return f"{'-' if amount < 0 else ''}{symbol}{major:,}.{minor:02d}"
+
+    rng = random.Random(11)
+    samples = [0, 1, 5, 99, 100, 10029, -5, -10029, _FAST_FORMAT_LIMIT - 1, _FAST_FORMAT_LIMIT,
+               -_FAST_FORMAT_LIMIT + 1, 10 ** 15 + 1]
+    samples += [rng.randint(-_FAST_FORMAT_LIMIT, _FAST_FORMAT_LIMIT) for _ in range(20000)]
+    wrong = [(amount, format_minor(amount, 'NGN')) for amount in samples if format_minor(amount, 'NGN') != exact(amount)]
+    named = format_minor(10029, 'NGN') == '₦100.29' and format_minor(-5, 'USD') == '-$0.05'
+    ok = not wrong and named
+    print(f"{'✅' if ok else '❌'} {len(samples) - len(wrong)}/{len(samples)} amounts formatted exactly"
+          + (f"; wrong {wrong[:5]}" if wrong else ''))
+    return ok
+
+def check_money_guards():
+    """Money takes only integer minor units, is immutable and never mixes currencies"""
+    from money import Money
+
+    print("\n🔍 Testing Money guards...")
+    refused = []
+    for name, attempt, error in [
+            ('float amount', lambda: Money(100.29), TypeError),
+            ('bool amount', lambda: Money(True), TypeError),
+            ('unknown currency', lambda: Money(100, 'XYZ'), ValueError),
+            ('mixed addition', lambda: Money(100, 'NGN') + Money(100, 'USD'), ValueError),
+            ('mixed comparison', lambda: Money(100, 'NGN') < Money(100, 'USD'), ValueError),
+            ('mixed sum', lambda: Money.sum([Money(1, 'USD')], 'NGN'), ValueError),
+            ('assignment', lambda: setattr(Money(1), 'amount', 2), AttributeError)]:
+        try:
+            attempt()
+        except error:
+            refused.append(name)
+    total = Money.sum([Money(10029), Money(-29), Money(0)])
+    ok = len(refused) == 7 and total == Money(10000) and str(total) == '₦100.00' and total.major == Decimal('100.00')
+    print(f"{'✅' if ok else '❌'} {len(refused)}/7 misuses refused, sum {total}")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Money Test")
+    print("=" * 50)
+
+    results = [
+        check_parsing(
+            [('100.29', 'NGN', 10029), (100.29, 'NGN', 10029), ('1,000.50', 'NGN', 100050), (' 5000 ', 'NGN', 500000),
+             ('0.01', 'USD', 1), (Decimal('19.99'), 'USD', 1999), ('-0.10', 'GHS', -10), ('1e3', 'ZAR', 100000)],
+            [('100.295', 'NGN'), ('0.001', 'USD'), ('abc', 'NGN'), ('', 'NGN'), ('nan', 'NGN'), ('inf', 'NGN'),
+             ('100', 'XYZ')]),
+        check_half_up_rounding(),
+        check_formatting(),
+        check_money_guards()
+    ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test the generated service worker: it precaches exactly the fingerprinted
+app shell from the asset manifest and is revalidated on every update check,
+it can never answer donation, payment or form routes, pages that showed a
+flashed message opt out of its cache, and disabling it serves a worker that
+removes itself.
+"""
+import re
+import tempfile
+from testing import setup_app
+
+def check_precache_from_manifest(app):
+    """sw.js lists the shell's fingerprinted URLs, each of them serves, and update checks get a 304"""
+    print("\n🔍 Testing the precached app shell...")
+    client = app.test_client()
+    worker = client.get('/sw.js')
+    script = worker.data.decode()
+    with app.test_request_context():
+        settings = app.extensions['service_worker'].settings()
+        expected = {app.extensions['asset_manifest'].asset_url(name)
+                    for name in ('css/main.css', 'css/fonts.css', 'js/main.js', 'images/logo.png',
+                                 'fonts/inter-latin.woff2')}
+    page = client.get('/campaign/1').data.decode()
+    statuses = {url: client.get(url).status_code for url in settings['precache']}
+    revalidated = client.get('/sw.js', headers={'If-None-Match': worker.headers['ETag']})
+    ok = (worker.status_code == 200 and worker.mimetype == 'application/javascript'
+          and 'no-cache' in worker.headers['Cache-Control'] and revalidated.status_code == 304
+          and expected <= set(settings['precache']) and all(url in page for url in expected)
+          and all(re.search(r'\?v=\w+$', url) for url in settings['precache'])
+          and set(statuses.values()) == {200} and settings['version'] in script
+          and all(url in script for url in settings['precache']))
+    print(f"{'✅' if ok else '❌'} {len(settings['precache'])} shell URLs precached (version {settings['version']}); "
+          f"update check {revalidated.status_code}")
+    return ok
+
+def check_never_cached_routes(app):
+    """Only the public pages are stale-while-revalidate; donation, payment and form routes are bypassed"""
+    print("\n🔍 Testing which routes the worker may cache...")
+    with app.test_request_context():
+        settings = app.extensions['service_worker'].settings()
+    patterns = [re.compile(source) for source in settings['pages']]
+
+    def page(path):
+        return any(pattern.search(path) for pattern in patterns)
+
+    def bypassed(path):
+        return any(path.startswith(prefix) for prefix in settings['never'])
+
+    private = ['/process-donation', '/paystack/callback', '/paystack/webhook', '/donate/verify/REF_1',
+               '/donate/success/1', '/donate/error', '/contact', '/admin/reports']
+    public = ['/', '/about', '/campaigns', '/campaign/1', '/campaign/42']
+    ok = (all(bypassed(path) and not page(path) for path in private)
+          and all(page(path) and not bypassed(path) for path in public)
+          and not page('/campaign/1/extra') and not page('/campaigns.json'))
+    print(f"{'✅' if ok else '❌'} {len(public)} page URLs cached, {len(private)} private URLs never touched")
+    return ok
+
+def check_flash_and_disable(app):
+    """A page showing a flashed error is no-store; disabled, the worker unregisters and is not registered"""
+    print("\n🔍 Testing flashed pages and the off switch...")
+    client = app.test_client()
+    plain = client.get('/campaign/1')
+    client.post('/process-donation', data={'campaign_id': '1', 'email': 'donor@example.com', 'amount': '0'})
+    flashed = client.get('/campaign/1')
+    after = client.get('/campaign/1')
+    app.config['SERVICE_WORKER_ENABLED'] = False
+    try:
+        off = client.get('/sw.js').data.decode()
+        unregistered = client.get('/').data.decode()
+    finally:
+        app.config['SERVICE_WORKER_ENABLED'] = True
+    ok = (b'serviceWorker.register' in plain.data and 'no-store' not in plain.headers.get('Cache-Control', '')
+          and b'valid donation amount' in flashed.data and 'no-store' in flashed.headers.get('Cache-Control', '')
+          and 'no-store' not in after.headers.get('Cache-Control', '')
+          and 'unregister()' in off and 'addAll' not in off and 'serviceWorker.register' not in unregistered)
+    print(f"{'✅' if ok else '❌'} Flashed page Cache-Control: {flashed.headers.get('Cache-Control')}; "
+          f"disabled worker unregisters")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Service Worker Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'offline-test.db')
+        results = [
+            check_precache_from_manifest(app),
+            check_never_cached_routes(app),
+            check_flash_and_disable(app)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression test for the Transaction ledger.
+
+Seeds a ledger of a million donations (or the size given) and checks that
+every hot query in ledger.py is answered from an index. Exits non-zero if any
+of them falls back to a sequential scan of the transaction table.
+
+Usage:
+    python test_query_plans.py [rows] [database_url]
+
+Without a URL it uses a temporary SQLite file. Pass a throwaway PostgreSQL
+database to check the covering/partial Postgres indexes; it is seeded once
+and reused on later runs.
+"""
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import func, insert, select
+from config import Config
+from database import init_db
+from ledger import (
+    successful_totals_query, pending_transactions_query, recent_donations_query, export_transactions_query,
+    inserted_since_query
+)
+from migrations import upgrade
+from models import db, Campaign, Transaction
+
+CAMPAIGN_COUNT = 20
+SQLITE_SEQ_SCAN = re.compile(r'^SCAN (TABLE )?"?transaction"?( AS \w+)?$')
+
+def make_app(database_url):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    init_db(app)
+    return app
+
+def seed_ledger(rows, chunk_size=50_000):
+    """Insert rows synthetic donations: mostly successful, some failed, a few pending"""
+    existing = db.session.scalar(select(func.count()).select_from(Transaction))
+    if existing >= rows:
+        print(f"📦 Reusing {existing:,} seeded transactions")
+        return
+
+    for campaign_id in range(1, CAMPAIGN_COUNT + 1):
+        if db.session.get(Campaign, campaign_id) is None:
+            db.session.add(Campaign(id=campaign_id, title=f'Plan test {campaign_id}', description='Seeded',
+                                    goal_amount=10**12, raised_amount=0, currency='NGN'))
+    db.session.commit()
+
+    random.seed(7)
+    start = datetime.utcnow() - timedelta(days=730)
+    started = time.perf_counter()
+    for offset in range(existing, rows, chunk_size):
+        batch = []
+        for i in range(offset, min(offset + chunk_size, rows)):
+            created_at = start + timedelta(seconds=random.randint(0, 730 * 86400))
+            status = random.choices(('success', 'failed', 'pending'), weights=(90, 8, 2))[0]
+            amount = random.randint(1000, 5000000) * 100
+            batch.append({
+                'transaction_id': f'PLAN_{i}',
+                'campaign_id': random.randint(1, CAMPAIGN_COUNT),
+                'amount': amount,
+                'currency': 'NGN',
+                'fx_rate': 1,
+                'campaign_amount': amount,
+                'payment_method': 'paystack',
+                'status': status,
+                'created_at': created_at,
+                'completed_at': created_at + timedelta(minutes=2) if status == 'success' else None
+            })
+        db.session.execute(insert(Transaction), batch)
+        db.session.commit()
+    print(f"📦 Seeded {rows - existing:,} transactions in {time.perf_counter() - started:.1f}s")
+
+    db.session.execute(db.text('ANALYZE "transaction"'))
+    db.session.commit()
+
+def explain(statement):
+    """Return (plan lines, sequential scan found) for a SELECT statement"""
+    connection = db.session.connection()
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', params).scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        nodes = []
+        def walk(node, depth=0):
+            nodes.append(('  ' * depth) + f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name') or ''}".strip())
+            for child in node.get('Plans', []):
+                walk(child, depth + 1)
+            return node
+        walk(plan[0]['Plan'])
+        seq_scan = any(line.strip() == 'Seq Scan transaction' for line in nodes)
+        return nodes, seq_scan
+
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+    details = [row[-1] for row in rows]
+    return details, any(SQLITE_SEQ_SCAN.match(detail) for detail in details)
+
+def hot_queries():
+    """The ledger queries that must never scan the whole table"""
+    now = datetime.utcnow()
+    return [
+        ('Donation lookup by reference', select(Transaction).where(Transaction.transaction_id == 'PLAN_12345')),
+        ('Successful totals for one campaign', successful_totals_query(7)),
+        ('Pending donations older than 30 minutes', pending_transactions_query(now - timedelta(minutes=30), 100)),
+        ('Recent donations', recent_donations_query(20)),
+        ('Donations inserted after an id', inserted_since_query(1_000_000, 1000)),
+        ('Recent donations for one campaign', recent_donations_query(20, campaign_id=7)),
+        ("Export of last month's donations", export_transactions_query(now - timedelta(days=30), now)),
+    ]
+
+def check_detector_flags_sequential_scan():
+    """Sanity check: an unindexed filter must be reported as a sequential scan"""
+    _, seq_scan = explain(select(Transaction).where(Transaction.payment_method == 'stripe'))
+    print(f"{'✅' if seq_scan else '❌'} Unindexed query is detected as a sequential scan")
+    return seq_scan
+
+def check_hot_queries_use_indexes():
+    """Every hot query is planned with an index"""
+    ok = True
+    for label, statement in hot_queries():
+        plan, seq_scan = explain(statement)
+        start = time.perf_counter()
+        db.session.execute(statement).all()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{'❌' if seq_scan else '✅'} {label} ({elapsed:.1f} ms)")
+        for line in plan:
+            print(f"      {line}")
+        ok = ok and not seq_scan
+    return ok
+
+def main():
+    """Run all tests"""
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    database_url = sys.argv[2] if len(sys.argv) > 2 else None
+
+    print("🧪 Black Shepherd Foundation - Query Plan Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(database_url or f"sqlite:///{os.path.join(tmp, 'plans.db')}")
+        with app.app_context():
+            upgrade()
+            seed_ledger(rows)
+            results = [check_detector_flags_sequential_scan(), check_hot_queries_use_indexes()]
+            db.session.remove()
+            db.engine.dispose()
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
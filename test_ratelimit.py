@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test the token-bucket rate limiter on both backends with a fake clock:
+buckets deny once empty and say how long to wait, refill continuously up to
+their capacity, and a request denied by one rule spends nothing from its
+others. The memory backend stays within max_keys, and a rate-limited view
+answers 429 with Retry-After.
+"""
+import os
+import tempfile
+from testing import setup_app
+
+class FakeClock:
+    """Clock the test moves by hand"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def backends(tmp):
+    """(name, backend) for the in-process and the memory-mapped backend"""
+    from ratelimit import MemoryBackend, SharedBackend
+
+    return [('memory', MemoryBackend()), ('shared', SharedBackend(os.path.join(tmp, 'ratelimit.bin'), slots=4096))]
+
+def check_denial_and_refill(tmp):
+    """3/3seconds: three hits pass, the fourth waits a second, tokens refill and cap at capacity"""
+    from ratelimit import RateLimiter
+
+    print("\n🔍 Testing bucket denial and refill...")
+    results = []
+    for name, backend in backends(tmp):
+        clock = FakeClock()
+        limiter = RateLimiter(backend, {'burst': '3/3seconds'}, clock=clock)
+        burst = [limiter.hit('burst', 'client') for _ in range(4)]
+        clock.now += 0.5
+        half = limiter.hit('burst', 'client')  # Half a token back: still denied
+        clock.now += 0.5
+        refilled = [limiter.hit('burst', 'client') for _ in range(2)]
+        clock.now += 3600
+        capped = [limiter.hit('burst', 'client') for _ in range(4)]
+        other = limiter.hit('burst', 'another client')
+        ok = (burst[:3] == [0.0, 0.0, 0.0] and abs(burst[3] - 1.0) < 1e-9 and abs(half - 0.5) < 1e-9
+              and refilled[0] == 0.0 and refilled[1] > 0 and capped[:3] == [0.0, 0.0, 0.0] and capped[3] > 0
+              and other == 0.0)
+        print(f"{'✅' if ok else '❌'} {name}: waits {[round(wait, 3) for wait in burst + [half] + refilled]}, "
+              f"{sum(not wait for wait in capped)} passed after an hour idle")
+        results.append(ok)
+    return all(results)
+
+def check_denied_check_spends_nothing(tmp):
+    """A check denied by its IP rule leaves the email bucket untouched"""
+    from ratelimit import RateLimiter
+
+    print("\n🔍 Testing a denied multi-rule check...")
+    results = []
+    for name, backend in backends(tmp):
+        clock = FakeClock()
+        limiter = RateLimiter(backend, {'ip': '2/minute', 'email': '10/minute'}, clock=clock)
+        hits = [('ip', '10.0.0.1'), ('email', 'donor@example.com'), ('email', None)]
+        allowed = [limiter.check(hits) for _ in range(2)]
+        denied = [limiter.check(hits) for _ in range(20)]
+        # Two tokens were spent by the allowed checks; the denied ones must not have spent any
+        email_left = sum(not limiter.hit('email', 'donor@example.com') for _ in range(20))
+        ok = allowed == [0.0, 0.0] and all(abs(wait - 30.0) < 1e-9 for wait in denied) and email_left == 8
+        print(f"{'✅' if ok else '❌'} {name}: {len(denied)} denied checks waited {denied[0]:.0f}s, "
+              f"{email_left}/8 email tokens left")
+        results.append(ok)
+    return all(results)
+
+def check_memory_bounded():
+    """The memory backend never tracks more than max_keys, evicting the least recently used"""
+    from ratelimit import MemoryBackend, RateLimiter
+
+    print("\n🔍 Testing the memory backend bound...")
+    backend = MemoryBackend(max_keys=100)
+    limiter = RateLimiter(backend, {'ip': '1/hour', 'email': '1/hour'}, clock=FakeClock())
+    limiter.hit('ip', 'kept')
+    for n in range(10000):
+        limiter.hit('ip', 'kept')  # Recently used, so never evicted
+        limiter.check([('ip', f'10.0.{n // 256}.{n % 256}'), ('email', f'donor{n}@example.com')])
+    ok = len(backend) == 100 and 'ip:kept' in backend._buckets and 'ip:10.0.0.0' not in backend._buckets
+    print(f"{'✅' if ok else '❌'} {len(backend)} keys tracked after 20,001 distinct keys")
+    return ok
+
+def check_view_returns_429(app):
+    """The fourth contact message in an hour from one IP gets 429 and Retry-After; other IPs are unaffected"""
+    print("\n🔍 Testing a rate-limited view...")
+    client = app.test_client()
+    def post(n, ip):
+        # The honeypot field skips validation and mail: only the limiter is exercised
+        return client.post('/contact', json={'email': f'sender{n}@example.com', 'website': 'x'},
+                           headers={'Accept': 'application/json'}, environ_base={'REMOTE_ADDR': ip})
+
+    statuses = [post(n, '192.0.2.1').status_code for n in range(3)]
+    denied = post(3, '192.0.2.1')
+    elsewhere = post(4, '192.0.2.2')
+    ok = (statuses == [200, 200, 200] and denied.status_code == 429
+          and denied.headers.get('Retry-After') in ('1200', '1201') and denied.get_json()['success'] is False and elsewhere.status_code == 200)
+    print(f"{'✅' if ok else '❌'} Statuses {statuses + [denied.status_code]}, "
+          f"Retry-After {denied.headers.get('Retry-After')}, other IP {elsewhere.status_code}")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Rate Limit Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'ratelimit-test.db', RATE_LIMIT_ENABLED='true', RATE_LIMIT_BACKEND='memory',
+                        RATE_LIMIT_CONTACT_IP='3/hour', RATE_LIMIT_CONTACT_EMAIL='3/hour')
+        results = [
+            check_denial_and_refill(tmp),
+            check_denied_check_spends_nothing(tmp),
+            check_memory_bounded(),
+            check_view_returns_429(app)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
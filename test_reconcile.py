@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test background reconciliation against the local Paystack stub and a
+throwaway database: pending Paystack donations are verified and settled in
+bulk, while pending offline donations from the importer are never sent to
+Paystack and never failed.
+"""
+import csv
+import os
+import tempfile
+from datetime import datetime, timedelta
+from testing import setup_app
+
+def start_app(tmp):
+    """Start the stub and import the app against it and a temporary database (passes are run by the test)"""
+    from paystack_stub import PaystackStub
+
+    stub = PaystackStub()
+    app = setup_app(tmp, 'reconcile-test.db', PAYSTACK_API_URL=stub.start(), PAYSTACK_SECRET_KEY='sk_test_reconcile',
+                    RECONCILE_RATE='1000/second')
+    return app, stub
+
+def seed(app, stub, tmp):
+    """Three pending Paystack donations an hour old and one pending bank transfer imported three days late"""
+    from importer import import_donations
+    from ledger import record_pending_donation
+    from models import db, Transaction
+    from money import Money
+
+    an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        for n in range(3):
+            record_pending_donation(f'BSF_reconcile_{n}', 1, Money(200000, 'NGN'), 'NGN', 1)
+        db.session.execute(db.update(Transaction).where(Transaction.transaction_id.like('BSF_reconcile_%'))
+                           .values(created_at=an_hour_ago))
+        db.session.commit()
+    stub.record('BSF_reconcile_0', status='success', amount=200000, currency='NGN', customer={'email': 'a@example.com'})
+    stub.record('BSF_reconcile_1', status='success', amount=210000, currency='NGN', customer={'email': 'b@example.com'})
+    stub.record('BSF_reconcile_2', status='failed', amount=200000, currency='NGN', customer={'email': 'c@example.com'})
+
+    path = os.path.join(tmp, 'transfers.csv')
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['reference', 'campaign_id', 'amount', 'currency', 'date', 'status', 'payment_method'])
+        writer.writerow(['TRF_pending_1', 2, '15000.00', 'NGN',
+                         (datetime.utcnow() - timedelta(days=3)).strftime('%Y-%m-%dT%H:%M:%S'), 'pending',
+                         'bank_transfer'])
+    with app.app_context():
+        import_donations(path, resume=False)
+        db.session.remove()
+
+def check_pending_donations_settled(app, stub, tmp):
+    """Verified successes complete and definitive failures close, in one pass"""
+    from models import db, Transaction
+    from reconcile import reconcile_pending
+
+    print("\n🔍 Testing a reconciliation pass...")
+    seed(app, stub, tmp)
+    totals = reconcile_pending(app)
+    with app.app_context():
+        statuses = {reference: status for reference, status in db.session.query(
+            Transaction.transaction_id, Transaction.status).filter(Transaction.transaction_id.like('BSF_reconcile_%'))}
+        second = db.session.scalar(db.select(Transaction.amount).where(Transaction.transaction_id == 'BSF_reconcile_1'))
+    ok = (totals['checked'] == 3 and totals['completed'] == 2 and totals['failed'] == 1
+          and statuses == {'BSF_reconcile_0': 'success', 'BSF_reconcile_1': 'success', 'BSF_reconcile_2': 'failed'}
+          and second == 210000)
+    print(f"{'✅' if ok else '❌'} {totals['checked']} checked: {totals['completed']} completed, "
+          f"{totals['failed']} failed")
+    return ok
+
+def check_offline_pending_left_alone(app, stub):
+    """A pending bank transfer past the give-up age is not verified, failed or counted as lag"""
+    from models import db, Transaction
+    from reconcile import reconcile_pending, reconcile_stats
+
+    print("\n🔍 Testing a pending imported bank transfer...")
+    verifies_before = stub.calls.get('verify', 0)
+    totals = reconcile_pending(app)
+    with app.app_context():
+        transfer = db.session.scalar(db.select(Transaction).where(Transaction.transaction_id == 'TRF_pending_1'))
+        status, error = transfer.status, transfer.last_verify_error
+    ok = (totals['checked'] == 0 and stub.calls.get('verify', 0) == verifies_before and status == 'pending'
+          and error is None and reconcile_stats()['lag_seconds'] == 0)
+    print(f"{'✅' if ok else '❌'} Transfer still {status}, {stub.calls.get('verify', 0) - verifies_before} "
+          f"Paystack calls, lag {reconcile_stats()['lag_seconds']:.0f}s")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Reconciliation Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app, stub = start_app(tmp)
+        results = [
+            check_pending_donations_settled(app, stub, tmp),
+            check_offline_pending_left_alone(app, stub)
+        ]
+        stub.shutdown()
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Test recurring pledges against the local Paystack stub and a throwaway
+database: a monthly donation starts a pledge, a scheduler pass charges tens
+of thousands of due pledges in batches, a charge whose outcome was lost is
+not charged twice, one the webhook recorded first is linked rather than
+blocking its batch, and repeated declines end in a lapsed pledge.
+"""
+import hashlib
+import hmac
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+from testing import setup_app
+
+PLEDGES = 20000
+SECRET = 'sk_test_recurring'
+
+def start_app(tmp):
+    """Start the stub and import the app against it and a temporary database (passes are run by the test)"""
+    from paystack_stub import PaystackStub
+
+    stub = PaystackStub(latency=0.002, decline_rate=0.05)
+    app = setup_app(tmp, 'recurring-test.db', PAYSTACK_API_URL=stub.start(), PAYSTACK_SECRET_KEY=SECRET,
+                    PAYSTACK_WEBHOOK_SECRET='', PLEDGE_CONCURRENCY=32, PLEDGE_CHARGE_RATE='10000/second')
+    return app, stub
+
+def check_monthly_donation_starts_pledge(app, stub):
+    """A verified donation with 'give monthly' stores the authorization once"""
+    from models import Pledge
+
+    print("\n🔍 Testing pledge creation on verification...")
+    client = app.test_client()
+    response = client.post('/process-donation', data={
+        'campaign_id': '1', 'email': 'monthly@example.com', 'amount': '5000', 'currency': 'NGN',
+        'recurring': 'monthly'})
+    reference = response.headers['Location'].rsplit('/', 1)[-1]
+    client.get(f'/paystack/callback?reference={reference}')
+    client.get(f'/paystack/callback?reference={reference}')
+    with app.app_context():
+        pledges = Pledge.query.filter_by(source_reference=reference).all()
+        ok = (len(pledges) == 1 and pledges[0].authorization_code.startswith('AUTH_')
+              and pledges[0].amount == 500000
+              and pledges[0].next_charge_at > datetime.utcnow() + timedelta(days=27))
+        print(f"{'✅' if ok else '❌'} {len(pledges)} pledge for {reference}, "
+              f"next charge {pledges[0].next_charge_at:%Y-%m-%d}" if pledges else "❌ No pledge created")
+    return ok
+
+def check_batched_pass(app, stub):
+    """Every due pledge is charged once; transactions and aggregates match"""
+    from sqlalchemy import func, insert
+    from models import db, Campaign, Pledge, Transaction
+    from recurring import charge_due_pledges
+
+    print(f"\n🔍 Testing a pass over {PLEDGES:,} due pledges...")
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(insert(Pledge), [{
+            'campaign_id': 1 + n % 3, 'email': f'donor{n}@example.com', 'amount': 100000 + n % 7 * 50000,
+            'currency': 'NGN', 'interval_months': 1, 'source_reference': f'BSF_seed_{n}',
+            'authorization_code': f'AUTH_seed_{n}', 'status': 'active', 'cycles': 0, 'failed_attempts': 0,
+            'next_charge_at': now - timedelta(minutes=n % 60), 'created_at': now - timedelta(days=31)
+        } for n in range(PLEDGES)])
+        db.session.commit()
+        raised_before = db.session.scalar(db.select(func.sum(Campaign.raised_amount)))
+        transactions_before = db.session.scalar(db.select(func.max(Transaction.id)))
+
+    charges_before = stub.calls.get('charge', 0)
+    started = time.perf_counter()
+    totals = charge_due_pledges(app)
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        raised_after = db.session.scalar(db.select(func.sum(Campaign.raised_amount)))
+        charged_sum = db.session.scalar(db.select(func.sum(Transaction.amount)).where(
+            Transaction.id > transactions_before, Transaction.status == 'success'))
+        recorded = db.session.scalar(db.select(func.count()).select_from(Transaction).where(
+            Transaction.id > transactions_before, Transaction.pledge_id.isnot(None)))
+        past_due = Pledge.query.filter_by(status='past_due').all()
+        still_due = db.session.scalar(db.select(func.count()).select_from(Pledge).where(
+            Pledge.next_charge_at <= datetime.utcnow()))
+
+    calls = stub.calls['charge'] - charges_before
+    ok = (totals['charged'] + totals['declined'] == PLEDGES and calls == PLEDGES and recorded == PLEDGES
+          and raised_after - raised_before == charged_sum and still_due == 0
+          and len(past_due) == totals['declined'] > 0
+          and all(p.next_charge_at > now + timedelta(hours=23) for p in past_due))
+    print(f"{'✅' if ok else '❌'} {totals['charged']:,} charged, {totals['declined']:,} declined "
+          f"in {elapsed:.1f}s ({PLEDGES / elapsed:,.0f} pledges/s), {calls:,} Paystack calls, "
+          f"{recorded:,} transactions")
+    return ok
+
+def check_lost_outcome_not_charged_twice(app, stub):
+    """A charge made but never recorded is found by its reference and recorded once"""
+    from models import db, Pledge, Transaction
+    from recurring import charge_due_pledges, charge_reference
+
+    print("\n🔍 Testing a charge whose outcome was lost...")
+    with app.app_context():
+        pledge = Pledge.query.filter_by(status='active').first()
+        pledge.next_charge_at = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+        reference = charge_reference(pledge)
+        pledge_id, cycles = pledge.id, pledge.cycles
+    # Paystack charged it, but the scheduler crashed before writing the batch
+    stub.record(reference, status='success', amount=100000, currency='NGN', customer={'email': 'x@example.com'})
+    charges_before = stub.calls.get('charge', 0)
+
+    totals = charge_due_pledges(app)
+    with app.app_context():
+        pledge = db.session.get(Pledge, pledge_id)
+        recorded = Transaction.query.filter_by(transaction_id=reference).count()
+        ok = (totals['charged'] == 1 and recorded == 1 and pledge.cycles == cycles + 1
+              and stub.calls['charge'] - charges_before == 1 and stub.calls.get('verify', 0) >= 1)
+    print(f"{'✅' if ok else '❌'} Duplicate reference verified and recorded once (cycle {cycles + 1})")
+    return ok
+
+def check_webhook_before_batch(app, stub):
+    """A charge the webhook recorded first is linked to its pledge, counted once, and blocks nothing"""
+    from sqlalchemy import func
+    from models import db, Campaign, Pledge, Transaction
+    from recurring import charge_due_pledges, charge_reference
+
+    print("\n🔍 Testing a webhook that lands before the batch...")
+    with app.app_context():
+        pledges = [Pledge(campaign_id=2, email=f'early{n}@example.com', amount=300000, currency='NGN',
+                          source_reference=f'BSF_seed_early_{n}', authorization_code=f'AUTH_early_{n}',
+                          next_charge_at=datetime.utcnow() - timedelta(minutes=1),
+                          created_at=datetime.utcnow() - timedelta(days=31)) for n in range(3)]
+        db.session.add_all(pledges)
+        db.session.commit()
+        pledge_ids = [pledge.id for pledge in pledges]
+        reference = charge_reference(pledges[0])
+        raised_before = db.session.scalar(db.select(func.sum(Campaign.raised_amount)))
+
+    # Paystack's charge.success for the first charge arrives before the scheduler writes its batch
+    payload = json.dumps({'event': 'charge.success', 'data': {
+        'reference': reference, 'status': 'success', 'amount': 300000, 'currency': 'NGN',
+        'metadata': {'campaign_id': 2, 'pledge_id': pledge_ids[0], 'cycle': 1}}}).encode()
+    signature = hmac.new(SECRET.encode(), payload, hashlib.sha512).hexdigest()
+    status = app.test_client().post('/paystack/webhook', data=payload, content_type='application/json',
+                                    headers={'X-Paystack-Signature': signature}).status_code
+    with app.app_context():
+        early_link = Transaction.query.filter_by(transaction_id=reference).one().pledge_id
+
+    decline_rate, stub.decline_rate = stub.decline_rate, 0.0
+    try:
+        totals = charge_due_pledges(app)
+    finally:
+        stub.decline_rate = decline_rate
+    with app.app_context():
+        cycles = [db.session.get(Pledge, pledge_id).cycles for pledge_id in pledge_ids]
+        rows = Transaction.query.filter_by(transaction_id=reference).all()
+        raised_after = db.session.scalar(db.select(func.sum(Campaign.raised_amount)))
+    ok = (status == 200 and early_link == pledge_ids[0] and totals['charged'] == 3 and cycles == [1, 1, 1]
+          and len(rows) == 1 and rows[0].pledge_id == pledge_ids[0] and raised_after - raised_before == 3 * 300000)
+    print(f"{'✅' if ok else '❌'} {totals['charged']} charged, cycles {cycles}, early charge linked to "
+          f"pledge {rows[0].pledge_id if rows else None}, raised +{raised_after - raised_before:,}")
+    return ok
+
+def check_declines_lapse(app, stub):
+    """Declines retry on the dunning schedule, then lapse; the donor is emailed twice"""
+    from models import db, OutboxMessage, Pledge
+    from recurring import charge_due_pledges
+
+    print("\n🔍 Testing dunning...")
+    with app.app_context():
+        pledge = Pledge(campaign_id=1, email='declined@example.com', amount=250000, currency='NGN',
+                        source_reference='BSF_seed_declined', authorization_code='AUTH_decline_1',
+                        next_charge_at=datetime.utcnow() - timedelta(minutes=1),
+                        created_at=datetime.utcnow() - timedelta(days=31))
+        db.session.add(pledge)
+        db.session.commit()
+        pledge_id = pledge.id
+
+    retries = len(app.config['PLEDGE_RETRY_DAYS'])
+    statuses = []
+    for _ in range(retries + 1):
+        charge_due_pledges(app)
+        with app.app_context():
+            pledge = db.session.get(Pledge, pledge_id)
+            statuses.append(pledge.status)
+            # Skip ahead to the next retry
+            pledge.next_charge_at = datetime.utcnow() - timedelta(minutes=1)
+            db.session.commit()
+
+    with app.app_context():
+        emails = OutboxMessage.query.filter_by(to_address='declined@example.com').all()
+        subjects = [message.subject for message in emails]
+    ok = (statuses == ['past_due'] * retries + ['lapsed'] and len(emails) == 2
+          and subjects[-1].endswith('has stopped'))
+    print(f"{'✅' if ok else '❌'} Statuses {statuses}, {len(emails)} dunning emails")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Recurring Pledges Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app, stub = start_app(tmp)
+        results = [
+            check_monthly_donation_starts_pledge(app, stub),
+            check_batched_pass(app, stub),
+            check_lost_outcome_not_charged_twice(app, stub),
+            check_webhook_before_batch(app, stub),
+            check_declines_lapse(app, stub)
+        ]
+        stub.shutdown()
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test donation reporting against a throwaway database: the rollups kept by
+every write path match the ledger (and a rebuild from it), the admin pages
+need the token, and exports stream every row as CSV and JSON lines.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from testing import setup_app
+
+TOKEN = 'admin-test-token'
+
+def seed(app, tmp):
+    """Donations through the callback path, the reconciler's bulk path and the importer"""
+    from importer import import_donations
+    from ledger import complete_donation, complete_donations, record_pending_donation
+    from models import db, Transaction
+    from money import Money
+
+    with app.app_context():
+        for n in range(12):
+            complete_donation(f'BSF_report_{n}', 100000 + n, 'NGN', 1 + n % 3)
+        for n in range(8):
+            record_pending_donation(f'BSF_pending_{n}', 1 + n % 2, Money(250000, 'NGN'), 'NGN', 1)
+        pending = Transaction.query.filter(Transaction.transaction_id.like('BSF_pending_%')).all()
+        complete_donations([(transaction, 260000, 'NGN') for transaction in pending[:5]])
+
+    # Offline donations over the last few months, in two currencies
+    path = os.path.join(tmp, 'offline.csv')
+    now = datetime.utcnow()
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['reference', 'campaign_id', 'amount', 'currency', 'date', 'status'])
+        for n in range(300):
+            date = now - timedelta(hours=7 * n)
+            writer.writerow([f'OFF_{n}', 1 + n % 3, f'{1000 + n}.50', 'USD' if n % 4 == 0 else 'NGN',
+                             date.strftime('%Y-%m-%dT%H:%M:%S'), 'failed' if n % 10 == 9 else 'success'])
+    with app.app_context():
+        import_donations(path, batch_size=64, resume=False)
+        db.session.remove()
+
+def ledger_buckets(grain):
+    """The same sums computed straight from the Transaction ledger"""
+    from ledger import period_start
+    from models import db, Transaction
+    buckets = {}
+    rows = db.session.query(Transaction.campaign_id, Transaction.currency, Transaction.amount,
+                            Transaction.completed_at).filter(Transaction.status == 'success')
+    for campaign_id, currency, amount, completed_at in rows:
+        key = (period_start(completed_at, grain), campaign_id, currency)
+        previous_amount, previous_count = buckets.get(key, (0, 0))
+        buckets[key] = (previous_amount + int(amount), previous_count + 1)
+    return buckets
+
+def rollup_table(grain):
+    from models import DonationRollup
+    return {(row.period_start, row.campaign_id, row.currency): (int(row.amount), row.donation_count)
+            for row in DonationRollup.query.filter_by(grain=grain)}
+
+def check_rollups_match_ledger(app, tmp):
+    """Incremental rollups equal the ledger at every grain, and equal a full rebuild"""
+    from models import db
+    from reporting import rebuild_rollups
+
+    print("\n🔍 Testing rollups against the ledger...")
+    seed(app, tmp)
+    with app.app_context():
+        incremental = {grain: rollup_table(grain) for grain in ('hour', 'day', 'month')}
+        expected = {grain: ledger_buckets(grain) for grain in ('hour', 'day', 'month')}
+        with db.engine.begin() as conn:
+            rebuilt_rows = rebuild_rollups(conn)
+        rebuilt = {grain: rollup_table(grain) for grain in ('hour', 'day', 'month')}
+    ok = incremental == expected == rebuilt and len(incremental['month']) > 3
+    sizes = ', '.join(f"{grain} {len(rows)}" for grain, rows in incremental.items())
+    print(f"{'✅' if ok else '❌'} Rollup rows ({sizes}) match the ledger; rebuild wrote {rebuilt_rows}")
+    return ok
+
+def check_admin_series(app):
+    """Admin pages need the token; the series sums the rollups per period"""
+    from models import Transaction
+    print("\n🔍 Testing the admin chart data...")
+    client = app.test_client()
+    anonymous = client.get('/admin/reports/series.json?grain=month')
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    response = client.get('/admin/reports/series.json?grain=month', headers=headers)
+    page = client.get('/admin/reports?grain=day', auth=('admin', TOKEN))
+    data = response.get_json()
+    with app.app_context():
+        expected_count = Transaction.query.filter(
+            Transaction.status == 'success',
+            Transaction.completed_at >= datetime.fromisoformat(data['periods'][0])).count()
+    ok = (anonymous.status_code == 401 and response.status_code == 200 and page.status_code == 200
+          and sum(data['donations']) == expected_count and set(data['currencies']) == {'NGN', 'USD'}
+          and response.headers['Cache-Control'] == 'private, no-store' and b'<svg' in page.data)
+    print(f"{'✅' if ok else '❌'} Anonymous {anonymous.status_code}; {len(data['periods'])} months, "
+          f"{sum(data['donations'])} donations, currencies {sorted(data['currencies'])}")
+    return ok
+
+def check_streamed_exports(app):
+    """CSV and JSONL exports stream every matching row in batches"""
+    from models import db, Transaction
+    print("\n🔍 Testing streamed exports...")
+    app.config['REPORT_EXPORT_BATCH_SIZE'] = 50
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    response = client.get('/admin/reports/export.csv', headers=headers)
+    chunks = list(response.response)
+    rows = list(csv.DictReader(io.StringIO(b''.join(chunk if isinstance(chunk, bytes) else chunk.encode()
+                                                    for chunk in chunks).decode())))
+    every = client.get('/admin/reports/export.jsonl?status=all&campaign_id=2', headers=headers)
+    records = [json.loads(line) for line in every.data.decode().splitlines()]
+    with app.app_context():
+        successes = Transaction.query.filter_by(status='success').count()
+        campaign_rows = Transaction.query.filter_by(campaign_id=2).count()
+        sample = db.session.get(Transaction, 1)
+    first = next(row for row in rows if row['reference'] == sample.transaction_id)
+    ok = (response.is_streamed and len(chunks) > successes // 50 and len(rows) == successes
+          and first['amount'] == f"{sample.amount // 100}.{sample.amount % 100:02d}"
+          and len(records) == campaign_rows and {record['campaign_id'] for record in records} == {2}
+          and rows == sorted(rows, key=lambda row: row['completed_at']))
+    print(f"{'✅' if ok else '❌'} CSV {len(rows)} rows in {len(chunks)} chunks; "
+          f"JSONL {len(records)} rows for campaign 2")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Reporting Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'reporting-test.db', ADMIN_TOKEN=TOKEN)
+        results = [
+            check_rollups_match_ledger(app, tmp),
+            check_admin_series(app),
+            check_streamed_exports(app)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test campaign share cards: cards are rendered in the background into a
+content-addressed directory and referenced by each campaign page's
+og:image, another worker reuses the files instead of rendering, and a new
+card is rendered only when progress crosses a bucket, while pages keep the
+previous card until it is ready.
+"""
+import os
+import re
+import tempfile
+import time
+from testing import setup_app
+
+def og_image(client, path):
+    return re.search(r'<meta property="og:image" content="([^"]+)"', client.get(path).data.decode()).group(1)
+
+def check_cards_on_pages(app):
+    """Nothing renders at import; after the first request each og:image is the campaign's cacheable card"""
+    from PIL import Image
+    from app import CAMPAIGNS, share_cards
+    print("\n🔍 Testing the rendered cards...")
+    idle_at_import = share_cards._pool is None and not share_cards._pending
+    client = app.test_client()
+    client.get('/healthz')
+    share_cards.wait()
+    urls = {campaign_id: og_image(client, f'/campaign/{campaign_id}') for campaign_id in CAMPAIGNS}
+    sizes = set()
+    for campaign_id in CAMPAIGNS:
+        with Image.open(share_cards.path_for(share_cards.card_key(campaign_id))) as card:
+            sizes.add(card.size)
+    card = client.get(urls[1].replace('http://localhost', ''))
+    home = og_image(client, '/')
+    ok = (idle_at_import and all(url.startswith('http://localhost/share/') for url in urls.values())
+          and len(set(urls.values())) == 3
+          and sizes == {(1200, 630)} and card.status_code == 200 and card.mimetype == 'image/jpeg'
+          and 'immutable' in card.headers['Cache-Control'] and home.startswith('http://localhost/static/images/'))
+    print(f"{'✅' if ok else '❌'} {len(urls)} campaign cards {sizes}; site pages use {home.rsplit('/', 1)[-1]}")
+    return ok
+
+def check_other_workers_reuse_files(app):
+    """A second worker reaching the same totals finds the cards on disk and renders nothing"""
+    from app import CAMPAIGNS, share_cards
+    from sharecards import ShareCards
+    print("\n🔍 Testing content-addressed reuse...")
+    other = ShareCards()
+    other.app = app
+    other.update(CAMPAIGNS)
+    ok = (not other._pending and other._pool is None
+          and all(other.card_key(campaign_id) == share_cards.card_key(campaign_id) for campaign_id in CAMPAIGNS))
+    print(f"{'✅' if ok else '❌'} Another worker picked up {len(other._current)} cards without a render pool")
+    return ok
+
+def check_bucket_thresholds(app):
+    """Small changes keep the card; crossing a bucket renders a new one off the request path"""
+    from app import CAMPAIGNS, share_cards
+    print("\n🔍 Testing bucket thresholds...")
+    client = app.test_client()
+    campaign = CAMPAIGNS[1]
+    before = share_cards.card_key(1)
+    step = app.config['SHARE_CARD_BUCKET'] * campaign['goal_amount'] // 100
+    campaign['raised_amount'] += step // 10
+    share_cards.update(CAMPAIGNS)
+    unchanged = share_cards.card_key(1) == before and not share_cards._pending
+
+    campaign['raised_amount'] += step
+    share_cards.update(CAMPAIGNS)
+    started = time.perf_counter()
+    during = og_image(client, '/campaign/1')
+    request_ms = (time.perf_counter() - started) * 1000
+    share_cards.wait()
+    after = og_image(client, '/campaign/1')
+    files = len(os.listdir(app.config['SHARE_CARD_DIR']))
+    ok = (unchanged and before in during and share_cards.card_key(1) != before
+          and share_cards.card_key(1) in after and files == 4
+          and os.path.exists(share_cards.path_for(before)))
+    print(f"{'✅' if ok else '❌'} New card after crossing a bucket; page served the old one in {request_ms:.0f} ms "
+          f"while it rendered; {files} card files")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Share Cards Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'sharecards-test.db', SHARE_CARD_DIR=os.path.join(tmp, 'cards'))
+        results = [
+            check_cards_on_pages(app),
+            check_other_workers_reuse_files(app),
+            check_bucket_thresholds(app)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
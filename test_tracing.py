@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test request tracing across a whole donation: form post, Paystack callback and
+success page, against a throwaway database with Paystack's HTTP API replaced
+by canned responses. Checks that all three requests share one trace and that
+Paystack, render and database spans are recorded.
+"""
+import os
+import tempfile
+import types
+from unittest import mock
+from testing import setup_app
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self._data
+
+def fake_paystack():
+    """Patch payments' HTTP client to answer initialize and verify like Paystack test mode.
+
+    Only the requests name inside payments is replaced, so the health prober
+    and every other module keep the real library.
+    """
+    import requests
+    state = {}
+
+    def post(url, json=None, **kwargs):
+        state['reference'] = json['reference']
+        state['amount'] = json['amount']
+        return FakeResponse({'status': True, 'data': {
+            'authorization_url': f"https://checkout.paystack.com/{json['reference']}",
+            'access_code': 'ACCESS_test'}})
+
+    def get(url, **kwargs):
+        return FakeResponse({'status': True, 'data': {
+            'status': 'success', 'amount': state['amount'], 'currency': 'NGN',
+            'metadata': {'campaign_id': 1, 'campaign_title': 'Test'},
+            'transaction_date': '2026-01-01T00:00:00Z',
+            'customer': {'email': 'donor@example.com'}}})
+
+    fake = types.SimpleNamespace(post=post, get=get, exceptions=requests.exceptions)
+    return mock.patch('payments.requests', fake)
+
+def run_donation(app):
+    client = app.test_client()
+    response = client.post('/process-donation', data={
+        'campaign_id': '1', 'email': 'donor@example.com', 'amount': '5000', 'currency': 'NGN'})
+    reference = response.headers['Location'].rsplit('/', 1)[-1]
+    client.get(f'/paystack/callback?reference={reference}')
+    client.get(f'/donate/success/{reference}')
+    app.extensions['tracer'].exporter.flush()
+    return reference
+
+def check_donation_is_one_trace(app, spans, reference):
+    """Form post, callback and success page land in the reference's trace"""
+    from tracing import reference_trace_id
+
+    print("\n🔍 Testing trace continuity across the redirect...")
+    roots = [s for s in spans if s['parent_id'] is None]
+    donation_roots = {s['name'] for s in roots if s['trace_id'] == reference_trace_id(reference)}
+    expected = {'POST /process-donation', 'GET /paystack/callback', 'GET /donate/success/<transaction_id>'}
+    if donation_roots == expected:
+        print("✅ 3 requests share one trace")
+        return True
+    print(f"❌ Requests in the donation trace: {donation_roots}")
+    return False
+
+def check_child_spans_are_recorded(app, spans, reference):
+    """Paystack calls, template renders and queries are children of their requests"""
+    print("\n🔍 Testing child spans...")
+    by_id = {s['span_id']: s for s in spans}
+    names = [s['name'] for s in spans if s['parent_id'] in by_id]
+    paystack = [n for n in names if n.startswith('paystack ')]
+    ok = (paystack.count('paystack POST /transaction/initialize') == 1
+          and paystack.count('paystack GET /transaction/verify') == 2
+          and 'render donate_success.html' in names
+          and any(n.startswith('db ') for n in names))
+    print(f"{'✅' if ok else '❌'} {len(paystack)} Paystack, "
+          f"{sum(n.startswith('render ') for n in names)} render, {sum(n.startswith('db ') for n in names)} db spans")
+    return ok
+
+def check_summary_shows_critical_path(spans):
+    """The CLI summary prints the donation trace with its critical path"""
+    import contextlib
+    import io
+    from tracing import summarize
+
+    print("\n🔍 Testing the summary...")
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        summarize(spans, top=1)
+    text = output.getvalue()
+    ok = 'outside the app' in text and 'paystack GET /transaction/verify' in text
+    print(f"{'✅' if ok else '❌'} Summary lists the donation's critical path")
+    return ok
+
+def main():
+    """Run all tests"""
+    print("🧪 Black Shepherd Foundation - Tracing Test")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(tmp, 'tracing-test.db', TRACING_EXPORTER='file',
+                        TRACING_FILE=os.path.join(tmp, 'traces.jsonl'), TRACING_EXPORT_INTERVAL=0.1,
+                        PAYSTACK_SECRET_KEY='sk_test_tracing')
+        with fake_paystack():
+            reference = run_donation(app)
+        from tracing import load_spans
+        spans = load_spans(os.environ['TRACING_FILE'])
+        results = [
+            check_donation_is_one_trace(app, spans, reference),
+            check_child_spans_are_recorded(app, spans, reference),
+            check_summary_shows_critical_path(spans)
+        ]
+
+    print("\n" + "=" * 50)
+    print(f"📋 {sum(results)}/{len(results)} tests passed")
+    return all(results)
+
+if __name__ == '__main__':
+    raise SystemExit(0 if main() else 1)
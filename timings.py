@@ -0,0 +1,51 @@
+"""
+Rolling latency windows for client- and server-side timings.
+
+Keeps the most recent samples per name in a bounded deque and summarises
+them as percentiles, so a busy endpoint costs constant memory.
+"""
+
+import threading
+from collections import deque
+
+class TimingWindow:
+    """Most recent `size` samples (milliseconds) with percentile summaries"""
+
+    def __init__(self, size=1000):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def add(self, duration_ms):
+        with self._lock:
+            self._samples.append(duration_ms)
+            self.total += 1
+
+    def summary(self):
+        """{'count', 'p50', 'p90', 'p99', 'max'} over the window (empty dict if no samples)"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))], 1)
+        return {'count': self.total, 'p50': percentile(50), 'p90': percentile(90),
+                'p99': percentile(99), 'max': round(samples[-1], 1)}
+
+_windows = {}
+_windows_lock = threading.Lock()
+
+def timing_window(name, size=1000):
+    """Process-wide TimingWindow for name"""
+    with _windows_lock:
+        window = _windows.get(name)
+        if window is None:
+            window = _windows[name] = TimingWindow(size)
+        return window
+
+def timing_summaries():
+    """Summaries of every window, keyed by name"""
+    with _windows_lock:
+        windows = dict(_windows)
+    return {name: window.summary() for name, window in windows.items()}
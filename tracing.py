@@ -0,0 +1,399 @@
+"""
+Lightweight request tracing.
+
+Every Flask request gets a root span, with child spans for Jinja renders,
+database queries and outbound Paystack calls. A donation crosses several
+requests (form post, Paystack redirect, callback, success page) plus the
+reconciler; once a request knows the Paystack reference, link_reference()
+moves its spans onto a trace id derived from that reference, so all of them
+land in one trace. An incoming W3C traceparent header takes precedence.
+
+Finished traces are handed to a background thread that exports them in
+batches to a JSON-lines file or an OTLP/HTTP collector. The queue is bounded;
+when it is full, spans are dropped and counted rather than held.
+
+    python tracing.py [trace_file] [--top 5]
+
+summarizes a trace file: time per span name, plus the critical path of the
+slowest traces.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_current = contextvars.ContextVar('current_span', default=None)
+_tracer = None
+# Static files and health checks would only add noise
+UNTRACED_ENDPOINTS = {'static', 'healthz', 'readyz'}
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+def _new_id(bits):
+    return f'{random.getrandbits(bits):0{bits // 4}x}'
+
+def reference_trace_id(reference):
+    """Trace id shared by every request and job that handles one donation"""
+    return hashlib.sha256(reference.encode()).hexdigest()[:32]
+
+class Trace:
+    """Spans of one unit of work (a request or job), exported together when its root ends"""
+
+    __slots__ = ('trace_id', 'remote', 'root', 'spans', 'dropped')
+
+    def __init__(self, trace_id=None, remote=False):
+        self.trace_id = trace_id or _new_id(128)
+        self.remote = remote
+        self.root = None
+        self.spans = []
+        self.dropped = 0
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {'trace_id': self.trace.trace_id, 'span_id': self.span_id, 'parent_id': self.parent_id,
+                'name': self.name, 'start_ns': self.start_ns, 'end_ns': self.end_ns,
+                'attributes': self.attributes, 'error': self.error}
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def start_span(name, attributes=None, trace=None):
+    """Start a span under the current one (a new root when there is none); return (span, token)"""
+    parent = _current.get()
+    if parent is not None:
+        span = Span(parent.trace, name, parent.span_id, attributes)
+    else:
+        span = Span(trace or Trace(), name, attributes=attributes)
+        span.trace.root = span
+    return span, _current.set(span)
+
+def end_span(span, token, error=None):
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = f'{type(error).__name__}: {error}'
+    _current.reset(token)
+    trace = span.trace
+    if len(trace.spans) < _tracer.max_spans:
+        trace.spans.append(span)
+    else:
+        trace.dropped += 1
+    if span is trace.root:
+        _tracer.exporter.submit(trace)
+
+@contextmanager
+def trace_span(name, **attributes):
+    """Time the block as a child of the current span (a root if there is none)"""
+    if _tracer is None or not _tracer.enabled:
+        yield NOOP_SPAN
+        return
+    span, token = start_span(name, attributes)
+    try:
+        yield span
+    except Exception as e:
+        end_span(span, token, e)
+        raise
+    end_span(span, token)
+
+def link_reference(reference):
+    """Put the current trace on the donation's trace id so its requests join up"""
+    span = _current.get()
+    if span is None or not reference:
+        return
+    if not span.trace.remote:
+        span.trace.trace_id = reference_trace_id(reference)
+    span.set('donation.reference', reference)
+
+class FileExporter:
+    """Append spans as JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, 'a') as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + '\n')
+
+class OTLPExporter:
+    """POST spans to an OTLP/HTTP collector (JSON encoding)"""
+
+    def __init__(self, endpoint, service_name):
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, bool):
+            return {'boolValue': value}
+        if isinstance(value, int):
+            return {'intValue': str(value)}
+        if isinstance(value, float):
+            return {'doubleValue': value}
+        return {'stringValue': str(value)}
+
+    def export(self, spans):
+        import requests
+
+        body = {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'blackshepherd.tracing'}, 'spans': [{
+                'traceId': span['trace_id'],
+                'spanId': span['span_id'],
+                'parentSpanId': span['parent_id'] or '',
+                'name': span['name'],
+                'kind': 2 if span['parent_id'] is None else 1,  # SERVER for roots, else INTERNAL
+                'startTimeUnixNano': str(span['start_ns']),
+                'endTimeUnixNano': str(span['end_ns']),
+                'attributes': [{'key': k, 'value': self._value(v)} for k, v in span['attributes'].items()],
+                'status': {'code': 2, 'message': span['error']} if span['error'] else {'code': 1},
+            } for span in spans]}],
+        }]}
+        response = requests.post(self.endpoint, json=body, timeout=10)
+        response.raise_for_status()
+
+class BatchExporter:
+    """Bounded queue of finished spans drained in batches by a per-process thread"""
+
+    def __init__(self, target, logger, queue_size, batch_size, interval):
+        self.target = target
+        self.logger = logger
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.exported = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # One thread per process, started after any fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(self.queue_size)
+                    self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def submit(self, trace):
+        self._ensure_thread()
+        spans = [span.to_dict() for span in trace.spans]
+        self.dropped += trace.dropped
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.target.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                self.logger.warning("Trace export failed, dropped %d spans: %s", len(batch), e)
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=5):
+        """Wait until everything queued has been exported or dropped (for tests and CLIs)"""
+        deadline = time.monotonic() + timeout
+        while self._queue is not None and self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def stats(self):
+        return {'queued': self._queue.qsize() if self._queue else 0,
+                'exported': self.exported, 'dropped': self.dropped}
+
+class Tracer:
+    """Tracing hooks bound to a Flask app"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.enabled = False
+        self.exporter = None
+        self.max_spans = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _tracer
+        self.app = app
+        app.extensions['tracer'] = self
+        config = app.config
+        self.enabled = config['TRACING_EXPORTER'] in ('file', 'otlp')
+        if not self.enabled:
+            return
+        if config['TRACING_EXPORTER'] == 'file':
+            target = FileExporter(config['TRACING_FILE'])
+        else:
+            target = OTLPExporter(config['TRACING_OTLP_ENDPOINT'], config['TRACING_SERVICE_NAME'])
+        self.exporter = BatchExporter(target, app.logger, config['TRACING_QUEUE_SIZE'],
+                                      config['TRACING_BATCH_SIZE'], config['TRACING_EXPORT_INTERVAL'])
+        self.max_spans = config['TRACING_MAX_SPANS']
+        _tracer = self
+
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._end_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._end_render, app)
+        event.listen(Engine, 'before_cursor_execute', self._start_query)
+        event.listen(Engine, 'after_cursor_execute', self._end_query)
+        event.listen(Engine, 'handle_error', self._query_error)
+
+    def _start_request(self):
+        if request.endpoint in UNTRACED_ENDPOINTS:
+            return
+        incoming = TRACEPARENT.match(request.headers.get('traceparent', ''))
+        trace = Trace(incoming.group(1), remote=True) if incoming else Trace()
+        span, token = start_span(f'{request.method} {request.url_rule.rule if request.url_rule else request.path}',
+                                 {'http.method': request.method, 'url.path': request.path}, trace)
+        if incoming:
+            span.parent_id = incoming.group(2)
+        g.trace_root = (span, token)
+
+    def _record_status(self, response):
+        root = g.get('trace_root')
+        if root:
+            root[0].set('http.status_code', response.status_code)
+        return response
+
+    def _end_request(self, exc):
+        root = g.pop('trace_root', None)
+        if root:
+            end_span(root[0], root[1], exc)
+
+    def _start_render(self, sender, template, context, **extra):
+        if _current.get() is not None:
+            g.setdefault('trace_renders', []).append(start_span(f'render {template.name}'))
+
+    def _end_render(self, sender, template, context, **extra):
+        renders = g.get('trace_renders')
+        if renders:
+            end_span(*renders.pop())
+
+    def _start_query(self, conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'SQL'
+        conn.info.setdefault('trace_queries', []).append(start_span(
+            f'db {operation}', {'db.system': conn.dialect.name, 'db.statement': statement[:300]}))
+
+    def _end_query(self, conn, cursor, statement, parameters, context, executemany):
+        queries = conn.info.get('trace_queries')
+        if queries:
+            end_span(*queries.pop())
+
+    def _query_error(self, context):
+        queries = context.connection.info.get('trace_queries') if context.connection else None
+        if queries:
+            end_span(*queries.pop(), context.original_exception)
+
+def load_spans(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def critical_path(span, children):
+    """[(span, depth)] of the spans that determined span's end, walking back from it"""
+    path = [(span, 0)]
+    cursor = span['end_ns']
+    chain = []
+    for child in sorted(children.get(span['span_id'], []), key=lambda s: s['end_ns'], reverse=True):
+        if child['end_ns'] <= cursor:
+            chain.append(child)
+            cursor = child['start_ns']
+    for child in reversed(chain):
+        path.extend((descendant, depth + 1) for descendant, depth in critical_path(child, children))
+    return path
+
+def summarize(spans, top=5):
+    def ms(span):
+        return (span['end_ns'] - span['start_ns']) / 1e6
+
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span['name'], []).append(ms(span))
+    print(f"⏱️  {len(spans)} spans in {len({s['trace_id'] for s in spans})} traces\n")
+    print(f"   {'span':<40} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>10}")
+    for name, durations in sorted(by_name.items(), key=lambda item: -sum(item[1]))[:20]:
+        durations.sort()
+        p50 = durations[len(durations) // 2]
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        print(f"   {name[:40]:<40} {len(durations):>6} {p50:>9.1f} {p95:>9.1f} {sum(durations):>10.1f}")
+
+    traces = {}
+    children = {}
+    for span in spans:
+        traces.setdefault(span['trace_id'], []).append(span)
+        if span['parent_id']:
+            children.setdefault(span['parent_id'], []).append(span)
+    known = {span['span_id'] for span in spans}
+
+    def duration(trace_spans):
+        return (max(s['end_ns'] for s in trace_spans) - min(s['start_ns'] for s in trace_spans)) / 1e6
+
+    slowest = sorted(traces.items(), key=lambda item: -duration(item[1]))[:top]
+    for trace_id, trace_spans in slowest:
+        roots = sorted((s for s in trace_spans if s['parent_id'] not in known), key=lambda s: s['start_ns'])
+        reference = next((s['attributes']['donation.reference'] for s in roots
+                          if 'donation.reference' in s['attributes']), None)
+        print(f"\n🧵 {trace_id} {duration(trace_spans):,.1f} ms" + (f" ({reference})" if reference else ""))
+        previous_end = None
+        for root in roots:
+            if previous_end is not None and root['start_ns'] > previous_end:
+                print(f"   ··· {(root['start_ns'] - previous_end) / 1e6:,.1f} ms outside the app")
+            for span, depth in critical_path(root, children):
+                error = f"  ❌ {span['error']}" if span['error'] else ''
+                print(f"   {'  ' * depth}{span['name'][:60]:<{62 - 2 * depth}} {ms(span):>9.1f} ms{error}")
+            previous_end = root['end_ns'] if previous_end is None else max(previous_end, root['end_ns'])
+
+if __name__ == '__main__':
+    import argparse
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Summarize exported trace spans')
+    parser.add_argument('path', nargs='?', default=Config.TRACING_FILE)
+    parser.add_argument('--top', type=int, default=5, help='slowest traces to show')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        raise SystemExit(f"❌ No trace file at {args.path} (set TRACING_EXPORTER=file)")
+    summarize(load_spans(args.path), args.top)
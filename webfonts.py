@@ -0,0 +1,173 @@
+"""
+Self-hosted, subset web fonts.
+
+Builds static/fonts/ and static/css/fonts.css in place of Google Fonts and
+the full Font Awesome stylesheet from cdnjs, keeping only:
+
+  - Inter (variable) for Latin text plus the naira sign, limited to the
+    400-800 weights main.css uses
+  - the Font Awesome 6.4 icons referenced in templates/ and static/js/, with
+    only the CSS rules those icons need
+
+Source fonts are downloaded once into .font-sources/ (or read from
+--sources). Run again after adding icons; then rebuild the critical CSS:
+
+    python webfonts.py [--sources DIR]
+"""
+
+import io
+import os
+import re
+import urllib.request
+
+from assets import file_hash
+from critical_css import filter_rules, split_rules
+
+INTER_URL = 'https://github.com/rsms/inter/raw/v4.0/docs/font-files/InterVariable.woff2'
+FONT_AWESOME_URL = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+SOURCES = {
+    'InterVariable.woff2': INTER_URL,
+    'fa-solid-900.woff2': f'{FONT_AWESOME_URL}/webfonts/fa-solid-900.woff2',
+    'fa-brands-400.woff2': f'{FONT_AWESOME_URL}/webfonts/fa-brands-400.woff2',
+    'all.css': f'{FONT_AWESOME_URL}/css/all.css',
+}
+
+# Google Fonts' "latin" range, plus the naira sign
+LATIN = ('U+0000-00FF, U+0131, U+0152-0153, U+02BB-02BC, U+02C6, U+02DA, U+02DC, U+0304, U+0308, '
+         'U+0329, U+2000-206F, U+2074, U+20A6, U+20AC, U+2122, U+2191, U+2193, U+2212, U+2215, '
+         'U+FEFF, U+FFFD')
+INTER_WEIGHTS = (400, 800)
+# Classes every icon needs, whichever style it uses
+ICON_BASE_CLASSES = {'fa', 'fas', 'fa-solid', 'fab', 'fa-brands', 'fa-classic'}
+ICON_CLASS = re.compile(r'\bfa-[a-z0-9-]+\b|\bfa[bs]?\b')
+
+def parse_unicode_range(value):
+    codepoints = set()
+    for part in value.split(','):
+        part = part.strip().upper().removeprefix('U+')
+        start, _, end = part.partition('-')
+        codepoints.update(range(int(start, 16), int(end or start, 16) + 1))
+    return codepoints
+
+def fetch_sources(directory):
+    """Download any missing source file into directory"""
+    os.makedirs(directory, exist_ok=True)
+    for name, url in SOURCES.items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            print(f"⬇️  {url}")
+            with urllib.request.urlopen(url, timeout=30) as response, open(path, 'wb') as f:
+                f.write(response.read())
+    return {name: os.path.join(directory, name) for name in SOURCES}
+
+def used_icon_classes(root):
+    """Font Awesome classes referenced in templates/ and static/js/"""
+    classes = set()
+    for directory in ('templates', os.path.join('static', 'js')):
+        for name in os.listdir(os.path.join(root, directory)):
+            if name.endswith(('.html', '.js')):
+                with open(os.path.join(root, directory, name)) as f:
+                    classes.update(ICON_CLASS.findall(f.read()))
+    return classes
+
+def icon_codepoints(rules, classes):
+    """Codepoints of the ::before content of the used icon classes"""
+    codepoints = set()
+    for prelude, body in rules:
+        if body is None or prelude.startswith('@'):
+            continue
+        for selector in prelude.split(','):
+            match = re.fullmatch(r'\s*\.(fa-[a-z0-9-]+)::?before\s*', selector)
+            if match and match.group(1) in classes:
+                content = re.search(r'content:\s*"\\([0-9a-fA-F]+)"', body)
+                if content:
+                    codepoints.add(int(content.group(1), 16))
+    return codepoints
+
+def subset_font(source, dest, codepoints, weights=None):
+    """Write a WOFF2 subset of source with only codepoints (and a clamped weight axis)"""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(source)
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.name_IDs = [1, 2]
+    options.notdef_outline = True
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+
+    if weights and 'fvar' in font:
+        from fontTools.varLib import instancer
+        axes = {axis.axisTag: axis for axis in font['fvar'].axes}
+        limits = {'wght': weights}
+        if 'opsz' in axes:
+            # Text optical size only, as Google Fonts serves by default
+            limits['opsz'] = axes['opsz'].defaultValue
+        font = instancer.instantiateVariableFont(font, limits)
+
+    buffer = io.BytesIO()
+    font.flavor = 'woff2'
+    font.save(buffer)
+    with open(dest, 'wb') as f:
+        f.write(buffer.getvalue())
+    return len(buffer.getvalue())
+
+def font_url(static_folder, name):
+    """Absolute fingerprinted URL, usable from inlined CSS as well as fonts.css"""
+    return f"/static/fonts/{name}?v={file_hash(os.path.join(static_folder, 'fonts', name))}"
+
+def build(root, sources):
+    """Write the subset fonts and fonts.css; return ({output name: bytes}, icon classes used)"""
+    static_folder = os.path.join(root, 'static')
+    fonts_dir = os.path.join(static_folder, 'fonts')
+    os.makedirs(fonts_dir, exist_ok=True)
+    sizes = {}
+
+    sizes['inter-latin.woff2'] = subset_font(sources['InterVariable.woff2'],
+                                             os.path.join(fonts_dir, 'inter-latin.woff2'),
+                                             parse_unicode_range(LATIN), INTER_WEIGHTS)
+
+    with open(sources['all.css']) as f:
+        rules = [rule for rule in split_rules(f.read()) if not rule[0].startswith('@font-face')]
+    classes = used_icon_classes(root)
+    codepoints = icon_codepoints(rules, classes)
+    for source, name in (('fa-solid-900.woff2', 'fa-solid.woff2'), ('fa-brands-400.woff2', 'fa-brands.woff2')):
+        sizes[name] = subset_font(sources[source], os.path.join(fonts_dir, name), codepoints)
+
+    icon_css = filter_rules(rules, {'tags': set(), 'classes': classes | ICON_BASE_CLASSES, 'ids': set()})
+    css = (
+        "/* Generated by webfonts.py - do not edit */\n"
+        "@font-face{font-family:'Inter';font-style:normal;"
+        f"font-weight:{INTER_WEIGHTS[0]} {INTER_WEIGHTS[1]};font-display:swap;"
+        f"src:url({font_url(static_folder, 'inter-latin.woff2')}) format('woff2');unicode-range:{LATIN}}}\n"
+        "@font-face{font-family:'Font Awesome 6 Free';font-style:normal;font-weight:900;font-display:block;"
+        f"src:url({font_url(static_folder, 'fa-solid.woff2')}) format('woff2')}}\n"
+        "@font-face{font-family:'Font Awesome 6 Brands';font-style:normal;font-weight:400;font-display:block;"
+        f"src:url({font_url(static_folder, 'fa-brands.woff2')}) format('woff2')}}\n"
+        f"{icon_css}\n"
+    )
+    with open(os.path.join(static_folder, 'css', 'fonts.css'), 'w') as f:
+        f.write(css)
+    sizes['fonts.css'] = len(css.encode())
+    return sizes, sorted(classes - ICON_BASE_CLASSES)
+
+if __name__ == '__main__':
+    import argparse
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Build self-hosted subset web fonts')
+    parser.add_argument('--sources', default=os.path.join(root, '.font-sources'),
+                        help='directory holding (or to download) the source fonts')
+    args = parser.parse_args()
+
+    sources = fetch_sources(args.sources)
+    original = sum(os.path.getsize(sources[name]) for name in SOURCES)
+    sizes, icons = build(root, sources)
+
+    print(f"🔤 Icons used: {', '.join(icons)}")
+    for name, size in sizes.items():
+        print(f"   {name:<20} {size:>8,} B")
+    print(f"📦 {sum(sizes.values()):,} B self-hosted, from {original:,} B of source fonts and CSS")
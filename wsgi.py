@@ -0,0 +1,13 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module builds everything the workers share (campaign totals,
+compiled templates, the asset manifest and FX rates) so that, with
+preload_app, it happens once in the gunicorn master before forking.
+"""
+
+from app import app, warm_up
+
+warm_up(before_fork=True)